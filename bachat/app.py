@@ -1,19 +1,53 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file
+import time
+import tracemalloc
+import random
+import threading
+from collections import OrderedDict
+from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, g, \
+    has_request_context
 from datetime import datetime, date, timedelta
 import mysql.connector
-from werkzeug.security import generate_password_hash, check_password_hash
+import mysql.connector.pooling
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
 import functools
+import contextlib
+import abc
+from concurrent.futures import ProcessPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import click
+import weakref
 from decimal import Decimal, ROUND_HALF_UP  # Import Decimal for precise arithmetic and rounding
 import json  # Import json for storing disbursement details
-from io import BytesIO  # For potential in-memory file handling, though direct file generation is limited
+import csv
+import itertools
+import pickle
+import re
+import secrets
+import shutil
+import sqlite3
+import tempfile
+import hashlib
+import gzip
+import zlib
+import mimetypes
+from io import BytesIO, StringIO, TextIOWrapper  # For potential in-memory file handling, though direct file generation is limited
+from werkzeug.datastructures import Headers, CallbackDict
+from flask.sessions import SessionInterface, SessionMixin
+from flask.json.tag import TaggedJSONSerializer
+from werkzeug.http import parse_accept_header
+from jinja2 import nodes, FileSystemBytecodeCache
+from jinja2.ext import Extension
+from markupsafe import Markup
+from xml.sax.saxutils import escape as xml_escape
 
 # Attempt to import report generation libraries. These might not be available in all environments.
 # If they are not installed, the application will still run, but export functionality will be conceptual.
 try:
-    from openpyxl import Workbook
+    from openpyxl import Workbook, load_workbook
     from openpyxl.styles import Font, Alignment, Border, Side
     from openpyxl.utils import get_column_letter
+    from openpyxl.cell import WriteOnlyCell
 
     EXCEL_AVAILABLE = True
 except ImportError:
@@ -31,6 +65,54 @@ except ImportError:
     print("reportlab not found. PDF export will be conceptual.")
     PDF_AVAILABLE = False
 
+# Optional: brotli variants of static files and image recompression are skipped without these.
+try:
+    import brotli
+
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+try:
+    from PIL import Image
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# Optional: only needed when CACHE_BACKEND is 'redis'.
+try:
+    import redis
+
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Optional: the columnar (Parquet) ledger export is unavailable without pyarrow.
+try:
+    import pyarrow
+    import pyarrow.parquet
+
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+# Optional: reports run on MySQL (never on a snapshot) without duckdb.
+try:
+    import duckdb
+
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+# Optional: the cash-flow forecast API is unavailable without numpy.
+try:
+    import numpy
+
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 # Import configuration from config.py
 from config import Config
 
@@ -41,11 +123,289 @@ app.config.from_object(Config)  # Load configuration from Config class
 DB_CONFIG = app.config['DB_CONFIG']
 
 
-# Context Processor to make datetime available in all templates
-@app.context_processor
-def inject_datetime():
-    """Makes the datetime object and date object available globally in all Jinja2 templates."""
-    return dict(datetime=datetime, date=date)
+class FragmentCacheExtension(Extension):
+    """
+    {% cache 'name', key, ... %}...{% endcache %} renders its body once per key and keeps the HTML
+    in the cache backend for FRAGMENT_CACHE_TTL seconds. The keys must cover everything the body
+    reads (e.g. the role for the navigation bar). A hash of the template source is part of the
+    cache key, so an edited template never picks up fragments rendered from the old one.
+    """
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        key_parts.insert(0, nodes.Const(f"{parser.name}:{_template_source_hash(parser.filename)}"))
+        call = self.call_method('_render_fragment', [nodes.List(key_parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_fragment(self, key_parts, caller):
+        if not app.config['FRAGMENT_CACHE_ENABLED']:
+            return caller()
+        key = "fragment:" + ":".join(str(part) for part in key_parts)
+        html = cache_backend.get(key)
+        if html is None:
+            html = str(caller())
+            cache_backend.set(key, html, app.config['FRAGMENT_CACHE_TTL'])
+        return Markup(html)
+
+
+def _template_source_hash(filename):
+    """Short hash of a template file, used to version its cached fragments."""
+    if not filename:
+        return 'nosource'
+    with open(filename, 'rb') as template_file:
+        return hashlib.sha1(template_file.read()).hexdigest()[:12]
+
+
+class LazyFileSystemBytecodeCache(FileSystemBytecodeCache):
+    """FileSystemBytecodeCache that creates its directory when it first stores a template, not at import."""
+
+    def dump_bytecode(self, bucket):
+        os.makedirs(self.directory, exist_ok=True)
+        super().dump_bytecode(bucket)
+
+
+# Compiled templates are kept on disk, so a new worker loads bytecode instead of parsing every
+# template again. Jinja checks the source checksum, so edited templates are recompiled.
+jinja_options = dict(app.jinja_options, extensions=[FragmentCacheExtension])
+if app.config['JINJA_BYTECODE_CACHE_DIR'] != '':
+    jinja_options['bytecode_cache'] = LazyFileSystemBytecodeCache(
+        app.config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_cache'))
+app.jinja_options = jinja_options
+
+# Make datetime and date available in all templates. They are environment globals rather than
+# a context processor, which would build a new dict on every render_template call.
+app.jinja_env.globals.update(datetime=datetime, date=date)
+
+
+# --- Static assets ---
+# At startup every file under static/ is read once and given a content-hash name
+# (css/style.css -> css/style.1a2b3c4d5e6f.css). url_for('static', ...) emits that name, and it
+# is served from memory with a one-year immutable Cache-Control, so browsers never ask again
+# until the file changes. Text files get gzip (and brotli) variants; images are recompressed and
+# scaled copies are made for STATIC_IMAGE_WIDTHS, e.g. url_for('static', filename='logo.jpg', width=160).
+STATIC_COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+STATIC_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _fingerprinted_name(filename, content, suffix=''):
+    stem, extension = os.path.splitext(filename)
+    return f"{stem}{suffix}.{hashlib.sha256(content).hexdigest()[:12]}{extension}"
+
+
+def _recompress_image(content, extension, width=None):
+    """Re-encodes an image, scaled down to width if given. Returns None when it would not help."""
+    image = Image.open(BytesIO(content))
+    if width:
+        if image.width <= width:
+            return None
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    output = BytesIO()
+    if extension in ('.jpg', '.jpeg'):
+        image.convert('RGB').save(output, 'JPEG', quality=app.config['STATIC_IMAGE_QUALITY'],
+                                  optimize=True, progressive=True)
+    else:
+        image.save(output, 'PNG', optimize=True)
+    data = output.getvalue()
+    return data if width or len(data) < len(content) else None
+
+
+def build_static_assets(static_folder):
+    """
+    Reads the static folder and returns (manifest, assets). manifest maps (filename, width) to the
+    fingerprinted name; assets maps a fingerprinted name to its mimetype and encoded variants.
+    """
+    manifest = {}
+    assets = {}
+    for directory, _, filenames in os.walk(static_folder):
+        for name in filenames:
+            path = os.path.join(directory, name)
+            filename = os.path.relpath(path, static_folder).replace(os.sep, '/')
+            extension = os.path.splitext(name)[1].lower()
+            with open(path, 'rb') as static_file:
+                content = static_file.read()
+            mimetype = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+
+            versions = {None: content}
+            if PIL_AVAILABLE and extension in STATIC_IMAGE_EXTENSIONS:
+                try:
+                    versions[None] = _recompress_image(content, extension) or content
+                    for width in app.config['STATIC_IMAGE_WIDTHS']:
+                        scaled = _recompress_image(content, extension, width)
+                        if scaled:
+                            versions[width] = scaled
+                except OSError as e:
+                    print(f"Could not recompress {filename}: {e}")
+
+            for width, data in versions.items():
+                variants = {'identity': data}
+                if extension in STATIC_COMPRESSIBLE_EXTENSIONS:
+                    gzipped = gzip.compress(data, 9, mtime=0)
+                    if len(gzipped) < len(data):
+                        variants['gzip'] = gzipped
+                    if BROTLI_AVAILABLE:
+                        brotli_data = brotli.compress(data, quality=11)
+                        if len(brotli_data) < len(data):
+                            variants['br'] = brotli_data
+                fingerprinted = _fingerprinted_name(filename, data, f".{width}w" if width else '')
+                manifest[(filename, width)] = fingerprinted
+                assets[fingerprinted] = {'mimetype': mimetype, 'variants': variants}
+    return manifest, assets
+
+
+if app.config['STATIC_FINGERPRINT']:
+    static_manifest, static_assets = build_static_assets(app.static_folder)
+else:
+    static_manifest, static_assets = {}, {}
+
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """Makes url_for('static', filename=...) emit the fingerprinted name (and pick a scaled image)."""
+    if endpoint != 'static':
+        return
+    width = values.pop('width', None)
+    fingerprinted = static_manifest.get((values.get('filename'), width))
+    if fingerprinted:
+        values['filename'] = fingerprinted
+
+
+def serve_static_file(filename):
+    """Serves fingerprinted files from memory, picking the best encoding the client accepts."""
+    asset = static_assets.get(filename)
+    if asset is None:
+        return app.send_static_file(filename)  # Plain names still work, with Flask's default caching
+    variants = asset['variants']
+    encoding = request.accept_encodings.best_match(
+        [encoding for encoding in ('br', 'gzip') if encoding in variants], default='identity')
+    response = app.response_class(variants[encoding], mimetype=asset['mimetype'])
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    if len(variants) > 1:
+        response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = f"public, max-age={app.config['STATIC_MAX_AGE']}, immutable"
+    return response
+
+
+app.view_functions['static'] = serve_static_file
+
+
+# --- Response compression ---
+# HTML pages and JSON responses are compressed on the way out (brotli when the client accepts it
+# and the package is installed, otherwise gzip). Responses that are already encoded (the static
+# variants above), binary downloads (xlsx, pdf), and bodies under COMPRESSION_MIN_SIZE are sent
+# as they are. Bodies without a Content-Length are compressed chunk by chunk as they stream.
+COMPRESSIBLE_MIMETYPES = frozenset(['text/html', 'text/plain', 'text/css', 'text/csv', 'text/javascript',
+                                    'application/javascript', 'application/json', 'application/xml',
+                                    'image/svg+xml'])
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses text responses according to Accept-Encoding."""
+
+    def __init__(self, wsgi_app, min_size, gzip_level, brotli_quality):
+        self.wsgi_app = wsgi_app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if BROTLI_AVAILABLE else ['gzip']
+
+    def __call__(self, environ, start_response):
+        encoding = parse_accept_header(environ.get('HTTP_ACCEPT_ENCODING', '')).best_match(self.encodings)
+        if encoding is None or environ['REQUEST_METHOD'] == 'HEAD':
+            return self.wsgi_app(environ, start_response)
+
+        response_start = {}
+
+        def capture_start_response(status, headers, exc_info=None):
+            response_start.update(status=status, headers=headers, exc_info=exc_info)
+            return lambda data: None  # The legacy write() callable is not used by Flask
+
+        body = self.wsgi_app(environ, capture_start_response)
+        status, headers = response_start['status'], Headers(response_start['headers'])
+        if not self._should_compress(status, headers):
+            start_response(status, headers.to_wsgi_list(), response_start['exc_info'])
+            return body
+        return CompressedBody(body, status, headers, encoding, start_response, self)
+
+    def _should_compress(self, status, headers):
+        if status[:3] in ('204', '206', '304') or 'Content-Encoding' in headers:
+            return False
+        if headers.get('Content-Type', '').split(';')[0].strip().lower() not in COMPRESSIBLE_MIMETYPES:
+            return False
+        if 'no-transform' in headers.get('Cache-Control', ''):
+            return False
+        content_length = headers.get('Content-Length')
+        return content_length is None or int(content_length) >= self.min_size
+
+    def compressor(self, encoding):
+        """Returns (compress_chunk, finish) for one response body."""
+        if encoding == 'br':
+            brotli_compressor = brotli.Compressor(quality=self.brotli_quality)
+            return (lambda chunk: brotli_compressor.process(chunk) + brotli_compressor.flush(),
+                    brotli_compressor.finish)
+        gzip_compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        return (lambda chunk: gzip_compressor.compress(chunk) + gzip_compressor.flush(zlib.Z_SYNC_FLUSH),
+                gzip_compressor.flush)
+
+
+class CompressedBody:
+    """
+    Response iterable for CompressionMiddleware. Chunks are read until min_size bytes are seen;
+    a body that ends before that is sent uncompressed, anything longer is compressed as it streams.
+    Each chunk is flushed, so a streamed page keeps arriving piece by piece.
+    """
+
+    def __init__(self, body, status, headers, encoding, start_response, middleware):
+        self.body = body
+        self.status = status
+        self.headers = headers
+        self.encoding = encoding
+        self.start_response = start_response
+        self.middleware = middleware
+
+    def __iter__(self):
+        chunks = iter(self.body)
+        buffered = []
+        buffered_size = 0
+        for chunk in chunks:
+            buffered.append(chunk)
+            buffered_size += len(chunk)
+            if buffered_size >= self.middleware.min_size:
+                break
+        else:
+            self.start_response(self.status, self.headers.to_wsgi_list())
+            yield b''.join(buffered)
+            return
+
+        self.headers['Content-Encoding'] = self.encoding
+        self.headers.remove('Content-Length')
+        self.headers['Vary'] = ', '.join(filter(None, [self.headers.get('Vary'), 'Accept-Encoding']))
+        etag = self.headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            self.headers['ETag'] = 'W/' + etag  # The compressed bytes are not the ones the tag was made for
+        self.start_response(self.status, self.headers.to_wsgi_list())
+
+        compress_chunk, finish = self.middleware.compressor(self.encoding)
+        yield compress_chunk(b''.join(buffered))
+        for chunk in chunks:
+            if chunk:
+                yield compress_chunk(chunk)
+        yield finish()
+
+    def close(self):
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
+
+if app.config['COMPRESSION_ENABLED']:
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, app.config['COMPRESSION_MIN_SIZE'],
+                                         app.config['COMPRESSION_GZIP_LEVEL'], app.config['COMPRESSION_BROTLI_QUALITY'])
+
 
 @app.template_filter('from_json')
 def from_json_filter(value):
@@ -58,2407 +418,6524 @@ def from_json_filter(value):
     return {}
 
 
+_db_pool = None  # Created lazily on first use so importing the app never needs a live database
+
+
+def get_db_pool():
+    """Returns the shared MySQL connection pool, creating it on first use."""
+    global _db_pool
+    if _db_pool is None:
+        _db_pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=app.config['DB_POOL_NAME'],
+            pool_size=app.config['DB_POOL_SIZE'],
+            pool_reset_session=app.config['DB_POOL_RESET_SESSION'],
+            **DB_CONFIG)
+    return _db_pool
+
+
+def checkout_connection(pool):
+    """
+    Takes a connection from pool. mysql.connector fails at once when every connection is in use;
+    this waits up to DB_POOL_CHECKOUT_TIMEOUT seconds for one to be returned first, so a burst of
+    requests queues briefly instead of failing.
+    """
+    deadline = time.monotonic() + app.config['DB_POOL_CHECKOUT_TIMEOUT']
+    while True:
+        try:
+            return pool.get_connection()
+        except mysql.connector.errors.PoolError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.01)
+
+
+# --- Read/write routing ---
+# Endpoints that never write. When a replica is configured (DB_REPLICA_CONFIG), their
+# connections come from the replica pool, so heavy reporting does not compete with approvals
+# and payments on the primary.
+READ_ONLY_ENDPOINTS = frozenset({
+    'dashboard', 'member_profile', 'reports', 'export_report', 'export_year_end_pack',
+    'loans', 'manage_members', 'manage_contributions', 'api_cash_flow_forecast', 'api_settings_simulation',
+})
+
+_replica_pool = None
+_replica_unavailable_until = 0.0  # time.monotonic() until which the replica is skipped after a failure
+
+
+def get_replica_pool():
+    """Returns the read replica connection pool, creating it on first use (None if no replica is configured)."""
+    global _replica_pool
+    if _replica_pool is None and app.config['DB_REPLICA_CONFIG']:
+        _replica_pool = mysql.connector.pooling.MySQLConnectionPool(
+            pool_name=app.config['DB_POOL_NAME'] + '_replica',
+            pool_size=app.config['DB_REPLICA_POOL_SIZE'],
+            pool_reset_session=app.config['DB_POOL_RESET_SESSION'],
+            **app.config['DB_REPLICA_CONFIG'])
+    return _replica_pool
+
+
+def _should_read_from_replica():
+    """True when the current request is a read-only route outside the user's read-your-writes window."""
+    if not app.config['DB_REPLICA_CONFIG'] or not has_request_context():
+        return False
+    if request.endpoint not in READ_ONLY_ENDPOINTS:
+        return False
+    last_write_at = session.get('last_write_at')
+    if last_write_at and time.time() - last_write_at < app.config['READ_YOUR_WRITES_SECONDS']:
+        return False
+    return time.monotonic() >= _replica_unavailable_until
+
+
 def get_db_connection():
-    """Establishes a connection to the MySQL database."""
+    """
+    Establishes a connection to the MySQL database (taken from the connection pool).
+    Read-only routes get a replica connection when possible and fall back to the primary.
+    """
+    global _replica_unavailable_until
+    if _should_read_from_replica():
+        try:
+            return get_replica_pool().get_connection()
+        except mysql.connector.errors.PoolError:
+            pass  # Replica pool momentarily exhausted: use the primary for this request only
+        except mysql.connector.Error as err:
+            _replica_unavailable_until = time.monotonic() + app.config['DB_REPLICA_RETRY_SECONDS']
+            print(f"Error connecting to read replica, using primary: {err}")
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = checkout_connection(get_db_pool())
+        if has_request_context():
+            note_commits(conn)
         return conn
     except mysql.connector.Error as err:
         print(f"Error connecting to database: {err}")
         return None
 
 
-# Modified login_required decorator to accept a list of roles
-def login_required(roles=None):
-    """Decorator to ensure user is logged in and has the required role(s)."""
+@app.after_request
+def start_read_your_writes_window(response):
+    """Keeps a user's reads on the primary for a short while after any request that may have written."""
+    if request.method == 'POST' and request.endpoint not in READ_ONLY_ENDPOINTS and 'user_id' in session:
+        session['last_write_at'] = time.time()
+    return response
 
-    def wrapper(view_func):
-        @functools.wraps(view_func)
-        def decorated_function(*args, **kwargs):
-            if 'user_id' not in session:
-                flash('Please log in to access this page.', 'danger')
-                return redirect(url_for('login'))
 
-            conn = get_db_connection()
-            if conn is None:
-                flash('Database connection error. Please try again later.', 'danger')
-                return redirect(url_for('login'))
+def note_commits(conn):
+    """Makes conn.commit() record in g that the request has written, once the commit succeeds."""
+    commit = conn.commit
 
-            cursor = conn.cursor(dictionary=True, buffered=True)
-            cursor.execute("SELECT role FROM users WHERE id = %s", (session['user_id'],))
-            user = cursor.fetchone()
-            cursor.close()  # Close cursor immediately after fetching
-            conn.close()
+    def commit_and_note():
+        commit()
+        g.committed_write = True
 
-            if not user:
-                session.pop('user_id', None)
-                flash('User not found. Please log in again.', 'danger')
-                return redirect(url_for('login'))
+    conn.commit = commit_and_note  # Only on this checkout: the pool hands out a new wrapper each time
 
-            # Check if roles are specified and if the user's role is in the allowed roles
-            if roles and user['role'] not in roles:
-                # Construct a user-friendly message for allowed roles
-                allowed_roles_str = ", ".join([r.capitalize() for r in roles])
-                flash(
-                    f'Access denied. You need to be one of the following roles: {allowed_roles_str} to view this page.',
-                    'danger')
-                return redirect(url_for('dashboard'))  # Redirect to their own dashboard
 
-            return view_func(*args, **kwargs)
+@app.after_request
+def invalidate_group_cache_after_write(response):
+    """A request that committed a write to a group drops the group's cached user rows and reports."""
+    if g.get('committed_write') and g.get('group_id') is not None:
+        invalidate_group_cache(g.group_id)
+    return response
 
-        return decorated_function
 
-    return wrapper
+# --- Prepared statement cache for hot queries ---
+# These few statements run on nearly every request. They are executed through
+# server-side prepared statements so MySQL parses each one only once per pooled
+# connection instead of on every call.
+HOT_QUERIES = {
+    'user_role': "SELECT role, group_id, data_version FROM users WHERE id = %s",
+    'loan_by_id': "SELECT id, group_id, user_id, amount, interest_rate, start_date, status FROM loans WHERE id = %s AND group_id = %s",
+    'loan_payment_summary': "SELECT SUM(amount_paid) as total_paid, SUM(interest_paid) as total_interest_paid_from_payments FROM loan_payments WHERE loan_id = %s",
+    'contribution_for_month': "SELECT * FROM contributions WHERE user_id = %s AND month = %s AND year = %s",
+    'group_settings': "SELECT default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day FROM bank_balance WHERE group_id = %s",
+}
 
+# Prepared cursors keyed by the underlying (physical) connection. Pooled connections
+# are thin wrappers that change on every checkout, so we look through to the real one.
+# Entries disappear automatically when the physical connection is garbage collected.
+_prepared_cursors = weakref.WeakKeyDictionary()
 
-@app.route('/')
-def index():
-    """Redirects to the login page."""
-    return redirect(url_for('login'))
 
+def _physical_connection(conn):
+    """Returns the real connection object behind a pooled connection wrapper."""
+    return getattr(conn, '_cnx', None) or conn
 
-@app.route('/login', methods=['GET', 'POST'])
-def login():
-    """Handles user login."""
-    if request.method == 'POST':
-        username = request.form['username']
-        password = request.form['password']
 
-        conn = get_db_connection()
-        if conn is None:
-            flash('Database connection error.', 'danger')
-            return render_template('login.html')
+def get_prepared_cursor(conn, query_name):
+    """Returns the cached prepared cursor for a named hot query on this connection."""
+    physical_conn = _physical_connection(conn)
+    cursors = _prepared_cursors.setdefault(physical_conn, {})
+    cursor = cursors.get(query_name)
+    if cursor is None:
+        cursor = physical_conn.cursor(prepared=True, dictionary=True)
+        cursors[query_name] = cursor
+    return cursor
 
-        # Use buffered=True for the cursor
-        cursor = conn.cursor(dictionary=True, buffered=True)
-        cursor.execute("SELECT id, username, password, role, name FROM users WHERE username = %s", (username,))
-        user = cursor.fetchone()
-        cursor.close()  # Close cursor immediately after fetching
-        conn.close()
 
-        # Added check to ensure user['password'] is not None or an empty string before hashing
-        if user and user['password'] and user['password'].strip() and check_password_hash(user['password'], password):
-            session['user_id'] = user['id']
-            session['username'] = user['username']
-            session['role'] = user['role']
-            session['name'] = user['name']
-            flash(f'Welcome, {user["name"]}!', 'success')
-            return redirect(url_for('dashboard'))
-        else:
-            flash('Invalid username or password.', 'danger')
-    return render_template('login.html')
+def run_hot_query(conn, query_name, params):
+    """
+    Executes a named hot query as a prepared statement and returns all rows as dictionaries.
+    The statement is prepared on first use and reused for later calls on the same connection.
+    """
+    operation = HOT_QUERIES[query_name]  # Same string object every time, so the cursor skips re-preparing
+    cursor = get_prepared_cursor(conn, query_name)
+    try:
+        cursor.execute(operation, params)
+    except mysql.connector.Error:
+        # The server may have dropped the statement (reconnect or session reset).
+        # Forget the cached cursor and prepare the statement again once.
+        _prepared_cursors.get(_physical_connection(conn), {}).pop(query_name, None)
+        cursor = get_prepared_cursor(conn, query_name)
+        cursor.execute(operation, params)
+    return cursor.fetchall()
+
+
+def run_hot_query_one(conn, query_name, params):
+    """Executes a named hot query and returns the first row (or None)."""
+    rows = run_hot_query(conn, query_name, params)
+    return rows[0] if rows else None
+
+
+# --- Compact rows for large result sets ---
+# A dictionary cursor builds one dict per row. For long listings and reports we
+# instead keep each row as a plain tuple and share a single column-name -> position
+# map across the whole result set. Rows still support row['col'], row.col (so the
+# templates work unchanged), .get(), 'col' in row and .items().
+class CompactRow:
+    """A lightweight, tuple-backed result row with named access."""
+    __slots__ = ('_index', '_values', '_extra')
+
+    def __init__(self, index, values):
+        self._index = index  # Shared dict: column name -> position in values
+        self._values = values  # Tuple of column values as returned by the cursor
+        self._extra = None  # Only created when a route adds or overwrites a field
+
+    def __getitem__(self, key):
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        return self._values[self._index[key]]
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
 
+    def __contains__(self, key):
+        return key in self._index or (self._extra is not None and key in self._extra)
 
-@app.route('/logout')
-def logout():
-    """Logs out the current user."""
-    session.pop('user_id', None)
-    session.pop('username', None)
-    session.pop('role', None)
-    session.pop('name', None)
-    flash('You have been logged out.', 'info')
-    return redirect(url_for('login'))
+    def __iter__(self):
+        return iter(self.keys())
 
+    def __len__(self):
+        return len(self.keys())
 
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    """Handles user registration (initially for President, then President can add members)."""
-    if request.method == 'POST':
-        name = request.form['name']
-        username = request.form['username']
-        email = request.form['email']
-        contact_number = request.form['contact_number']
-        pan_number = request.form['pan_number']
-        aadhar_number = request.form['aadhar_number']
-        password = request.form['password']
-        role = request.form.get('role', 'member')  # Default to 'member' if not specified
+    def __repr__(self):
+        return f"CompactRow({dict(self.items())!r})"
 
-        # Added server-side validation for password
-        if not password or not password.strip():  # Ensure password is not empty or just whitespace
-            flash('Password cannot be empty.', 'danger')
-            return render_template('register.html')
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
 
-        hashed_password = generate_password_hash(password)
+    def keys(self):
+        if self._extra is None:
+            return list(self._index)
+        return list(self._index) + [key for key in self._extra if key not in self._index]
 
-        conn = get_db_connection()
-        if conn is None:
-            flash('Database connection error.', 'danger')
-            return render_template('register.html')
+    def items(self):
+        # Returns a list (not a view) so callers may assign row[key] while looping
+        return [(key, self[key]) for key in self.keys()]
 
-        # Use buffered=True for the cursor
-        cursor = conn.cursor(buffered=True)
-        try:
-            cursor.execute(
-                "INSERT INTO users (name, username, email, contact_number, pan_number, aadhar_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                (name, username, email, contact_number, pan_number, aadhar_number, hashed_password, role)
-            )
-            conn.commit()
-            flash('Registration successful! Please log in.', 'success')
-            return redirect(url_for('login'))
-        except mysql.connector.Error as err:
-            if err.errno == 1062:  # Duplicate entry error
-                flash('Username, Email, PAN, or Aadhar number already exists.', 'danger')
-            else:
-                flash(f'An error occurred during registration: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
-    return render_template('register.html')
 
+def _column_index(cursor):
+    """Builds the shared column-name -> position map for a cursor's current result set."""
+    return {column[0]: position for position, column in enumerate(cursor.description or ())}
 
-@app.route('/dashboard')
-@login_required()
-def dashboard():
-    """Renders the appropriate dashboard based on user role."""
-    role = session.get('role')
-    user_id = session.get('user_id')
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('logout'))  # Redirect to logout if DB connection fails
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
 
-    # Initialize variables for president/secretary dashboard with default values
-    total_members = 0
-    total_loans = 0
-    total_contributions_this_month = Decimal('0.00')
-    total_interest_this_month = Decimal('0.00')
-    total_income_this_month = Decimal('0.00')
-    bank_balance = Decimal('0.00')
-    recent_activities = []
-    pending_contributions_count = 0  # New: for President/Secretary dashboard
+def fetch_compact_rows(cursor):
+    """Fetches all rows from a plain (non-dictionary) cursor as CompactRow objects."""
+    index = _column_index(cursor)
+    return [CompactRow(index, values) for values in cursor.fetchall()]
 
-    # Initialize variables for member dashboard with default values (if needed for a different path)
-    total_contributed = Decimal('0.00')
-    current_loans = []
-    pending_contribution = None
 
-    # Modified to allow both president and secretary to view the president dashboard
-    if role in ['president', 'secretary']:
-        # Get total members (count all users)
-        cursor.execute("SELECT COUNT(*) as total_members FROM users")
-        total_members = cursor.fetchone()['total_members']
+class StreamedRows:
+    """
+    Iterates an unbuffered cursor in batches, yielding CompactRow objects.
+    Only one batch is held in memory at a time. The first batch is fetched up front
+    so that '{% if rows %}' in a template still works. It can be iterated only once.
+    """
 
-        # Get total loans (approved)
-        cursor.execute("SELECT COUNT(*) as total_loans FROM loans WHERE status = 'approved'")
-        total_loans = cursor.fetchone()['total_loans']
+    def __init__(self, cursor, batch_size=None):
+        self._cursor = cursor
+        self._batch_size = batch_size or app.config['STREAM_BATCH_SIZE']
+        self._index = _column_index(cursor)
+        self._first_batch = self._fetch_batch()
 
-        # Get total contributions this month
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        cursor.execute(
-            "SELECT SUM(amount) as total_contributions FROM contributions WHERE month = %s AND year = %s AND is_paid = TRUE",
-            (current_month, current_year))
-        result_contributions = cursor.fetchone()
-        total_contributions_this_month = result_contributions['total_contributions'] if result_contributions and \
-                                                                                        result_contributions[
-                                                                                            'total_contributions'] is not None else Decimal(
-            '0.00')
+    def _fetch_batch(self):
+        return [CompactRow(self._index, values) for values in self._cursor.fetchmany(self._batch_size)]
 
-        # Get total interest collected this month
-        cursor.execute("""
-            SELECT SUM(lp.interest_paid) as total_interest_paid 
-            FROM loan_payments lp
-            JOIN loans l ON lp.loan_id = l.id
-            WHERE MONTH(lp.payment_date) = %s AND YEAR(lp.payment_date) = %s
-        """, (current_month, current_year))
-        result_interest = cursor.fetchone()
-        total_interest_this_month = result_interest['total_interest_paid'] if result_interest and result_interest[
-            'total_interest_paid'] is not None else Decimal('0.00')
+    def __bool__(self):
+        return bool(self._first_batch)
 
-        # Calculate total income for this month
-        total_income_this_month = total_contributions_this_month + total_interest_this_month
+    def __iter__(self):
+        batch, self._first_batch = self._first_batch, []
+        while batch:
+            yield from batch
+            batch = self._fetch_batch()
 
-        # Get bank balance
-        cursor.execute("SELECT balance FROM bank_balance WHERE id = 1")
-        result_balance = cursor.fetchone()
-        bank_balance = result_balance['balance'] if result_balance and result_balance[
-            'balance'] is not None else Decimal('0.00')
+    def close(self):
+        """Discards any rows the template did not read and closes the cursor."""
+        close_row_cursor(self._cursor)
 
-        # Get recent activities (e.g., last 5 contributions/loans)
-        cursor.execute("""
-            SELECT 'contribution' as type, u.name as member_name, c.amount, c.payment_date 
-            FROM contributions c JOIN users u ON c.user_id = u.id 
-            WHERE c.is_paid = TRUE ORDER BY c.payment_date DESC LIMIT 5
-        """)
-        recent_contributions = cursor.fetchall()
 
-        cursor.execute("""
-            SELECT 'loan' as type, u.name as member_name, l.amount, l.start_date 
-            FROM loans l JOIN users u ON l.user_id = u.id 
-            ORDER BY l.start_date DESC LIMIT 5
-        """)
-        recent_loans = cursor.fetchall()
+def close_row_cursor(cursor):
+    """
+    Closes a cursor from open_row_cursor(). An unbuffered cursor must have its unread rows
+    discarded first, or the connection cannot be used (or reset by the pool) again.
+    """
+    try:
+        cursor.fetchall()
+    except mysql.connector.Error:
+        pass  # Nothing left to read (or no statement ran)
+    cursor.close()
 
-        # Convert all dates to date objects for consistent comparison before sorting
-        for activity in recent_contributions:
-            if 'payment_date' in activity and isinstance(activity['payment_date'], datetime):
-                activity['payment_date'] = activity['payment_date'].date()
-        for activity in recent_loans:
-            if 'start_date' in activity and isinstance(activity['start_date'], datetime):
-                activity['start_date'] = activity['start_date'].date()
 
-        recent_activities = sorted(recent_contributions + recent_loans,
-                                   key=lambda x: x['payment_date'] if 'payment_date' in x else x['start_date'],
-                                   reverse=True)[:5]
+# --- Money (integer paise) ---
+# All money arithmetic (interest, fines, cash-note totals, balances) is done in whole
+# paise using plain Python integers. Values are converted from Decimal when read from
+# the database or a form (to_paise / Money.from_decimal) and back to Decimal when written
+# to the database or passed to a template (paise_to_decimal / money.to_decimal()).
+# Loops over many rows work on the ints directly; Money wraps them for request-level code.
+# Rounding rule: every result is rounded to the nearest paisa, halves away from zero,
+# which is the same as Decimal's ROUND_HALF_UP.
+def _divide_half_up(numerator, denominator):
+    """Integer division (positive denominator) rounded to the nearest whole number, halves away from zero."""
+    if numerator >= 0:
+        return (numerator * 2 + denominator) // (denominator * 2)
+    return -((denominator - numerator * 2) // (denominator * 2))
 
-        cursor.close()
-        conn.close()
-        return render_template('president_dashboard.html',
-                               total_members=total_members,
-                               total_loans=total_loans,
-                               total_contributions_this_month=total_contributions_this_month,  # Updated variable name
-                               total_interest_this_month=total_interest_this_month,  # New variable
-                               total_income_this_month=total_income_this_month,  # New variable
-                               bank_balance=bank_balance,
-                               recent_activities=recent_activities,
-                               pending_contributions_count=pending_contributions_count)  # Pass pending count
 
-    elif role == 'member':  # Only 'member' role for this block now
-        # Member dashboard
-        # Get user's total contributions
-        cursor.execute(
-            "SELECT SUM(amount) as total_contributed FROM contributions WHERE user_id = %s AND is_paid = TRUE",
-            (user_id,))
-        result_contributed = cursor.fetchone()
-        total_contributed = result_contributed['total_contributed'] if result_contributed and result_contributed[
-            'total_contributed'] is not None else Decimal('0.00')
+@functools.lru_cache(maxsize=256)
+def _rate_as_fraction(rate_percent):
+    """Exact (numerator, denominator) of an interest rate. A group only uses a handful of rates."""
+    return Decimal(rate_percent).as_integer_ratio()
 
-        # Get user's current loans
-        cursor.execute("SELECT * FROM loans WHERE user_id = %s AND status IN ('approved', 'overdue')", (user_id,))
-        current_loans = cursor.fetchall()
 
-        # Get user's pending contributions for current month
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        cursor.execute("""
-            SELECT * FROM contributions 
-            WHERE user_id = %s AND month = %s AND year = %s AND is_paid = FALSE
-        """, (user_id, current_month, current_year))
-        pending_contribution = cursor.fetchone()
+def to_paise(value):
+    """Converts a Decimal, int or numeric string in rupees to whole paise (None counts as zero)."""
+    if value is None:
+        return 0
+    numerator, denominator = (value if type(value) is Decimal else Decimal(value)).as_integer_ratio()
+    paise, remainder = divmod(numerator * 100, denominator)
+    if remainder:  # More than two decimal places: round the extra digits
+        paise = _divide_half_up(numerator * 100, denominator)
+    return paise
 
-        cursor.close()
-        conn.close()
-        return render_template('member_dashboard.html',
-                               total_contributed=total_contributed,
-                               current_loans=current_loans,
-                               pending_contribution=pending_contribution,
-                               is_president=(role == 'president'))  # Pass this for conditional rendering
 
-    else:
-        flash('Unknown role.', 'danger')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('login'))
+def paise_to_decimal(paise):
+    """Returns whole paise as a two-place Decimal amount in rupees."""
+    return Decimal(paise).scaleb(-2)
 
 
-@app.route('/members')
-@login_required(roles=['president', 'secretary'])  # Allow secretary to manage members
-def manage_members():
-    """Displays a list of all members for the President/Secretary to manage."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('manage_members'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
-    cursor.execute("SELECT id, name, username, email, contact_number, role FROM users ORDER BY id")
-    members = cursor.fetchall()
-    cursor.close()
-    conn.close()
-    return render_template('manage_members.html', members=members)
+def interest_paise(paise, annual_rate_percent, periods=1, periods_per_year=12):
+    """
+    Simple interest in paise on an amount in paise for a number of periods at an annual
+    percentage rate, e.g. one month: interest_paise(p, rate), or N days: interest_paise(p, rate, N, 365).
+    The rate is taken as an exact fraction, so nothing is lost before the single rounding to paise.
+    """
+    rate_numerator, rate_denominator = _rate_as_fraction(annual_rate_percent)
+    return _divide_half_up(paise * rate_numerator * periods, rate_denominator * 100 * periods_per_year)
 
 
-@app.route('/add_member', methods=['GET', 'POST'])
-@login_required(roles=['president', 'secretary'])  # Allow secretary to add members
-def add_member():
-    """Allows President/Secretary to add new members."""
-    if request.method == 'POST':
-        name = request.form['name']
-        username = request.form['username']
-        email = request.form['email']
-        contact_number = request.form['contact_number']
-        pan_number = request.form['pan_number']
-        aadhar_number = request.form['aadhar_number']
-        password = request.form['password']
-        role = request.form.get('role', 'member')  # President/Secretary can specify role for new user
+def _new_money(paise):
+    """Builds a Money from an int without going through __init__ (used by the arithmetic below)."""
+    money = _object_new(Money)
+    money.paise = paise
+    return money
 
-        # Added server-side validation for password
-        if not password or not password.strip():  # Ensure password is not empty or just whitespace
-            flash('Password cannot be empty.', 'danger')
-            return render_template('register.html')
 
-        hashed_password = generate_password_hash(password)
+_object_new = object.__new__
 
-        conn = get_db_connection()
-        if conn is None:
-            flash('Database connection error.', 'danger')
-            return render_template('add_member.html')
 
-        # Use buffered=True for the cursor
-        cursor = conn.cursor(buffered=True)
-        try:
-            cursor.execute(
-                "INSERT INTO users (name, username, email, contact_number, pan_number, aadhar_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                (name, username, email, contact_number, pan_number, aadhar_number, hashed_password, role)
-            )
-            conn.commit()
-            flash(f'{name} added successfully as a {role}!', 'success')
-            return redirect(url_for('manage_members'))
-        except mysql.connector.Error as err:
-            if err.errno == 1062:
-                flash('Username, Email, PAN, or Aadhar number already exists.', 'danger')
-            else:
-                flash(f'An error occurred: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
-    return render_template('add_member.html')
+def _paise_of(other):
+    """Paise of the other operand of a Money operation: Money, or whole/Decimal rupees."""
+    if type(other) is Money:
+        return other.paise
+    if type(other) is int or type(other) is Decimal:
+        return to_paise(other)
+    raise TypeError(f"cannot combine Money with {type(other).__name__}")
 
 
-@app.route('/edit_member/<int:member_id>', methods=['GET', 'POST'])
-@login_required(roles=['president', 'secretary'])  # Allow secretary to edit members
-def edit_member(member_id):
-    """Allows President/Secretary to edit member details."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('manage_members'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
+class Money:
+    """A fixed-point rupee amount stored as an integer number of paise."""
+    __slots__ = ('paise',)
 
-    if request.method == 'POST':
-        name = request.form['name']
-        username = request.form['username']
-        email = request.form['email']
-        contact_number = request.form['contact_number']
-        pan_number = request.form['pan_number']
-        aadhar_number = request.form['aadhar_number']
-        role = request.form['role']
-        password = request.form.get('password')  # Optional password change
+    def __init__(self, paise=0):
+        self.paise = int(paise)
 
-        try:
-            if password:
-                # Only hash and update password if it's provided and not empty
-                if not password.strip():  # Check for empty string or just whitespace
-                    flash('Password cannot be empty if you choose to change it.', 'danger')
-                    # Re-fetch member data to display the form correctly again
-                    cursor.execute(
-                        "SELECT id, name, username, email, contact_number, pan_number, aadhar_number, role FROM users WHERE id = %s",
-                        (member_id,))
-                    member = cursor.fetchone()
-                    cursor.close()
-                    conn.close()
-                    return render_template('edit_member.html', member=member)
-                hashed_password = generate_password_hash(password)
-                cursor.execute(
-                    "UPDATE users SET name=%s, username=%s, email=%s, contact_number=%s, pan_number=%s, aadhar_number=%s, password=%s, role=%s WHERE id=%s",
-                    (name, username, email, contact_number, pan_number, aadhar_number, hashed_password, role, member_id)
-                )
-            else:
-                cursor.execute(
-                    "UPDATE users SET name=%s, username=%s, email=%s, contact_number=%s, pan_number=%s, aadhar_number=%s, role=%s WHERE id=%s",
-                    (name, username, email, contact_number, pan_number, aadhar_number, role, member_id)
-                )
-            conn.commit()
-            flash(f'Member {name} updated successfully!', 'success')
-            return redirect(url_for('manage_members'))
-        except mysql.connector.Error as err:
-            if err.errno == 1062:
-                flash('Username, Email, PAN, or Aadhar number already exists.', 'danger')
-            else:
-                flash(f'An error occurred: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
+    @classmethod
+    def from_decimal(cls, value):
+        """Converts a Decimal, int or numeric string in rupees to Money (None counts as zero)."""
+        if type(value) is Money:
+            return value
+        return _new_money(to_paise(value))
 
-    # GET request: Display member details for editing
-    cursor.execute(
-        "SELECT id, name, username, email, contact_number, pan_number, aadhar_number, role FROM users WHERE id = %s",
-        (member_id,))
-    member = cursor.fetchone()
-    cursor.close()  # Close cursor immediately after fetching
-    conn.close()
-    if not member:
-        flash('Member not found.', 'danger')
-        return redirect(url_for('manage_members'))
-    return render_template('edit_member.html', member=member)
+    def to_decimal(self):
+        """Returns the amount in rupees as a two-place Decimal (for SQL parameters and templates)."""
+        return Decimal(self.paise).scaleb(-2)
 
+    def interest(self, annual_rate_percent, periods=1, periods_per_year=12):
+        """Simple interest on this amount; see interest_paise()."""
+        return _new_money(interest_paise(self.paise, annual_rate_percent, periods, periods_per_year))
 
-@app.route('/delete_member/<int:member_id>', methods=['POST'])
-@login_required(roles=['president', 'secretary'])  # Allow secretary to delete members
-def delete_member(member_id):
-    """Allows President/Secretary to delete a member."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('manage_members'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(buffered=True)
-    try:
-        cursor.execute("DELETE FROM users WHERE id = %s", (member_id,))
-        conn.commit()
-        flash('Member deleted successfully!', 'success')
-    except mysql.connector.Error as err:
-        flash(f'An error occurred: {err}', 'danger')
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
-    return redirect(url_for('manage_members'))
+    def __add__(self, other):
+        return _new_money(self.paise + _paise_of(other))
 
+    __radd__ = __add__  # Lets sum() start from 0
 
-@app.route('/member_profile/<int:user_id>')
-@login_required()  # Any logged-in user can view their own profile, president can view any
-def member_profile(user_id):
-    """Displays a member's profile and records."""
-    current_user_id = session.get('user_id')
-    current_user_role = session.get('role')
+    def __sub__(self, other):
+        return _new_money(self.paise - _paise_of(other))
 
-    # Allow president or secretary to view any profile, but members can only view their own
-    if current_user_role not in ['president', 'secretary'] and current_user_id != user_id:
-        flash('You are not authorized to view this profile.', 'danger')
-        return redirect(url_for('dashboard'))
+    def __rsub__(self, other):
+        return _new_money(_paise_of(other) - self.paise)
 
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
+    def __mul__(self, count):
+        if type(count) is not int:
+            return NotImplemented  # Only whole-number multiples, e.g. note counts
+        return _new_money(self.paise * count)
 
-    # Get user details
-    cursor.execute(
-        "SELECT id, name, username, email, contact_number, pan_number, aadhar_number, role FROM users WHERE id = %s",
-        (user_id,))
-    user_profile = cursor.fetchone()
-    if not user_profile:
-        flash('User not found.', 'danger')
-        cursor.close()  # Close cursor before returning
-        conn.close()
-        return redirect(url_for('dashboard'))
+    __rmul__ = __mul__
 
-    # Get contributions history
-    cursor.execute("SELECT * FROM contributions WHERE user_id = %s ORDER BY year DESC, month DESC", (user_id,))
-    contributions = cursor.fetchall()
+    def __neg__(self):
+        return _new_money(-self.paise)
 
-    # Get loan history
-    cursor.execute("SELECT * FROM loans WHERE user_id = %s ORDER BY start_date DESC", (user_id,))
-    loans = cursor.fetchall()
+    def __eq__(self, other):
+        try:
+            return self.paise == _paise_of(other)
+        except TypeError:
+            return NotImplemented  # e.g. None: never equal to an amount
 
-    # Get loan payments for each loan
-    for loan in loans:
-        cursor.execute("SELECT * FROM loan_payments WHERE loan_id = %s ORDER BY payment_date DESC", (loan['id'],))
-        loan['payments'] = cursor.fetchall()
+    def __hash__(self):
+        return hash(self.paise)
 
-    cursor.close()  # Close cursor after all fetches
-    conn.close()
-    return render_template('member_profile.html', user_profile=user_profile, contributions=contributions, loans=loans)
+    def __lt__(self, other):
+        return self.paise < _paise_of(other)
 
+    def __le__(self, other):
+        return self.paise <= _paise_of(other)
 
-@app.route('/contributions', methods=['GET', 'POST'])
-@login_required()
-def contributions():
-    """Handles contribution payments and displays history."""
-    user_id = session.get('user_id')
-    role = session.get('role')
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
+    def __gt__(self, other):
+        return self.paise > _paise_of(other)
 
-    # Get default contribution amount and payment period for display
-    default_contribution_amount = Decimal('0.00')
-    payment_start_day = 1
-    payment_end_day = 7
-    default_fine_amount = Decimal('0.00')  # Initialize
-    try:
-        cursor.execute(
-            "SELECT default_contribution_amount, payment_start_day, payment_end_day, default_fine_amount FROM bank_balance WHERE id = 1")
-        settings = cursor.fetchone()
-        if settings:
-            if settings['default_contribution_amount'] is not None:
-                default_contribution_amount = settings['default_contribution_amount']
-            if settings['payment_start_day'] is not None:
-                payment_start_day = settings['payment_start_day']
-            if settings['payment_end_day'] is not None:
-                payment_end_day = settings['payment_end_day']
-            if settings['default_fine_amount'] is not None:
-                default_fine_amount = settings['default_fine_amount']
-    except Exception as e:
-        print(f"Could not fetch default contribution amount or payment period: {e}")
+    def __ge__(self, other):
+        return self.paise >= _paise_of(other)
 
-    # Calculate current fine amount based on today's date
-    current_day_of_month = datetime.now().day
-    current_fine_amount = Decimal('0.00')
-    # Fine applies if current day is past the end day, regardless of role
-    if current_day_of_month > payment_end_day:
-        current_fine_amount = default_fine_amount
+    def __bool__(self):
+        return self.paise != 0
 
-    # Calculate total monthly loan interest due for all active loans of the user
-    total_monthly_loan_interest_due = Decimal('0.00')
-    cursor.execute(
-        "SELECT id, amount, interest_rate, start_date FROM loans WHERE user_id = %s AND status IN ('approved', 'overdue')",
-        (user_id,))
-    active_loans = cursor.fetchall()
+    def __float__(self):
+        return self.paise / 100  # Display only; never use floats for arithmetic
 
-    for loan in active_loans:
-        cursor.execute(
-            "SELECT SUM(amount_paid) as total_paid, SUM(interest_paid) as total_interest_paid_from_payments FROM loan_payments WHERE loan_id = %s",
-            (loan['id'],))
-        payment_summary = cursor.fetchone()
-        total_paid_on_loan = payment_summary['total_paid'] if payment_summary and payment_summary[
-            'total_paid'] is not None else Decimal('0.00')
-        total_interest_paid_on_loan = payment_summary['total_interest_paid_from_payments'] if payment_summary and \
-                                                                                              payment_summary[
-                                                                                                  'total_interest_paid_from_payments'] is not None else Decimal(
-            '0.00')
+    def __format__(self, format_spec):
+        return format(self.to_decimal(), format_spec)
 
-        outstanding_principal_on_loan = loan['amount'] - (total_paid_on_loan - total_interest_paid_on_loan)
+    def __str__(self):
+        return str(self.to_decimal())
 
-        # Calculate interest for the current month based on outstanding principal
-        if outstanding_principal_on_loan > 0:
-            # Determine the start date for interest calculation for this month
-            # This is a simplified approach, a real system would need more robust amortization
-            # For simplicity, we'll calculate monthly interest on the current outstanding principal.
-            monthly_interest_rate_for_loan = loan['interest_rate'] / Decimal('100') / Decimal('12')
-            monthly_interest_due_for_this_loan = (
-                        outstanding_principal_on_loan * monthly_interest_rate_for_loan).quantize(Decimal('0.01'),
-                                                                                                 rounding=ROUND_HALF_UP)
-            total_monthly_loan_interest_due += monthly_interest_due_for_this_loan
+    def __repr__(self):
+        return f"Money('{self.to_decimal()}')"
 
-    # Calculate the total amount to pay (contribution + fine + loan interest)
-    total_amount_to_pay = (
-                default_contribution_amount + current_fine_amount + total_monthly_loan_interest_due).quantize(
-        Decimal('0.01'), rounding=ROUND_HALF_UP)
 
-    if request.method == 'POST':
-        # The amount will be taken from the hidden input, which is pre-filled with total_amount_to_pay
-        amount_from_form = request.form.get('amount')  # This should be total_amount_to_pay
-        utr_number = request.form.get('utr_number', '').strip()
+def open_row_cursor(conn):
+    """
+    Returns the cursor used for list and report queries. When STREAM_LARGE_RESULTS is on,
+    the cursor is unbuffered so rows are pulled from the server as they are consumed.
+    """
+    return conn.cursor(buffered=not app.config['STREAM_LARGE_RESULTS'])
+
+
+# --- Shared cache backend ---
+# Group settings, user rows, report results and rendered fragments go through one cache backend,
+# chosen by CACHE_BACKEND. 'memory' keeps entries inside each worker; 'redis' shares them between
+# all workers and nodes. Entries are tagged with the version of a namespace (e.g. 'group:3') when
+# they are stored. Bumping the namespace turns every older entry into a miss, in every worker that
+# shares the backend, without having to know or delete the individual keys.
+class CacheBackend(abc.ABC):
+    """Interface shared by the cache backends. Values must be picklable."""
+    shared = False  # True when all workers see the same entries and namespace versions
+
+    @abc.abstractmethod
+    def get(self, key):
+        """Returns the value stored under key, or None."""
+
+    @abc.abstractmethod
+    def set(self, key, value, ttl):
+        """Stores value under key for ttl seconds."""
+
+    @abc.abstractmethod
+    def delete(self, key):
+        """Removes key if present."""
+
+    @abc.abstractmethod
+    def get_version(self, namespace):
+        """Returns the current version of namespace."""
+
+    @abc.abstractmethod
+    def bump_version(self, namespace):
+        """Moves namespace to a new version, so every entry stored under the old one misses."""
+
+    def get_versioned(self, namespace, key):
+        """
+        Returns (value, version). value is None on a miss or when the entry was stored under an
+        older namespace version. Pass version back to set_versioned after recomputing the value,
+        so a value computed before a concurrent bump is never stored as current.
+        """
+        version = self.get_version(namespace)
+        entry = self.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1], version
+        return None, version
+
+    def set_versioned(self, namespace, key, value, version, ttl):
+        self.set(key, (version, value), ttl)
+
+
+class MemoryCache(CacheBackend):
+    """Per-worker LRU cache with per-entry expiry. Namespace versions are kept apart and never evicted."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_version(self, namespace):
+        with self._lock:
+            return self._versions.get(namespace, 0)
+
+    def bump_version(self, namespace):
+        with self._lock:
+            self._versions[namespace] = self._versions.get(namespace, 0) + 1
+
+
+class RedisCache(CacheBackend):
+    """
+    Cache on a Redis-protocol server, shared by every worker. Takes a redis-py compatible client,
+    so a local server or an in-process fake can be used. Values are pickled; namespace versions
+    are plain counters (INCR). A failing server is reported and treated as a miss.
+    """
+    shared = True
 
-        if not amount_from_form:
-            flash('Contribution amount is required.', 'danger')
-            cursor.close()
-            conn.close()
-            return redirect(url_for('contributions'))
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
 
-        if not utr_number:
-            flash('UTR Number is required for contribution.', 'danger')
-            cursor.close()
-            conn.close()
-            return redirect(url_for('contributions'))
+    def _version_key(self, namespace):
+        return f"{self.prefix}ns:{namespace}"
 
+    def get(self, key):
         try:
-            amount_to_record = Decimal(amount_from_form)  # Use the amount from the form
-        except Exception:
-            flash('Invalid amount format.', 'danger')
-            cursor.close()
-            conn.close()
-            return redirect(url_for('contributions'))
+            data = self.client.get(self.prefix + key)
+        except redis.RedisError as err:
+            print(f"Cache read failed: {err}")
+            return None
+        return pickle.loads(data) if data is not None else None
 
-        current_month = datetime.now().month
-        current_year = datetime.now().year
-        current_day = datetime.now().day
+    def set(self, key, value, ttl):
+        try:
+            self.client.set(self.prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), ex=max(1, int(ttl)))
+        except redis.RedisError as err:
+            print(f"Cache write failed: {err}")
 
-        # Check if already paid for this month (or pending)
-        cursor.execute("SELECT * FROM contributions WHERE user_id = %s AND month = %s AND year = %s",
-                       (user_id, current_month, current_year))
-        existing_contribution = cursor.fetchone()
+    def delete(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except redis.RedisError as err:
+            print(f"Cache delete failed: {err}")
 
-        # Recalculate fine_amount for the POST request to ensure consistency
-        fine_amount_for_post = Decimal('0.00')
-        # Fine applies if current day is past the end day, regardless of role
-        if current_day > payment_end_day:
-            if not existing_contribution or not existing_contribution['is_paid']:
-                fine_amount_for_post = default_fine_amount
-                # Flash message for fine will be handled by the initial GET request render or specific POST logic if needed.
-                # For now, just ensure the fine is recorded.
+    def get_version(self, namespace):
+        try:
+            return int(self.client.get(self._version_key(namespace)) or 0)
+        except redis.RedisError as err:
+            print(f"Cache read failed: {err}")
+            return None  # Never equal to a stored version, so every versioned read misses
 
+    def bump_version(self, namespace):
         try:
-            if existing_contribution and existing_contribution['is_paid']:
-                flash(
-                    f'You have already paid your contribution for {datetime.strptime(str(current_month), "%m").strftime("%B")} {current_year}.',
-                    'info')
-                return redirect(url_for('contributions'))
+            self.client.incr(self._version_key(namespace))
+        except redis.RedisError as err:
+            print(f"Cache invalidation failed for {namespace}: {err}")
 
-            if existing_contribution:
-                cursor.execute(
-                    "UPDATE contributions SET amount = %s, utr_number = %s, fine_amount = %s, payment_date = %s WHERE id = %s",
-                    (amount_to_record, utr_number, fine_amount_for_post, datetime.now(), existing_contribution['id'])
-                )
-                flash('Your pending contribution has been updated with the new UTR. Awaiting President approval.',
-                      'info')
-            else:
-                cursor.execute(
-                    "INSERT INTO contributions (user_id, amount, month, year, is_paid, fine_amount, utr_number) VALUES (%s, %s, %s, %s, FALSE, %s, %s)",
-                    (user_id, amount_to_record, current_month, current_year, fine_amount_for_post, utr_number)
-                )
-                flash('Contribution submitted for approval. Awaiting President approval.', 'success')
-
-            conn.commit()
-            return redirect(url_for('contributions'))
-        except mysql.connector.Error as err:
-            flash(f'An error occurred while submitting contribution: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
+    def get_versioned(self, namespace, key):
+        # Entry and namespace version in one round trip
+        try:
+            data, version = self.client.mget([self.prefix + key, self._version_key(namespace)])
+        except redis.RedisError as err:
+            print(f"Cache read failed: {err}")
+            return None, None
+        version = int(version or 0)
+        if data is not None:
+            entry = pickle.loads(data)
+            if entry[0] == version:
+                return entry[1], version
+        return None, version
+
+    def set_versioned(self, namespace, key, value, version, ttl):
+        if version is not None:  # None: the version could not be read, so do not store
+            self.set(key, (version, value), ttl)
+
+
+def create_cache_backend():
+    """Builds the backend named by CACHE_BACKEND. Falls back to the in-memory cache if redis is missing."""
+    if app.config['CACHE_BACKEND'] == 'redis':
+        if REDIS_AVAILABLE:
+            client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'],
+                                          socket_timeout=app.config['CACHE_SOCKET_TIMEOUT'])
+            return RedisCache(client, app.config['CACHE_KEY_PREFIX'])
+        print("redis not found. Falling back to the in-memory cache.")
+    return MemoryCache(app.config['CACHE_MAX_ENTRIES'])
+
+
+cache_backend = create_cache_backend()
+
+
+def invalidate_group_cache(group_id):
+    """Drops a group's cached user rows and report results. Call it after the write has committed."""
+    cache_backend.bump_version(f"group:{group_id}")
+
+
+# --- Server-side sessions ---
+# Session contents (login, flash messages, read-your-writes timestamp) live in a session store;
+# the cookie only carries a random session id. The cookie stays small, nothing is re-signed per
+# request, and any worker can read any session as long as they share the store, whatever their
+# SECRET_KEY. Expired sessions are removed in batches, at most once per SESSION_CLEANUP_INTERVAL.
+SESSION_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]{43}')  # secrets.token_urlsafe(32)
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    """Session dict backed by a session store. The cookie only holds its id."""
+
+    def __init__(self, initial=None, sid=None):
+        def on_update(session_dict):
+            session_dict.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.previous_sid = None
+        self.modified = False
+
+    def regenerate(self):
+        """Moves the session to a new id, so an id handed out before login cannot be reused after it."""
+        if self.sid is not None:
+            self.previous_sid = self.sid
+        self.sid = None
+        self.modified = True
+
+
+class MemorySessionStore:
+    """Sessions in this process's memory. Only for a single worker (e.g. the development server)."""
+
+    def __init__(self, cleanup_interval):
+        self.cleanup_interval = cleanup_interval
+        self._sessions = {}  # sid -> (expires_at, serialized data)
+        self._lock = threading.Lock()
+        self._next_cleanup = time.time() + cleanup_interval
+
+    def load(self, sid):
+        with self._lock:
+            entry = self._sessions.get(sid)
+        return entry[1] if entry and entry[0] > time.time() else None
+
+    def save(self, sid, data, lifetime):
+        now = time.time()
+        with self._lock:
+            self._sessions[sid] = (now + lifetime, data)
+            if now >= self._next_cleanup:
+                self._next_cleanup = now + self.cleanup_interval
+                for expired_sid in [key for key, entry in self._sessions.items() if entry[0] <= now]:
+                    del self._sessions[expired_sid]
+
+    def delete(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+
+class SQLiteSessionStore:
+    """Sessions in a local SQLite file (WAL mode), shared by all workers on one machine."""
+
+    def __init__(self, path, cleanup_interval):
+        self.path = path
+        self.cleanup_interval = cleanup_interval
+        self._local = threading.local()  # One connection per thread and process
+        self._next_cleanup = time.time() + cleanup_interval
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                sid TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        self._connection().execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at)")
+
+    def _connection(self):
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)  # Autocommit
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def load(self, sid):
+        try:
+            row = self._connection().execute(
+                "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())).fetchone()
+        except sqlite3.Error as err:
+            print(f"Session read failed: {err}")
+            return None
+        return row[0] if row else None
+
+    def save(self, sid, data, lifetime):
+        now = time.time()
+        try:
+            connection = self._connection()
+            connection.execute("INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+                               (sid, data, now + lifetime))
+            if now >= self._next_cleanup:
+                self._next_cleanup = now + self.cleanup_interval
+                connection.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,))
+        except sqlite3.Error as err:
+            print(f"Session write failed: {err}")
+
+    def delete(self, sid):
+        try:
+            self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        except sqlite3.Error as err:
+            print(f"Session delete failed: {err}")
 
-    # GET request: Display contribution history
-    cursor.execute("""
-        SELECT c.*, p.name as approver_name
-        FROM contributions c
-        LEFT JOIN users p ON c.user_id = p.id
-        WHERE c.user_id = %s
-        ORDER BY c.year DESC, c.month DESC
-    """, (user_id,))
-    contributions_history = cursor.fetchall()
 
-    # Payment button is always enabled from the UI perspective,
-    # but the backend logic still applies fines based on the configured period.
-    payment_enabled = True  # Always True now, as per user request (though this variable is no longer used in the template)
+class RedisSessionStore:
+    """Sessions on a Redis-protocol server, shared by all machines. Redis expires them itself."""
 
-    # Check for pending contribution for current month
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    cursor.execute("""
-        SELECT * FROM contributions 
-        WHERE user_id = %s AND month = %s AND year = %s AND is_paid = FALSE
-    """, (user_id, current_month, current_year))
-    pending_contribution_for_display = cursor.fetchone()
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
 
-    cursor.close()
-    conn.close()
-    return render_template('contributions.html',
-                           contributions_history=contributions_history,
-                           payment_enabled=payment_enabled,  # Still passed, but always True
-                           pending_contribution=pending_contribution_for_display,  # Pass for display
-                           default_contribution_amount=default_contribution_amount,
-                           current_fine_amount=current_fine_amount,  # Pass calculated fine
-                           total_monthly_loan_interest_due=total_monthly_loan_interest_due,
-                           # Pass calculated loan interest
-                           total_amount_to_pay=total_amount_to_pay,  # Pass total amount
-                           payment_start_day=payment_start_day,  # Pass to template
-                           payment_end_day=payment_end_day)  # Pass to template
+    def load(self, sid):
+        try:
+            data = self.client.get(self.prefix + sid)
+        except redis.RedisError as err:
+            print(f"Session read failed: {err}")
+            return None
+        return data.decode('utf-8') if data is not None else None
 
+    def save(self, sid, data, lifetime):
+        try:
+            self.client.set(self.prefix + sid, data, ex=max(1, int(lifetime)))
+        except redis.RedisError as err:
+            print(f"Session write failed: {err}")
 
-@app.route('/loans', methods=['GET'])
-@login_required()
-def loans():
-    """Displays loans for members or manages loans for president."""
-    user_id = session.get('user_id')
-    role = session.get('role')
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
+    def delete(self, sid):
+        try:
+            self.client.delete(self.prefix + sid)
+        except redis.RedisError as err:
+            print(f"Session delete failed: {err}")
 
-    if role in ['president', 'secretary']:  # Allow secretary to view/manage all loan applications
-        # President/Secretary sees all loan applications
-        cursor.execute("""
-            SELECT l.*, u.name as borrower_name 
-            FROM loans l JOIN users u ON l.user_id = u.id 
-            ORDER BY l.start_date DESC
-        """)
-        loans_list = cursor.fetchall()
-        template = 'manage_loans.html'
-    else:
-        # Member sees their own loans
-        cursor.execute("""
-            SELECT l.*, u.name as president_name 
-            FROM loans l LEFT JOIN users u ON l.president_id = u.id 
-            WHERE l.user_id = %s ORDER BY l.start_date DESC
-        """, (user_id,))
-        loans_list = cursor.fetchall()
-        template = 'member_loans.html'
 
-    cursor.close()  # Close cursor after all fetches
-    conn.close()
-    return render_template(template, loans=loans_list)
+class ServerSideSessionInterface(SessionInterface):
+    """Flask session interface that keeps session data in a store and only the id in the cookie."""
+    serializer = TaggedJSONSerializer()  # Same format Flask uses inside its signed cookies
 
+    def __init__(self, store):
+        self.store = store
 
-@app.route('/apply_loan', methods=['GET', 'POST'])
-@login_required()
-def apply_loan():
-    """Allows members to apply for a loan."""
-    user_id = session.get('user_id')
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error.', 'danger')
-        # Ensure default values are passed even if DB connection fails for initial render
-        return render_template('apply_loan.html', default_interest_rate=Decimal('0.00'), bank_balance=Decimal('0.00'),
-                               today_date=date.today())
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and SESSION_ID_PATTERN.fullmatch(sid):
+            data = self.store.load(sid)
+            if data is not None:
+                try:
+                    return ServerSideSession(self.serializer.loads(data), sid)
+                except ValueError:
+                    pass
+        return ServerSideSession()
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if session.sid is not None and session.modified:
+                self.store.delete(session.sid)
+                response.delete_cookie(cookie_name, domain=domain, path=path, secure=self.get_cookie_secure(app),
+                                       samesite=self.get_cookie_samesite(app), httponly=self.get_cookie_httponly(app))
+            return
+        if not session.modified:
+            return
+
+        # The cookie only changes when the id does (or to push out a permanent session's expiry)
+        set_cookie = session.sid is None or session.permanent
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.save(session.sid, self.serializer.dumps(dict(session)),
+                        app.permanent_session_lifetime.total_seconds())
+        if set_cookie:
+            response.set_cookie(cookie_name, session.sid, expires=self.get_expiration_time(app, session),
+                                httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+                                secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app))
+
+
+def create_session_interface():
+    """Builds the session interface for SESSION_BACKEND ('cookie' keeps Flask's signed cookies)."""
+    backend = app.config['SESSION_BACKEND']
+    if backend == 'cookie':
+        return app.session_interface
+    if backend == 'memory':
+        return ServerSideSessionInterface(MemorySessionStore(app.config['SESSION_CLEANUP_INTERVAL']))
+    if backend == 'redis':
+        if REDIS_AVAILABLE:
+            client = redis.Redis.from_url(app.config['SESSION_REDIS_URL'],
+                                          socket_timeout=app.config['CACHE_SOCKET_TIMEOUT'])
+            return ServerSideSessionInterface(RedisSessionStore(client, app.config['CACHE_KEY_PREFIX'] + 'session:'))
+        print("redis not found. Falling back to the SQLite session store.")
+    return ServerSideSessionInterface(
+        SQLiteSessionStore(app.config['SESSION_SQLITE_PATH'], app.config['SESSION_CLEANUP_INTERVAL']))
+
+
+app.session_interface = create_session_interface()
+
+
+# --- Multi-group tenancy ---
+# One app instance serves many self-help groups (savings_groups). Every tenant-owned table
+# carries group_id, every query filters on it, and the indexes are led by group_id so each
+# group's rows form one contiguous index range.
+def current_group_id():
+    """Group of the logged-in user. login_required sets it from the users row on every request."""
+    return g.group_id
+
+
+def get_group_settings(conn, group_id):
+    """
+    Returns the group's settings row (default fine, interest rate, contribution amount and
+    payment period) as a dict, or None if the group has no settings row. Cached per group
+    for GROUP_SETTINGS_CACHE_TTL seconds. The balance is not cached, it changes with every payment.
+    """
+    namespace = f"settings:{group_id}"
+    settings, version = cache_backend.get_versioned(namespace, f"settings:{group_id}")
+    if settings is not None:
+        return settings
 
-    cursor = conn.cursor(dictionary=True, buffered=True)
+    settings = run_hot_query_one(conn, 'group_settings', (group_id,))
+    if settings is None:
+        return None
+    settings = dict(settings)
+    cache_backend.set_versioned(namespace, f"settings:{group_id}", settings, version,
+                                app.config['GROUP_SETTINGS_CACHE_TTL'])
+    return settings
 
-    default_interest_rate = Decimal('0.00')  # Initialize with a default
-    bank_balance = Decimal('0.00')  # Initialize with a default
-    today_date = date.today()  # Get today's date
 
-    try:
-        cursor.execute("SELECT default_interest_rate, balance FROM bank_balance WHERE id = 1")
-        settings = cursor.fetchone()
-        if settings:
-            if settings['default_interest_rate'] is not None:
-                default_interest_rate = settings['default_interest_rate']
-            if settings['balance'] is not None:
-                bank_balance = settings['balance']
-    except Exception as e:
-        print(f"Could not fetch default interest rate or bank balance: {e}")
+def invalidate_group_settings(group_id):
+    """Drops a group's cached settings after they are changed."""
+    cache_backend.bump_version(f"settings:{group_id}")
 
-    if request.method == 'POST':
-        # Get form data and strip whitespace
-        amount_str = request.form.get('amount', '').strip()
-        start_date_str = request.form.get('start_date', '').strip()
 
-        # Input validation for empty strings
-        if not amount_str:
-            flash('Loan amount is required.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
+# --- Per-member data version ---
+# users.data_version goes up whenever anything shown on a member's own pages changes: their
+# contributions, loans and payments, or their group's settings and month close. It is read
+# together with the login check, so comparing versions costs no extra query.
+def bump_data_version(cursor, user_id):
+    """Marks one member's data as changed. Run it inside the write's own transaction."""
+    cursor.execute("UPDATE users SET data_version = data_version + 1 WHERE id = %s", (user_id,))
 
-        if not start_date_str:
-            flash('Proposed start date is required.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
 
-        try:
-            amount = Decimal(amount_str)
-            # Use the default interest rate from settings, not from the disabled form field
-            interest_rate = default_interest_rate
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-        except Exception as e:
-            flash(f'Invalid data format for loan application: {e}', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
+def bump_data_versions(cursor, user_ids):
+    """Marks several members' data as changed in one statement."""
+    user_ids = list(user_ids)
+    if user_ids:
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        cursor.execute(f"UPDATE users SET data_version = data_version + 1 WHERE id IN ({placeholders})",
+                       tuple(user_ids))
 
-        if amount <= 0:
-            flash('Loan amount must be positive.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
 
-        if amount > bank_balance:
-            flash(f'Requested loan amount (₹{amount:.2f}) exceeds available bank balance (₹{bank_balance:.2f}).',
-                  'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
+def bump_loan_owner_data_version(cursor, loan_id):
+    """Marks the borrower of a loan as changed."""
+    cursor.execute(
+        "UPDATE users SET data_version = data_version + 1 WHERE id = (SELECT user_id FROM loans WHERE id = %s)",
+        (loan_id,))
 
-        # Interest rate validation is now based on the fetched default_interest_rate
-        if interest_rate < 0 or interest_rate > 100:
-            flash('Default interest rate is configured incorrectly (must be between 0 and 100). Please contact admin.',
-                  'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
 
-        if start_date < date.today():
-            flash('Proposed start date cannot be in the past.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
-                                   bank_balance=bank_balance, today_date=today_date)
+def bump_group_data_version(cursor, group_id):
+    """Marks every member of a group as changed (settings change, month close)."""
+    cursor.execute("UPDATE users SET data_version = data_version + 1 WHERE group_id = %s", (group_id,))
 
-        try:
-            # Loan status starts as 'pending', president_id is NULL until approved
-            # The start_date here is the *proposed* start date. It will be updated to the approval date upon approval.
-            # end_date is now NULL
-            cursor.execute(
-                "INSERT INTO loans (user_id, president_id, amount, interest_rate, start_date, status) VALUES (%s, %s, %s, %s, %s, %s)",
-                (user_id, None, amount, interest_rate, start_date, 'pending')  # Set president_id to NULL
-            )
-            conn.commit()
-            flash('Loan application submitted successfully! Awaiting President approval.', 'success')
-            return redirect(url_for('loans'))
-        except mysql.connector.Error as err:
-            flash(f'An error occurred while submitting loan application: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
 
-    # GET request: Display loan application form with default values
-    cursor.close()
-    conn.close()
-    return render_template('apply_loan.html', default_interest_rate=default_interest_rate, bank_balance=bank_balance,
-                           today_date=today_date)
+# Computed contexts of a member's own pages, keyed on (page, user_id, data_version, day). A write
+# bumps the version, so stale entries are never read again and simply age out of the LRU. The day
+# is part of the key because dues and fines depend on today's date.
+_page_context_cache = OrderedDict()
+_page_context_lock = threading.Lock()
 
 
-@app.route('/approve_loan/<int:loan_id>', methods=['GET'])  # Changed to GET
-@login_required(roles=['president', 'secretary'])  # Allow secretary to approve loans
-def approve_loan(loan_id):
-    """
-    Renders the loan disbursement form for the President/Secretary to specify transaction details.
-    This route no longer directly approves the loan.
-    """
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('loans'))
+def get_cached_page_context(page, user_id, data_version):
+    """Returns the cached context for one member page at this data version, or None."""
+    key = (page, user_id, data_version, date.today())
+    with _page_context_lock:
+        context = _page_context_cache.get(key)
+        if context is not None:
+            _page_context_cache.move_to_end(key)
+        return context
 
-    cursor = conn.cursor(dictionary=True, buffered=True)
-    cursor.execute(
-        "SELECT l.id, l.amount, l.user_id, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s",
-        (loan_id,))
-    loan = cursor.fetchone()
-    cursor.close()
-    conn.close()
 
-    if not loan:
-        flash('Loan not found.', 'danger')
-        return redirect(url_for('loans'))
+def cache_page_context(page, user_id, data_version, context):
+    """Stores a computed page context, evicting the least recently used ones past PAGE_CONTEXT_CACHE_SIZE."""
+    key = (page, user_id, data_version, date.today())
+    with _page_context_lock:
+        _page_context_cache[key] = context
+        _page_context_cache.move_to_end(key)
+        while len(_page_context_cache) > app.config['PAGE_CONTEXT_CACHE_SIZE']:
+            _page_context_cache.popitem(last=False)
+    return context
 
-    # Pass loan details to the new disbursement form
-    return render_template('disburse_loan_form.html', loan=loan)
 
+API_PREFIX = '/api/v1'  # Versioned JSON API for mobile clients
 
-@app.route('/disburse_loan/<int:loan_id>', methods=['POST'])
-@login_required(roles=['president', 'secretary'])
-def disburse_loan(loan_id):
-    """
-    Handles the disbursement of an approved loan, recording transaction details.
-    This is the new route that performs the actual loan approval and fund deduction.
-    """
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('loans'))
 
-    conn.autocommit = False  # Start transaction
-    cursor = conn.cursor(buffered=True)  # Cursor is NOT dictionary=True here
+def api_error(message, status):
+    """JSON error response for the API routes."""
+    return jsonify({'error': message}), status
 
-    transaction_type = request.form.get('transaction_type')
-    disbursement_details = {}
 
-    # Fetch loan amount for validation and deduction
-    cursor.execute("SELECT amount FROM loans WHERE id = %s", (loan_id,))
-    loan_result = cursor.fetchone()
-    if not loan_result:
-        flash('Loan not found.', 'danger')
-        conn.rollback()
-        return redirect(url_for('loans'))
-    loan_amount = loan_result[0]  # This is already Decimal
+# Modified login_required decorator to accept a list of roles
+def login_required(roles=None):
+    """Decorator to ensure user is logged in and has the required role(s). API routes get JSON errors."""
 
-    # Validate transaction details based on type
-    if transaction_type == 'cash':
-        notes_500_str = request.form.get('notes_500', '0')
-        notes_200_str = request.form.get('notes_200', '0')
-        notes_100_str = request.form.get('notes_100', '0')
+    def wrapper(view_func):
+        @functools.wraps(view_func)
+        def decorated_function(*args, **kwargs):
+            is_api = request.path.startswith(API_PREFIX)
+            if 'user_id' not in session:
+                if is_api:
+                    return api_error('Authentication required.', 401)
+                flash('Please log in to access this page.', 'danger')
+                return redirect(url_for('login'))
 
-        try:
-            notes_500 = int(notes_500_str)
-            notes_200 = int(notes_200_str)
-            notes_100 = int(notes_100_str)
+            # On a shared cache the user row is cached under the group's namespace, which every
+            # write in the group bumps, so role and data_version are as fresh as the database.
+            # Per-worker caches would miss other workers' bumps, so they always query.
+            user = user_cache_version = None
+            group_hint = session.get('group_id')
+            user_key = f"user:{session['user_id']}"
+            if cache_backend.shared and group_hint is not None:
+                user, user_cache_version = cache_backend.get_versioned(f"group:{group_hint}", user_key)
+
+            if user is None:
+                conn = get_db_connection()
+                if conn is None:
+                    if is_api:
+                        return api_error('Database connection error.', 503)
+                    flash('Database connection error. Please try again later.', 'danger')
+                    return redirect(url_for('login'))
+
+                user = run_hot_query_one(conn, 'user_role', (session['user_id'],))
+                conn.close()
+                if user and user_cache_version is not None and user['group_id'] == group_hint:
+                    cache_backend.set_versioned(f"group:{group_hint}", user_key, dict(user), user_cache_version,
+                                                app.config['USER_CACHE_TTL'])
 
-            if notes_500 < 0 or notes_200 < 0 or notes_100 < 0:
-                flash('Note counts cannot be negative.', 'danger')
-                conn.rollback()
-                return redirect(url_for('approve_loan', loan_id=loan_id))
+            if not user:
+                session.pop('user_id', None)
+                if is_api:
+                    return api_error('User not found.', 401)
+                flash('User not found. Please log in again.', 'danger')
+                return redirect(url_for('login'))
 
-            calculated_cash_amount = (Decimal(notes_500) * 500) + (Decimal(notes_200) * 200) + (
-                        Decimal(notes_100) * 100)
+            # Tenant for this request comes from the database, so a stale session cannot cross groups
+            g.group_id = user['group_id']
+            g.data_version = user['data_version']
+            g.user_role = user['role']
 
-            if calculated_cash_amount != loan_amount:
+            # Check if roles are specified and if the user's role is in the allowed roles
+            if roles and user['role'] not in roles:
+                if is_api:
+                    return api_error('Access denied.', 403)
+                # Construct a user-friendly message for allowed roles
+                allowed_roles_str = ", ".join([r.capitalize() for r in roles])
                 flash(
-                    f'Cash notes total (₹{calculated_cash_amount:.2f}) does not match loan amount (₹{loan_amount:.2f}).',
+                    f'Access denied. You need to be one of the following roles: {allowed_roles_str} to view this page.',
                     'danger')
-                conn.rollback()
-                return redirect(url_for('approve_loan', loan_id=loan_id))
+                return redirect(url_for('dashboard'))  # Redirect to their own dashboard
 
-            disbursement_details = {
-                'notes_500': notes_500,
-                'notes_200': notes_200,
-                'notes_100': notes_100
-            }
-        except ValueError:
-            flash('Invalid note count for cash disbursement.', 'danger')
-            conn.rollback()
-            return redirect(url_for('approve_loan', loan_id=loan_id))
+            return view_func(*args, **kwargs)
 
-    elif transaction_type == 'cheque':
-        cheque_number = request.form.get('cheque_number', '').strip()
-        if not cheque_number or not cheque_number.isdigit() or len(cheque_number) != 6:
-            flash('Cheque number must be a 6-digit number.', 'danger')
-            conn.rollback()
-            return redirect(url_for('approve_loan', loan_id=loan_id))
-        disbursement_details = {'cheque_number': cheque_number}
+        return decorated_function
 
-    elif transaction_type == 'upi':
-        upi_utr = request.form.get('upi_utr', '').strip()
-        if not upi_utr or not upi_utr.isdigit() or len(upi_utr) != 12:
-            flash('UPI UTR must be a 12-digit number.', 'danger')
-            conn.rollback()
-            return redirect(url_for('approve_loan', loan_id=loan_id))
-        disbursement_details = {'upi_utr': upi_utr}
-    else:
-        flash('Invalid transaction type selected.', 'danger')
-        conn.rollback()
-        return redirect(url_for('approve_loan', loan_id=loan_id))
+    return wrapper
 
-    # Convert disbursement_details to JSON string for storage
-    disbursement_details_json = json.dumps(disbursement_details)
 
-    try:
-        # 1. Get current bank balance
-        cursor.execute("SELECT balance FROM bank_balance WHERE id = 1")
-        balance_result = cursor.fetchone()  # This will be a tuple (balance,)
-        current_balance = balance_result[0] if balance_result and balance_result[0] is not None else Decimal('0.00')
+# --- Idempotency keys ---
+# Money-moving forms carry a one-time key (a hidden idempotency_key field, or the
+# Idempotency-Key header for API clients). The first request with a key claims it in
+# idempotency_keys before running; when it ends in a redirect without errors, the outcome is
+# stored and any repeat of the key replays it without touching the loan or balance rows. Failed
+# attempts release the key so a retry runs again. Keys expire after IDEMPOTENCY_KEY_TTL_HOURS
+# (purge-idempotency-keys command).
+IDEMPOTENCY_KEY_PATTERN = re.compile(r'^[A-Za-z0-9_.:-]{8,64}$')
+IDEMPOTENCY_PENDING = ''  # Response column value while the first request is still running
 
-        # 2. Check for sufficient funds
-        if current_balance < loan_amount:
-            flash(
-                f'Insufficient bank balance (Current: ₹{current_balance:.2f}, Required: ₹{loan_amount:.2f}) to approve this loan. Please deposit funds.',
-                'danger')
-            conn.rollback()
-            return redirect(url_for('loans'))
 
-        # 3. Update loan status AND set start_date to today's date (approval date)
-        # Also store disbursement type and details
-        cursor.execute(
-            "UPDATE loans SET status = 'approved', president_id = %s, start_date = %s, disbursement_type = %s, disbursement_details = %s WHERE id = %s",
-            (session['user_id'], date.today(), transaction_type, disbursement_details_json, loan_id)
-        )
+def new_idempotency_key():
+    """A fresh key for one rendering of a form (used as a template global)."""
+    return secrets.token_urlsafe(16)
 
-        # 4. Deduct loan amount from bank balance
-        cursor.execute("UPDATE bank_balance SET balance = balance - %s WHERE id = 1", (loan_amount,))
 
-        # 5. Commit the transaction
-        conn.commit()
-        flash('Loan approved and amount disbursed! Transaction details recorded.', 'success')
+app.jinja_env.globals.update(new_idempotency_key=new_idempotency_key)
 
-    except mysql.connector.Error as err:
-        flash(f'An error occurred while disbursing loan: {err}', 'danger')
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
-    return redirect(url_for('loans'))
 
+def request_fingerprint():
+    """Hash of what the request asks for, so a key reused for a different submission is refused."""
+    fields = sorted((name, value) for name, value in request.form.items(multi=True) if name != 'idempotency_key')
+    return hashlib.sha256(json.dumps([request.path, fields]).encode()).hexdigest()
 
-@app.route('/reject_loan/<int:loan_id>', methods=['POST'])
-@login_required(roles=['president', 'secretary'])  # Allow secretary to reject loans
-def reject_loan(loan_id):
-    """Allows President/Secretary to reject a loan."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('loans'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(buffered=True)
+
+def claim_idempotency_key(conn, key, fingerprint):
+    """
+    Claims key for the current user and endpoint. Returns None when claimed, otherwise the stored
+    record: {'response': ..., 'fingerprint': ...}, with response IDEMPOTENCY_PENDING while the
+    first request is still running. An expired record is deleted and the key claimed again.
+    """
+    cursor = conn.cursor(dictionary=True, buffered=True)
     try:
-        # Record which president/secretary rejected the loan
-        cursor.execute("UPDATE loans SET status = 'rejected', president_id = %s WHERE id = %s",
-                       (session['user_id'], loan_id))
+        for _ in range(2):
+            try:
+                cursor.execute(
+                    "INSERT INTO idempotency_keys (group_id, user_id, idempotency_key, endpoint, response) VALUES (%s, %s, %s, %s, %s)",
+                    (current_group_id(), session['user_id'], key, request.endpoint, IDEMPOTENCY_PENDING))
+                conn.commit()
+                return None
+            except mysql.connector.IntegrityError:
+                conn.rollback()
+            cursor.execute("""
+                SELECT id, endpoint, response, created_at < NOW() - INTERVAL %s HOUR AS expired
+                FROM idempotency_keys WHERE user_id = %s AND idempotency_key = %s
+            """, (app.config['IDEMPOTENCY_KEY_TTL_HOURS'], session['user_id'], key))
+            record = cursor.fetchone()
+            if record is None or record['expired']:
+                if record:
+                    cursor.execute("DELETE FROM idempotency_keys WHERE id = %s", (record['id'],))
+                    conn.commit()
+                continue
+            if record['endpoint'] != request.endpoint:
+                return {'response': None, 'fingerprint': None}
+            if record['response'] == IDEMPOTENCY_PENDING:
+                return {'response': IDEMPOTENCY_PENDING, 'fingerprint': fingerprint}
+            stored = json.loads(record['response'])
+            return {'response': stored, 'fingerprint': stored.get('fingerprint')}
+        return {'response': IDEMPOTENCY_PENDING, 'fingerprint': fingerprint}  # Lost a race twice
+    finally:
+        cursor.close()
+
+
+def finish_idempotency_key(key, outcome):
+    """Stores the outcome for key, or releases the key when outcome is None."""
+    conn = get_db_connection()
+    if conn is None:
+        print(f"Could not record the outcome of idempotency key {key}; it stays pending until it expires.")
+        return
+    cursor = conn.cursor()
+    try:
+        if outcome is None:
+            cursor.execute("DELETE FROM idempotency_keys WHERE user_id = %s AND idempotency_key = %s",
+                           (session['user_id'], key))
+        else:
+            cursor.execute("UPDATE idempotency_keys SET response = %s WHERE user_id = %s AND idempotency_key = %s",
+                           (json.dumps(outcome), session['user_id'], key))
         conn.commit()
-        flash('Loan rejected.', 'info')
     except mysql.connector.Error as err:
-        flash(f'An error occurred while rejecting loan: {err}', 'danger')
+        print(f"Could not record the outcome of idempotency key {key}: {err}")
         conn.rollback()
     finally:
         cursor.close()
         conn.close()
-    return redirect(url_for('loans'))
 
 
-@app.route('/record_loan_payment/<int:loan_id>', methods=['GET', 'POST'])
-@login_required()  # Can be done by member or treasurer/president/secretary
-def record_loan_payment(loan_id):
-    """Allows recording a payment for a specific loan."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('loans'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
+def idempotent(view_func):
+    """
+    Decorator for money-moving views (place below login_required). POSTs without a key run as
+    before; other methods are not affected.
+    """
 
-    # Get loan details
-    cursor.execute("SELECT id, user_id, amount, interest_rate, start_date, status FROM loans WHERE id = %s", (loan_id,))
-    loan = cursor.fetchone()
+    @functools.wraps(view_func)
+    def decorated_function(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key') or request.form.get('idempotency_key')
+        if request.method != 'POST' or not key:
+            return view_func(*args, **kwargs)
+        is_api = request.path.startswith(API_PREFIX)
+        if not IDEMPOTENCY_KEY_PATTERN.match(key):
+            if is_api:
+                return api_error('Invalid Idempotency-Key.', 400)
+            flash('This form has expired. Please reload the page and try again.', 'danger')
+            return redirect(request.referrer or url_for('dashboard'))
+
+        fingerprint = request_fingerprint()
+        conn = get_db_connection()
+        if conn is None:
+            if is_api:
+                return api_error('Database connection error.', 503)
+            flash('Database connection error. Please try again later.', 'danger')
+            return redirect(request.referrer or url_for('dashboard'))
+        try:
+            record = claim_idempotency_key(conn, key, fingerprint)
+        finally:
+            conn.close()
 
-    if not loan:
-        flash('Loan not found.', 'danger')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('loans'))
+        if record is not None:
+            if record['fingerprint'] != fingerprint:
+                if is_api:
+                    return api_error('Idempotency-Key was already used for a different request.', 422)
+                flash('This form was already submitted with different details. Please reload the page.', 'danger')
+                return redirect(request.referrer or url_for('dashboard'))
+            if record['response'] == IDEMPOTENCY_PENDING:
+                if is_api:
+                    response, status = api_error('This request is already being processed.', 409)
+                    response.headers['Retry-After'] = '1'
+                    return response, status
+                flash('This request is already being processed. Please wait a moment.', 'info')
+                return redirect(request.referrer or url_for('dashboard'))
+            # Replay: same flash messages and redirect as the first time
+            stored = record['response']
+            for category, message in stored['flashes']:
+                flash(message, category)
+            response = redirect(stored['location'], stored['status'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+
+        flashes_before = len(session.get('_flashes', []))
+        try:
+            response = app.make_response(view_func(*args, **kwargs))
+        except Exception:
+            finish_idempotency_key(key, None)
+            raise
+        new_flashes = session.get('_flashes', [])[flashes_before:]
+        succeeded = response.status_code in (301, 302, 303, 307, 308) and not any(
+            category == 'danger' for category, _ in new_flashes)
+        finish_idempotency_key(key, {
+            'fingerprint': fingerprint,
+            'status': response.status_code,
+            'location': response.headers.get('Location'),
+            'flashes': [list(flash_entry) for flash_entry in new_flashes],
+        } if succeeded else None)
+        return response
+
+    return decorated_function
 
-    # Ensure only the borrower or president/secretary can record payments
-    if session.get('user_id') != loan['user_id'] and session.get('role') not in ['president', 'secretary']:
-        flash('You are not authorized to record payments for this loan.', 'danger')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('loans'))
 
-    if loan['status'] == 'completed':
-        flash('This loan is already completed. No more payments are needed.', 'info')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('loans'))
+@app.route('/')
+def index():
+    """Redirects to the login page."""
+    return redirect(url_for('login'))
 
-    # Calculate current outstanding principal and total interest paid so far
-    cursor.execute(
-        "SELECT SUM(amount_paid) as total_paid, SUM(interest_paid) as total_interest_paid_from_payments FROM loan_payments WHERE loan_id = %s",
-        (loan_id,))
-    payment_summary = cursor.fetchone()
-    total_paid_so_far = payment_summary['total_paid'] if payment_summary and payment_summary[
-        'total_paid'] is not None else Decimal('0.00')
-    total_interest_paid_from_payments = payment_summary['total_interest_paid_from_payments'] if payment_summary and \
-                                                                                                payment_summary[
-                                                                                                    'total_interest_paid_from_payments'] is not None else Decimal(
-        '0.00')
 
-    # Initial principal is the loan amount
-    outstanding_principal = loan['amount'] - (total_paid_so_far - total_interest_paid_from_payments)
+# --- Password hashing ---
+# Hashing a password (scrypt by default) costs tens of milliseconds of CPU. It runs in a small
+# process pool, so request threads only wait for the result and other routes keep being served.
+# At most PASSWORD_HASH_MAX_PENDING hashes are queued per app worker, and each username can have
+# at most PASSWORD_LOGIN_CONCURRENCY logins in flight, so a login burst cannot take every thread.
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool is full or a username already has too many logins in flight."""
+
+
+_password_pool = None
+_password_pool_pid = None
+_password_pool_slots = None
+_password_pool_lock = threading.Lock()
+_logins_in_flight = {}  # username -> number of logins being checked
+_logins_in_flight_lock = threading.Lock()
+
+
+def _get_password_pool():
+    """Returns (pool, slots) for this process, creating them on first use and again after a fork."""
+    global _password_pool, _password_pool_pid, _password_pool_slots
+    with _password_pool_lock:
+        if _password_pool is None or _password_pool_pid != os.getpid():
+            _password_pool = ProcessPoolExecutor(max_workers=app.config['PASSWORD_HASH_WORKERS'])
+            _password_pool_pid = os.getpid()
+            _password_pool_slots = threading.BoundedSemaphore(app.config['PASSWORD_HASH_MAX_PENDING'])
+        return _password_pool, _password_pool_slots
+
+
+def _run_password_job(function, *args):
+    """Runs a werkzeug hashing function in the pool (or inline when PASSWORD_HASH_WORKERS is 0)."""
+    global _password_pool
+    if app.config['PASSWORD_HASH_WORKERS'] <= 0:
+        return function(*args)
+    pool, slots = _get_password_pool()
+    if not slots.acquire(timeout=app.config['PASSWORD_HASH_QUEUE_TIMEOUT']):
+        raise PasswordHashingBusy()
+    try:
+        future = pool.submit(function, *args)
+    except BrokenProcessPool:
+        slots.release()
+        with _password_pool_lock:
+            _password_pool = None  # A worker died; start a fresh pool on the next call
+        raise PasswordHashingBusy() from None
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=app.config['PASSWORD_HASH_TIMEOUT'])
+    except FuturesTimeoutError:
+        raise PasswordHashingBusy() from None
 
-    # Calculate monthly interest based on outstanding principal (simple interest for demo)
-    # Assuming interest_rate is annual percentage
-    monthly_interest_rate = loan['interest_rate'] / Decimal('100') / Decimal('12')
-    monthly_interest_due = (outstanding_principal * monthly_interest_rate).quantize(Decimal('0.01'),
-                                                                                    rounding=ROUND_HALF_UP)
 
+def hash_password(password):
+    """Hashes a password with PASSWORD_HASH_METHOD."""
+    return _run_password_job(generate_password_hash, password, app.config['PASSWORD_HASH_METHOD'])
+
+
+def hash_passwords(passwords):
+    """
+    Hashes many passwords at once (bulk member import). They go to a pool of their own with
+    PASSWORD_BULK_HASH_WORKERS processes, so logins keep the regular pool while an import runs.
+    """
+    workers = app.config['PASSWORD_BULK_HASH_WORKERS']
+    method = app.config['PASSWORD_HASH_METHOD']
+    if workers <= 0 or len(passwords) < 2:
+        return [generate_password_hash(password, method) for password in passwords]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(generate_password_hash, passwords, itertools.repeat(method, len(passwords)),
+                             chunksize=max(1, len(passwords) // (workers * 4))))
+
+
+def verify_password(password_hash, password):
+    """Checks a password against a stored hash."""
+    return _run_password_job(check_password_hash, password_hash, password)
+
+
+def hash_method_parameters(method):
+    """
+    Algorithm and parameters of a werkzeug method string with werkzeug's defaults filled in, e.g.
+    'pbkdf2:sha256' -> ('pbkdf2', 'sha256', 1000000). Stored hashes always carry every parameter.
+    """
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        args = [2 ** 15, 8, 1]
+    elif name == 'pbkdf2':
+        args = [args[0] if args else 'sha256', args[1] if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS]
+    return (name,) + tuple(int(arg) if str(arg).isdigit() else arg for arg in args)
+
+
+def password_needs_rehash(password_hash):
+    """True when a stored hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    return (hash_method_parameters(password_hash.split('$', 1)[0]) !=
+            hash_method_parameters(app.config['PASSWORD_HASH_METHOD']))
+
+
+@contextlib.contextmanager
+def login_slot(username):
+    """Holds one of the PASSWORD_LOGIN_CONCURRENCY login slots of a username."""
+    with _logins_in_flight_lock:
+        in_flight = _logins_in_flight.get(username, 0)
+        if in_flight >= app.config['PASSWORD_LOGIN_CONCURRENCY']:
+            raise PasswordHashingBusy()
+        _logins_in_flight[username] = in_flight + 1
+    try:
+        yield
+    finally:
+        with _logins_in_flight_lock:
+            if _logins_in_flight[username] > 1:
+                _logins_in_flight[username] -= 1
+            else:
+                del _logins_in_flight[username]
+
+
+@app.errorhandler(PasswordHashingBusy)
+def password_hashing_busy(error):
+    """Too many logins or password changes at once: ask the user to try again."""
+    if request.path.startswith(API_PREFIX):
+        response, status = api_error('Too many logins at once. Please try again in a moment.', 503)
+        response.headers['Retry-After'] = '2'
+        return response, status
+    flash('Too many logins at once. Please try again in a moment.', 'danger')
+    return redirect(request.url)
+
+
+def authenticate_user(conn, username, password):
+    """
+    Returns the user row if the username and password match, otherwise None. A hash made with
+    older parameters than PASSWORD_HASH_METHOD is replaced while the password is at hand.
+    """
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("SELECT id, group_id, username, password, role, name FROM users WHERE username = %s", (username,))
+    user = cursor.fetchone()
+    cursor.close()  # Close cursor immediately after fetching
+
+    # Added check to ensure user['password'] is not None or an empty string before hashing
+    if not (user and user['password'] and user['password'].strip()):
+        return None
+    with login_slot(username):
+        if not verify_password(user['password'], password):
+            return None
+        if password_needs_rehash(user['password']):
+            try:
+                new_hash = hash_password(password)
+                cursor = conn.cursor()
+                cursor.execute("UPDATE users SET password = %s WHERE id = %s", (new_hash, user['id']))
+                conn.commit()
+                cursor.close()
+            except (PasswordHashingBusy, mysql.connector.Error) as e:
+                print(f"Could not rehash password for user {user['id']}, will retry at next login: {e}")
+    return user
+
+
+def start_user_session(user):
+    """Stores the logged-in user in the session, under a new session id."""
+    if isinstance(session, ServerSideSession):
+        session.regenerate()
+    session['user_id'] = user['id']
+    session['group_id'] = user['group_id']
+    session['username'] = user['username']
+    session['role'] = user['role']
+    session['name'] = user['name']
+
+
+@app.route('/login', methods=['GET', 'POST'])
+def login():
+    """Handles user login."""
     if request.method == 'POST':
-        amount_paid_str = request.form.get('amount_paid')
+        username = request.form['username']
+        password = request.form['password']
 
-        if not amount_paid_str:
-            flash('Payment amount is required.', 'danger')
-            cursor.close()
-            conn.close()
-            return redirect(url_for('record_loan_payment', loan_id=loan_id))
+        conn = get_db_connection()
+        if conn is None:
+            flash('Database connection error.', 'danger')
+            return render_template('login.html')
 
         try:
-            amount_paid = Decimal(amount_paid_str)
-        except Exception:
-            flash('Invalid amount format.', 'danger')
-            cursor.close()
+            user = authenticate_user(conn, username, password)
+        finally:
             conn.close()
-            return redirect(url_for('record_loan_payment', loan_id=loan_id))
 
-        if amount_paid <= 0:
-            flash('Payment amount must be positive.', 'danger')
-            cursor.close()
-            conn.close()
-            return redirect(url_for('record_loan_payment', loan_id=loan_id))
+        if user:
+            start_user_session(user)
+            flash(f'Welcome, {user["name"]}!', 'success')
+            return redirect(url_for('dashboard'))
+        else:
+            flash('Invalid username or password.', 'danger')
+    return render_template('login.html')
 
-        # Determine how much goes to interest and how much to principal
-        interest_portion = min(amount_paid, monthly_interest_due)
-        principal_portion = amount_paid - interest_portion
 
-        try:
-            cursor.execute(
-                "INSERT INTO loan_payments (loan_id, amount_paid, interest_paid, payment_date) VALUES (%s, %s, %s, %s)",
-                (loan_id, amount_paid, interest_portion, datetime.now())
-            )
+@app.route('/logout')
+def logout():
+    """Logs out the current user."""
+    session.pop('user_id', None)
+    session.pop('group_id', None)
+    session.pop('username', None)
+    session.pop('role', None)
+    session.pop('name', None)
+    flash('You have been logged out.', 'info')
+    return redirect(url_for('login'))
 
-            # Update bank balance (money coming back to the gat)
-            cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE id = 1", (amount_paid,))
 
-            # Recalculate outstanding principal after this payment
-            new_outstanding_principal = outstanding_principal - principal_portion
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    """Handles user registration (initially for President, then President can add members)."""
+    if request.method == 'POST':
+        name = request.form['name']
+        username = request.form['username']
+        email = request.form['email']
+        contact_number = request.form['contact_number']
+        pan_number = request.form['pan_number']
+        aadhar_number = request.form['aadhar_number']
+        password = request.form['password']
+        role = 'member'  # Self-registration always creates a member; roles are assigned in add_member
+        group_code = request.form.get('group_code', '').strip()  # Which self-help group to join
 
-            # Check if loan is fully paid (principal is zero or less)
-            if new_outstanding_principal <= Decimal('0.00'):
-                cursor.execute("UPDATE loans SET status = 'completed', actual_end_date = %s WHERE id = %s",
-                               (date.today(), loan_id))
-                flash('Loan fully paid and marked as completed!', 'success')
-            else:
-                flash('Loan payment recorded successfully!', 'success')
+        # Added server-side validation for password
+        if not password or not password.strip():  # Ensure password is not empty or just whitespace
+            flash('Password cannot be empty.', 'danger')
+            return render_template('register.html')
+
+        conn = get_db_connection()
+        if conn is None:
+            flash('Database connection error.', 'danger')
+            return render_template('register.html')
 
+        # Use buffered=True for the cursor
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute("SELECT id FROM savings_groups WHERE code = %s", (group_code,))
+            group_row = cursor.fetchone()
+            if not group_row:
+                flash('Unknown group code. Please check the code given by your group.', 'danger')
+                return render_template('register.html')
+
+            # Hashed only for a valid group code, so a wrong code costs no hashing worker time
+            hashed_password = hash_password(password)
+            cursor.execute(
+                "INSERT INTO users (group_id, name, username, email, contact_number, pan_number, aadhar_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (group_row[0], name, username, email, contact_number, pan_number, aadhar_number, hashed_password, role)
+            )
             conn.commit()
-            return redirect(url_for('loans'))
+            invalidate_group_cache(group_row[0])
+            flash('Registration successful! Please log in.', 'success')
+            return redirect(url_for('login'))
         except mysql.connector.Error as err:
-            flash(f'An error occurred while recording payment: {err}', 'danger')
+            if err.errno == 1062:  # Duplicate entry error
+                flash('Username, Email, PAN, or Aadhar number already exists.', 'danger')
+            else:
+                flash(f'An error occurred during registration: {err}', 'danger')
             conn.rollback()
         finally:
             cursor.close()
             conn.close()
-
-    # GET request: Display loan payment form
-    # Recalculate for display after potential POST redirect or initial GET
-    cursor.execute("SELECT id, user_id, amount, interest_rate, start_date, status FROM loans WHERE id = %s", (loan_id,))
-    loan = cursor.fetchone()  # Re-fetch to ensure latest state
-
-    cursor.execute(
-        "SELECT SUM(amount_paid) as total_paid, SUM(interest_paid) as total_interest_paid_from_payments FROM loan_payments WHERE loan_id = %s",
-        (loan_id,))
-    payment_summary = cursor.fetchone()
-    total_paid_so_far = payment_summary['total_paid'] if payment_summary and payment_summary[
-        'total_paid'] is not None else Decimal('0.00')
-    total_interest_paid_from_payments = payment_summary['total_interest_paid_from_payments'] if payment_summary and \
-                                                                                                payment_summary[
-                                                                                                    'total_interest_paid_from_payments'] is not None else Decimal(
-        '0.00')
-
-    outstanding_principal = loan['amount'] - (total_paid_so_far - total_interest_paid_from_payments)
-    monthly_interest_rate = loan['interest_rate'] / Decimal('100') / Decimal('12')
-    monthly_interest_due = (outstanding_principal * monthly_interest_rate).quantize(Decimal('0.01'),
-                                                                                    rounding=ROUND_HALF_UP)
-
-    # total_expected_repayment_over_term and loan_duration_months removed as end_date is no longer used.
-
-    remaining_total_amount = (outstanding_principal + monthly_interest_due).quantize(Decimal('0.01'),
-                                                                                     rounding=ROUND_HALF_UP)
-    if remaining_total_amount < 0:
-        remaining_total_amount = Decimal('0.00')
-
-    cursor.close()
-    conn.close()
-    return render_template('record_loan_payment.html',
-                           loan=loan,
-                           total_paid=total_paid_so_far,
-                           outstanding_principal=outstanding_principal,
-                           monthly_interest_due=monthly_interest_due,
-                           remaining_total_amount=remaining_total_amount,
-                           total_interest_paid_from_payments=total_interest_paid_from_payments
-                           )
+    return render_template('register.html')
 
 
-# New route for President/Secretary to manage settings (e.g., default fine amount and interest rate)
-@app.route('/manage_settings', methods=['GET', 'POST'])
-@login_required(roles=['president', 'secretary'])
-def manage_settings():
-    """Allows President/Secretary to manage application settings like default fine amount, interest rate, contribution amount, and payment period."""
+@app.route('/dashboard')
+@login_required()
+def dashboard():
+    """Renders the appropriate dashboard based on user role."""
+    role = session.get('role')
+    user_id = session.get('user_id')
+    group_id = current_group_id()
+    if role == 'member':
+        page_context = get_cached_page_context('dashboard', user_id, g.data_version)
+        if page_context is not None:
+            return render_template('member_dashboard.html', **page_context)
     conn = get_db_connection()
     if conn is None:
         flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('logout'))  # Redirect to logout if DB connection fails
+    # Use buffered=True for the cursor
     cursor = conn.cursor(dictionary=True, buffered=True)
 
-    if request.method == 'POST':
-        default_fine_amount_str = request.form.get('default_fine_amount')
-        default_interest_rate_str = request.form.get('default_interest_rate')
-        default_contribution_amount_str = request.form.get('default_contribution_amount')
-        payment_start_day_str = request.form.get('payment_start_day')  # New field
-        payment_end_day_str = request.form.get('payment_end_day')  # New field
+    # Initialize variables for president/secretary dashboard with default values
+    total_members = 0
+    total_loans = 0
+    total_contributions_this_month = Decimal('0.00')
+    total_interest_this_month = Decimal('0.00')
+    total_income_this_month = Decimal('0.00')
+    bank_balance = Decimal('0.00')
+    recent_activities = []
+    pending_contributions_count = 0  # New: for President/Secretary dashboard
 
-        if not all([default_fine_amount_str, default_interest_rate_str, default_contribution_amount_str,
-                    payment_start_day_str, payment_end_day_str]):
-            flash('All default settings (fine, interest, contribution amounts, and payment period) are required.',
-                  'danger')
-            # Re-fetch current settings to pre-fill the form on error
-            cursor.execute(
-                "SELECT default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day FROM bank_balance WHERE id = 1")
-            settings = cursor.fetchone()
-            current_fine_amount = settings['default_fine_amount'] if settings and settings[
-                'default_fine_amount'] is not None else Decimal('0.00')
-            current_interest_rate = settings['default_interest_rate'] if settings and settings[
-                'default_interest_rate'] is not None else Decimal('0.00')
-            current_contribution_amount = settings['default_contribution_amount'] if settings and settings[
-                'default_contribution_amount'] is not None else Decimal('0.00')
-            current_payment_start_day = settings['payment_start_day'] if settings and settings[
-                'payment_start_day'] is not None else 1
-            current_payment_end_day = settings['payment_end_day'] if settings and settings[
-                'payment_end_day'] is not None else 7
-            cursor.close()
-            conn.close()
-            return render_template('manage_settings.html',
+    # Initialize variables for member dashboard with default values (if needed for a different path)
+    total_contributed = Decimal('0.00')
+    current_loans = []
+    pending_contribution = None
+
+    # Modified to allow both president and secretary to view the president dashboard
+    if role in ['president', 'secretary']:
+        # Get total members (count all users of the group)
+        cursor.execute("SELECT COUNT(*) as total_members FROM users WHERE group_id = %s", (group_id,))
+        total_members = cursor.fetchone()['total_members']
+
+        # Get total loans (approved)
+        cursor.execute("SELECT COUNT(*) as total_loans FROM loans WHERE group_id = %s AND status = 'approved'",
+                       (group_id,))
+        total_loans = cursor.fetchone()['total_loans']
+
+        # Get total contributions this month
+        current_month = datetime.now().month
+        current_year = datetime.now().year
+        cursor.execute(
+            "SELECT SUM(amount) as total_contributions FROM contributions WHERE group_id = %s AND year = %s AND month = %s AND is_paid = TRUE",
+            (group_id, current_year, current_month))
+        result_contributions = cursor.fetchone()
+        total_contributions_this_month = result_contributions['total_contributions'] if result_contributions and \
+                                                                                        result_contributions[
+                                                                                            'total_contributions'] is not None else Decimal(
+            '0.00')
+
+        # Get total interest collected this month (a date range, so idx_loan_payments_group_date is used)
+        month_start = datetime(current_year, current_month, 1)
+        next_month_start = datetime(current_year + current_month // 12, current_month % 12 + 1, 1)
+        cursor.execute("""
+            SELECT SUM(lp.interest_paid) as total_interest_paid 
+            FROM loan_payments lp
+            WHERE lp.group_id = %s AND lp.payment_date >= %s AND lp.payment_date < %s
+        """, (group_id, month_start, next_month_start))
+        result_interest = cursor.fetchone()
+        total_interest_this_month = result_interest['total_interest_paid'] if result_interest and result_interest[
+            'total_interest_paid'] is not None else Decimal('0.00')
+
+        # Calculate total income for this month
+        total_income_this_month = total_contributions_this_month + total_interest_this_month
+
+        # Get bank balance
+        cursor.execute("SELECT balance FROM bank_balance WHERE group_id = %s", (group_id,))
+        result_balance = cursor.fetchone()
+        bank_balance = result_balance['balance'] if result_balance and result_balance[
+            'balance'] is not None else Decimal('0.00')
+
+        # Get recent activities (e.g., last 5 contributions/loans)
+        cursor.execute("""
+            SELECT 'contribution' as type, u.name as member_name, c.amount, c.payment_date 
+            FROM contributions c JOIN users u ON c.user_id = u.id 
+            WHERE c.group_id = %s AND c.is_paid = TRUE ORDER BY c.payment_date DESC LIMIT 5
+        """, (group_id,))
+        recent_contributions = cursor.fetchall()
+
+        cursor.execute("""
+            SELECT 'loan' as type, u.name as member_name, l.amount, l.start_date 
+            FROM loans l JOIN users u ON l.user_id = u.id 
+            WHERE l.group_id = %s
+            ORDER BY l.start_date DESC LIMIT 5
+        """, (group_id,))
+        recent_loans = cursor.fetchall()
+
+        # Convert all dates to date objects for consistent comparison before sorting
+        for activity in recent_contributions:
+            if 'payment_date' in activity and isinstance(activity['payment_date'], datetime):
+                activity['payment_date'] = activity['payment_date'].date()
+        for activity in recent_loans:
+            if 'start_date' in activity and isinstance(activity['start_date'], datetime):
+                activity['start_date'] = activity['start_date'].date()
+
+        recent_activities = sorted(recent_contributions + recent_loans,
+                                   key=lambda x: x['payment_date'] if 'payment_date' in x else x['start_date'],
+                                   reverse=True)[:5]
+
+        cursor.close()
+        conn.close()
+        return render_template('president_dashboard.html',
+                               total_members=total_members,
+                               total_loans=total_loans,
+                               total_contributions_this_month=total_contributions_this_month,  # Updated variable name
+                               total_interest_this_month=total_interest_this_month,  # New variable
+                               total_income_this_month=total_income_this_month,  # New variable
+                               bank_balance=bank_balance,
+                               recent_activities=recent_activities,
+                               pending_contributions_count=pending_contributions_count)  # Pass pending count
+
+    elif role == 'member':  # Only 'member' role for this block now
+        # Member dashboard
+        # Get user's total contributions
+        cursor.execute(
+            "SELECT SUM(amount) as total_contributed FROM contributions WHERE user_id = %s AND is_paid = TRUE",
+            (user_id,))
+        result_contributed = cursor.fetchone()
+        total_contributed = result_contributed['total_contributed'] if result_contributed and result_contributed[
+            'total_contributed'] is not None else Decimal('0.00')
+
+        # Get user's current loans
+        cursor.execute("SELECT * FROM loans WHERE user_id = %s AND status IN ('approved', 'overdue')", (user_id,))
+        current_loans = cursor.fetchall()
+
+        # Get user's pending contributions for current month
+        current_month = datetime.now().month
+        current_year = datetime.now().year
+        cursor.execute("""
+            SELECT * FROM contributions 
+            WHERE user_id = %s AND month = %s AND year = %s AND is_paid = FALSE AND utr_number IS NOT NULL
+        """, (user_id, current_month, current_year))
+        pending_contribution = cursor.fetchone()
+
+        cursor.close()
+        conn.close()
+        page_context = cache_page_context('dashboard', user_id, g.data_version, dict(
+            total_contributed=total_contributed,
+            current_loans=current_loans,
+            pending_contribution=pending_contribution,
+            is_president=(role == 'president')))  # Pass this for conditional rendering
+        return render_template('member_dashboard.html', **page_context)
+
+    else:
+        flash('Unknown role.', 'danger')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('login'))
+
+
+@app.route('/members')
+@login_required(roles=['president', 'secretary'])  # Allow secretary to manage members
+def manage_members():
+    """Displays a list of all members for the President/Secretary to manage."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_members'))
+    cursor = open_row_cursor(conn)
+    try:
+        cursor.execute("SELECT id, name, username, email, contact_number, role FROM users WHERE group_id = %s ORDER BY id",
+                       (current_group_id(),))
+        return render_template('manage_members.html', members=StreamedRows(cursor))
+    finally:
+        close_row_cursor(cursor)
+        conn.close()
+
+
+@app.route('/add_member', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])  # Allow secretary to add members
+def add_member():
+    """Allows President/Secretary to add new members."""
+    if request.method == 'POST':
+        name = request.form['name']
+        username = request.form['username']
+        email = request.form['email']
+        contact_number = request.form['contact_number']
+        pan_number = request.form['pan_number']
+        aadhar_number = request.form['aadhar_number']
+        password = request.form['password']
+        role = request.form.get('role', 'member')  # President/Secretary can specify role for new user
+
+        # Added server-side validation for password
+        if not password or not password.strip():  # Ensure password is not empty or just whitespace
+            flash('Password cannot be empty.', 'danger')
+            return render_template('register.html')
+
+        hashed_password = hash_password(password)
+
+        conn = get_db_connection()
+        if conn is None:
+            flash('Database connection error.', 'danger')
+            return render_template('add_member.html')
+
+        # Use buffered=True for the cursor
+        cursor = conn.cursor(buffered=True)
+        try:
+            cursor.execute(
+                "INSERT INTO users (group_id, name, username, email, contact_number, pan_number, aadhar_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                (current_group_id(), name, username, email, contact_number, pan_number, aadhar_number, hashed_password,
+                 role)
+            )
+            conn.commit()
+            flash(f'{name} added successfully as a {role}!', 'success')
+            return redirect(url_for('manage_members'))
+        except mysql.connector.Error as err:
+            if err.errno == 1062:
+                flash('Username, Email, PAN, or Aadhar number already exists.', 'danger')
+            else:
+                flash(f'An error occurred: {err}', 'danger')
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+    return render_template('add_member.html')
+
+
+# --- Bulk member import/export ---
+# A whole CSV/XLSX file is validated before anything is written: required fields, column
+# lengths, and uniqueness of username/email/PAN/Aadhar both within the file and against existing
+# users (one query for all values). Valid rows are hashed in parallel and inserted in chunks;
+# every rejected row is reported with its reasons.
+MEMBER_IMPORT_COLUMNS = ('name', 'username', 'email', 'contact_number', 'pan_number', 'aadhar_number', 'password',
+                         'role')
+MEMBER_IMPORT_REQUIRED = ('name', 'username', 'email', 'contact_number', 'password')
+MEMBER_EXPORT_COLUMNS = ('name', 'username', 'email', 'contact_number', 'pan_number', 'aadhar_number', 'role',
+                         'created_at')
+MEMBER_UNIQUE_FIELDS = ('username', 'email', 'pan_number', 'aadhar_number')
+MEMBER_FIELD_LIMITS = {'name': 255, 'username': 255, 'email': 255, 'contact_number': 20, 'pan_number': 10,
+                       'aadhar_number': 12}  # users column sizes
+MEMBER_ROLES = ('president', 'secretary', 'treasurer', 'member')
+
+
+def _import_cell_text(value):
+    """Spreadsheet cell as text; whole numbers (phone and Aadhar numbers) lose Excel's '.0'."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def read_member_rows(upload, max_rows):
+    """
+    Reads an uploaded .csv or .xlsx file into [(row_number, {column: text})], skipping blank
+    lines. Header names are matched case-insensitively. Raises ValueError for unreadable files.
+    """
+    filename = (upload.filename or '').lower()
+    workbook = None
+    if filename.endswith('.xlsx'):
+        if not EXCEL_AVAILABLE:
+            raise ValueError('Excel import needs openpyxl. Please upload a CSV file instead.')
+        workbook = load_workbook(upload.stream, read_only=True, data_only=True)
+        lines = workbook.active.iter_rows(values_only=True)
+    elif filename.endswith('.csv'):
+        lines = csv.reader(TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''))
+    else:
+        raise ValueError('Please upload a .csv or .xlsx file.')
+
+    try:
+        header = next(lines, None)
+        if header is None:
+            raise ValueError('The file is empty.')
+        columns = [_import_cell_text(column).lower().replace(' ', '_') for column in header]
+        missing = [column for column in MEMBER_IMPORT_REQUIRED if column not in columns]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}.")
+
+        rows = []
+        for row_number, values in enumerate(lines, start=2):
+            row = {column: _import_cell_text(value) for column, value in zip(columns, values)
+                   if column in MEMBER_IMPORT_COLUMNS}
+            if not any(row.values()):
+                continue
+            if len(rows) == max_rows:
+                raise ValueError(f'The file has more than {max_rows} members. Please split it.')
+            rows.append((row_number, row))
+        return rows
+    except UnicodeDecodeError:
+        raise ValueError('CSV files must be saved with UTF-8 encoding.')
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def validate_member_rows(cursor, rows):
+    """
+    Checks every row and normalizes role, PAN and Aadhar in place. Returns {row_number: [errors]}
+    for the rejected rows. Uniqueness is checked against the rest of the file and, with one
+    query, against all existing users (the unique keys are not per group).
+    """
+    errors = {}
+    first_seen = {field: {} for field in MEMBER_UNIQUE_FIELDS}  # lowercased value -> first row number
+    for row_number, row in rows:
+        problems = [f'{field} is required' for field in MEMBER_IMPORT_REQUIRED if not row.get(field)]
+        problems.extend(f'{field} is longer than {limit} characters'
+                        for field, limit in MEMBER_FIELD_LIMITS.items() if len(row.get(field, '')) > limit)
+        if row.get('email') and '@' not in row['email']:
+            problems.append('email is not a valid address')
+        row['role'] = (row.get('role') or 'member').lower()
+        if row['role'] not in MEMBER_ROLES:
+            problems.append(f"role must be one of {', '.join(MEMBER_ROLES)}")
+        row['pan_number'] = row.get('pan_number', '').upper()
+        row['aadhar_number'] = row.get('aadhar_number', '')
+        for field in MEMBER_UNIQUE_FIELDS:
+            value = row[field].lower() if row.get(field) else None
+            if value is None:
+                continue
+            if value in first_seen[field]:
+                problems.append(f'{field} is the same as in row {first_seen[field][value]}')
+            else:
+                first_seen[field][value] = row_number
+        if problems:
+            errors[row_number] = problems
+
+    clauses, params = [], []
+    for field in MEMBER_UNIQUE_FIELDS:
+        if first_seen[field]:
+            clauses.append(f"{field} IN ({', '.join(['%s'] * len(first_seen[field]))})")
+            params.extend(first_seen[field])
+    if clauses:
+        taken = {field: set() for field in MEMBER_UNIQUE_FIELDS}
+        cursor.execute(f"SELECT {', '.join(MEMBER_UNIQUE_FIELDS)} FROM users WHERE {' OR '.join(clauses)}",
+                       tuple(params))
+        for user in cursor.fetchall():
+            for field in MEMBER_UNIQUE_FIELDS:
+                if user[field]:
+                    taken[field].add(user[field].lower())
+        for row_number, row in rows:
+            problems = [f'{field} already exists' for field in MEMBER_UNIQUE_FIELDS
+                        if row.get(field) and row[field].lower() in taken[field]]
+            if problems:
+                errors.setdefault(row_number, []).extend(problems)
+    return errors
+
+
+def insert_member_rows(conn, group_id, rows, password_hashes, errors):
+    """
+    Inserts validated rows in chunks of MEMBER_IMPORT_CHUNK_SIZE, one multi-row INSERT and commit
+    per chunk (executemany sends INSERT ... VALUES as a single statement). A chunk that hits a
+    duplicate added meanwhile is retried row by row, so only the clashing rows are rejected
+    (added to errors). Returns the number of members inserted.
+    """
+    sql = ("INSERT INTO users (group_id, name, username, email, contact_number, pan_number, aadhar_number, password, role) "
+           "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)")
+    values = [(group_id, row['name'], row['username'], row['email'], row['contact_number'],
+               row['pan_number'] or None, row['aadhar_number'] or None, password_hash, row['role'])
+              for (_, row), password_hash in zip(rows, password_hashes)]
+    chunk_size = app.config['MEMBER_IMPORT_CHUNK_SIZE']
+    cursor = conn.cursor()
+    inserted_count = 0
+    try:
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            try:
+                cursor.executemany(sql, chunk)
+                conn.commit()
+                inserted_count += len(chunk)
+                continue
+            except mysql.connector.IntegrityError:
+                conn.rollback()
+            for (row_number, _), row_values in zip(rows[start:start + chunk_size], chunk):
+                try:
+                    cursor.execute(sql, row_values)
+                    conn.commit()
+                    inserted_count += 1
+                except mysql.connector.IntegrityError:
+                    conn.rollback()
+                    errors[row_number] = ['username, email, PAN or Aadhar number already exists']
+    finally:
+        cursor.close()
+    return inserted_count
+
+
+@app.route('/members/import', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])
+def import_members():
+    """Adds many members from a CSV/XLSX file, or only checks the file when 'validate only' is ticked."""
+    if request.method == 'GET':
+        return render_template('import_members.html', columns=MEMBER_IMPORT_COLUMNS, report=None)
+
+    upload = request.files.get('members_file')
+    if not upload or not upload.filename:
+        flash('Please choose a CSV or Excel file to import.', 'danger')
+        return render_template('import_members.html', columns=MEMBER_IMPORT_COLUMNS, report=None)
+    try:
+        rows = read_member_rows(upload, app.config['MEMBER_IMPORT_MAX_ROWS'])
+    except ValueError as err:
+        flash(str(err), 'danger')
+        return render_template('import_members.html', columns=MEMBER_IMPORT_COLUMNS, report=None)
+
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return render_template('import_members.html', columns=MEMBER_IMPORT_COLUMNS, report=None)
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    errors = validate_member_rows(cursor, rows)
+    cursor.close()
+
+    validate_only = bool(request.form.get('validate_only'))
+    valid_rows = [(row_number, row) for row_number, row in rows if row_number not in errors]
+    inserted_count = 0
+    if valid_rows and not validate_only:
+        try:
+            password_hashes = hash_passwords([row['password'] for _, row in valid_rows])
+            inserted_count = insert_member_rows(conn, current_group_id(), valid_rows, password_hashes, errors)
+        except BrokenProcessPool:
+            flash('Password hashing failed. Please try the import again.', 'danger')
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while importing members: {err}', 'danger')
+    conn.close()
+
+    report = {
+        'total': len(rows),
+        'valid': len(valid_rows),
+        'inserted': inserted_count,
+        'validate_only': validate_only,
+        'rejected': [{'row_number': row_number, 'username': row.get('username', ''), 'name': row.get('name', ''),
+                      'errors': errors[row_number]}
+                     for row_number, row in rows if row_number in errors],
+    }
+    if inserted_count:
+        flash(f'Imported {inserted_count} member(s).', 'success')
+    return render_template('import_members.html', columns=MEMBER_IMPORT_COLUMNS, report=report)
+
+
+@app.route('/members/export.<export_format>')
+@login_required(roles=['president', 'secretary'])
+def export_members(export_format):
+    """
+    Downloads the group's members in the import layout (without passwords). CSV is streamed
+    from an unbuffered cursor as it is written; Excel uses openpyxl's write-only mode.
+    """
+    if export_format not in ('csv', 'xlsx') or (export_format == 'xlsx' and not EXCEL_AVAILABLE):
+        flash('That export format is not available.', 'danger')
+        return redirect(url_for('manage_members'))
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_members'))
+    cursor = open_row_cursor(conn)
+    cursor.execute(f"SELECT {', '.join(MEMBER_EXPORT_COLUMNS)} FROM users WHERE group_id = %s ORDER BY id",
+                   (current_group_id(),))
+    members = StreamedRows(cursor)
+
+    if export_format == 'xlsx':
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Members')
+        sheet.append(MEMBER_EXPORT_COLUMNS)
+        for member in members:
+            sheet.append([member[column] for column in MEMBER_EXPORT_COLUMNS])
+        members.close()
+        conn.close()
+        output = BytesIO()
+        workbook.save(output)
+        output.seek(0)
+        return send_file(output, as_attachment=True, download_name='members.xlsx',
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+    def generate_csv():
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(MEMBER_EXPORT_COLUMNS)
+        for member in members:
+            writer.writerow([api_value(member[column]) if member[column] is not None else ''
+                             for column in MEMBER_EXPORT_COLUMNS])
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    response = app.response_class(generate_csv(), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=members.csv'
+
+    @response.call_on_close
+    def close_export_cursor():
+        members.close()
+        conn.close()
+
+    return response
+
+
+@app.route('/edit_member/<int:member_id>', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])  # Allow secretary to edit members
+def edit_member(member_id):
+    """Allows President/Secretary to edit member details."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_members'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        if request.method == 'POST':
+            name = request.form['name']
+            username = request.form['username']
+            email = request.form['email']
+            contact_number = request.form['contact_number']
+            pan_number = request.form['pan_number']
+            aadhar_number = request.form['aadhar_number']
+            role = request.form['role']
+            password = request.form.get('password')  # Optional password change
+
+            try:
+                if password:
+                    # Only hash and update password if it's provided and not empty
+                    if not password.strip():  # Check for empty string or just whitespace
+                        flash('Password cannot be empty if you choose to change it.', 'danger')
+                        # Re-fetch member data to display the form correctly again
+                        cursor.execute(
+                            "SELECT id, name, username, email, contact_number, pan_number, aadhar_number, role FROM users WHERE id = %s AND group_id = %s",
+                            (member_id, current_group_id()))
+                        member = cursor.fetchone()
+                        return render_template('edit_member.html', member=member)
+                    hashed_password = hash_password(password)
+                    cursor.execute(
+                        "UPDATE users SET name=%s, username=%s, email=%s, contact_number=%s, pan_number=%s, aadhar_number=%s, password=%s, role=%s WHERE id=%s AND group_id=%s",
+                        (name, username, email, contact_number, pan_number, aadhar_number, hashed_password, role, member_id,
+                         current_group_id())
+                    )
+                else:
+                    cursor.execute(
+                        "UPDATE users SET name=%s, username=%s, email=%s, contact_number=%s, pan_number=%s, aadhar_number=%s, role=%s WHERE id=%s AND group_id=%s",
+                        (name, username, email, contact_number, pan_number, aadhar_number, role, member_id, current_group_id())
+                    )
+                bump_data_version(cursor, member_id)
+                conn.commit()
+                flash(f'Member {name} updated successfully!', 'success')
+                return redirect(url_for('manage_members'))
+            except mysql.connector.Error as err:
+                if err.errno == 1062:
+                    flash('Username, Email, PAN, or Aadhar number already exists.', 'danger')
+                else:
+                    flash(f'An error occurred: {err}', 'danger')
+                conn.rollback()
+
+        # GET request: Display member details for editing
+        cursor.execute(
+            "SELECT id, name, username, email, contact_number, pan_number, aadhar_number, role FROM users WHERE id = %s AND group_id = %s",
+            (member_id, current_group_id()))
+        member = cursor.fetchone()
+        if not member:
+            flash('Member not found.', 'danger')
+            return redirect(url_for('manage_members'))
+        return render_template('edit_member.html', member=member)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route('/delete_member/<int:member_id>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])  # Allow secretary to delete members
+def delete_member(member_id):
+    """Allows President/Secretary to delete a member."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_members'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(buffered=True)
+    try:
+        record_member_deleted_rows(cursor, member_id, current_group_id())  # Synced devices drop their rows too
+        cursor.execute("DELETE FROM users WHERE id = %s AND group_id = %s", (member_id, current_group_id()))
+        conn.commit()
+        flash('Member deleted successfully!', 'success')
+    except mysql.connector.Error as err:
+        flash(f'An error occurred: {err}', 'danger')
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+    return redirect(url_for('manage_members'))
+
+
+@app.route('/member_profile/<int:user_id>')
+@login_required()  # Any logged-in user can view their own profile, president can view any
+def member_profile(user_id):
+    """Displays a member's profile and records."""
+    current_user_id = session.get('user_id')
+    current_user_role = session.get('role')
+
+    # Allow president or secretary to view any profile, but members can only view their own
+    if current_user_role not in ['president', 'secretary'] and current_user_id != user_id:
+        flash('You are not authorized to view this profile.', 'danger')
+        return redirect(url_for('dashboard'))
+
+    # A member's own profile is served at their current data version without touching the database
+    if current_user_id == user_id:
+        page_context = get_cached_page_context('member_profile', user_id, g.data_version)
+        if page_context is not None:
+            return render_template('member_profile.html', **page_context)
+
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    # Get user details (only within the viewer's own group)
+    cursor.execute(
+        "SELECT id, name, username, email, contact_number, pan_number, aadhar_number, role, data_version FROM users WHERE id = %s AND group_id = %s",
+        (user_id, current_group_id()))
+    user_profile = cursor.fetchone()
+    if not user_profile:
+        flash('User not found.', 'danger')
+        cursor.close()  # Close cursor before returning
+        conn.close()
+        return redirect(url_for('dashboard'))
+
+    # Other members' profiles are cached on the version read with the profile row
+    page_context = get_cached_page_context('member_profile', user_id, user_profile['data_version'])
+    if page_context is not None:
+        cursor.close()
+        conn.close()
+        return render_template('member_profile.html', **page_context)
+
+    # Get contributions history
+    cursor.execute("SELECT * FROM contributions WHERE user_id = %s ORDER BY year DESC, month DESC", (user_id,))
+    contributions = cursor.fetchall()
+
+    # Get loan history
+    cursor.execute("SELECT * FROM loans WHERE user_id = %s ORDER BY start_date DESC", (user_id,))
+    loans = cursor.fetchall()
+
+    # Get loan payments for each loan
+    for loan in loans:
+        cursor.execute("SELECT * FROM loan_payments WHERE loan_id = %s ORDER BY payment_date DESC", (loan['id'],))
+        loan['payments'] = cursor.fetchall()
+
+    cursor.close()  # Close cursor after all fetches
+    conn.close()
+    page_context = cache_page_context('member_profile', user_id, user_profile['data_version'],
+                                      dict(user_profile=user_profile, contributions=contributions, loans=loans))
+    return render_template('member_profile.html', **page_context)
+
+
+def compute_member_dues(conn, user_id, group_id):
+    """
+    Works out what a member owes for the current month: contribution, fine and loan interest.
+    Stored dues from the monthly close batch are used when present, otherwise they are computed
+    on the fly. Amounts are returned as Money, together with the group's payment period.
+    """
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    # Get default contribution amount and payment period for display
+    default_contribution_amount = Money(0)
+    payment_start_day = 1
+    payment_end_day = 7
+    default_fine_amount = Money(0)  # Initialize
+    try:
+        settings = get_group_settings(conn, group_id)
+        if settings:
+            if settings['default_contribution_amount'] is not None:
+                default_contribution_amount = Money.from_decimal(settings['default_contribution_amount'])
+            if settings['payment_start_day'] is not None:
+                payment_start_day = settings['payment_start_day']
+            if settings['payment_end_day'] is not None:
+                payment_end_day = settings['payment_end_day']
+            if settings['default_fine_amount'] is not None:
+                default_fine_amount = Money.from_decimal(settings['default_fine_amount'])
+    except Exception as e:
+        print(f"Could not fetch default contribution amount or payment period: {e}")
+
+    # Dues stored by the monthly close batch (close-month command), when it has run for this month
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    stored_contribution = run_hot_query_one(conn, 'contribution_for_month', (user_id, current_month, current_year))
+
+    # Calculate current fine amount based on today's date
+    current_day_of_month = datetime.now().day
+    current_fine_amount = Money(0)
+    if stored_contribution and not stored_contribution['is_paid'] and stored_contribution['fine_amount']:
+        current_fine_amount = Money.from_decimal(stored_contribution['fine_amount'])
+    # Fine applies if current day is past the end day, regardless of role
+    elif current_day_of_month > payment_end_day:
+        current_fine_amount = default_fine_amount
+
+    # Total monthly loan interest due for all active loans of the user. Loans the close batch has
+    # already stored a due for this month use it; loans without one (e.g. disbursed since the
+    # batch ran) are calculated on the fly.
+    total_monthly_loan_interest_due = Money(0)
+    cursor.execute("""
+        SELECT l.id, l.amount, l.interest_rate, d.interest_due AS stored_interest_due
+        FROM loans l
+        LEFT JOIN loan_interest_dues d ON d.loan_id = l.id AND d.month = %s AND d.year = %s
+        WHERE l.user_id = %s AND l.status IN ('approved', 'overdue')
+    """, (current_month, current_year, user_id))
+    active_loans = cursor.fetchall()
+
+    for loan in active_loans:
+        if loan['stored_interest_due'] is not None:
+            total_monthly_loan_interest_due += Money.from_decimal(loan['stored_interest_due'])
+            continue
+
+        payment_summary = run_hot_query_one(conn, 'loan_payment_summary', (loan['id'],))
+        total_paid_on_loan = Money.from_decimal(payment_summary['total_paid'] if payment_summary else None)
+        total_interest_paid_on_loan = Money.from_decimal(
+            payment_summary['total_interest_paid_from_payments'] if payment_summary else None)
+
+        outstanding_principal_on_loan = Money.from_decimal(loan['amount']) - (
+                    total_paid_on_loan - total_interest_paid_on_loan)
+
+        # Calculate interest for the current month based on outstanding principal
+        if outstanding_principal_on_loan > 0:
+            # Determine the start date for interest calculation for this month
+            # This is a simplified approach, a real system would need more robust amortization
+            # For simplicity, we'll calculate monthly interest on the current outstanding principal.
+            monthly_interest_due_for_this_loan = outstanding_principal_on_loan.interest(loan['interest_rate'])
+            total_monthly_loan_interest_due += monthly_interest_due_for_this_loan
+
+    cursor.close()
+
+    return {
+        'default_contribution_amount': default_contribution_amount,
+        'default_fine_amount': default_fine_amount,
+        'payment_start_day': payment_start_day,
+        'payment_end_day': payment_end_day,
+        'current_fine_amount': current_fine_amount,
+        'total_monthly_loan_interest_due': total_monthly_loan_interest_due,
+        # The total amount to pay (contribution + fine + loan interest)
+        'total_amount_to_pay': default_contribution_amount + current_fine_amount + total_monthly_loan_interest_due,
+    }
+
+
+@app.route('/contributions', methods=['GET', 'POST'])
+@login_required()
+@idempotent
+def contributions():
+    """Handles contribution payments and displays history."""
+    user_id = session.get('user_id')
+    role = session.get('role')
+    if request.method == 'GET':
+        page_context = get_cached_page_context('contributions', user_id, g.data_version)
+        if page_context is not None:
+            return render_template('contributions.html', **page_context)
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    # Get default contribution amount, payment period and this month's dues
+    dues = compute_member_dues(conn, user_id, current_group_id())
+    default_contribution_amount = dues['default_contribution_amount']
+    payment_start_day = dues['payment_start_day']
+    payment_end_day = dues['payment_end_day']
+    default_fine_amount = dues['default_fine_amount']
+    current_fine_amount = dues['current_fine_amount']
+    total_monthly_loan_interest_due = dues['total_monthly_loan_interest_due']
+    total_amount_to_pay = dues['total_amount_to_pay']
+
+    if request.method == 'POST':
+        # The amount will be taken from the hidden input, which is pre-filled with total_amount_to_pay
+        amount_from_form = request.form.get('amount')  # This should be total_amount_to_pay
+        utr_number = request.form.get('utr_number', '').strip()
+
+        if not amount_from_form:
+            flash('Contribution amount is required.', 'danger')
+            cursor.close()
+            conn.close()
+            return redirect(url_for('contributions'))
+
+        if not utr_number:
+            flash('UTR Number is required for contribution.', 'danger')
+            cursor.close()
+            conn.close()
+            return redirect(url_for('contributions'))
+
+        try:
+            amount_to_record = Money.from_decimal(amount_from_form)  # Use the amount from the form
+        except Exception:
+            flash('Invalid amount format.', 'danger')
+            cursor.close()
+            conn.close()
+            return redirect(url_for('contributions'))
+
+        current_month = datetime.now().month
+        current_year = datetime.now().year
+        current_day = datetime.now().day
+
+        # Check if already paid for this month (or pending)
+        existing_contribution = run_hot_query_one(conn, 'contribution_for_month',
+                                                  (user_id, current_month, current_year))
+
+        # Recalculate fine_amount for the POST request to ensure consistency
+        fine_amount_for_post = Money(0)
+        # Fine applies if current day is past the end day, regardless of role
+        if current_day > payment_end_day:
+            if not existing_contribution or not existing_contribution['is_paid']:
+                fine_amount_for_post = default_fine_amount
+                # Flash message for fine will be handled by the initial GET request render or specific POST logic if needed.
+                # For now, just ensure the fine is recorded.
+
+        try:
+            if existing_contribution and existing_contribution['is_paid']:
+                flash(
+                    f'You have already paid your contribution for {datetime.strptime(str(current_month), "%m").strftime("%B")} {current_year}.',
+                    'info')
+                return redirect(url_for('contributions'))
+
+            if existing_contribution:
+                cursor.execute(
+                    "UPDATE contributions SET amount = %s, utr_number = %s, fine_amount = %s, payment_date = %s WHERE id = %s",
+                    (amount_to_record.to_decimal(), utr_number, fine_amount_for_post.to_decimal(), datetime.now(),
+                     existing_contribution['id'])
+                )
+                flash('Your pending contribution has been updated with the new UTR. Awaiting President approval.',
+                      'info')
+            else:
+                cursor.execute(
+                    "INSERT INTO contributions (group_id, user_id, amount, month, year, is_paid, fine_amount, utr_number) VALUES (%s, %s, %s, %s, %s, FALSE, %s, %s)",
+                    (current_group_id(), user_id, amount_to_record.to_decimal(), current_month, current_year,
+                     fine_amount_for_post.to_decimal(), utr_number)
+                )
+                flash('Contribution submitted for approval. Awaiting President approval.', 'success')
+
+            bump_data_version(cursor, user_id)
+            conn.commit()
+            return redirect(url_for('contributions'))
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while submitting contribution: {err}', 'danger')
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+
+    # GET request: Display contribution history
+    cursor.execute("""
+        SELECT c.*, p.name as approver_name
+        FROM contributions c
+        LEFT JOIN users p ON c.user_id = p.id
+        WHERE c.user_id = %s
+        ORDER BY c.year DESC, c.month DESC
+    """, (user_id,))
+    contributions_history = cursor.fetchall()
+
+    # Payment button is always enabled from the UI perspective,
+    # but the backend logic still applies fines based on the configured period.
+    payment_enabled = True  # Always True now, as per user request (though this variable is no longer used in the template)
+
+    # Check for pending contribution for current month
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    cursor.execute("""
+        SELECT * FROM contributions 
+        WHERE user_id = %s AND month = %s AND year = %s AND is_paid = FALSE AND utr_number IS NOT NULL
+    """, (user_id, current_month, current_year))
+    pending_contribution_for_display = cursor.fetchone()
+
+    cursor.close()
+    conn.close()
+    page_context = cache_page_context('contributions', user_id, g.data_version, dict(
+        contributions_history=contributions_history,
+        payment_enabled=payment_enabled,  # Still passed, but always True
+        pending_contribution=pending_contribution_for_display,  # Pass for display
+        default_contribution_amount=default_contribution_amount.to_decimal(),
+        current_fine_amount=current_fine_amount.to_decimal(),  # Pass calculated fine
+        total_monthly_loan_interest_due=total_monthly_loan_interest_due.to_decimal(),
+        # Pass calculated loan interest
+        total_amount_to_pay=total_amount_to_pay.to_decimal(),  # Pass total amount
+        payment_start_day=payment_start_day,  # Pass to template
+        payment_end_day=payment_end_day))  # Pass to template
+    return render_template('contributions.html', **page_context)
+
+
+@app.route('/loans', methods=['GET'])
+@login_required()
+def loans():
+    """Displays loans for members or manages loans for president."""
+    user_id = session.get('user_id')
+    role = session.get('role')
+    is_manager = role in ['president', 'secretary']  # Allow secretary to view/manage all loan applications
+    if not is_manager:
+        page_context = get_cached_page_context('loans', user_id, g.data_version)
+        if page_context is not None:
+            return render_template('member_loans.html', **page_context)
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    # Compact rows, streamed in batches while the template renders (the full listing can be large)
+    cursor = open_row_cursor(conn)
+    try:
+        if is_manager:
+            # President/Secretary sees all loan applications
+            cursor.execute("""
+                SELECT l.*, u.name as borrower_name 
+                FROM loans l JOIN users u ON l.user_id = u.id 
+                WHERE l.group_id = %s
+                ORDER BY l.start_date DESC
+            """, (current_group_id(),))
+            return render_template('manage_loans.html', loans=StreamedRows(cursor))
+
+        # Member sees their own loans; a member's list is short, so it is fetched whole and cached
+        cursor.execute("""
+            SELECT l.*, u.name as president_name 
+            FROM loans l LEFT JOIN users u ON l.president_id = u.id 
+            WHERE l.user_id = %s ORDER BY l.start_date DESC
+        """, (user_id,))
+        page_context = cache_page_context('loans', user_id, g.data_version, dict(loans=fetch_compact_rows(cursor)))
+    finally:
+        close_row_cursor(cursor)
+        conn.close()
+    return render_template('member_loans.html', **page_context)
+
+
+@app.route('/apply_loan', methods=['GET', 'POST'])
+@login_required()
+def apply_loan():
+    """Allows members to apply for a loan."""
+    user_id = session.get('user_id')
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error.', 'danger')
+        # Ensure default values are passed even if DB connection fails for initial render
+        return render_template('apply_loan.html', default_interest_rate=Decimal('0.00'), bank_balance=Decimal('0.00'),
+                               today_date=date.today())
+
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    default_interest_rate = Decimal('0.00')  # Initialize with a default
+    bank_balance = Decimal('0.00')  # Initialize with a default
+    today_date = date.today()  # Get today's date
+
+    try:
+        settings = get_group_settings(conn, current_group_id())
+        if settings and settings['default_interest_rate'] is not None:
+            default_interest_rate = settings['default_interest_rate']
+        cursor.execute("SELECT balance FROM bank_balance WHERE group_id = %s", (current_group_id(),))
+        balance_row = cursor.fetchone()
+        if balance_row and balance_row['balance'] is not None:
+            bank_balance = balance_row['balance']
+    except Exception as e:
+        print(f"Could not fetch default interest rate or bank balance: {e}")
+
+    if request.method == 'POST':
+        # Get form data and strip whitespace
+        amount_str = request.form.get('amount', '').strip()
+        start_date_str = request.form.get('start_date', '').strip()
+
+        # Input validation for empty strings
+        if not amount_str:
+            flash('Loan amount is required.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        if not start_date_str:
+            flash('Proposed start date is required.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        try:
+            amount = Decimal(amount_str)
+            # Use the default interest rate from settings, not from the disabled form field
+            interest_rate = default_interest_rate
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+        except Exception as e:
+            flash(f'Invalid data format for loan application: {e}', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        if amount <= 0:
+            flash('Loan amount must be positive.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        if amount > bank_balance:
+            flash(f'Requested loan amount (₹{amount:.2f}) exceeds available bank balance (₹{bank_balance:.2f}).',
+                  'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        # Interest rate validation is now based on the fetched default_interest_rate
+        if interest_rate < 0 or interest_rate > 100:
+            flash('Default interest rate is configured incorrectly (must be between 0 and 100). Please contact admin.',
+                  'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        if start_date < date.today():
+            flash('Proposed start date cannot be in the past.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('apply_loan.html', default_interest_rate=default_interest_rate,
+                                   bank_balance=bank_balance, today_date=today_date)
+
+        try:
+            # Loan status starts as 'pending', president_id is NULL until approved
+            # The start_date here is the *proposed* start date. It will be updated to the approval date upon approval.
+            # end_date is now NULL
+            cursor.execute(
+                "INSERT INTO loans (group_id, user_id, president_id, amount, interest_rate, start_date, status) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (current_group_id(), user_id, None, amount, interest_rate, start_date, 'pending')  # Set president_id to NULL
+            )
+            bump_data_version(cursor, user_id)
+            conn.commit()
+            flash('Loan application submitted successfully! Awaiting President approval.', 'success')
+            return redirect(url_for('loans'))
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while submitting loan application: {err}', 'danger')
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+
+    # GET request: Display loan application form with default values
+    cursor.close()
+    conn.close()
+    return render_template('apply_loan.html', default_interest_rate=default_interest_rate, bank_balance=bank_balance,
+                           today_date=today_date)
+
+
+@app.route('/approve_loan/<int:loan_id>', methods=['GET'])  # Changed to GET
+@login_required(roles=['president', 'secretary'])  # Allow secretary to approve loans
+def approve_loan(loan_id):
+    """
+    Renders the loan disbursement form for the President/Secretary to specify transaction details.
+    This route no longer directly approves the loan.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        cursor.execute(
+            "SELECT l.id, l.amount, l.user_id, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s AND l.group_id = %s",
+            (loan_id, current_group_id()))
+        loan = cursor.fetchone()
+
+        if not loan:
+            flash('Loan not found.', 'danger')
+            return redirect(url_for('loans'))
+
+        # Pass loan details to the new disbursement form
+        return render_template('disburse_loan_form.html', loan=loan)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route('/disburse_loan/<int:loan_id>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])
+@idempotent
+def disburse_loan(loan_id):
+    """
+    Handles the disbursement of an approved loan, recording transaction details.
+    This is the new route that performs the actual loan approval and fund deduction.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+
+    conn.autocommit = False  # Start transaction
+    cursor = conn.cursor(buffered=True)  # Cursor is NOT dictionary=True here
+    try:
+        transaction_type = request.form.get('transaction_type')
+        disbursement_details = {}
+
+        # Fetch loan amount for validation and deduction
+        cursor.execute("SELECT amount FROM loans WHERE id = %s AND group_id = %s", (loan_id, current_group_id()))
+        loan_result = cursor.fetchone()
+        if not loan_result:
+            flash('Loan not found.', 'danger')
+            conn.rollback()
+            return redirect(url_for('loans'))
+        loan_amount = Money.from_decimal(loan_result[0])
+
+        # Validate transaction details based on type
+        if transaction_type == 'cash':
+            notes_500_str = request.form.get('notes_500', '0')
+            notes_200_str = request.form.get('notes_200', '0')
+            notes_100_str = request.form.get('notes_100', '0')
+
+            try:
+                notes_500 = int(notes_500_str)
+                notes_200 = int(notes_200_str)
+                notes_100 = int(notes_100_str)
+
+                if notes_500 < 0 or notes_200 < 0 or notes_100 < 0:
+                    flash('Note counts cannot be negative.', 'danger')
+                    conn.rollback()
+                    return redirect(url_for('approve_loan', loan_id=loan_id))
+
+                calculated_cash_amount = (Money(50000) * notes_500) + (Money(20000) * notes_200) + (
+                            Money(10000) * notes_100)
+
+                if calculated_cash_amount != loan_amount:
+                    flash(
+                        f'Cash notes total (₹{calculated_cash_amount:.2f}) does not match loan amount (₹{loan_amount:.2f}).',
+                        'danger')
+                    conn.rollback()
+                    return redirect(url_for('approve_loan', loan_id=loan_id))
+
+                disbursement_details = {
+                    'notes_500': notes_500,
+                    'notes_200': notes_200,
+                    'notes_100': notes_100
+                }
+            except ValueError:
+                flash('Invalid note count for cash disbursement.', 'danger')
+                conn.rollback()
+                return redirect(url_for('approve_loan', loan_id=loan_id))
+
+        elif transaction_type == 'cheque':
+            cheque_number = request.form.get('cheque_number', '').strip()
+            if not cheque_number or not cheque_number.isdigit() or len(cheque_number) != 6:
+                flash('Cheque number must be a 6-digit number.', 'danger')
+                conn.rollback()
+                return redirect(url_for('approve_loan', loan_id=loan_id))
+            disbursement_details = {'cheque_number': cheque_number}
+
+        elif transaction_type == 'upi':
+            upi_utr = request.form.get('upi_utr', '').strip()
+            if not upi_utr or not upi_utr.isdigit() or len(upi_utr) != 12:
+                flash('UPI UTR must be a 12-digit number.', 'danger')
+                conn.rollback()
+                return redirect(url_for('approve_loan', loan_id=loan_id))
+            disbursement_details = {'upi_utr': upi_utr}
+        else:
+            flash('Invalid transaction type selected.', 'danger')
+            conn.rollback()
+            return redirect(url_for('approve_loan', loan_id=loan_id))
+
+        # Convert disbursement_details to JSON string for storage
+        disbursement_details_json = json.dumps(disbursement_details)
+
+        try:
+            # 1. Get current bank balance
+            cursor.execute("SELECT balance FROM bank_balance WHERE group_id = %s", (current_group_id(),))
+            balance_result = cursor.fetchone()  # This will be a tuple (balance,)
+            current_balance = Money.from_decimal(balance_result[0] if balance_result else None)
+
+            # 2. Check for sufficient funds
+            if current_balance < loan_amount:
+                flash(
+                    f'Insufficient bank balance (Current: ₹{current_balance:.2f}, Required: ₹{loan_amount:.2f}) to approve this loan. Please deposit funds.',
+                    'danger')
+                conn.rollback()
+                return redirect(url_for('loans'))
+
+            # 3. Update loan status AND set start_date to today's date (approval date)
+            # Also store disbursement type and details
+            cursor.execute(
+                "UPDATE loans SET status = 'approved', president_id = %s, start_date = %s, disbursement_type = %s, disbursement_details = %s WHERE id = %s",
+                (session['user_id'], date.today(), transaction_type, disbursement_details_json, loan_id)
+            )
+
+            # 4. Deduct loan amount from bank balance
+            cursor.execute("UPDATE bank_balance SET balance = balance - %s WHERE group_id = %s",
+                           (loan_amount.to_decimal(), current_group_id()))
+            bump_loan_owner_data_version(cursor, loan_id)
+
+            # 5. Commit the transaction
+            conn.commit()
+            flash('Loan approved and amount disbursed! Transaction details recorded.', 'success')
+
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while disbursing loan: {err}', 'danger')
+            conn.rollback()
+        return redirect(url_for('loans'))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route('/reject_loan/<int:loan_id>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])  # Allow secretary to reject loans
+def reject_loan(loan_id):
+    """Allows President/Secretary to reject a loan."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(buffered=True)
+    try:
+        # Record which president/secretary rejected the loan
+        cursor.execute("UPDATE loans SET status = 'rejected', president_id = %s WHERE id = %s AND group_id = %s",
+                       (session['user_id'], loan_id, current_group_id()))
+        bump_loan_owner_data_version(cursor, loan_id)
+        conn.commit()
+        flash('Loan rejected.', 'info')
+    except mysql.connector.Error as err:
+        flash(f'An error occurred while rejecting loan: {err}', 'danger')
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+    return redirect(url_for('loans'))
+
+
+@app.route('/record_loan_payment/<int:loan_id>', methods=['GET', 'POST'])
+@login_required()  # Can be done by member or treasurer/president/secretary
+@idempotent
+def record_loan_payment(loan_id):
+    """Allows recording a payment for a specific loan."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    # Get loan details
+    loan = run_hot_query_one(conn, 'loan_by_id', (loan_id, current_group_id()))
+
+    if not loan:
+        flash('Loan not found.', 'danger')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('loans'))
+
+    # Ensure only the borrower or president/secretary can record payments
+    if session.get('user_id') != loan['user_id'] and session.get('role') not in ['president', 'secretary']:
+        flash('You are not authorized to record payments for this loan.', 'danger')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('loans'))
+
+    if loan['status'] == 'completed':
+        flash('This loan is already completed. No more payments are needed.', 'info')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('loans'))
+
+    # Calculate current outstanding principal and total interest paid so far
+    payment_summary = run_hot_query_one(conn, 'loan_payment_summary', (loan_id,))
+    total_paid_so_far = Money.from_decimal(payment_summary['total_paid'] if payment_summary else None)
+    total_interest_paid_from_payments = Money.from_decimal(
+        payment_summary['total_interest_paid_from_payments'] if payment_summary else None)
+
+    # Initial principal is the loan amount
+    outstanding_principal = Money.from_decimal(loan['amount']) - (total_paid_so_far - total_interest_paid_from_payments)
+
+    # Calculate monthly interest based on outstanding principal (simple interest for demo)
+    # Assuming interest_rate is annual percentage
+    monthly_interest_due = outstanding_principal.interest(loan['interest_rate'])
+
+    if request.method == 'POST':
+        amount_paid_str = request.form.get('amount_paid')
+
+        if not amount_paid_str:
+            flash('Payment amount is required.', 'danger')
+            cursor.close()
+            conn.close()
+            return redirect(url_for('record_loan_payment', loan_id=loan_id))
+
+        try:
+            amount_paid = Money.from_decimal(amount_paid_str)
+        except Exception:
+            flash('Invalid amount format.', 'danger')
+            cursor.close()
+            conn.close()
+            return redirect(url_for('record_loan_payment', loan_id=loan_id))
+
+        if amount_paid <= 0:
+            flash('Payment amount must be positive.', 'danger')
+            cursor.close()
+            conn.close()
+            return redirect(url_for('record_loan_payment', loan_id=loan_id))
+
+        # Determine how much goes to interest and how much to principal
+        interest_portion = min(amount_paid, monthly_interest_due)
+        principal_portion = amount_paid - interest_portion
+
+        try:
+            cursor.execute(
+                "INSERT INTO loan_payments (group_id, loan_id, amount_paid, interest_paid, payment_date) VALUES (%s, %s, %s, %s, %s)",
+                (loan['group_id'], loan_id, amount_paid.to_decimal(), interest_portion.to_decimal(), datetime.now())
+            )
+
+            # Update bank balance (money coming back to the gat)
+            cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE group_id = %s",
+                           (amount_paid.to_decimal(), loan['group_id']))
+
+            # Recalculate outstanding principal after this payment
+            new_outstanding_principal = outstanding_principal - principal_portion
+
+            # Check if loan is fully paid (principal is zero or less)
+            if new_outstanding_principal <= 0:
+                cursor.execute("UPDATE loans SET status = 'completed', actual_end_date = %s WHERE id = %s",
+                               (date.today(), loan_id))
+                flash('Loan fully paid and marked as completed!', 'success')
+            else:
+                if loan['status'] == 'overdue':
+                    # A fresh payment brings an overdue loan back to normal until the next overdue check
+                    cursor.execute("UPDATE loans SET status = 'approved' WHERE id = %s", (loan_id,))
+                flash('Loan payment recorded successfully!', 'success')
+
+            bump_data_version(cursor, loan['user_id'])
+            conn.commit()
+            return redirect(url_for('loans'))
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while recording payment: {err}', 'danger')
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+
+    # GET request: Display loan payment form
+    # Recalculate for display after potential POST redirect or initial GET
+    loan = run_hot_query_one(conn, 'loan_by_id', (loan_id, current_group_id()))  # Re-fetch to ensure latest state
+
+    payment_summary = run_hot_query_one(conn, 'loan_payment_summary', (loan_id,))
+    total_paid_so_far = Money.from_decimal(payment_summary['total_paid'] if payment_summary else None)
+    total_interest_paid_from_payments = Money.from_decimal(
+        payment_summary['total_interest_paid_from_payments'] if payment_summary else None)
+
+    outstanding_principal = Money.from_decimal(loan['amount']) - (total_paid_so_far - total_interest_paid_from_payments)
+    monthly_interest_due = outstanding_principal.interest(loan['interest_rate'])
+
+    # total_expected_repayment_over_term and loan_duration_months removed as end_date is no longer used.
+
+    remaining_total_amount = outstanding_principal + monthly_interest_due
+    if remaining_total_amount < 0:
+        remaining_total_amount = Money(0)
+
+    cursor.close()
+    conn.close()
+    return render_template('record_loan_payment.html',
+                           loan=loan,
+                           total_paid=total_paid_so_far.to_decimal(),
+                           outstanding_principal=outstanding_principal.to_decimal(),
+                           monthly_interest_due=monthly_interest_due.to_decimal(),
+                           remaining_total_amount=remaining_total_amount.to_decimal(),
+                           total_interest_paid_from_payments=total_interest_paid_from_payments.to_decimal()
+                           )
+
+
+def load_loan_balances(cursor, group_id, loan_ids=None):
+    """
+    Active (approved or overdue) loans of a group, optionally only loan_ids, with their outstanding
+    principal and this month's interest due as Money. One grouped query over all their payments.
+    Returns {loan_id: row}, ordered by borrower name.
+    """
+    loan_filter = ''
+    params = [group_id]
+    if loan_ids:
+        loan_filter = f"AND l.id IN ({', '.join(['%s'] * len(loan_ids))})"
+        params.extend(loan_ids)
+    cursor.execute(f"""
+        SELECT l.id, l.user_id, l.amount, l.interest_rate, l.status, u.name AS borrower_name,
+               SUM(lp.amount_paid) AS total_paid, SUM(lp.interest_paid) AS total_interest_paid
+        FROM loans l
+        JOIN users u ON u.id = l.user_id
+        LEFT JOIN loan_payments lp ON lp.loan_id = l.id
+        WHERE l.group_id = %s AND l.status IN ('approved', 'overdue') {loan_filter}
+        GROUP BY l.id, l.user_id, l.amount, l.interest_rate, l.status, u.name
+        ORDER BY u.name, l.id
+    """, tuple(params))
+    balances = {}
+    for loan in cursor.fetchall():
+        outstanding_principal = to_paise(loan['amount']) - (
+                to_paise(loan['total_paid']) - to_paise(loan['total_interest_paid']))
+        loan['outstanding_principal'] = _new_money(outstanding_principal)
+        loan['monthly_interest_due'] = _new_money(interest_paise(outstanding_principal, loan['interest_rate'])
+                                                  if outstanding_principal > 0 else 0)
+        balances[loan['id']] = loan
+    return balances
+
+
+@app.route('/loans/payments', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])
+@idempotent
+def record_loan_payments():
+    """
+    Meeting-day collection screen: records repayments for many loans at once. All amounts are
+    checked first; then every payment is inserted, the balance updated and finished loans
+    closed in one transaction.
+    """
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    group_id = current_group_id()
+    entered_amounts = {}  # Kept so the form can be shown again with what was typed
+
+    if request.method == 'POST':
+        entries = []
+        errors = []
+        for loan_id_str, amount_str in zip(request.form.getlist('loan_id'), request.form.getlist('amount')):
+            amount_str = amount_str.strip()
+            entered_amounts[loan_id_str] = amount_str
+            if not amount_str:
+                continue  # No payment from this borrower today
+            try:
+                loan_id = int(loan_id_str)
+                amount = Money.from_decimal(amount_str)
+            except (ValueError, ArithmeticError):
+                errors.append(f'Invalid amount "{amount_str}" for loan {loan_id_str}.')
+                continue
+            if amount <= 0:
+                errors.append(f'Payment amount for loan {loan_id} must be positive.')
+            elif any(loan_id == entry[0] for entry in entries):
+                errors.append(f'Loan {loan_id} appears more than once.')
+            else:
+                entries.append((loan_id, amount))
+
+        balances = {}
+        if entries and not errors:
+            balances = load_loan_balances(cursor, group_id, [loan_id for loan_id, _ in entries])
+            errors.extend(f'Loan {loan_id} is not an active loan of this group.'
+                          for loan_id, _ in entries if loan_id not in balances)
+
+        if errors:
+            for error in errors:
+                flash(error, 'danger')
+        elif not entries:
+            flash('Enter at least one payment amount.', 'danger')
+        else:
+            # Interest is paid first, the rest reduces the principal (as in record_loan_payment)
+            payment_time = datetime.now()
+            payment_rows = []
+            completed_loan_ids = []
+            reopened_loan_ids = []
+            total_collected = Money(0)
+            for loan_id, amount in entries:
+                loan = balances[loan_id]
+                interest_portion = min(amount, loan['monthly_interest_due'])
+                principal_portion = amount - interest_portion
+                payment_rows.append((group_id, loan_id, amount.to_decimal(), interest_portion.to_decimal(),
+                                     payment_time))
+                total_collected += amount
+                if loan['outstanding_principal'] - principal_portion <= 0:
+                    completed_loan_ids.append(loan_id)
+                elif loan['status'] == 'overdue':
+                    reopened_loan_ids.append(loan_id)
+
+            try:
+                cursor.executemany(
+                    "INSERT INTO loan_payments (group_id, loan_id, amount_paid, interest_paid, payment_date) VALUES (%s, %s, %s, %s, %s)",
+                    payment_rows)
+                cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE group_id = %s",
+                               (total_collected.to_decimal(), group_id))
+                if completed_loan_ids:
+                    placeholders = ', '.join(['%s'] * len(completed_loan_ids))
+                    cursor.execute(
+                        f"UPDATE loans SET status = 'completed', actual_end_date = %s WHERE id IN ({placeholders})",
+                        (date.today(), *completed_loan_ids))
+                if reopened_loan_ids:
+                    # A fresh payment brings an overdue loan back to normal until the next overdue check
+                    placeholders = ', '.join(['%s'] * len(reopened_loan_ids))
+                    cursor.execute(f"UPDATE loans SET status = 'approved' WHERE id IN ({placeholders})",
+                                   tuple(reopened_loan_ids))
+                bump_data_versions(cursor, {balances[loan_id]['user_id'] for loan_id, _ in entries})
+                conn.commit()
+                flash(f'Recorded {len(entries)} payment(s) totalling ₹{total_collected.to_decimal():.2f}; '
+                      f'{len(completed_loan_ids)} loan(s) fully paid and completed.', 'success')
+                cursor.close()
+                conn.close()
+                return redirect(url_for('loans'))
+            except mysql.connector.Error as err:
+                flash(f'An error occurred while recording payments: {err}', 'danger')
+                conn.rollback()
+
+    active_loans = []
+    for loan in load_loan_balances(cursor, group_id).values():
+        active_loans.append(dict(loan, outstanding_principal=loan['outstanding_principal'].to_decimal(),
+                                 monthly_interest_due=loan['monthly_interest_due'].to_decimal()))
+    cursor.close()
+    conn.close()
+    return render_template('record_loan_payments.html', loans=active_loans, entered_amounts=entered_amounts)
+
+
+# New route for President/Secretary to manage settings (e.g., default fine amount and interest rate)
+@app.route('/manage_settings', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])
+def manage_settings():
+    """Allows President/Secretary to manage application settings like default fine amount, interest rate, contribution amount, and payment period."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    if request.method == 'POST':
+        default_fine_amount_str = request.form.get('default_fine_amount')
+        default_interest_rate_str = request.form.get('default_interest_rate')
+        default_contribution_amount_str = request.form.get('default_contribution_amount')
+        payment_start_day_str = request.form.get('payment_start_day')  # New field
+        payment_end_day_str = request.form.get('payment_end_day')  # New field
+
+        if not all([default_fine_amount_str, default_interest_rate_str, default_contribution_amount_str,
+                    payment_start_day_str, payment_end_day_str]):
+            flash('All default settings (fine, interest, contribution amounts, and payment period) are required.',
+                  'danger')
+            # Re-fetch current settings to pre-fill the form on error
+            cursor.execute(
+                "SELECT default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day FROM bank_balance WHERE group_id = %s",
+                (current_group_id(),))
+            settings = cursor.fetchone()
+            current_fine_amount = settings['default_fine_amount'] if settings and settings[
+                'default_fine_amount'] is not None else Decimal('0.00')
+            current_interest_rate = settings['default_interest_rate'] if settings and settings[
+                'default_interest_rate'] is not None else Decimal('0.00')
+            current_contribution_amount = settings['default_contribution_amount'] if settings and settings[
+                'default_contribution_amount'] is not None else Decimal('0.00')
+            current_payment_start_day = settings['payment_start_day'] if settings and settings[
+                'payment_start_day'] is not None else 1
+            current_payment_end_day = settings['payment_end_day'] if settings and settings[
+                'payment_end_day'] is not None else 7
+            cursor.close()
+            conn.close()
+            return render_template('manage_settings.html',
                                    current_fine_amount=current_fine_amount,
                                    current_interest_rate=current_interest_rate,
                                    current_contribution_amount=current_contribution_amount,
                                    current_payment_start_day=current_payment_start_day,
                                    current_payment_end_day=current_payment_end_day)
 
-        try:
-            new_fine_amount = Decimal(default_fine_amount_str)
-            new_interest_rate = Decimal(default_interest_rate_str)
-            new_contribution_amount = Decimal(default_contribution_amount_str)
-            new_payment_start_day = int(payment_start_day_str)
-            new_payment_end_day = int(payment_end_day_str)
+        try:
+            new_fine_amount = Decimal(default_fine_amount_str)
+            new_interest_rate = Decimal(default_interest_rate_str)
+            new_contribution_amount = Decimal(default_contribution_amount_str)
+            new_payment_start_day = int(payment_start_day_str)
+            new_payment_end_day = int(payment_end_day_str)
+
+            if new_fine_amount < 0:
+                flash('Fine amount cannot be negative.', 'danger')
+                cursor.close()
+                conn.close()
+                return render_template('manage_settings.html',
+                                       current_fine_amount=new_fine_amount,
+                                       current_interest_rate=new_interest_rate,
+                                       current_contribution_amount=new_contribution_amount,
+                                       current_payment_start_day=new_payment_start_day,
+                                       current_payment_end_day=new_payment_end_day)
+            if new_interest_rate < 0 or new_interest_rate > 100:
+                flash('Interest rate must be between 0 and 100.', 'danger')
+                cursor.close()
+                conn.close()
+                return render_template('manage_settings.html',
+                                       current_fine_amount=new_fine_amount,
+                                       current_interest_rate=new_interest_rate,
+                                       current_contribution_amount=new_contribution_amount,
+                                       current_payment_start_day=new_payment_start_day,
+                                       current_payment_end_day=new_payment_end_day)
+            if new_contribution_amount <= 0:
+                flash('Contribution amount must be positive.', 'danger')
+                cursor.close()
+                conn.close()
+                return render_template('manage_settings.html',
+                                       current_fine_amount=new_fine_amount,
+                                       current_interest_rate=new_interest_rate,
+                                       current_contribution_amount=new_contribution_amount,
+                                       current_payment_start_day=new_payment_start_day,
+                                       current_payment_end_day=new_payment_end_day)
+
+            if not (1 <= new_payment_start_day <= 31) or not (1 <= new_payment_end_day <= 31):
+                flash('Payment start and end days must be between 1 and 31.', 'danger')
+                cursor.close()
+                conn.close()
+                return render_template('manage_settings.html',
+                                       current_fine_amount=new_fine_amount,
+                                       current_interest_rate=new_interest_rate,
+                                       current_contribution_amount=new_contribution_amount,
+                                       current_payment_start_day=new_payment_start_day,
+                                       current_payment_end_day=new_payment_end_day)
+
+            if new_payment_start_day > new_payment_end_day:
+                flash('Payment start day cannot be after the end day.', 'danger')
+                cursor.close()
+                conn.close()
+                return render_template('manage_settings.html',
+                                       current_fine_amount=new_fine_amount,
+                                       current_interest_rate=new_interest_rate,
+                                       current_contribution_amount=new_contribution_amount,
+                                       current_payment_start_day=new_payment_start_day,
+                                       current_payment_end_day=new_payment_end_day)
+
+
+        except Exception:
+            flash('Invalid number format for fine, interest, contribution amount, or payment days.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('manage_settings.html',
+                                   current_fine_amount=Decimal('0.00'),
+                                   current_interest_rate=Decimal('0.00'),
+                                   current_contribution_amount=Decimal('0.00'),
+                                   current_payment_start_day=1,
+                                   current_payment_end_day=7)
+
+        try:
+            # Each group keeps its settings on its own bank_balance row
+            cursor.execute(
+                "UPDATE bank_balance SET default_fine_amount = %s, default_interest_rate = %s, default_contribution_amount = %s, payment_start_day = %s, payment_end_day = %s WHERE group_id = %s",
+                (new_fine_amount, new_interest_rate, new_contribution_amount, new_payment_start_day,
+                 new_payment_end_day, current_group_id()))
+            bump_group_data_version(cursor, current_group_id())  # Dues shown to every member change
+            conn.commit()
+            invalidate_group_settings(current_group_id())
+            flash(
+                f'Settings updated successfully! Default Fine: ₹{new_fine_amount:.2f}, Default Interest: {new_interest_rate:.2f}%, Default Contribution: ₹{new_contribution_amount:.2f}, Payment Period: {new_payment_start_day} to {new_payment_end_day}.',
+                'success')
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while updating settings: {err}', 'danger')
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+        return redirect(url_for('manage_settings'))
+
+    # GET request: Display current settings
+    cursor.execute(
+        "SELECT default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day FROM bank_balance WHERE group_id = %s",
+        (current_group_id(),))
+    settings = cursor.fetchone()
+    current_fine_amount = settings['default_fine_amount'] if settings and settings[
+        'default_fine_amount'] is not None else Decimal('0.00')
+    current_interest_rate = settings['default_interest_rate'] if settings and settings[
+        'default_interest_rate'] is not None else Decimal('0.00')
+    current_contribution_amount = settings['default_contribution_amount'] if settings and settings[
+        'default_contribution_amount'] is not None else Decimal('0.00')
+    current_payment_start_day = settings['payment_start_day'] if settings and settings[
+        'payment_start_day'] is not None else 1
+    current_payment_end_day = settings['payment_end_day'] if settings and settings['payment_end_day'] is not None else 7
+
+    cursor.close()
+    conn.close()
+    return render_template('manage_settings.html',
+                           current_fine_amount=current_fine_amount,
+                           current_interest_rate=current_interest_rate,
+                           current_contribution_amount=current_contribution_amount,
+                           current_payment_start_day=current_payment_start_day,
+                           current_payment_end_day=current_payment_end_day)
+
+
+@app.route('/bank_balance', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])  # Allow secretary to manage bank balance
+@idempotent
+def bank_balance():
+    """Manages and displays the collective bank balance."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        if request.method == 'POST':
+            action = request.form['action']
+            amount_str = request.form.get('amount')
+
+            if not amount_str:
+                flash('Amount is required.', 'danger')
+                return redirect(url_for('bank_balance'))
+
+            try:
+                amount = Decimal(amount_str)  # Convert to Decimal
+            except Exception:
+                flash('Invalid amount format.', 'danger')
+                return redirect(url_for('bank_balance'))
+
+            if amount <= 0:
+                flash('Amount must be positive.', 'danger')
+                return redirect(url_for('bank_balance'))
+
+            try:
+                cursor.execute("SELECT balance FROM bank_balance WHERE group_id = %s", (current_group_id(),))
+                result_balance = cursor.fetchone()
+                current_balance = result_balance[0] if result_balance and result_balance[0] is not None else Decimal('0.00')
+
+                if action == 'deposit':
+                    new_balance = current_balance + amount
+                    flash(f'Deposited {amount:.2f} into bank balance.', 'success')
+                elif action == 'withdraw':
+                    if current_balance < amount:  # Compare Decimal with Decimal
+                        flash('Insufficient balance for withdrawal.', 'danger')
+                        conn.rollback()
+                        return redirect(url_for('bank_balance'))
+                    new_balance = current_balance - amount
+                    flash(f'Withdrew {amount:.2f} from bank balance.', 'success')
+                else:
+                    flash('Invalid action.', 'danger')
+                    conn.rollback()
+                    return redirect(url_for('bank_balance'))
+
+                cursor.execute("UPDATE bank_balance SET balance = %s WHERE group_id = %s", (new_balance, current_group_id()))
+                conn.commit()
+            except mysql.connector.Error as err:
+                flash(f'An error occurred: {err}', 'danger')
+                conn.rollback()
+            return redirect(url_for('bank_balance'))
+
+        # GET request: Display current balance
+        cursor.execute("SELECT balance, last_updated FROM bank_balance WHERE group_id = %s", (current_group_id(),))
+        balance_info = cursor.fetchone()
+        return render_template('bank_balance.html', balance_info=balance_info)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route('/send_reminders', methods=['POST'])
+@login_required(roles=['president', 'secretary'])  # Allow secretary to send reminders
+def send_reminders():
+    """Simulates sending reminders for contributions and interest."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    # Use buffered=True for the cursor
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+
+    # Find members who haven't paid contribution for current month
+    cursor.execute("""
+        SELECT u.name, u.email, u.contact_number 
+        FROM users u 
+        LEFT JOIN contributions c ON u.id = c.user_id AND c.month = %s AND c.year = %s AND c.is_paid = TRUE
+        WHERE u.group_id = %s AND u.role = 'member' AND c.id IS NULL
+    """, (current_month, current_year, current_group_id()))
+    unpaid_members = cursor.fetchall()
+
+    # Find members with active loans
+    cursor.execute("""
+        SELECT DISTINCT u.name, u.email, u.contact_number 
+        FROM users u 
+        JOIN loans l ON u.id = l.user_id 
+        WHERE l.group_id = %s AND l.status IN ('approved', 'overdue')
+    """, (current_group_id(),))
+    loan_members = cursor.fetchall()
+
+    # In a real application, you would integrate with SMS/Email APIs here.
+    # For this example, we'll just flash a message.
+    if unpaid_members:
+        flash(f'Reminders sent to {len(unpaid_members)} members for pending contributions.', 'info')
+        # print(f"Contribution reminders to: {unpaid_members}") # For debugging
+    if loan_members:
+        flash(f'Reminders sent to {len(loan_members)} members for loan interest/payments.', 'info')
+        # print(f"Loan reminders to: {loan_members}") # For debugging
+
+    if not unpaid_members and not loan_members:
+        flash('No pending contributions or active loans found for reminders.', 'info')
+
+    cursor.close()  # Close cursor after all fetches
+    conn.close()
+    return redirect(url_for('dashboard'))  # Redirect back to the main dashboard
+
+
+# New route for President/Secretary to review and edit pending loan applications
+@app.route('/review_loan/<int:loan_id>', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])
+def review_loan(loan_id):
+    """Allows President/Secretary to review and edit a pending loan application."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        if request.method == 'POST':
+            amount_str = request.form.get('amount')
+            interest_rate_str = request.form.get('interest_rate')
+            start_date_str = request.form.get('start_date')
+            # end_date_str removed from form
+
+            # Input validation
+            if not all([amount_str, interest_rate_str, start_date_str]):  # Removed end_date_str
+                flash('All loan fields are required.', 'danger')
+                # Re-fetch loan details to re-render the form with current values
+                cursor.execute(
+                    "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s AND l.group_id = %s",
+                    (loan_id, current_group_id()))
+                loan_details = cursor.fetchone()
+                return render_template('review_loan.html', loan=loan_details)
+
+            try:
+                amount = Decimal(amount_str)
+                interest_rate = Decimal(interest_rate_str)
+                start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
+                # end_date removed
+            except Exception as e:
+                flash(f'Invalid data format: {e}', 'danger')
+                cursor.execute(
+                    "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s AND l.group_id = %s",
+                    (loan_id, current_group_id()))
+                loan_details = cursor.fetchone()
+                return render_template('review_loan.html', loan=loan_details)
+
+            if amount <= 0 or interest_rate <= 0:
+                flash('Amount and interest rate must be positive values.', 'danger')
+                cursor.execute(
+                    "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s AND l.group_id = %s",
+                    (loan_id, current_group_id()))
+                loan_details = cursor.fetchone()
+                return render_template('review_loan.html', loan=loan_details)
+
+            # No end_date validation needed
+
+            try:
+                # Update statement no longer includes end_date
+                cursor.execute(
+                    "UPDATE loans SET amount = %s, interest_rate = %s, start_date = %s WHERE id = %s AND group_id = %s",
+                    (amount, interest_rate, start_date, loan_id, current_group_id())
+                )
+                bump_loan_owner_data_version(cursor, loan_id)
+                conn.commit()
+                flash('Loan application updated successfully! You can now approve or reject it.', 'success')
+                return redirect(url_for('loans'))  # Redirect back to manage loans
+            except mysql.connector.Error as err:
+                flash(f'An error occurred while updating loan: {err}', 'danger')
+                conn.rollback()
+
+        # GET request: Display current loan details for review
+        cursor.execute(
+            "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s AND l.group_id = %s",
+            (loan_id, current_group_id()))
+        loan_details = cursor.fetchone()
+
+        if not loan_details:
+            flash('Loan application not found.', 'danger')
+            return redirect(url_for('loans'))
+
+        return render_template('review_loan.html', loan=loan_details)
+    finally:
+        cursor.close()
+        conn.close()
+
+
+@app.route('/close_loan/<int:loan_id>', methods=['GET', 'POST'])
+@login_required()
+@idempotent
+def close_loan(loan_id):
+    """Allows a member to apply to close their loan."""
+    user_id = session.get('user_id')
+    role = session.get('role')
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('loans'))
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    # Get loan details
+    loan = run_hot_query_one(conn, 'loan_by_id', (loan_id, current_group_id()))
+
+    if not loan:
+        flash('Loan not found.', 'danger')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('loans'))
+
+    # Ensure only the borrower or president/secretary can close this loan
+    if user_id != loan['user_id'] and role not in ['president', 'secretary']:
+        flash('You are not authorized to close this loan.', 'danger')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('loans'))
+
+    if loan['status'] == 'completed':
+        flash('This loan is already completed. No more payments are needed.', 'info')
+        cursor.close()
+        conn.close()
+        return redirect(url_for('loans'))
+
+    # Calculate current outstanding principal and total interest paid so far
+    payment_summary = run_hot_query_one(conn, 'loan_payment_summary', (loan_id,))
+    total_paid_so_far = Money.from_decimal(payment_summary['total_paid'] if payment_summary else None)
+    total_interest_paid_from_payments = Money.from_decimal(
+        payment_summary['total_interest_paid_from_payments'] if payment_summary else None)
+
+    outstanding_principal = Money.from_decimal(loan['amount']) - (total_paid_so_far - total_interest_paid_from_payments)
+
+    # Calculate accrued interest since last payment or loan start
+    last_payment_date = None
+    cursor.execute("SELECT MAX(payment_date) as last_payment_date FROM loan_payments WHERE loan_id = %s", (loan_id,))
+    last_payment_result = cursor.fetchone()
+    if last_payment_result and last_payment_result['last_payment_date']:
+        last_payment_date = last_payment_result['last_payment_date'].date()  # Convert datetime to date
+
+    interest_start_date = last_payment_date if last_payment_date else loan['start_date']
+
+    # Ensure interest calculation is only for active loans and within loan term
+    if loan['status'] in ['approved', 'overdue']:
+        today = date.today()
+        # Calculate days since last interest calculation or loan start
+        days_since_last_calc = (today - interest_start_date).days
+
+        # Simple daily interest calculation
+        accrued_interest = outstanding_principal.interest(loan['interest_rate'], days_since_last_calc, 365)
+    else:
+        accrued_interest = Money(0)  # No new interest if loan is not active
+
+    remaining_amount_to_close = outstanding_principal + accrued_interest
+    if remaining_amount_to_close < 0:
+        remaining_amount_to_close = Money(0)
+
+    if request.method == 'POST':
+        closing_amount_str = request.form.get('closing_amount')
+
+        if not closing_amount_str:
+            flash('Closing amount is required.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('close_loan.html', loan=loan,
+                                   outstanding_principal=outstanding_principal.to_decimal(),
+                                   accrued_interest=accrued_interest.to_decimal(),
+                                   remaining_amount_to_close=remaining_amount_to_close.to_decimal())
+        try:
+            closing_amount = Money.from_decimal(closing_amount_str)
+        except Exception:
+            flash('Invalid amount format.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('close_loan.html', loan=loan,
+                                   outstanding_principal=outstanding_principal.to_decimal(),
+                                   accrued_interest=accrued_interest.to_decimal(),
+                                   remaining_amount_to_close=remaining_amount_to_close.to_decimal())
+
+        if closing_amount <= 0:
+            flash('Closing amount must be positive.', 'danger')
+            cursor.close()
+            conn.close()
+            return render_template('close_loan.html', loan=loan,
+                                   outstanding_principal=outstanding_principal.to_decimal(),
+                                   accrued_interest=accrued_interest.to_decimal(),
+                                   remaining_amount_to_close=remaining_amount_to_close.to_decimal())
+
+        if closing_amount < remaining_amount_to_close:
+            flash(
+                f'The closing amount is less than the total outstanding amount (Principal + Accrued Interest: ₹{remaining_amount_to_close:.2f}). Please pay the full amount to close the loan.',
+                'danger')
+            cursor.close()
+            conn.close()
+            return render_template('close_loan.html', loan=loan,
+                                   outstanding_principal=outstanding_principal.to_decimal(),
+                                   accrued_interest=accrued_interest.to_decimal(),
+                                   remaining_amount_to_close=remaining_amount_to_close.to_decimal())
+
+        try:
+            # Record the final payment
+            cursor.execute(
+                "INSERT INTO loan_payments (group_id, loan_id, amount_paid, interest_paid, payment_date) VALUES (%s, %s, %s, %s, %s)",
+                (loan['group_id'], loan_id, closing_amount.to_decimal(), accrued_interest.to_decimal(), datetime.now())
+            )
+
+            # Update bank balance
+            cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE group_id = %s",
+                           (closing_amount.to_decimal(), loan['group_id']))
+
+            # Mark loan as completed and set actual_end_date
+            cursor.execute("UPDATE loans SET status = 'completed', actual_end_date = %s WHERE id = %s",
+                           (date.today(), loan_id))
+            bump_data_version(cursor, loan['user_id'])
+
+            conn.commit()
+            flash('Loan successfully closed!', 'success')
+            return redirect(url_for('loans'))
+        except mysql.connector.Error as err:
+            flash(f'An error occurred while closing loan: {err}', 'danger')
+            conn.rollback()
+        finally:
+            cursor.close()
+            conn.close()
+
+    cursor.close()
+    conn.close()
+    return render_template('close_loan.html',
+                           loan=loan,
+                           outstanding_principal=outstanding_principal.to_decimal(),
+                           accrued_interest=accrued_interest.to_decimal(),
+                           remaining_amount_to_close=remaining_amount_to_close.to_decimal())
+
+
+# New routes for Contribution Approval Workflow
+@app.route('/manage_contributions', methods=['GET'])
+@login_required(roles=['president', 'secretary'])
+def manage_contributions():
+    """Allows President/Secretary to view and manage pending contributions."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('dashboard'))
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    # Fetch all pending contributions (submitted with a UTR, is_paid = FALSE and president_utr_number is NULL).
+    # Rows created by the monthly close batch have no UTR until the member pays, so they are not listed.
+    cursor.execute("""
+        SELECT c.*, u.name as member_name, u.username as member_username
+        FROM contributions c
+        JOIN users u ON c.user_id = u.id
+        WHERE c.group_id = %s AND c.is_paid = FALSE AND c.president_utr_number IS NULL AND c.utr_number IS NOT NULL
+        ORDER BY c.payment_date DESC
+    """, (current_group_id(),))
+    pending_contributions = cursor.fetchall()
+
+    # Fetch all approved contributions for this month
+    current_month = datetime.now().month
+    current_year = datetime.now().year
+    cursor.execute("""
+        SELECT c.*, u.name as member_name, u.username as member_username, p.name as approver_name
+        FROM contributions c
+        JOIN users u ON c.user_id = u.id
+        LEFT JOIN users p ON c.president_id = p.id
+        WHERE c.group_id = %s AND c.year = %s AND c.month = %s AND c.is_paid = TRUE
+        ORDER BY c.payment_date DESC
+    """, (current_group_id(), current_year, current_month))
+    approved_contributions_this_month = cursor.fetchall()
+
+    cursor.close()
+    conn.close()
+    return render_template('manage_contributions.html',
+                           pending_contributions=pending_contributions,
+                           approved_contributions_this_month=approved_contributions_this_month)
+
+
+@app.route('/approve_contribution/<int:contribution_id>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])
+def approve_contribution(contribution_id):
+    """Allows President/Secretary to approve a contribution after UTR matching."""
+    president_utr_number = request.form.get('president_utr_number', '').strip()
+
+    if not president_utr_number:
+        flash('President UTR Number is required to approve this contribution.', 'danger')
+        return redirect(url_for('manage_contributions'))
+
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_contributions'))
+
+    conn.autocommit = False  # Start transaction
+
+    cursor = conn.cursor(dictionary=True, buffered=True)
+
+    try:
+        # 1. Fetch the pending contribution
+        cursor.execute(
+            "SELECT id, user_id, amount, fine_amount, utr_number, is_paid FROM contributions WHERE id = %s AND group_id = %s",
+            (contribution_id, current_group_id()))
+        contribution = cursor.fetchone()
+
+        if not contribution:
+            flash('Contribution not found.', 'danger')
+            conn.rollback()
+            return redirect(url_for('manage_contributions'))
+
+        if contribution['is_paid']:  # Already paid/approved
+            flash('This contribution has already been approved.', 'info')
+            conn.rollback()
+            return redirect(url_for('manage_contributions'))
+
+        # 2. Compare UTR numbers
+        if contribution['utr_number'] != president_utr_number:
+            flash(f'UTR Number mismatch for contribution ID {contribution_id}. Please check the UTR entered.', 'danger')
+            conn.rollback()
+            return redirect(url_for('manage_contributions'))
+
+        # 3. Update contribution status to paid and record approver
+        total_amount_to_add = contribution['amount'] + contribution['fine_amount']
+
+        cursor.execute(
+            "UPDATE contributions SET is_paid = TRUE, president_id = %s, president_utr_number = %s, payment_date = %s WHERE id = %s",
+            (session['user_id'], president_utr_number, datetime.now(), contribution_id)
+        )
+
+        # 4. Update bank balance
+        cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE group_id = %s",
+                       (total_amount_to_add, current_group_id()))
+        bump_data_version(cursor, contribution['user_id'])
+
+        conn.commit()
+        flash(
+            f'Contribution from {contribution["user_id"]} approved successfully! Amount ₹{total_amount_to_add:.2f} added to bank balance.',
+            'success')
+
+    except mysql.connector.Error as err:
+        flash(f'An error occurred while approving contribution: {err}', 'danger')
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+    return redirect(url_for('manage_contributions'))
+
+
+@app.route('/reject_contribution/<int:contribution_id>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])
+def reject_contribution(contribution_id):
+    """Allows President/Secretary to reject a contribution."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_contributions'))
+
+    cursor = conn.cursor(buffered=True)
+
+    try:
+        # Fetch the contribution to ensure it's pending
+        cursor.execute("SELECT is_paid, user_id FROM contributions WHERE id = %s AND group_id = %s",
+                       (contribution_id, current_group_id()))
+        contribution_status = cursor.fetchone()
+
+        if not contribution_status:
+            flash('Contribution not found.', 'danger')
+            return redirect(url_for('manage_contributions'))
+
+        if contribution_status[0]:  # is_paid is True
+            flash('This contribution has already been approved and cannot be rejected.', 'info')
+            return redirect(url_for('manage_contributions'))
+
+        # Mark as rejected (by setting president_utr_number to a specific string or adding a 'status' column)
+        # For simplicity, we'll just set president_id to mark who rejected, and keep is_paid=FALSE
+        cursor.execute(
+            "UPDATE contributions SET president_id = %s, president_utr_number = 'REJECTED' WHERE id = %s",
+            (session['user_id'], contribution_id)
+        )
+        bump_data_version(cursor, contribution_status[1])
+        conn.commit()
+        flash('Contribution rejected.', 'info')
+
+    except mysql.connector.Error as err:
+        flash(f'An error occurred while rejecting contribution: {err}', 'danger')
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+    return redirect(url_for('manage_contributions'))
+
+
+@app.route('/delete_contribution/<int:contribution_id>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])
+def delete_contribution(contribution_id):
+    """Allows President/Secretary to delete a pending contribution."""
+    conn = get_db_connection()
+    if conn is None:
+        flash('Database connection error. Please try again later.', 'danger')
+        return redirect(url_for('manage_contributions'))
+
+    cursor = conn.cursor(buffered=True)
+
+    try:
+        # Optional: Check if the contribution is indeed pending before deleting
+        cursor.execute("SELECT is_paid, user_id FROM contributions WHERE id = %s AND group_id = %s",
+                       (contribution_id, current_group_id()))
+        contribution_status = cursor.fetchone()
+
+        if not contribution_status:
+            flash('Contribution not found.', 'danger')
+            return redirect(url_for('manage_contributions'))
+
+        if contribution_status[0]:  # is_paid is True
+            flash('Approved contributions cannot be deleted.', 'danger')
+            return redirect(url_for('manage_contributions'))
+
+        record_deleted_rows(cursor, 'contributions', 'id = %s', (contribution_id,))
+        cursor.execute("DELETE FROM contributions WHERE id = %s", (contribution_id,))
+        bump_data_version(cursor, contribution_status[1])
+        conn.commit()
+        flash('Contribution deleted successfully!', 'success')
+
+    except mysql.connector.Error as err:
+        flash(f'An error occurred while deleting contribution: {err}', 'danger')
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
+    return redirect(url_for('manage_contributions'))
+
+
+# --- New Reports Feature ---
+def report_member_name(cursor, member_id, group_id):
+    """Name of the member the member reports are for, or None when there is no such member in the group."""
+    if not member_id:
+        return None
+    cursor.execute("SELECT name FROM users WHERE id = %s AND group_id = %s", (member_id, group_id))
+    member = cursor.fetchone()
+    return member['name'] if member else None
 
-            if new_fine_amount < 0:
-                flash('Fine amount cannot be negative.', 'danger')
-                cursor.close()
-                conn.close()
-                return render_template('manage_settings.html',
-                                       current_fine_amount=new_fine_amount,
-                                       current_interest_rate=new_interest_rate,
-                                       current_contribution_amount=new_contribution_amount,
-                                       current_payment_start_day=new_payment_start_day,
-                                       current_payment_end_day=new_payment_end_day)
-            if new_interest_rate < 0 or new_interest_rate > 100:
-                flash('Interest rate must be between 0 and 100.', 'danger')
-                cursor.close()
-                conn.close()
-                return render_template('manage_settings.html',
-                                       current_fine_amount=new_fine_amount,
-                                       current_interest_rate=new_interest_rate,
-                                       current_contribution_amount=new_contribution_amount,
-                                       current_payment_start_day=new_payment_start_day,
-                                       current_payment_end_day=new_payment_end_day)
-            if new_contribution_amount <= 0:
-                flash('Contribution amount must be positive.', 'danger')
-                cursor.close()
-                conn.close()
-                return render_template('manage_settings.html',
-                                       current_fine_amount=new_fine_amount,
-                                       current_interest_rate=new_interest_rate,
-                                       current_contribution_amount=new_contribution_amount,
-                                       current_payment_start_day=new_payment_start_day,
-                                       current_payment_end_day=new_payment_end_day)
 
-            if not (1 <= new_payment_start_day <= 31) or not (1 <= new_payment_end_day <= 31):
-                flash('Payment start and end days must be between 1 and 31.', 'danger')
-                cursor.close()
-                conn.close()
-                return render_template('manage_settings.html',
-                                       current_fine_amount=new_fine_amount,
-                                       current_interest_rate=new_interest_rate,
-                                       current_contribution_amount=new_contribution_amount,
-                                       current_payment_start_day=new_payment_start_day,
-                                       current_payment_end_day=new_payment_end_day)
+def build_report(cursor, report_cursor, group_id, report_type, selected_month, selected_year, selected_member_id):
+    """
+    Runs one report of the reports page and returns (report_title, report_headers, report_data).
+    report_headers is empty when the report could not run (a required month, year or member was
+    missing, or the member is not in the group; a message is flashed).
+    """
+    report_data = []
+    report_title = "Select a Report Type"
+    report_headers = []
 
-            if new_payment_start_day > new_payment_end_day:
-                flash('Payment start day cannot be after the end day.', 'danger')
-                cursor.close()
-                conn.close()
-                return render_template('manage_settings.html',
-                                       current_fine_amount=new_fine_amount,
-                                       current_interest_rate=new_interest_rate,
-                                       current_contribution_amount=new_contribution_amount,
-                                       current_payment_start_day=new_payment_start_day,
-                                       current_payment_end_day=new_payment_end_day)
+    if report_type == 'monthly_contributions':
+        if not selected_month or not selected_year:
+            flash('Please select both month and year for Monthly Contributions report.', 'danger')
+        else:
+            report_title = f"Monthly Contributions Report - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
+            report_headers = ["Member Name", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date",
+                              "UTR (Member)", "UTR (President)"]
+            report_cursor.execute("""
+                SELECT u.name as member_name, c.amount, c.fine_amount, (c.amount + c.fine_amount) as total_paid,
+                       c.is_paid, c.payment_date, c.utr_number, c.president_utr_number
+                FROM contributions c
+                JOIN users u ON c.user_id = u.id
+                WHERE c.group_id = %s AND c.year = %s AND c.month = %s
+                ORDER BY u.id
+            """, (group_id, selected_year, selected_month))
+            report_data = fetch_compact_rows(report_cursor)
 
+    elif report_type == 'yearly_contributions':
+        if not selected_year:
+            flash('Please select a year for Yearly Contributions report.', 'danger')
+        else:
+            report_title = f"Yearly Contributions Report - {selected_year}"
+            report_headers = ["Member Name", "Total Contributions", "Total Fines", "Grand Total"]
+            report_cursor.execute("""
+                SELECT u.name as member_name, SUM(c.amount) as total_amount, SUM(c.fine_amount) as total_fine_amount
+                FROM contributions c
+                JOIN users u ON c.user_id = u.id
+                WHERE c.group_id = %s AND c.year = %s AND c.is_paid = TRUE
+                GROUP BY u.id, u.name
+                ORDER BY u.id
+            """, (group_id, selected_year))
+            report_data = fetch_compact_rows(report_cursor)
+            # Add a 'grand_total' field for display
+            for row in report_data:
+                row['grand_total'] = (Money.from_decimal(row['total_amount']) +
+                                      Money.from_decimal(row['total_fine_amount'])).to_decimal()
 
-        except Exception:
-            flash('Invalid number format for fine, interest, contribution amount, or payment days.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('manage_settings.html',
-                                   current_fine_amount=Decimal('0.00'),
-                                   current_interest_rate=Decimal('0.00'),
-                                   current_contribution_amount=Decimal('0.00'),
-                                   current_payment_start_day=1,
-                                   current_payment_end_day=7)
+    elif report_type == 'monthly_loan_interest':
+        if not selected_month or not selected_year:
+            flash('Please select both month and year for Monthly Loan Interest report.', 'danger')
+        else:
+            report_title = f"Monthly Loan Interest Collected - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
+            report_headers = ["Borrower Name", "Loan Amount", "Interest Rate", "Interest Paid This Month",
+                              "Payment Date"]
+            report_cursor.execute("""
+                SELECT u.name as borrower_name, l.amount as loan_amount, l.interest_rate, lp.interest_paid, lp.payment_date
+                FROM loan_payments lp
+                JOIN loans l ON lp.loan_id = l.id
+                JOIN users u ON l.user_id = u.id
+                WHERE lp.group_id = %s AND MONTH(lp.payment_date) = %s AND YEAR(lp.payment_date) = %s
+                ORDER BY u.id, lp.payment_date
+            """, (group_id, selected_month, selected_year))
+            report_data = fetch_compact_rows(report_cursor)
 
-        try:
-            # Assuming bank_balance table has a single row with id = 1 for settings
-            cursor.execute(
-                "UPDATE bank_balance SET default_fine_amount = %s, default_interest_rate = %s, default_contribution_amount = %s, payment_start_day = %s, payment_end_day = %s WHERE id = 1",
-                (new_fine_amount, new_interest_rate, new_contribution_amount, new_payment_start_day,
-                 new_payment_end_day))
-            conn.commit()
-            flash(
-                f'Settings updated successfully! Default Fine: ₹{new_fine_amount:.2f}, Default Interest: {new_interest_rate:.2f}%, Default Contribution: ₹{new_contribution_amount:.2f}, Payment Period: {new_payment_start_day} to {new_payment_end_day}.',
-                'success')
-        except mysql.connector.Error as err:
-            flash(f'An error occurred while updating settings: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
-        return redirect(url_for('manage_settings'))
+    elif report_type == 'yearly_loan_interest':
+        if not selected_year:
+            flash('Please select a year for Yearly Loan Interest report.', 'danger')
+        else:
+            report_title = f"Yearly Loan Interest Collected - {selected_year}"
+            report_headers = ["Borrower Name", "Total Interest Paid in Year"]
+            report_cursor.execute("""
+                SELECT u.name as borrower_name, SUM(lp.interest_paid) as total_interest_paid_yearly
+                FROM loan_payments lp
+                JOIN loans l ON lp.loan_id = l.id
+                JOIN users u ON l.user_id = u.id
+                WHERE lp.group_id = %s AND YEAR(lp.payment_date) = %s
+                GROUP BY u.id, u.name
+                ORDER BY u.id
+            """, (group_id, selected_year))
+            report_data = fetch_compact_rows(report_cursor)
 
-    # GET request: Display current settings
-    cursor.execute(
-        "SELECT default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day FROM bank_balance WHERE id = 1")
-    settings = cursor.fetchone()
-    current_fine_amount = settings['default_fine_amount'] if settings and settings[
-        'default_fine_amount'] is not None else Decimal('0.00')
-    current_interest_rate = settings['default_interest_rate'] if settings and settings[
-        'default_interest_rate'] is not None else Decimal('0.00')
-    current_contribution_amount = settings['default_contribution_amount'] if settings and settings[
-        'default_contribution_amount'] is not None else Decimal('0.00')
-    current_payment_start_day = settings['payment_start_day'] if settings and settings[
-        'payment_start_day'] is not None else 1
-    current_payment_end_day = settings['payment_end_day'] if settings and settings['payment_end_day'] is not None else 7
+    elif report_type == 'member_contributions':
+        member_name = report_member_name(cursor, selected_member_id, group_id)
+        if not selected_member_id:
+            flash('Please select a member for Member Contributions report.', 'danger')
+        elif member_name is None:
+            flash('Member not found.', 'danger')
+        else:
+            report_title = f"Contributions History for {member_name}"
+            report_headers = ["Month", "Year", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date"]
+            report_cursor.execute("""
+                SELECT month, year, amount, fine_amount, (amount + fine_amount) as total_paid, is_paid, payment_date
+                FROM contributions
+                WHERE group_id = %s AND user_id = %s
+                ORDER BY year DESC, month DESC
+            """, (group_id, selected_member_id))
+            report_data = fetch_compact_rows(report_cursor)
+            # Format month name for display
+            for row in report_data:
+                row['month_name'] = datetime.strptime(str(row['month']), '%m').strftime('%B')
 
-    cursor.close()
-    conn.close()
-    return render_template('manage_settings.html',
-                           current_fine_amount=current_fine_amount,
-                           current_interest_rate=current_interest_rate,
-                           current_contribution_amount=current_contribution_amount,
-                           current_payment_start_day=current_payment_start_day,
-                           current_payment_end_day=current_payment_end_day)
+    elif report_type == 'member_loans':
+        member_name = report_member_name(cursor, selected_member_id, group_id)
+        if not selected_member_id:
+            flash('Please select a member for Member Loans report.', 'danger')
+        elif member_name is None:
+            flash('Member not found.', 'danger')
+        else:
+            report_title = f"Loan History for {member_name}"
+            report_headers = ["Loan ID", "Amount", "Interest Rate", "Start Date", "Actual End Date", "Status",
+                              "Disbursement Type"]
+            report_cursor.execute("""
+                SELECT id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type, disbursement_details
+                FROM loans
+                WHERE group_id = %s AND user_id = %s
+                ORDER BY start_date DESC
+            """, (group_id, selected_member_id))
+            report_data = fetch_compact_rows(report_cursor)
+            # Parse disbursement_details for display
+            for row in report_data:
+                if row['disbursement_details']:
+                    row['disbursement_details_parsed'] = json.loads(row['disbursement_details'])
+                else:
+                    row['disbursement_details_parsed'] = {}
+
+    elif report_type == 'all_members_summary':
+        report_title = "All Members Summary"
+        report_headers = ["Member Name", "Total Contributions", "Total Loans Taken", "Active Loans Count"]
+        report_cursor.execute("""
+            SELECT u.id, u.name,
+                   SUM(CASE WHEN c.is_paid = TRUE THEN c.amount + c.fine_amount ELSE 0 END) as total_contributions,
+                   SUM(CASE WHEN l.status IN ('approved', 'overdue', 'completed') THEN l.amount ELSE 0 END) as total_loans_taken,
+                   COUNT(DISTINCT CASE WHEN l.status IN ('approved', 'overdue') THEN l.id ELSE NULL END) as active_loans_count
+            FROM users u
+            LEFT JOIN contributions c ON u.id = c.user_id
+            LEFT JOIN loans l ON u.id = l.user_id
+            WHERE u.group_id = %s AND u.role = 'member'
+            GROUP BY u.id, u.name
+            ORDER BY u.id
+        """, (group_id,))
+        report_data = fetch_compact_rows(report_cursor)
 
+    return report_title, report_headers, report_data
 
-@app.route('/bank_balance', methods=['GET', 'POST'])
-@login_required(roles=['president', 'secretary'])  # Allow secretary to manage bank balance
-def bank_balance():
-    """Manages and displays the collective bank balance."""
-    conn = get_db_connection()
+
+@app.route('/reports', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])
+def reports():
+    """Allows President/Secretary to generate and view various reports."""
+    conn = open_report_snapshot() or get_db_connection()  # Both provide the same cursors
     if conn is None:
         flash('Database connection error. Please try again later.', 'danger')
         return redirect(url_for('dashboard'))
-    # Use buffered=True for the cursor
     cursor = conn.cursor(dictionary=True, buffered=True)
+    # Report rows are kept as compact tuples, not dicts. Every report query is read whole with
+    # fetch_compact_rows(), so the cursor is buffered even when STREAM_LARGE_RESULTS is on.
+    report_cursor = conn.cursor(buffered=True)
+
+    report_type = request.form.get('report_type')
+    selected_month = request.form.get('month')
+    selected_year = request.form.get('year')
+    selected_member_id = request.form.get('member_id')
+    group_id = current_group_id()
+
+    report_data = []
+    report_title = "Select a Report Type"
+    report_headers = []
+
+    # Fetch all members for the dropdown
+    cursor.execute(
+        "SELECT id, name FROM users WHERE group_id = %s AND role IN ('member', 'president', 'secretary', 'treasurer') ORDER BY id",
+        (group_id,))
+
+    all_members = cursor.fetchall()
+
+    # Fetch all years with data
+    cursor.execute(
+        "SELECT DISTINCT year FROM contributions WHERE group_id = %s UNION SELECT DISTINCT YEAR(start_date) FROM loans WHERE group_id = %s ORDER BY year DESC",
+        (group_id, group_id))
+    all_years = [row['year'] for row in cursor.fetchall()]
 
     if request.method == 'POST':
-        action = request.form['action']
-        amount_str = request.form.get('amount')
+        # Results are cached per group until the next write in the group (or REPORT_CACHE_TTL)
+        source = conn.snapshot_id if isinstance(conn, ReportSnapshot) else 'live'
+        report_key = f"report:{group_id}:{source}:{report_type}:{selected_month}:{selected_year}:{selected_member_id}"
+        cached_report, report_version = cache_backend.get_versioned(f"group:{group_id}", report_key)
+        if cached_report is not None:
+            report_title, report_headers, report_data = cached_report
+        else:
+            report_title, report_headers, report_data = build_report(
+                cursor, report_cursor, group_id, report_type, selected_month, selected_year, selected_member_id)
+            if report_headers:  # Only reports that actually ran, not missing-parameter errors
+                cache_backend.set_versioned(f"group:{group_id}", report_key,
+                                            (report_title, report_headers, report_data), report_version,
+                                            app.config['REPORT_CACHE_TTL'])
+
+    snapshot_taken_at = conn.taken_at if isinstance(conn, ReportSnapshot) else None
+    report_cursor.close()
+    cursor.close()
+    conn.close()
 
-        if not amount_str:
-            flash('Amount is required.', 'danger')
-            return redirect(url_for('bank_balance'))
+    return render_template('reports.html',
+                           all_members=all_members,
+                           all_years=all_years,
+                           report_type=report_type,
+                           selected_month=selected_month,
+                           selected_year=selected_year,
+                           selected_member_id=selected_member_id,
+                           report_data=report_data,
+                           report_title=report_title,
+                           report_headers=report_headers,
+                           snapshot_taken_at=snapshot_taken_at,
+                           excel_available=EXCEL_AVAILABLE,  # Pass availability to template
+                           pdf_available=PDF_AVAILABLE)  # Pass availability to template
 
-        try:
-            amount = Decimal(amount_str)  # Convert to Decimal
-        except Exception:
-            flash('Invalid amount format.', 'danger')
-            return redirect(url_for('bank_balance'))
 
-        if amount <= 0:
-            flash('Amount must be positive.', 'danger')
-            return redirect(url_for('bank_balance'))
+# --- Conceptual Export Routes (for demonstration, actual file generation may not work in sandbox) ---
+@app.route('/export_report/<report_format>', methods=['POST'])
+@login_required(roles=['president', 'secretary'])
+def export_report(report_format):
+    """
+    Conceptual route for exporting reports.
+    Actual file generation and download might not work directly in all sandbox environments.
+    """
+    report_type = request.form.get('report_type')
+    selected_month = request.form.get('month')
+    selected_year = request.form.get('year')
+    selected_member_id = request.form.get('member_id')
+    group_id = current_group_id()
+
+    conn = open_report_snapshot() or get_db_connection()
+    if conn is None:
+        flash('Database connection error. Cannot generate report.', 'danger')
+        return redirect(url_for('reports'))
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    # Report rows are kept as compact tuples, not dicts. Every report query is read whole with
+    # fetch_compact_rows(), so the cursor is buffered even when STREAM_LARGE_RESULTS is on.
+    report_cursor = conn.cursor(buffered=True)
+    try:
+        report_data = []
+        report_title = "Report"
+        report_headers = []
+
+        # Re-fetch data based on report type, similar to the /reports GET/POST logic
+        if report_type == 'monthly_contributions':
+            report_title = f"Monthly Contributions - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
+            report_headers = ["Member Name", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date",
+                              "UTR (Member)", "UTR (President)"]
+            report_cursor.execute("""
+                SELECT u.name as member_name, c.amount, c.fine_amount, (c.amount + c.fine_amount) as total_paid,
+                       c.is_paid, c.payment_date, c.utr_number, c.president_utr_number
+                FROM contributions c
+                JOIN users u ON c.user_id = u.id
+                WHERE c.group_id = %s AND c.year = %s AND c.month = %s
+                ORDER BY u.id
+            """, (group_id, selected_year, selected_month))
+            report_data = fetch_compact_rows(report_cursor)
+            # Convert datetime objects to string for export (Decimals stay exact; openpyxl writes them as numbers)
+            for row in report_data:
+                for key, value in row.items():
+                    if isinstance(value, datetime):
+                        row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+                    elif isinstance(value, date):
+                        row[key] = value.strftime('%Y-%m-%d')
+                row['is_paid'] = 'Paid' if row['is_paid'] else 'Pending'
+
+
+        elif report_type == 'yearly_contributions':
+            report_title = f"Yearly Contributions - {selected_year}"
+            report_headers = ["Member Name", "Total Contributions", "Total Fines", "Grand Total"]
+            report_cursor.execute("""
+                SELECT u.name as member_name, SUM(c.amount) as total_amount, SUM(c.fine_amount) as total_fine_amount
+                FROM contributions c
+                JOIN users u ON c.user_id = u.id
+                WHERE c.group_id = %s AND c.year = %s AND c.is_paid = TRUE
+                GROUP BY u.id, u.name
+                ORDER BY u.id
+            """, (group_id, selected_year))
+            report_data = fetch_compact_rows(report_cursor)
+            for row in report_data:
+                row['grand_total'] = (Money.from_decimal(row['total_amount']) +
+                                      Money.from_decimal(row['total_fine_amount'])).to_decimal()
+
+        elif report_type == 'monthly_loan_interest':
+            report_title = f"Monthly Loan Interest Collected - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
+            report_headers = ["Borrower Name", "Loan Amount", "Interest Rate", "Interest Paid This Month", "Payment Date"]
+            report_cursor.execute("""
+                SELECT u.name as borrower_name, l.amount as loan_amount, l.interest_rate, lp.interest_paid, lp.payment_date
+                FROM loan_payments lp
+                JOIN loans l ON lp.loan_id = l.id
+                JOIN users u ON l.user_id = u.id
+                WHERE lp.group_id = %s AND MONTH(lp.payment_date) = %s AND YEAR(lp.payment_date) = %s
+                ORDER BY u.id, lp.payment_date
+            """, (group_id, selected_month, selected_year))
+            report_data = fetch_compact_rows(report_cursor)
+            for row in report_data:
+                for key, value in row.items():
+                    if isinstance(value, datetime):
+                        row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+                    elif isinstance(value, date):
+                        row[key] = value.strftime('%Y-%m-%d')
+
+        elif report_type == 'yearly_loan_interest':
+            report_title = f"Yearly Loan Interest Collected - {selected_year}"
+            report_headers = ["Borrower Name", "Total Interest Paid in Year"]
+            report_cursor.execute("""
+                SELECT u.name as borrower_name, SUM(lp.interest_paid) as total_interest_paid_yearly
+                FROM loan_payments lp
+                JOIN loans l ON lp.loan_id = l.id
+                JOIN users u ON l.user_id = u.id
+                WHERE lp.group_id = %s AND YEAR(lp.payment_date) = %s
+                GROUP BY u.id, u.name
+                ORDER BY u.id
+            """, (group_id, selected_year))
+            report_data = fetch_compact_rows(report_cursor)
+
+        elif report_type == 'member_contributions':
+            member_name = report_member_name(cursor, selected_member_id, group_id)
+            if member_name is None:
+                flash('Member not found.', 'danger')
+                return redirect(url_for('reports'))
+            report_title = f"Contributions History for {member_name}"
+            report_headers = ["Month", "Year", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date"]
+            report_cursor.execute("""
+                SELECT month, year, amount, fine_amount, (amount + fine_amount) as total_paid, is_paid, payment_date
+                FROM contributions
+                WHERE group_id = %s AND user_id = %s
+                ORDER BY year DESC, month DESC
+            """, (group_id, selected_member_id))
+            report_data = fetch_compact_rows(report_cursor)
+            for row in report_data:
+                row['month_name'] = datetime.strptime(str(row['month']), '%m').strftime('%B')
+                for key, value in row.items():
+                    if isinstance(value, datetime):
+                        row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+                    elif isinstance(value, date):
+                        row[key] = value.strftime('%Y-%m-%d')
+                row['is_paid'] = 'Paid' if row['is_paid'] else 'Pending'
+
+
+        elif report_type == 'member_loans':
+            member_name = report_member_name(cursor, selected_member_id, group_id)
+            if member_name is None:
+                flash('Member not found.', 'danger')
+                return redirect(url_for('reports'))
+            report_title = f"Loan History for {member_name}"
+            report_headers = ["Loan ID", "Amount", "Interest Rate", "Start Date", "Actual End Date", "Status",
+                              "Disbursement Type", "Disbursement Details"]
+            report_cursor.execute("""
+                SELECT id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type, disbursement_details
+                FROM loans
+                WHERE group_id = %s AND user_id = %s
+                ORDER BY start_date DESC
+            """, (group_id, selected_member_id))
+            report_data = fetch_compact_rows(report_cursor)
+            for row in report_data:
+                if row['disbursement_details']:
+                    details = json.loads(row['disbursement_details'])
+                    if row['disbursement_type'] == 'cash':
+                        row[
+                            'disbursement_details_formatted'] = f"₹500: {details.get('notes_500', 0)}, ₹200: {details.get('notes_200', 0)}, ₹100: {details.get('notes_100', 0)}"
+                    elif row['disbursement_type'] == 'cheque':
+                        row['disbursement_details_formatted'] = f"Cheque No: {details.get('cheque_number', 'N/A')}"
+                    elif row['disbursement_type'] == 'upi':
+                        row['disbursement_details_formatted'] = f"UTR: {details.get('upi_utr', 'N/A')}"
+                    else:
+                        row['disbursement_details_formatted'] = "N/A"
+                else:
+                    row['disbursement_details_formatted'] = "N/A"
+
+                for key, value in row.items():
+                    if isinstance(value, datetime):
+                        row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+                    elif isinstance(value, date):
+                        row[key] = value.strftime('%Y-%m-%d')
+
+        elif report_type == 'all_members_summary':
+            report_title = "All Members Summary"
+            report_headers = ["Member Name", "Total Contributions", "Total Loans Taken", "Active Loans Count"]
+            report_cursor.execute("""
+                SELECT u.id, u.name,
+                       SUM(CASE WHEN c.is_paid = TRUE THEN c.amount + c.fine_amount ELSE 0 END) as total_contributions,
+                       SUM(CASE WHEN l.status IN ('approved', 'overdue', 'completed') THEN l.amount ELSE 0 END) as total_loans_taken,
+                       COUNT(DISTINCT CASE WHEN l.status IN ('approved', 'overdue') THEN l.id ELSE NULL END) as active_loans_count
+                FROM users u
+                LEFT JOIN contributions c ON u.id = c.user_id
+                LEFT JOIN loans l ON u.id = l.user_id
+                WHERE u.group_id = %s AND u.role = 'member'
+                GROUP BY u.id, u.name
+                ORDER BY u.id
+            """, (group_id,))
+            report_data = fetch_compact_rows(report_cursor)
+    finally:
+        report_cursor.close()
+        cursor.close()
+        conn.close()
+
+    if not report_data:
+        flash('No data found for the selected report criteria.', 'info')
+        return redirect(url_for('reports'))
+
+    if report_format == 'excel' and EXCEL_AVAILABLE:
+        output = BytesIO()
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = report_title[:31]  # Max 31 chars for sheet title
+
+        # Add title
+        sheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(report_headers))
+        title_cell = sheet.cell(row=1, column=1, value=report_title)
+        title_cell.font = Font(bold=True, size=16)
+        title_cell.alignment = Alignment(horizontal='center', vertical='center')
 
-        try:
-            cursor.execute("SELECT balance FROM bank_balance WHERE id = 1")
-            result_balance = cursor.fetchone()
-            current_balance = result_balance[0] if result_balance and result_balance[0] is not None else Decimal('0.00')
-
-            if action == 'deposit':
-                new_balance = current_balance + amount
-                flash(f'Deposited {amount:.2f} into bank balance.', 'success')
-            elif action == 'withdraw':
-                if current_balance < amount:  # Compare Decimal with Decimal
-                    flash('Insufficient balance for withdrawal.', 'danger')
-                    conn.rollback()
-                    cursor.close()  # Close cursor before redirect
-                    conn.close()
-                    return redirect(url_for('bank_balance'))
-                new_balance = current_balance - amount
-                flash(f'Withdrew {amount:.2f} from bank balance.', 'success')
-            else:
-                flash('Invalid action.', 'danger')
-                conn.rollback()
-                cursor.close()  # Close cursor before redirect
-                conn.close()
-                return redirect(url_for('bank_balance'))
+        # Add headers
+        for col_num, header in enumerate(report_headers, 1):
+            cell = sheet.cell(row=3, column=col_num, value=header)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(horizontal='center', vertical='center')
+            cell.border = Border(top=Side(style='thin'), bottom=Side(style='thin'), left=Side(style='thin'),
+                                 right=Side(style='thin'))
+            sheet.column_dimensions[get_column_letter(col_num)].width = 20  # Default width
 
-            cursor.execute("UPDATE bank_balance SET balance = %s WHERE id = 1", (new_balance,))
-            conn.commit()
-        except mysql.connector.Error as err:
-            flash(f'An error occurred: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()  # Close cursor after all operations
-            conn.close()
-        return redirect(url_for('bank_balance'))
+        # Add data
+        row_num = 4
+        for row_dict in report_data:
+            col_num = 1
+            for header_key in report_headers:
+                # Map header to dictionary key (e.g., "Member Name" -> "member_name")
+                # This requires careful mapping or consistent naming.
+                # For simplicity, we'll assume header names directly map to dictionary keys
+                # or we'll need a more robust mapping logic.
+                # Let's use a simplified mapping for common cases.
+                key_map = {
+                    "Member Name": "member_name",
+                    "Borrower Name": "borrower_name",
+                    "Loan ID": "id",
+                    "Amount": "amount",
+                    "Loan Amount": "loan_amount",
+                    "Interest Rate (%)": "interest_rate",
+                    "Start Date": "start_date",
+                    "Actual End Date": "actual_end_date",
+                    "Status": "status",
+                    "Disbursement Type": "disbursement_type",
+                    "Disbursement Details": "disbursement_details_formatted",  # Use formatted details
+                    "Month": "month_name",  # For member_contributions
+                    "Year": "year",
+                    "Fine Amount": "fine_amount",
+                    "Total Paid": "total_paid",
+                    "UTR (Member)": "utr_number",
+                    "UTR (President)": "president_utr_number",
+                    "Total Contributions": "total_contributions",
+                    "Total Fines": "total_fine_amount",
+                    "Grand Total": "grand_total",
+                    "Interest Paid This Month": "interest_paid",
+                    "Total Interest Paid in Year": "total_interest_paid_yearly",
+                    "Total Loans Taken": "total_loans_taken",
+                    "Active Loans Count": "active_loans_count"
+                }
+                data_key = key_map.get(header_key, header_key.replace(" ", "_").lower())
 
-    # GET request: Display current balance
-    cursor.execute("SELECT balance, last_updated FROM bank_balance WHERE id = 1")
-    balance_info = cursor.fetchone()
-    cursor.close()  # Close cursor after all fetches
-    conn.close()
-    return render_template('bank_balance.html', balance_info=balance_info)
+                cell_value = row_dict.get(data_key, '')
 
+                # Special handling for boolean status
+                if data_key == 'is_paid':
+                    cell_value = 'Paid' if cell_value else 'Pending'
 
-@app.route('/send_reminders', methods=['POST'])
-@login_required(roles=['president', 'secretary'])  # Allow secretary to send reminders
-def send_reminders():
-    """Simulates sending reminders for contributions and interest."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
-    # Use buffered=True for the cursor
-    cursor = conn.cursor(dictionary=True, buffered=True)
+                sheet.cell(row=row_num, column=col_num, value=cell_value)
+                col_num += 1
+            row_num += 1
 
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+        workbook.save(output)
+        output.seek(0)
+        return send_file(output, download_name=f"{report_title.replace(' ', '_')}.xlsx", as_attachment=True,
+                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
-    # Find members who haven't paid contribution for current month
-    cursor.execute("""
-        SELECT u.name, u.email, u.contact_number 
-        FROM users u 
-        LEFT JOIN contributions c ON u.id = c.user_id AND c.month = %s AND c.year = %s AND c.is_paid = TRUE
-        WHERE u.role = 'member' AND c.id IS NULL
-    """, (current_month, current_year))
-    unpaid_members = cursor.fetchall()
+    elif report_format == 'pdf' and PDF_AVAILABLE:
+        output = BytesIO()
+        doc = SimpleDocTemplate(output, pagesize=letter)
+        styles = getSampleStyleSheet()
 
-    # Find members with active loans
-    cursor.execute("""
-        SELECT DISTINCT u.name, u.email, u.contact_number 
-        FROM users u 
-        JOIN loans l ON u.id = l.user_id 
-        WHERE l.status IN ('approved', 'overdue')
-    """)
-    loan_members = cursor.fetchall()
+        elements = []
 
-    # In a real application, you would integrate with SMS/Email APIs here.
-    # For this example, we'll just flash a message.
-    if unpaid_members:
-        flash(f'Reminders sent to {len(unpaid_members)} members for pending contributions.', 'info')
-        # print(f"Contribution reminders to: {unpaid_members}") # For debugging
-    if loan_members:
-        flash(f'Reminders sent to {len(loan_members)} members for loan interest/payments.', 'info')
-        # print(f"Loan reminders to: {loan_members}") # For debugging
+        # Title
+        elements.append(Paragraph(report_title, styles['h1']))
+        elements.append(Spacer(1, 12))
 
-    if not unpaid_members and not loan_members:
-        flash('No pending contributions or active loans found for reminders.', 'info')
+        # Table data
+        table_data = [report_headers]
+        for row_dict in report_data:
+            row_values = []
+            for header_key in report_headers:
+                key_map = {
+                    "Member Name": "member_name",
+                    "Borrower Name": "borrower_name",
+                    "Loan ID": "id",
+                    "Amount": "amount",
+                    "Loan Amount": "loan_amount",
+                    "Interest Rate (%)": "interest_rate",
+                    "Start Date": "start_date",
+                    "Actual End Date": "actual_end_date",
+                    "Status": "status",
+                    "Disbursement Type": "disbursement_type",
+                    "Disbursement Details": "disbursement_details_formatted",
+                    "Month": "month_name",
+                    "Year": "year",
+                    "Fine Amount": "fine_amount",
+                    "Total Paid": "total_paid",
+                    "UTR (Member)": "utr_number",
+                    "UTR (President)": "president_utr_number",
+                    "Total Contributions": "total_contributions",
+                    "Total Fines": "total_fine_amount",
+                    "Grand Total": "grand_total",
+                    "Interest Paid This Month": "interest_paid",
+                    "Total Interest Paid in Year": "total_interest_paid_yearly",
+                    "Total Loans Taken": "total_loans_taken",
+                    "Active Loans Count": "active_loans_count"
+                }
+                data_key = key_map.get(header_key, header_key.replace(" ", "_").lower())
 
-    cursor.close()  # Close cursor after all fetches
-    conn.close()
-    return redirect(url_for('dashboard'))  # Redirect back to the main dashboard
+                cell_value = row_dict.get(data_key, '')
 
+                if data_key == 'is_paid':
+                    cell_value = 'Paid' if cell_value else 'Pending'
+                elif isinstance(cell_value, Decimal):
+                    cell_value = f"{cell_value:.2f}" if data_key == 'interest_rate' else f"₹{cell_value:.2f}"
+                elif isinstance(cell_value, datetime) or isinstance(cell_value, date):
+                    cell_value = cell_value.strftime('%Y-%m-%d')
 
-# New route for President/Secretary to review and edit pending loan applications
-@app.route('/review_loan/<int:loan_id>', methods=['GET', 'POST'])
-@login_required(roles=['president', 'secretary'])
-def review_loan(loan_id):
-    """Allows President/Secretary to review and edit a pending loan application."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('loans'))
-    cursor = conn.cursor(dictionary=True, buffered=True)
+                row_values.append(str(cell_value))
+            table_data.append(row_values)
 
-    if request.method == 'POST':
-        amount_str = request.form.get('amount')
-        interest_rate_str = request.form.get('interest_rate')
-        start_date_str = request.form.get('start_date')
-        # end_date_str removed from form
-
-        # Input validation
-        if not all([amount_str, interest_rate_str, start_date_str]):  # Removed end_date_str
-            flash('All loan fields are required.', 'danger')
-            # Re-fetch loan details to re-render the form with current values
-            cursor.execute(
-                "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s",
-                (loan_id,))
-            loan_details = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return render_template('review_loan.html', loan=loan_details)
+        table = Table(table_data)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E0E0E0')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+        ]))
+        elements.append(table)
 
-        try:
-            amount = Decimal(amount_str)
-            interest_rate = Decimal(interest_rate_str)
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-            # end_date removed
-        except Exception as e:
-            flash(f'Invalid data format: {e}', 'danger')
-            cursor.execute(
-                "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s",
-                (loan_id,))
-            loan_details = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return render_template('review_loan.html', loan=loan_details)
+        doc.build(output)
+        output.seek(0)
+        return send_file(output, download_name=f"{report_title.replace(' ', '_')}.pdf", as_attachment=True,
+                         mimetype='application/pdf')
 
-        if amount <= 0 or interest_rate <= 0:
-            flash('Amount and interest rate must be positive values.', 'danger')
-            cursor.execute(
-                "SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s",
-                (loan_id,))
-            loan_details = cursor.fetchone()
-            cursor.close()
-            conn.close()
-            return render_template('review_loan.html', loan=loan_details)
+    else:
+        flash('Report format not supported or required libraries not installed.', 'danger')
+        return redirect(url_for('reports'))
 
-        # No end_date validation needed
 
-        try:
-            # Update statement no longer includes end_date
-            cursor.execute(
-                "UPDATE loans SET amount = %s, interest_rate = %s, start_date = %s WHERE id = %s",
-                (amount, interest_rate, start_date, loan_id)
-            )
-            conn.commit()
-            flash('Loan application updated successfully! You can now approve or reject it.', 'success')
-            return redirect(url_for('loans'))  # Redirect back to manage loans
-        except mysql.connector.Error as err:
-            flash(f'An error occurred while updating loan: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
+YEAR_END_SUMMARY_HEADERS = ('Member ID', 'Member Name', 'Role', 'Months Paid', 'Contributions', 'Fines',
+                            'Loans Taken', 'Loan Repayments', 'Interest Paid', 'Active Loans')
+YEAR_END_MONTH_HEADERS = ('Month', 'Contributions', 'Fines', 'Loans Disbursed', 'Loan Repayments', 'Interest Collected')
+YEAR_END_LOAN_HEADERS = ('Loan ID', 'Borrower', 'Amount', 'Interest Rate (%)', 'Start Date', 'Actual End Date',
+                         'Status', 'Paid This Year', 'Interest This Year', 'Total Paid', 'Outstanding Principal')
+YEAR_END_MEMBER_HEADERS = ('Member ID', 'Member Name', 'Type', 'Month', 'Loan ID', 'Amount', 'Fine / Interest',
+                           'Status', 'Date')
 
-    # GET request: Display current loan details for review
-    cursor.execute("SELECT l.*, u.name as borrower_name FROM loans l JOIN users u ON l.user_id = u.id WHERE l.id = %s",
-                   (loan_id,))
-    loan_details = cursor.fetchone()
-    cursor.close()
-    conn.close()
 
-    if not loan_details:
-        flash('Loan application not found.', 'danger')
-        return redirect(url_for('loans'))
+def write_year_end_pack(conn, group_id, year, output):
+    """
+    Writes the year-end workbook to output in one pass over six set-based queries: a summary sheet
+    (one row per member), a per-month sheet, a per-loan sheet and a member activity sheet with
+    every member's contributions and loan payments of the year, grouped by member. The workbook
+    is in write-only mode, so rows go to temporary files as they arrive and memory stays flat
+    however many members the group has. (One sheet per member would mean thousands of sheets,
+    which openpyxl creates in quadratic time and Excel opens slowly; the activity sheet can be
+    filtered by member instead.)
+    """
+    year_start, year_end = date(year, 1, 1), date(year + 1, 1, 1)
+    workbook = Workbook(write_only=True)
+    header_font = Font(bold=True)
+
+    def add_sheet(title, headers):
+        sheet = workbook.create_sheet(title)
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(sheet, value=header)
+            cell.font = header_font
+            header_cells.append(cell)
+        sheet.append(header_cells)
+        return sheet
+
+    cursor = open_row_cursor(conn)
+
+    summary = add_sheet('Summary', YEAR_END_SUMMARY_HEADERS)
+    cursor.execute("""
+        SELECT u.id, u.name, u.role, COALESCE(c.months_paid, 0) AS months_paid,
+               COALESCE(c.contributions, 0) AS contributions, COALESCE(c.fines, 0) AS fines,
+               COALESCE(l.loans_taken, 0) AS loans_taken, COALESCE(p.repaid, 0) AS repaid,
+               COALESCE(p.interest, 0) AS interest, COALESCE(l.active_loans, 0) AS active_loans
+        FROM users u
+        LEFT JOIN (
+            SELECT user_id, COUNT(*) AS months_paid, SUM(amount) AS contributions, SUM(fine_amount) AS fines
+            FROM contributions WHERE group_id = %s AND year = %s AND is_paid = TRUE GROUP BY user_id
+        ) c ON c.user_id = u.id
+        LEFT JOIN (
+            SELECT user_id,
+                   SUM(CASE WHEN start_date >= %s AND start_date < %s AND status IN ('approved', 'overdue', 'completed')
+                            THEN amount ELSE 0 END) AS loans_taken,
+                   SUM(CASE WHEN status IN ('approved', 'overdue') THEN 1 ELSE 0 END) AS active_loans
+            FROM loans WHERE group_id = %s GROUP BY user_id
+        ) l ON l.user_id = u.id
+        LEFT JOIN (
+            SELECT ln.user_id, SUM(lp.amount_paid) AS repaid, SUM(lp.interest_paid) AS interest
+            FROM loan_payments lp JOIN loans ln ON ln.id = lp.loan_id
+            WHERE lp.group_id = %s AND lp.payment_date >= %s AND lp.payment_date < %s
+            GROUP BY ln.user_id
+        ) p ON p.user_id = u.id
+        WHERE u.group_id = %s
+        ORDER BY u.id
+    """, (group_id, year, year_start, year_end, group_id, group_id, year_start, year_end, group_id))
+    for row in StreamedRows(cursor):
+        summary.append([value for _, value in row.items()])
+
+    # Per-month totals: three grouped queries merged into twelve rows
+    months = {month: [Decimal('0.00')] * 5 for month in range(1, 13)}
+    cursor.execute("""
+        SELECT month, SUM(amount), SUM(fine_amount) FROM contributions
+        WHERE group_id = %s AND year = %s AND is_paid = TRUE GROUP BY month
+    """, (group_id, year))
+    for month, contributions, fines in cursor.fetchall():
+        months[month][0:2] = [contributions, fines]
+    cursor.execute("""
+        SELECT MONTH(start_date), SUM(amount) FROM loans
+        WHERE group_id = %s AND start_date >= %s AND start_date < %s AND status IN ('approved', 'overdue', 'completed')
+        GROUP BY MONTH(start_date)
+    """, (group_id, year_start, year_end))
+    for month, disbursed in cursor.fetchall():
+        months[month][2] = disbursed
+    cursor.execute("""
+        SELECT MONTH(payment_date), SUM(amount_paid), SUM(interest_paid) FROM loan_payments
+        WHERE group_id = %s AND payment_date >= %s AND payment_date < %s GROUP BY MONTH(payment_date)
+    """, (group_id, year_start, year_end))
+    for month, repaid, interest in cursor.fetchall():
+        months[month][3:5] = [repaid, interest]
+    per_month = add_sheet('By Month', YEAR_END_MONTH_HEADERS)
+    for month, totals in months.items():
+        per_month.append([date(year, month, 1).strftime('%B')] + totals)
+
+    per_loan = add_sheet('Loans', YEAR_END_LOAN_HEADERS)
+    cursor.execute("""
+        SELECT l.id, u.name, l.amount, l.interest_rate, l.start_date, l.actual_end_date, l.status,
+               COALESCE(SUM(CASE WHEN lp.payment_date >= %s AND lp.payment_date < %s THEN lp.amount_paid END), 0) AS paid_year,
+               COALESCE(SUM(CASE WHEN lp.payment_date >= %s AND lp.payment_date < %s THEN lp.interest_paid END), 0) AS interest_year,
+               COALESCE(SUM(CASE WHEN lp.payment_date < %s THEN lp.amount_paid END), 0) AS paid_total,
+               COALESCE(SUM(CASE WHEN lp.payment_date < %s THEN lp.interest_paid END), 0) AS interest_total
+        FROM loans l
+        JOIN users u ON u.id = l.user_id
+        LEFT JOIN loan_payments lp ON lp.loan_id = l.id
+        WHERE l.group_id = %s AND l.start_date < %s
+          AND (l.actual_end_date IS NULL OR l.actual_end_date >= %s) AND l.status NOT IN ('pending', 'rejected')
+        GROUP BY l.id, u.name, l.amount, l.interest_rate, l.start_date, l.actual_end_date, l.status
+        ORDER BY l.id
+    """, (year_start, year_end, year_start, year_end, year_end, year_end, group_id, year_end, year_start))
+    for row in StreamedRows(cursor):
+        outstanding = to_paise(row['amount']) - (to_paise(row['paid_total']) - to_paise(row['interest_total']))
+        per_loan.append([value for key, value in row.items() if key != 'interest_total'] +
+                        [paise_to_decimal(max(outstanding, 0))])
+
+    # Member activity: the member_contributions and member_loans reports of every member, in one stream
+    cursor.execute("""
+        SELECT c.user_id, u.name, 'Contribution' AS kind, c.month, NULL AS loan_id, c.amount,
+               c.fine_amount AS extra, CASE WHEN c.is_paid THEN 'Paid' ELSE 'Pending' END AS status,
+               c.payment_date AS paid_on
+        FROM contributions c JOIN users u ON u.id = c.user_id
+        WHERE c.group_id = %s AND c.year = %s
+        UNION ALL
+        SELECT l.user_id, u.name, 'Loan payment', MONTH(lp.payment_date), lp.loan_id, lp.amount_paid,
+               lp.interest_paid, l.status, lp.payment_date
+        FROM loan_payments lp JOIN loans l ON l.id = lp.loan_id JOIN users u ON u.id = l.user_id
+        WHERE lp.group_id = %s AND lp.payment_date >= %s AND lp.payment_date < %s
+        ORDER BY 1, 3, 4, 9
+    """, (group_id, year, group_id, year_start, year_end))
+    member_activity = add_sheet('Member Activity', YEAR_END_MEMBER_HEADERS)
+    for row in StreamedRows(cursor):
+        month_name = date(year, row['month'], 1).strftime('%B') if row['month'] else ''
+        member_activity.append([row['user_id'], row['name'], row['kind'], month_name, row['loan_id'], row['amount'],
+                                row['extra'], row['status'], row['paid_on']])
+    cursor.close()
 
-    return render_template('review_loan.html', loan=loan_details)
+    workbook.save(output)
 
 
-@app.route('/close_loan/<int:loan_id>', methods=['GET', 'POST'])
-@login_required()
-def close_loan(loan_id):
-    """Allows a member to apply to close their loan."""
-    user_id = session.get('user_id')
-    role = session.get('role')
+@app.route('/export_year_end_pack')
+@login_required(roles=['president', 'secretary'])
+def export_year_end_pack():
+    """Downloads the year-end workbook for the year given as ?year= (default: last year)."""
+    if not EXCEL_AVAILABLE:
+        flash('Excel export needs openpyxl, which is not installed.', 'danger')
+        return redirect(url_for('reports'))
+    year = request.args.get('year', type=int) or date.today().year - 1
     conn = get_db_connection()
     if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('loans'))
-    cursor = conn.cursor(dictionary=True, buffered=True)
-
-    # Get loan details
-    cursor.execute("SELECT id, user_id, amount, interest_rate, start_date, status FROM loans WHERE id = %s", (loan_id,))
-    loan = cursor.fetchone()
-
-    if not loan:
-        flash('Loan not found.', 'danger')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('loans'))
-
-    # Ensure only the borrower or president/secretary can close this loan
-    if user_id != loan['user_id'] and role not in ['president', 'secretary']:
-        flash('You are not authorized to close this loan.', 'danger')
-        cursor.close()
+        flash('Database connection error. Cannot generate report.', 'danger')
+        return redirect(url_for('reports'))
+    output = tempfile.TemporaryFile()  # Sent from disk in chunks, then deleted
+    try:
+        write_year_end_pack(conn, current_group_id(), year, output)
+    except mysql.connector.Error as err:
+        output.close()
+        flash(f'An error occurred while building the year-end pack: {err}', 'danger')
+        return redirect(url_for('reports'))
+    finally:
         conn.close()
-        return redirect(url_for('loans'))
+    output.seek(0)
+    return send_file(output, as_attachment=True, download_name=f'Year_End_Pack_{year}.xlsx',
+                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
-    if loan['status'] == 'completed':
-        flash('This loan is already completed. No more payments are needed.', 'info')
-        cursor.close()
-        conn.close()
-        return redirect(url_for('loans'))
 
-    # Calculate current outstanding principal and total interest paid so far
-    cursor.execute(
-        "SELECT SUM(amount_paid) as total_paid, SUM(interest_paid) as total_interest_paid_from_payments FROM loan_payments WHERE loan_id = %s",
-        (loan_id,))
-    payment_summary = cursor.fetchone()
-    total_paid_so_far = payment_summary['total_paid'] if payment_summary and payment_summary[
-        'total_paid'] is not None else Decimal('0.00')
-    total_interest_paid_from_payments = payment_summary['total_interest_paid_from_payments'] if payment_summary and \
-                                                                                                payment_summary[
-                                                                                                    'total_interest_paid_from_payments'] is not None else Decimal(
-        '0.00')
+# --- End New Reports Feature ---
 
-    outstanding_principal = loan['amount'] - (total_paid_so_far - total_interest_paid_from_payments)
 
-    # Calculate accrued interest since last payment or loan start
-    last_payment_date = None
-    cursor.execute("SELECT MAX(payment_date) as last_payment_date FROM loan_payments WHERE loan_id = %s", (loan_id,))
-    last_payment_result = cursor.fetchone()
-    if last_payment_result and last_payment_result['last_payment_date']:
-        last_payment_date = last_payment_result['last_payment_date'].date()  # Convert datetime to date
+# --- JSON API (v1) ---
+# Read endpoints for a member's own data, used by the mobile clients. Each response carries an
+# ETag built from the member's data_version, which login_required has already read. A client
+# revalidating unchanged data gets a 304 before any contribution or loan query runs.
+CONTRIBUTION_API_FIELDS = ('id', 'month', 'year', 'amount', 'fine_amount', 'is_paid', 'payment_date',
+                           'utr_number', 'status')
+LOAN_API_FIELDS = ('id', 'amount', 'interest_rate', 'start_date', 'actual_end_date', 'status', 'disbursement_type')
 
-    interest_start_date = last_payment_date if last_payment_date else loan['start_date']
 
-    # Ensure interest calculation is only for active loans and within loan term
-    if loan['status'] in ['approved', 'overdue']:
-        today = date.today()
-        # Calculate days since last interest calculation or loan start
-        days_since_last_calc = (today - interest_start_date).days
+def api_value(value):
+    """Converts a DB value for JSON: amounts as exact decimal strings, dates as ISO 8601."""
+    if isinstance(value, (Decimal, Money)):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
 
-        # Simple daily interest calculation
-        daily_interest_rate = loan['interest_rate'] / Decimal('100') / Decimal('365')
-        accrued_interest = (outstanding_principal * daily_interest_rate * days_since_last_calc).quantize(
-            Decimal('0.01'), rounding=ROUND_HALF_UP)
-    else:
-        accrued_interest = Decimal('0.00')  # No new interest if loan is not active
 
-    remaining_amount_to_close = (outstanding_principal + accrued_interest).quantize(Decimal('0.01'),
-                                                                                    rounding=ROUND_HALF_UP)
-    if remaining_amount_to_close < 0:
-        remaining_amount_to_close = Decimal('0.00')
+def api_rows(rows, fields):
+    """Converts rows to JSON-ready dicts with only the given fields."""
+    return [{field: api_value(row[field]) for field in fields} for row in rows]
 
-    if request.method == 'POST':
-        closing_amount_str = request.form.get('closing_amount')
 
-        if not closing_amount_str:
-            flash('Closing amount is required.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('close_loan.html', loan=loan,
-                                   outstanding_principal=outstanding_principal,
-                                   accrued_interest=accrued_interest,
-                                   remaining_amount_to_close=remaining_amount_to_close)
-        try:
-            closing_amount = Decimal(closing_amount_str)
-        except Exception:
-            flash('Invalid amount format.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('close_loan.html', loan=loan,
-                                   outstanding_principal=outstanding_principal,
-                                   accrued_interest=accrued_interest,
-                                   remaining_amount_to_close=remaining_amount_to_close)
+def contribution_status(contribution):
+    """Status of a contribution row as shown to the member."""
+    if contribution['is_paid']:
+        return 'paid'
+    if contribution['president_utr_number'] == 'REJECTED':
+        return 'rejected'
+    if not contribution['utr_number']:
+        return 'due'  # Created by the monthly close, not yet submitted
+    return 'pending_approval'
 
-        if closing_amount <= 0:
-            flash('Closing amount must be positive.', 'danger')
-            cursor.close()
-            conn.close()
-            return render_template('close_loan.html', loan=loan,
-                                   outstanding_principal=outstanding_principal,
-                                   accrued_interest=accrued_interest,
-                                   remaining_amount_to_close=remaining_amount_to_close)
 
-        if closing_amount < remaining_amount_to_close:
-            flash(
-                f'The closing amount is less than the total outstanding amount (Principal + Accrued Interest: ₹{remaining_amount_to_close:.2f}). Please pay the full amount to close the loan.',
-                'danger')
-            cursor.close()
-            conn.close()
-            return render_template('close_loan.html', loan=loan,
-                                   outstanding_principal=outstanding_principal,
-                                   accrued_interest=accrued_interest,
-                                   remaining_amount_to_close=remaining_amount_to_close)
+def etag_by_data_version(resource):
+    """
+    Decorator for member API views (place below login_required). The ETag also carries the
+    date because fines depend on the day of the month.
+    """
 
-        try:
-            # Record the final payment
-            cursor.execute(
-                "INSERT INTO loan_payments (loan_id, amount_paid, interest_paid, payment_date) VALUES (%s, %s, %s, %s)",
-                (loan_id, closing_amount, accrued_interest, datetime.now())
-            )
+    def wrapper(view_func):
+        @functools.wraps(view_func)
+        def decorated_function(*args, **kwargs):
+            etag = f"{resource}-{session['user_id']}-{g.data_version}-{date.today():%Y%m%d}"
+            if request.if_none_match.contains_weak(etag):
+                response = app.response_class(status=304)
+            else:
+                response = app.make_response(view_func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
 
-            # Update bank balance
-            cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE id = 1", (closing_amount,))
+        return decorated_function
 
-            # Mark loan as completed and set actual_end_date
-            cursor.execute("UPDATE loans SET status = 'completed', actual_end_date = %s WHERE id = %s",
-                           (date.today(), loan_id))
+    return wrapper
 
-            conn.commit()
-            flash('Loan successfully closed!', 'success')
-            return redirect(url_for('loans'))
-        except mysql.connector.Error as err:
-            flash(f'An error occurred while closing loan: {err}', 'danger')
-            conn.rollback()
-        finally:
-            cursor.close()
-            conn.close()
 
-    cursor.close()
-    conn.close()
-    return render_template('close_loan.html',
-                           loan=loan,
-                           outstanding_principal=outstanding_principal,
-                           accrued_interest=accrued_interest,
-                           remaining_amount_to_close=remaining_amount_to_close)
+@app.route(API_PREFIX + '/login', methods=['POST'])
+def api_login():
+    """Logs in with a JSON body {"username": ..., "password": ...} and starts a session cookie."""
+    data = request.get_json(silent=True) or {}
+    username = data.get('username', '')
+    password = data.get('password', '')
+    if not username or not password:
+        return api_error('Username and password are required.', 400)
 
+    conn = get_db_connection()
+    if conn is None:
+        return api_error('Database connection error.', 503)
+    try:
+        user = authenticate_user(conn, username, password)
+    finally:
+        conn.close()
 
-# New routes for Contribution Approval Workflow
-@app.route('/manage_contributions', methods=['GET'])
-@login_required(roles=['president', 'secretary'])
-def manage_contributions():
-    """Allows President/Secretary to view and manage pending contributions."""
+    if not user:
+        return api_error('Invalid username or password.', 401)
+    start_user_session(user)
+    return jsonify({'id': user['id'], 'name': user['name'], 'role': user['role']})
+
+
+@app.route(API_PREFIX + '/logout', methods=['POST'])
+def api_logout():
+    """Ends the API session."""
+    session.clear()
+    return jsonify({'logged_out': True})
+
+
+@app.route(API_PREFIX + '/me/dashboard')
+@login_required()
+@etag_by_data_version('dashboard')
+def api_member_dashboard():
+    """Member dashboard: total contributed, active loans and the pending contribution for this month."""
+    user_id = session['user_id']
     conn = get_db_connection()
     if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
+        return api_error('Database connection error.', 503)
     cursor = conn.cursor(dictionary=True, buffered=True)
 
-    # Fetch all pending contributions (is_paid = FALSE and president_utr_number is NULL)
+    cursor.execute(
+        "SELECT SUM(amount) as total_contributed FROM contributions WHERE user_id = %s AND is_paid = TRUE",
+        (user_id,))
+    total_contributed = cursor.fetchone()['total_contributed'] or Decimal('0.00')
+
     cursor.execute("""
-        SELECT c.*, u.name as member_name, u.username as member_username
-        FROM contributions c
-        JOIN users u ON c.user_id = u.id
-        WHERE c.is_paid = FALSE AND c.president_utr_number IS NULL
-        ORDER BY c.payment_date DESC
-    """)
-    pending_contributions = cursor.fetchall()
+        SELECT id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type
+        FROM loans WHERE user_id = %s AND status IN ('approved', 'overdue')
+        ORDER BY start_date DESC
+    """, (user_id,))
+    current_loans = cursor.fetchall()
 
-    # Fetch all approved contributions for this month
     current_month = datetime.now().month
     current_year = datetime.now().year
-    cursor.execute("""
-        SELECT c.*, u.name as member_name, u.username as member_username, p.name as approver_name
-        FROM contributions c
-        JOIN users u ON c.user_id = u.id
-        LEFT JOIN users p ON c.president_id = p.id
-        WHERE c.is_paid = TRUE AND c.month = %s AND c.year = %s
-        ORDER BY c.payment_date DESC
-    """, (current_month, current_year))
-    approved_contributions_this_month = cursor.fetchall()
+    pending_contribution = run_hot_query_one(conn, 'contribution_for_month', (user_id, current_month, current_year))
+    if pending_contribution and pending_contribution['is_paid']:
+        pending_contribution = None
+    elif pending_contribution:
+        pending_contribution['status'] = contribution_status(pending_contribution)
 
     cursor.close()
     conn.close()
-    return render_template('manage_contributions.html',
-                           pending_contributions=pending_contributions,
-                           approved_contributions_this_month=approved_contributions_this_month)
-
-
-@app.route('/approve_contribution/<int:contribution_id>', methods=['POST'])
-@login_required(roles=['president', 'secretary'])
-def approve_contribution(contribution_id):
-    """Allows President/Secretary to approve a contribution after UTR matching."""
-    president_utr_number = request.form.get('president_utr_number', '').strip()
+    return jsonify({
+        'user': {'id': user_id, 'name': session.get('name'), 'role': session.get('role')},
+        'total_contributed': api_value(total_contributed),
+        'current_loans': api_rows(current_loans, LOAN_API_FIELDS),
+        'pending_contribution': api_rows([pending_contribution], CONTRIBUTION_API_FIELDS)[0]
+        if pending_contribution else None,
+    })
 
-    if not president_utr_number:
-        flash('President UTR Number is required to approve this contribution.', 'danger')
-        return redirect(url_for('manage_contributions'))
 
+@app.route(API_PREFIX + '/me/contributions')
+@login_required()
+@etag_by_data_version('contributions')
+def api_member_contributions():
+    """Member's contribution history, newest first."""
     conn = get_db_connection()
     if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('manage_contributions'))
+        return api_error('Database connection error.', 503)
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("""
+        SELECT id, month, year, amount, fine_amount, is_paid, payment_date, utr_number, president_utr_number
+        FROM contributions WHERE user_id = %s
+        ORDER BY year DESC, month DESC
+    """, (session['user_id'],))
+    contributions_history = cursor.fetchall()
+    cursor.close()
+    conn.close()
 
-    conn.autocommit = False  # Start transaction
+    for contribution in contributions_history:
+        contribution['status'] = contribution_status(contribution)
+    return jsonify({'contributions': api_rows(contributions_history, CONTRIBUTION_API_FIELDS)})
 
+
+@app.route(API_PREFIX + '/me/loans')
+@login_required()
+@etag_by_data_version('loans')
+def api_member_loans():
+    """Member's loans, each with a payment summary, from one grouped query."""
+    conn = get_db_connection()
+    if conn is None:
+        return api_error('Database connection error.', 503)
     cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("""
+        SELECT l.id, l.amount, l.interest_rate, l.start_date, l.actual_end_date, l.status, l.disbursement_type,
+               SUM(lp.amount_paid) AS total_paid, SUM(lp.interest_paid) AS total_interest_paid,
+               COUNT(lp.id) AS payment_count, MAX(lp.payment_date) AS last_payment_date
+        FROM loans l
+        LEFT JOIN loan_payments lp ON lp.loan_id = l.id
+        WHERE l.user_id = %s
+        GROUP BY l.id
+        ORDER BY l.start_date DESC
+    """, (session['user_id'],))
+    member_loans = cursor.fetchall()
+    cursor.close()
+    conn.close()
 
+    loans_json = []
+    for loan in member_loans:
+        total_paid = Money.from_decimal(loan['total_paid'])
+        total_interest_paid = Money.from_decimal(loan['total_interest_paid'])
+        outstanding_principal = Money.from_decimal(loan['amount']) - (total_paid - total_interest_paid)
+        if loan['status'] in ('approved', 'overdue') and outstanding_principal > 0:
+            monthly_interest_due = outstanding_principal.interest(loan['interest_rate'])
+        else:
+            monthly_interest_due = Money(0)
+        loan_json = api_rows([loan], LOAN_API_FIELDS)[0]
+        loan_json['payment_summary'] = {
+            'payment_count': loan['payment_count'],
+            'last_payment_date': api_value(loan['last_payment_date']),
+            'total_paid': api_value(total_paid),
+            'total_interest_paid': api_value(total_interest_paid),
+            'outstanding_principal': api_value(max(outstanding_principal, Money(0))),
+            'monthly_interest_due': api_value(monthly_interest_due),
+        }
+        loans_json.append(loan_json)
+    return jsonify({'loans': loans_json})
+
+
+@app.route(API_PREFIX + '/me/dues')
+@login_required()
+@etag_by_data_version('dues')
+def api_member_dues():
+    """What the member owes for the current month (same figures as the contributions page)."""
+    conn = get_db_connection()
+    if conn is None:
+        return api_error('Database connection error.', 503)
+    dues = compute_member_dues(conn, session['user_id'], current_group_id())
+    conn.close()
+    today = date.today()
+    return jsonify({
+        'month': today.month,
+        'year': today.year,
+        'payment_start_day': dues['payment_start_day'],
+        'payment_end_day': dues['payment_end_day'],
+        'contribution_amount': api_value(dues['default_contribution_amount']),
+        'fine_amount': api_value(dues['current_fine_amount']),
+        'loan_interest_due': api_value(dues['total_monthly_loan_interest_due']),
+        'total_amount_to_pay': api_value(dues['total_amount_to_pay']),
+    })
+
+
+# --- Offline sync (v1) ---
+# Field collectors record contributions and loan payments offline and upload them in one
+# (optionally gzip-compressed) batch. Each operation carries a client-generated key; its outcome
+# is stored in idempotency_keys, so a batch re-sent after a dropped connection is not applied
+# twice. The response also carries every contribution, loan and payment changed on the server
+# since the client's cursor, and the ids of those deleted since then, so one request brings the
+# device up to date.
+SYNC_COLLECTOR_ROLES = ('president', 'secretary')  # May record for other members and take loan payments
+SYNC_OPERATION_TYPES = ('contribution', 'loan_payment')
+SYNC_CONTRIBUTION_FIELDS = CONTRIBUTION_API_FIELDS + ('user_id',)
+SYNC_LOAN_FIELDS = LOAN_API_FIELDS + ('user_id',)
+SYNC_LOAN_PAYMENT_FIELDS = ('id', 'loan_id', 'amount_paid', 'interest_paid', 'payment_date')
+
+
+# Deleting a member cascades to their contributions, loans and loan payments inside MySQL, where
+# triggers do not fire, so the routes that delete write the tombstones themselves, in the same
+# transaction and before the delete. Each query selects (group_id, user_id, id) of a table's rows.
+SYNC_TOMBSTONE_QUERIES = {
+    'contributions': "SELECT group_id, user_id, id FROM contributions WHERE {where}",
+    'loans': "SELECT group_id, user_id, id FROM loans WHERE {where}",
+    'loan_payments': "SELECT lp.group_id, l.user_id, lp.id FROM loan_payments lp JOIN loans l ON l.id = lp.loan_id WHERE {where}",
+}
+
+
+def record_deleted_rows(cursor, table, where, params):
+    """Writes a deleted_rows tombstone for every row of table matching where (call before deleting them)."""
+    cursor.execute(f"""
+        INSERT INTO deleted_rows (group_id, user_id, table_name, row_id)
+        SELECT source.group_id, source.user_id, %s, source.id
+        FROM ({SYNC_TOMBSTONE_QUERIES[table].format(where=where)}) AS source
+    """, (table, *params))
+
+
+def record_member_deleted_rows(cursor, member_id, group_id):
+    """Tombstones for everything that is deleted along with a member."""
+    record_deleted_rows(cursor, 'contributions', 'user_id = %s AND group_id = %s', (member_id, group_id))
+    record_deleted_rows(cursor, 'loans', 'user_id = %s AND group_id = %s', (member_id, group_id))
+    record_deleted_rows(cursor, 'loan_payments', 'l.user_id = %s AND l.group_id = %s', (member_id, group_id))
+
+
+class SyncRequestError(Exception):
+    """A sync request that cannot be read at all; reported as a 400/413 for the whole batch."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def read_json_body(max_bytes):
+    """
+    Parses the JSON request body, inflating it first for Content-Encoding gzip or deflate.
+    Bodies larger than max_bytes (before or after inflating) raise SyncRequestError.
+    """
+    if request.content_length is not None and request.content_length > max_bytes:
+        raise SyncRequestError('Request body is too large.', 413)
+    body = request.get_data(cache=False)
+    encoding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+    if encoding in ('gzip', 'deflate'):
+        # wbits 16+ reads a gzip header, 15 a zlib one; max_length guards against zip bombs
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS if encoding == 'gzip' else zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, max_bytes)
+        except zlib.error:
+            raise SyncRequestError(f'Request body is not valid {encoding} data.')
+        if decompressor.unconsumed_tail:
+            raise SyncRequestError('Request body is too large.', 413)
+    elif encoding != 'identity':
+        raise SyncRequestError(f'Unsupported Content-Encoding: {encoding}.', 415)
+    if len(body) > max_bytes:
+        raise SyncRequestError('Request body is too large.', 413)
     try:
-        # 1. Fetch the pending contribution
-        cursor.execute("SELECT id, user_id, amount, fine_amount, utr_number, is_paid FROM contributions WHERE id = %s",
-                       (contribution_id,))
-        contribution = cursor.fetchone()
+        return json.loads(body)
+    except ValueError:
+        raise SyncRequestError('Request body is not valid JSON.')
 
-        if not contribution:
-            flash('Contribution not found.', 'danger')
-            conn.rollback()
-            return redirect(url_for('manage_contributions'))
 
-        if contribution['is_paid']:  # Already paid/approved
-            flash('This contribution has already been approved.', 'info')
-            conn.rollback()
-            return redirect(url_for('manage_contributions'))
+def parse_sync_cursor(cursor_value):
+    """The client's cursor is the server time of its last sync, as returned by the previous response."""
+    if cursor_value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(cursor_value)
+    except (TypeError, ValueError):
+        raise SyncRequestError('Invalid sync cursor.')
 
-        # 2. Compare UTR numbers
-        if contribution['utr_number'] != president_utr_number:
-            flash(f'UTR Number mismatch for contribution ID {contribution_id}. Please check the UTR entered.', 'danger')
-            conn.rollback()
-            return redirect(url_for('manage_contributions'))
 
-        # 3. Update contribution status to paid and record approver
-        total_amount_to_add = contribution['amount'] + contribution['fine_amount']
+def parse_recorded_at(value, now):
+    """When the collector took the payment offline. Naive local time like the rest of the app; never in the future."""
+    if value in (None, ''):
+        return now
+    recorded_at = datetime.fromisoformat(value)
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone().replace(tzinfo=None)
+    return min(recorded_at, now)
 
-        cursor.execute(
-            "UPDATE contributions SET is_paid = TRUE, president_id = %s, president_utr_number = %s, payment_date = %s WHERE id = %s",
-            (session['user_id'], president_utr_number, datetime.now(), contribution_id)
-        )
 
-        # 4. Update bank balance
-        cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE id = 1", (total_amount_to_add,))
+def apply_sync_operations(cursor, group_id, user, operations, since, settings):
+    """
+    Validates and applies a batch of sync operations in the caller's transaction. Contributions
+    and loan payments are checked against one query each; rows are written with executemany
+    and the bank balance is updated once. Returns a result dict per operation, in order.
 
-        conn.commit()
-        flash(
-            f'Contribution from {contribution["user_id"]} approved successfully! Amount ₹{total_amount_to_add:.2f} added to bank balance.',
-            'success')
+    An operation is a conflict when the server state it depends on has moved: the month is
+    already paid, the pending submission was changed on the server after the client's cursor,
+    or the loan is no longer active (closed or fully repaid, possibly earlier in this batch).
+    """
+    now = datetime.now()
+    is_collector = user['role'] in SYNC_COLLECTOR_ROLES
+    results = [None] * len(operations)
+    contribution_ops = []  # (index, key, member_id, month, year, amount, utr_number, recorded_at)
+    payment_ops = []  # (index, key, loan_id, amount, recorded_at)
+
+    for index, op in enumerate(operations):
+        key = op.get('key')
+        try:
+            op_type = op.get('type')
+            if op_type not in SYNC_OPERATION_TYPES:
+                raise ValueError(f'Unknown operation type: {op_type}.')
+            amount = Money.from_decimal(str(op.get('amount', '')))
+            if amount <= 0:
+                raise ValueError('Amount must be positive.')
+            recorded_at = parse_recorded_at(op.get('recorded_at'), now)
+            if op_type == 'contribution':
+                member_id = int(op.get('member_id') or user['id'])
+                if member_id != user['id'] and not is_collector:
+                    raise ValueError('Only a president or secretary can record contributions for other members.')
+                utr_number = str(op.get('utr_number') or '').strip()
+                if not utr_number:
+                    raise ValueError('UTR Number is required for contribution.')
+                contribution_ops.append((index, key, member_id, recorded_at.month, recorded_at.year, amount,
+                                         utr_number, recorded_at))
+            else:
+                if not is_collector:
+                    raise ValueError('Only a president or secretary can record loan payments.')
+                payment_ops.append((index, key, int(op.get('loan_id')), amount, recorded_at))
+        except (TypeError, ValueError, ArithmeticError) as err:
+            results[index] = {'key': key, 'status': 'invalid', 'message': str(err) or 'Invalid operation.'}
+
+    touched_user_ids = set()
+
+    if contribution_ops:
+        member_ids = sorted({op[2] for op in contribution_ops})
+        placeholders = ', '.join(['%s'] * len(member_ids))
+        cursor.execute(f"SELECT id FROM users WHERE group_id = %s AND id IN ({placeholders})",
+                       (group_id, *member_ids))
+        group_member_ids = {row['id'] for row in cursor.fetchall()}
+        periods = sorted({(op[2], op[3], op[4]) for op in contribution_ops})
+        period_placeholders = ', '.join(['(%s, %s, %s)'] * len(periods))
+        cursor.execute(f"""
+            SELECT id, user_id, month, year, is_paid, utr_number, updated_at FROM contributions
+            WHERE group_id = %s AND (user_id, month, year) IN ({period_placeholders})
+        """, (group_id, *[value for period in periods for value in period]))
+        existing = {(row['user_id'], row['month'], row['year']): row for row in cursor.fetchall()}
+
+        default_fine_amount = Money.from_decimal(settings['default_fine_amount']) if settings else Money(0)
+        payment_end_day = settings['payment_end_day'] if settings and settings['payment_end_day'] else 7
+        inserts, updates, seen_periods = [], [], set()
+        for index, key, member_id, month, year, amount, utr_number, recorded_at in contribution_ops:
+            period = (member_id, month, year)
+            row = existing.get(period)
+            if member_id not in group_member_ids:
+                results[index] = {'key': key, 'status': 'invalid', 'message': 'Member not found in this group.'}
+                continue
+            if period in seen_periods:
+                results[index] = {'key': key, 'status': 'conflict',
+                                  'message': 'Another operation in this batch already submitted this month.'}
+                continue
+            if row and row['is_paid']:
+                results[index] = {'key': key, 'status': 'conflict',
+                                  'message': f'Contribution for {month}/{year} is already paid.'}
+                continue
+            if row and row['utr_number'] and (since is None or row['updated_at'] > since):
+                results[index] = {'key': key, 'status': 'conflict',
+                                  'message': f'Contribution for {month}/{year} was changed on the server since your last sync.'}
+                continue
+            seen_periods.add(period)
+            # Same fine rule as the contributions page, judged on the day the money was collected
+            fine_amount = default_fine_amount if recorded_at.day > payment_end_day else Money(0)
+            if row:
+                updates.append((amount.to_decimal(), utr_number, fine_amount.to_decimal(), recorded_at, row['id']))
+            else:
+                inserts.append((group_id, member_id, amount.to_decimal(), month, year, fine_amount.to_decimal(),
+                                utr_number, recorded_at))
+            touched_user_ids.add(member_id)
+            results[index] = {'key': key, 'status': 'applied'}
+        if inserts:
+            cursor.executemany(
+                "INSERT INTO contributions (group_id, user_id, amount, month, year, is_paid, fine_amount, utr_number, payment_date) VALUES (%s, %s, %s, %s, %s, FALSE, %s, %s, %s)",
+                inserts)
+        if updates:
+            cursor.executemany(
+                "UPDATE contributions SET amount = %s, utr_number = %s, fine_amount = %s, payment_date = %s WHERE id = %s",
+                updates)
+
+    if payment_ops:
+        balances = load_loan_balances(cursor, group_id, sorted({op[2] for op in payment_ops}))
+        payment_rows, completed_loan_ids, reopened_loan_ids = [], set(), set()
+        total_collected = Money(0)
+        for index, key, loan_id, amount, recorded_at in payment_ops:
+            loan = balances.get(loan_id)
+            if loan is None or loan['outstanding_principal'] <= 0:
+                results[index] = {'key': key, 'status': 'conflict',
+                                  'message': f'Loan {loan_id} is no longer active.'}
+                continue
+            # Interest first, then principal; the balance carries over to later payments in the batch
+            interest_portion = min(amount, loan['monthly_interest_due'])
+            loan['outstanding_principal'] -= amount - interest_portion
+            loan['monthly_interest_due'] = (loan['outstanding_principal'].interest(loan['interest_rate'])
+                                            if loan['outstanding_principal'] > 0 else Money(0))
+            payment_rows.append((group_id, loan_id, amount.to_decimal(), interest_portion.to_decimal(), recorded_at))
+            total_collected += amount
+            if loan['outstanding_principal'] <= 0:
+                completed_loan_ids.add(loan_id)
+            elif loan['status'] == 'overdue':
+                reopened_loan_ids.add(loan_id)
+            touched_user_ids.add(loan['user_id'])
+            results[index] = {'key': key, 'status': 'applied'}
+        if payment_rows:
+            cursor.executemany(
+                "INSERT INTO loan_payments (group_id, loan_id, amount_paid, interest_paid, payment_date) VALUES (%s, %s, %s, %s, %s)",
+                payment_rows)
+            cursor.execute("UPDATE bank_balance SET balance = balance + %s WHERE group_id = %s",
+                           (total_collected.to_decimal(), group_id))
+        if completed_loan_ids:
+            placeholders = ', '.join(['%s'] * len(completed_loan_ids))
+            cursor.execute(
+                f"UPDATE loans SET status = 'completed', actual_end_date = %s WHERE id IN ({placeholders})",
+                (date.today(), *sorted(completed_loan_ids)))
+        reopened_loan_ids -= completed_loan_ids  # Repaid later in the same batch
+        if reopened_loan_ids:
+            placeholders = ', '.join(['%s'] * len(reopened_loan_ids))
+            cursor.execute(f"UPDATE loans SET status = 'approved' WHERE id IN ({placeholders})",
+                           tuple(sorted(reopened_loan_ids)))
 
-    except mysql.connector.Error as err:
-        flash(f'An error occurred while approving contribution: {err}', 'danger')
-        conn.rollback()
-    finally:
-        cursor.close()
-        conn.close()
-    return redirect(url_for('manage_contributions'))
+    bump_data_versions(cursor, touched_user_ids)
+    return results
 
 
-@app.route('/reject_contribution/<int:contribution_id>', methods=['POST'])
-@login_required(roles=['president', 'secretary'])
-def reject_contribution(contribution_id):
-    """Allows President/Secretary to reject a contribution."""
+def fetch_sync_changes(cursor, group_id, user, since):
+    """
+    Contributions, loans and loan payments changed since the cursor (everything when it is None):
+    the whole group for collectors, the member's own rows otherwise, plus the tables and ids of
+    rows deleted since the cursor. The cursor is moved back by SYNC_CURSOR_OVERLAP seconds to catch
+    rows committed late with an earlier updated_at; clients upsert and delete by id, so seeing a
+    row twice is harmless.
+    """
+    if user['role'] in SYNC_COLLECTOR_ROLES:
+        scope, scope_params = 'group_id = %s', [group_id]
+    else:
+        scope, scope_params = 'user_id = %s', [user['id']]
+    since_filter, since_params = '', []
+    if since is not None:
+        since_filter = 'AND {alias}updated_at >= %s'
+        since_params = [since - timedelta(seconds=app.config['SYNC_CURSOR_OVERLAP'])]
+
+    cursor.execute(f"""
+        SELECT id, user_id, month, year, amount, fine_amount, is_paid, payment_date, utr_number, president_utr_number
+        FROM contributions WHERE {scope} {since_filter.format(alias='')}
+    """, (*scope_params, *since_params))
+    contributions_changed = cursor.fetchall()
+    for contribution in contributions_changed:
+        contribution['status'] = contribution_status(contribution)
+
+    cursor.execute(f"""
+        SELECT id, user_id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type
+        FROM loans WHERE {scope} {since_filter.format(alias='')}
+    """, (*scope_params, *since_params))
+    loans_changed = cursor.fetchall()
+
+    cursor.execute(f"""
+        SELECT lp.id, lp.loan_id, lp.amount_paid, lp.interest_paid, lp.payment_date
+        FROM loan_payments lp JOIN loans l ON l.id = lp.loan_id
+        WHERE l.{scope} {since_filter.format(alias='lp.')}
+    """, (*scope_params, *since_params))
+    payments_changed = cursor.fetchall()
+
+    deleted = []
+    if since is not None:  # A first sync has nothing to remove
+        cursor.execute(f"SELECT table_name, row_id FROM deleted_rows WHERE {scope} AND deleted_at >= %s",
+                       (*scope_params, *since_params))
+        deleted = [{'table': row['table_name'], 'id': row['row_id']} for row in cursor.fetchall()]
+
+    return {
+        'contributions': api_rows(contributions_changed, SYNC_CONTRIBUTION_FIELDS),
+        'loans': api_rows(loans_changed, SYNC_LOAN_FIELDS),
+        'loan_payments': api_rows(payments_changed, SYNC_LOAN_PAYMENT_FIELDS),
+        'deleted': deleted,
+    }
+
+
+@app.route(API_PREFIX + '/sync', methods=['POST'])
+@login_required()
+def api_sync():
+    """
+    Uploads offline operations and downloads server changes in one request. Body (JSON, optionally
+    gzip/deflate with Content-Encoding):
+        {"cursor": <from the last response or null>,
+         "operations": [{"key": "<unique per operation>", "type": "contribution", "amount": "150.00",
+                         "utr_number": "...", "member_id": 12, "recorded_at": "2024-05-03T10:15:00"},
+                        {"key": "...", "type": "loan_payment", "loan_id": 7, "amount": "500.00", "recorded_at": ...}]}
+    Every operation gets a result (applied, conflict or invalid); a re-sent key returns its first
+    result with "replayed": true. Applied operations commit together. changes.deleted lists the
+    {"table", "id"} of rows deleted on the server since the cursor.
+    """
+    try:
+        payload = read_json_body(app.config['SYNC_MAX_BODY_BYTES'])
+        if not isinstance(payload, dict):
+            raise SyncRequestError('Request body must be a JSON object.')
+        since = parse_sync_cursor(payload.get('cursor'))
+        operations = payload.get('operations') or []
+        if not isinstance(operations, list) or not all(isinstance(op, dict) for op in operations):
+            raise SyncRequestError('operations must be a list of objects.')
+        if len(operations) > app.config['SYNC_MAX_OPERATIONS']:
+            raise SyncRequestError(f"At most {app.config['SYNC_MAX_OPERATIONS']} operations per sync.", 413)
+        keys = [op.get('key') for op in operations]
+        if not all(isinstance(key, str) and IDEMPOTENCY_KEY_PATTERN.match(key) for key in keys):
+            raise SyncRequestError('Every operation needs a key of 8-64 letters, digits or _.:- characters.')
+        if len(set(keys)) != len(keys):
+            raise SyncRequestError('Operation keys must be unique within a batch.')
+    except SyncRequestError as err:
+        return api_error(str(err), err.status)
+
     conn = get_db_connection()
     if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('manage_contributions'))
-
-    cursor = conn.cursor(buffered=True)
+        return api_error('Database connection error.', 503)
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    group_id = current_group_id()
+    user = {'id': session['user_id'], 'role': g.user_role}
 
     try:
-        # Fetch the contribution to ensure it's pending
-        cursor.execute("SELECT is_paid FROM contributions WHERE id = %s", (contribution_id,))
-        contribution_status = cursor.fetchone()
-
-        if not contribution_status:
-            flash('Contribution not found.', 'danger')
-            return redirect(url_for('manage_contributions'))
-
-        if contribution_status[0]:  # is_paid is True
-            flash('This contribution has already been approved and cannot be rejected.', 'info')
-            return redirect(url_for('manage_contributions'))
+        # Operations already applied by an earlier (possibly interrupted) upload. Keys are unique per
+        # user across endpoints, so a key may also belong to a form submission still in progress.
+        replayed = {}
+        if keys:
+            placeholders = ', '.join(['%s'] * len(keys))
+            cursor.execute(f"""
+                SELECT idempotency_key, endpoint, response FROM idempotency_keys
+                WHERE user_id = %s AND idempotency_key IN ({placeholders})
+            """, (user['id'], *keys))
+            used_keys = cursor.fetchall()
+            if any(row['response'] == IDEMPOTENCY_PENDING for row in used_keys):
+                response, status = api_error('An operation key is still being processed. Retry shortly.', 409)
+                response.headers['Retry-After'] = '1'
+                return response, status
+            if any(row['endpoint'] != 'api_sync' for row in used_keys):
+                return api_error('An operation key was already used for a different request.', 422)
+            replayed = {row['idempotency_key']: dict(json.loads(row['response']), replayed=True)
+                        for row in used_keys}
+        new_operations = [op for op in operations if op['key'] not in replayed]
+
+        results = []
+        if new_operations:
+            results = apply_sync_operations(cursor, group_id, user, new_operations, since,
+                                            get_group_settings(conn, group_id))
+            cursor.executemany(
+                "INSERT INTO idempotency_keys (group_id, user_id, idempotency_key, endpoint, response) VALUES (%s, %s, %s, %s, %s)",
+                [(group_id, user['id'], result['key'], 'api_sync', json.dumps(result)) for result in results])
+            conn.commit()
 
-        # Mark as rejected (by setting president_utr_number to a specific string or adding a 'status' column)
-        # For simplicity, we'll just set president_id to mark who rejected, and keep is_paid=FALSE
-        cursor.execute(
-            "UPDATE contributions SET president_id = %s, president_utr_number = 'REJECTED' WHERE id = %s",
-            (session['user_id'], contribution_id)
-        )
-        conn.commit()
-        flash('Contribution rejected.', 'info')
+        results_by_key = {result['key']: result for result in results}
+        results_by_key.update(replayed)
 
+        # The new cursor is read before the changes, so nothing committed meanwhile is skipped next time
+        cursor.execute("SELECT NOW(6) AS server_time")
+        next_cursor = cursor.fetchone()['server_time']
+        changes = fetch_sync_changes(cursor, group_id, user, since)
+    except mysql.connector.IntegrityError:
+        # Another upload with the same keys committed first; retrying returns its results
+        conn.rollback()
+        return api_error('A sync with the same operations is in progress. Retry shortly.', 409)
     except mysql.connector.Error as err:
-        flash(f'An error occurred while rejecting contribution: {err}', 'danger')
         conn.rollback()
+        return api_error(f'An error occurred while applying operations: {err}', 500)
     finally:
         cursor.close()
         conn.close()
-    return redirect(url_for('manage_contributions'))
-
-
-@app.route('/delete_contribution/<int:contribution_id>', methods=['POST'])
-@login_required(roles=['president', 'secretary'])
-def delete_contribution(contribution_id):
-    """Allows President/Secretary to delete a pending contribution."""
-    conn = get_db_connection()
-    if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('manage_contributions'))
+    return jsonify({
+        'results': [results_by_key[key] for key in keys],
+        'changes': changes,
+        'cursor': next_cursor.isoformat(),
+    })
+
+# --- Monthly member statements ---
+# A PDF statement per member (contributions, loans and their payments, as on the profile page).
+# The whole group's data comes from four set-based queries; members are split into chunks of
+# STATEMENT_CHUNK_SIZE and rendered by a pool of STATEMENT_WORKERS processes, each writing its
+# PDFs straight to STATEMENT_OUTPUT_DIR/group-<id>/<YYYY-MM>/. The run keeps status.json there
+# up to date, so any app worker can report progress, and ends by writing manifest.json. Every
+# status write stamps updated_at; a run that stops updating (its worker was killed) turns stale.
+def statement_run_dir(group_id, year, month):
+    """Output directory of one group's statements for a month."""
+    return os.path.join(app.config['STATEMENT_OUTPUT_DIR'], f'group-{group_id}', f'{year}-{month:02d}')
+
+
+def _write_json_file(path, data):
+    """Writes JSON through a temporary file and a rename, so readers never see half a file."""
+    temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temporary_path, 'w', encoding='utf-8') as json_file:
+        json.dump(data, json_file, indent=2, default=api_value)
+    os.replace(temporary_path, path)
+
+
+def write_statement_status(status_path, status):
+    """Writes a run's status.json, stamped with the time of this update."""
+    status['updated_at'] = datetime.now()
+    _write_json_file(status_path, status)
+
+
+def read_statement_status(group_id, year, month):
+    """
+    The status.json of a statement run, or None if statements were never generated for that month.
+    A queued or running run not updated for STATEMENT_STALE_MINUTES is reported as failed.
+    """
+    try:
+        with open(os.path.join(statement_run_dir(group_id, year, month), 'status.json'), encoding='utf-8') as status_file:
+            status = json.load(status_file)
+    except FileNotFoundError:
+        return None
+    if status['state'] in ('queued', 'running'):
+        updated_at = datetime.fromisoformat(status['updated_at']) if status.get('updated_at') else None
+        if updated_at is None or datetime.now() - updated_at > timedelta(minutes=app.config['STATEMENT_STALE_MINUTES']):
+            status.update(state='failed', error='The run stopped without finishing.')
+    return status
 
-    cursor = conn.cursor(buffered=True)
 
-    try:
-        # Optional: Check if the contribution is indeed pending before deleting
-        cursor.execute("SELECT is_paid FROM contributions WHERE id = %s", (contribution_id,))
-        contribution_status = cursor.fetchone()
+def load_statement_data(conn, group_id, month, year):
+    """
+    Every member's statement data up to the end of the month, as plain picklable dicts. One query
+    each for members, contributions, loans and loan payments, grouped here in Python.
+    """
+    period_end = date(year + month // 12, month % 12 + 1, 1)  # First day of the following month
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("SELECT id, name, username, email, contact_number, role FROM users WHERE group_id = %s ORDER BY id",
+                   (group_id,))
+    statements = {member['id']: {'member': member, 'contributions': [], 'loans': []} for member in cursor.fetchall()}
 
-        if not contribution_status:
-            flash('Contribution not found.', 'danger')
-            return redirect(url_for('manage_contributions'))
+    cursor.execute("""
+        SELECT user_id, month, year, amount, fine_amount, is_paid, payment_date, utr_number, president_utr_number
+        FROM contributions
+        WHERE group_id = %s AND (year < %s OR (year = %s AND month <= %s))
+        ORDER BY user_id, year DESC, month DESC
+    """, (group_id, year, year, month))
+    for contribution in cursor.fetchall():
+        contribution['status'] = contribution_status(contribution)
+        statements[contribution['user_id']]['contributions'].append(contribution)
 
-        if contribution_status[0]:  # is_paid is True
-            flash('Approved contributions cannot be deleted.', 'danger')
-            return redirect(url_for('manage_contributions'))
+    cursor.execute("""
+        SELECT id, user_id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type
+        FROM loans
+        WHERE group_id = %s AND start_date < %s
+        ORDER BY user_id, start_date DESC
+    """, (group_id, period_end))
+    loans = {}
+    for loan in cursor.fetchall():
+        loan['payments'] = []
+        loans[loan['id']] = loan
+        statements[loan['user_id']]['loans'].append(loan)
 
-        cursor.execute("DELETE FROM contributions WHERE id = %s", (contribution_id,))
-        conn.commit()
-        flash('Contribution deleted successfully!', 'success')
+    cursor.execute("""
+        SELECT loan_id, amount_paid, interest_paid, payment_date
+        FROM loan_payments
+        WHERE group_id = %s AND payment_date < %s
+        ORDER BY loan_id, payment_date DESC
+    """, (group_id, period_end))
+    for payment in cursor.fetchall():
+        if payment['loan_id'] in loans:
+            loans[payment['loan_id']]['payments'].append(payment)
+    cursor.close()
 
-    except mysql.connector.Error as err:
-        flash(f'An error occurred while deleting contribution: {err}', 'danger')
-        conn.rollback()
-    finally:
+    for statement in statements.values():
+        statement['total_contributed'] = paise_to_decimal(sum(
+            to_paise(c['amount']) + to_paise(c['fine_amount']) for c in statement['contributions'] if c['is_paid']))
+        for loan in statement['loans']:
+            total_paid = sum(to_paise(p['amount_paid']) for p in loan['payments'])
+            interest_paid = sum(to_paise(p['interest_paid']) for p in loan['payments'])
+            outstanding_principal = to_paise(loan['amount']) - (total_paid - interest_paid)
+            loan['total_paid'] = paise_to_decimal(total_paid)
+            loan['interest_paid'] = paise_to_decimal(interest_paid)
+            loan['outstanding_principal'] = (paise_to_decimal(max(outstanding_principal, 0))
+                                             if loan['status'] in ('approved', 'overdue') else Decimal('0.00'))
+    return list(statements.values())
+
+
+def _statement_table(rows):
+    """A reportlab table styled like the report PDFs."""
+    table = Table(rows, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E0E0E0')),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+    ]))
+    return table
+
+
+def _statement_amount(amount):
+    """An amount as printed on statements. The built-in PDF fonts have no rupee sign glyph."""
+    return f"Rs. {amount or 0:.2f}"
+
+
+def render_statement_chunk(output_dir, group_name, period_label, statements):
+    """
+    Process pool worker: writes one PDF per statement into output_dir and returns their manifest
+    entries. A member whose PDF fails is reported as failed; the rest of the chunk continues.
+    """
+    styles = getSampleStyleSheet()
+    entries = []
+    for statement in statements:
+        member = statement['member']
+        filename = f"statement-{member['id']}.pdf"
+        entry = {'member_id': member['id'], 'name': member['name'], 'username': member['username']}
+        try:
+            elements = [
+                Paragraph(xml_escape(f"{group_name} - Statement for {period_label}"), styles['h1']),
+                Paragraph(xml_escape(f"{member['name']} ({member['username']}), {member['email']}, "
+                                     f"{member['contact_number']}"), styles['Normal']),
+                Spacer(1, 12),
+                Paragraph(f"Total contributed: {_statement_amount(statement['total_contributed'])}", styles['Normal']),
+                Spacer(1, 12),
+                Paragraph('Contributions', styles['h2']),
+            ]
+            if statement['contributions']:
+                elements.append(_statement_table(
+                    [['Month', 'Amount', 'Fine', 'Status', 'Payment Date', 'UTR']] +
+                    [[f"{c['month']:02d}/{c['year']}", _statement_amount(c['amount']),
+                      _statement_amount(c['fine_amount']),
+                      c['status'].replace('_', ' ').capitalize(),
+                      c['payment_date'].strftime('%Y-%m-%d') if c['payment_date'] else '', c['utr_number'] or '']
+                     for c in statement['contributions']]))
+            else:
+                elements.append(Paragraph('No contributions recorded.', styles['Normal']))
+
+            elements.append(Spacer(1, 12))
+            elements.append(Paragraph('Loans', styles['h2']))
+            if not statement['loans']:
+                elements.append(Paragraph('No loans.', styles['Normal']))
+            for loan in statement['loans']:
+                elements.append(Paragraph(
+                    f"Loan {loan['id']}: {_statement_amount(loan['amount'])} at {loan['interest_rate']:.2f}%, "
+                    f"started {loan['start_date']:%Y-%m-%d}, {loan['status']}. "
+                    f"Paid {_statement_amount(loan['total_paid'])} (interest {_statement_amount(loan['interest_paid'])}), "
+                    f"outstanding {_statement_amount(loan['outstanding_principal'])}.",
+                    styles['Normal']))
+                if loan['payments']:
+                    elements.append(_statement_table(
+                        [['Payment Date', 'Amount Paid', 'Interest Paid']] +
+                        [[p['payment_date'].strftime('%Y-%m-%d') if p['payment_date'] else '',
+                          _statement_amount(p['amount_paid']), _statement_amount(p['interest_paid'])]
+                         for p in loan['payments']]))
+                elements.append(Spacer(1, 8))
+
+            path = os.path.join(output_dir, filename)
+            SimpleDocTemplate(path, pagesize=letter).build(elements)
+            with open(path, 'rb') as pdf_file:
+                content = pdf_file.read()
+            entry.update(status='ok', file=filename, bytes=len(content), sha256=hashlib.sha256(content).hexdigest())
+        except Exception as err:
+            entry.update(status='failed', error=str(err))
+        entries.append(entry)
+    return entries
+
+
+def generate_member_statements(conn, group_id, month, year):
+    """
+    Generates every member's statement for a month and returns the manifest. Progress goes to
+    status.json after each finished chunk; a run that raises is recorded there as failed.
+    """
+    output_dir = statement_run_dir(group_id, year, month)
+    os.makedirs(output_dir, exist_ok=True)
+    status_path = os.path.join(output_dir, 'status.json')
+    status = {'group_id': group_id, 'year': year, 'month': month, 'state': 'running',
+              'started_at': datetime.now(), 'total': None, 'done': 0, 'failed': 0}
+    write_statement_status(status_path, status)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM savings_groups WHERE id = %s", (group_id,))
+        group_name = cursor.fetchone()[0]
         cursor.close()
-        conn.close()
-    return redirect(url_for('manage_contributions'))
+        statements = load_statement_data(conn, group_id, month, year)
+        status['total'] = len(statements)
+        write_statement_status(status_path, status)
+
+        period_label = date(year, month, 1).strftime('%B %Y')
+        chunk_size = app.config['STATEMENT_CHUNK_SIZE']
+        chunks = [statements[start:start + chunk_size] for start in range(0, len(statements), chunk_size)]
+        entries = []
+
+        def record_chunk(chunk_entries):
+            entries.extend(chunk_entries)
+            status['done'] += len(chunk_entries)
+            status['failed'] += sum(1 for entry in chunk_entries if entry['status'] != 'ok')
+            write_statement_status(status_path, status)
+
+        if app.config['STATEMENT_WORKERS'] <= 0:
+            for chunk in chunks:
+                record_chunk(render_statement_chunk(output_dir, group_name, period_label, chunk))
+        else:
+            with ProcessPoolExecutor(max_workers=app.config['STATEMENT_WORKERS']) as pool:
+                futures = [pool.submit(render_statement_chunk, output_dir, group_name, period_label, chunk)
+                           for chunk in chunks]
+                for future in as_completed(futures):
+                    record_chunk(future.result())
+
+        manifest = {'group_id': group_id, 'group_name': group_name, 'period': f'{year}-{month:02d}',
+                    'generated_at': datetime.now(), 'count': len(entries), 'failed': status['failed'],
+                    'statements': sorted(entries, key=lambda entry: entry['member_id'])}
+        _write_json_file(os.path.join(output_dir, 'manifest.json'), manifest)
+        status.update(state='finished', finished_at=datetime.now(), manifest='manifest.json')
+        write_statement_status(status_path, status)
+        return manifest
+    except Exception as err:
+        status.update(state='failed', finished_at=datetime.now(), error=str(err))
+        write_statement_status(status_path, status)
+        raise
+
+
+def claim_statement_run(group_id, year, month):
+    """
+    Records a new queued run for the month and returns its status, or None if a run is already
+    queued or running. The check and the write happen while holding run.lock, created with O_EXCL,
+    so two requests (in any app process) cannot both start a run.
+    """
+    output_dir = statement_run_dir(group_id, year, month)
+    os.makedirs(output_dir, exist_ok=True)
+    lock_path = os.path.join(output_dir, 'run.lock')
+    try:
+        lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Held only while a request starts a run; one left behind by a killed process is removed once stale
+        try:
+            if time.time() - os.path.getmtime(lock_path) > app.config['STATEMENT_STALE_MINUTES'] * 60:
+                os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+        return None
+    try:
+        status = read_statement_status(group_id, year, month)
+        if status and status['state'] in ('queued', 'running'):
+            return None
+        status = {'group_id': group_id, 'year': year, 'month': month, 'state': 'queued'}
+        write_statement_status(os.path.join(output_dir, 'status.json'), status)
+        return status
+    finally:
+        os.close(lock_fd)
+        os.remove(lock_path)
 
 
-# --- New Reports Feature ---
-@app.route('/reports', methods=['GET', 'POST'])
-@login_required(roles=['president', 'secretary'])
-def reports():
-    """Allows President/Secretary to generate and view various reports."""
+def _run_statement_job(group_id, month, year):
+    """Background thread body for a statement run started from the API."""
     conn = get_db_connection()
     if conn is None:
-        flash('Database connection error. Please try again later.', 'danger')
-        return redirect(url_for('dashboard'))
-    cursor = conn.cursor(dictionary=True, buffered=True)
+        write_statement_status(os.path.join(statement_run_dir(group_id, year, month), 'status.json'),
+                               {'group_id': group_id, 'year': year, 'month': month, 'state': 'failed',
+                                'error': 'Database connection error.'})
+        return
+    try:
+        generate_member_statements(conn, group_id, month, year)
+    except Exception as err:
+        print(f"Error generating statements for group {group_id}, {month:02d}/{year}: {err}")
+    finally:
+        conn.close()
 
-    report_type = request.form.get('report_type')
-    selected_month = request.form.get('month')
-    selected_year = request.form.get('year')
-    selected_member_id = request.form.get('member_id')
 
-    report_data = []
-    report_title = "Select a Report Type"
-    report_headers = []
+@app.route(API_PREFIX + '/statements/<int:year>/<int:month>', methods=['GET', 'POST'])
+@login_required(roles=['president', 'secretary'])
+def api_member_statements(year, month):
+    """
+    POST starts generating every member's statement for the month in the background (202);
+    GET returns the run's progress: state (queued, running, finished or failed), total, done and
+    failed. A run whose worker died is reported as failed and can be started again.
+    """
+    if not 1 <= month <= 12:
+        return api_error('Month must be between 1 and 12.', 400)
+    group_id = current_group_id()
 
-    # Fetch all members for the dropdown
-    cursor.execute("SELECT id, name FROM users WHERE role IN ('member', 'president', 'secretary', 'treasurer') ORDER BY id")
+    if request.method == 'POST':
+        if not PDF_AVAILABLE:
+            return api_error('PDF generation needs reportlab, which is not installed.', 501)
+        status = claim_statement_run(group_id, year, month)
+        if status is None:
+            return api_error('Statements for this month are already being generated.', 409)
+        threading.Thread(target=_run_statement_job, args=(group_id, month, year), daemon=True).start()
+        response = jsonify(status)
+        response.status_code = 202
+        response.headers['Location'] = url_for('api_member_statements', year=year, month=month)
+        return response
+
+    status = read_statement_status(group_id, year, month)
+    if status is None:
+        return api_error('No statements have been generated for this month.', 404)
+    return jsonify(status)
+
+
+# --- Cash-flow forecast ---
+# GET /api/v1/forecast?months=N projects the group's bank balance month by month, for deciding
+# on loan applications. load_forecast_inputs() reads everything in three set-based queries, with
+# amounts already in paise so the rows go straight into int64 arrays: the balance and settings,
+# every member's contribution record over the last FORECAST_HISTORY_MONTHS months, and every
+# active loan with its repayments so far. project_cash_flow() is then numpy arithmetic over all
+# members and loans at once:
+#   - contributions: default_contribution_amount x each member's share of months paid (members
+#     with no history count at the group's rate);
+#   - fines: default_fine_amount x each member's share of months with a fine paid;
+#   - loan principal: each loan repaid at its own pace so far (principal repaid per month since
+#     disbursement) until cleared; loans with no payments yet at the group's average pace;
+#   - loan interest: the month's interest on the principal still outstanding x the share of
+#     months in which the borrower made a payment.
+# Results are expectations, rounded to paise only at the end.
+def _month_index(year, month):
+    """Months since year 0, so that month arithmetic is integer arithmetic."""
+    return year * 12 + month - 1
+
+
+def load_forecast_inputs(conn, group_id, today=None):
+    """The balance, settings, member history and active loans of a group as Money and int64 arrays (None: no settings row)."""
+    today = today or date.today()
+    current_month = _month_index(today.year, today.month)
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT b.balance, b.default_contribution_amount, b.default_interest_rate, b.default_fine_amount,
+                   (SELECT COALESCE(SUM(l.amount), 0) FROM loans l
+                    WHERE l.group_id = b.group_id AND l.status = 'pending') AS pending_loans
+            FROM bank_balance b
+            WHERE b.group_id = %s
+        """, (group_id,))
+        settings_row = cursor.fetchone()
+        if settings_row is None:
+            return None
+
+        # Months billed, paid and paid with a fine per member; the current month is still open and is left out
+        cursor.execute("""
+            SELECT COUNT(c.id) AS months_billed, COUNT(CASE WHEN c.is_paid THEN 1 END) AS months_paid,
+                   COUNT(CASE WHEN c.is_paid AND c.fine_amount > 0 THEN 1 END) AS months_fined
+            FROM users u
+            LEFT JOIN contributions c ON c.user_id = u.id AND c.year * 12 + c.month - 1 BETWEEN %s AND %s
+            WHERE u.group_id = %s
+            GROUP BY u.id
+        """, (current_month - app.config['FORECAST_HISTORY_MONTHS'], current_month - 1, group_id))
+        member_history = numpy.array(cursor.fetchall(), dtype=numpy.int64).reshape(-1, 3)
 
-    all_members = cursor.fetchall()
+        # Per active loan, all in whole paise (the rate in hundredths of a percent)
+        cursor.execute("""
+            SELECT CAST(l.amount * 100 AS SIGNED) AS amount,
+                   CAST(l.interest_rate * 100 AS SIGNED) AS rate,
+                   YEAR(l.start_date) * 12 + MONTH(l.start_date) - 1 AS start_month,
+                   CAST(COALESCE(SUM(lp.amount_paid), 0) * 100 AS SIGNED)
+                       - CAST(COALESCE(SUM(lp.interest_paid), 0) * 100 AS SIGNED) AS principal_paid,
+                   COUNT(DISTINCT YEAR(lp.payment_date) * 12 + MONTH(lp.payment_date)) AS months_with_payment
+            FROM loans l
+            LEFT JOIN loan_payments lp ON lp.loan_id = l.id
+            WHERE l.group_id = %s AND l.status IN ('approved', 'overdue')
+            GROUP BY l.id, l.amount, l.interest_rate, l.start_date
+        """, (group_id,))
+        loans = numpy.array(cursor.fetchall(), dtype=numpy.int64).reshape(-1, 5)
+    finally:
+        cursor.close()
+    return {
+        'month_index': current_month,
+        'balance': Money.from_decimal(settings_row[0]),
+        'contribution_amount': Money.from_decimal(settings_row[1]),
+        'interest_rate': settings_row[2],
+        'fine_amount': Money.from_decimal(settings_row[3]),
+        'pending_loans': Money.from_decimal(settings_row[4]),
+        'member_history': member_history,
+        'loans': loans,
+    }
+
+
+def project_cash_flow(inputs, months, contribution_amount=None, fine_amount=None, interest_rate=None):
+    """
+    Expected contributions, fines, loan principal and loan interest for each of the next months,
+    and the balance at the end of each, as float arrays in paise. contribution_amount and
+    fine_amount (Money) override the group's defaults; interest_rate (Decimal percent) replaces
+    the rate of every active loan.
+    """
+    if contribution_amount is None:
+        contribution_amount = inputs['contribution_amount']
+    if fine_amount is None:
+        fine_amount = inputs['fine_amount']
+    months_billed, months_paid, months_fined = inputs['member_history'].T
+    billed_total = months_billed.sum()
+    group_paid_rate = months_paid.sum() / billed_total if billed_total else 1.0
+    group_fined_rate = months_fined.sum() / billed_total if billed_total else 0.0
+    has_billing = months_billed > 0
+    member_paid_rate = numpy.where(has_billing, months_paid / numpy.maximum(months_billed, 1), group_paid_rate)
+    member_fined_rate = numpy.where(has_billing, months_fined / numpy.maximum(months_billed, 1), group_fined_rate)
+    contributions = numpy.full(months, contribution_amount.paise * member_paid_rate.sum())
+    fines = numpy.full(months, fine_amount.paise * member_fined_rate.sum())
+
+    amount, rate, start_month, principal_paid, months_with_payment = inputs['loans'].T
+    if interest_rate is not None:
+        rate = numpy.full_like(rate, int(Decimal(interest_rate) * 100))
+    months_elapsed = numpy.maximum(inputs['month_index'] - start_month, 1)
+    outstanding = numpy.maximum(amount - principal_paid, 0)
+    has_history = months_with_payment > 0
+    pace = principal_paid / months_elapsed  # Principal repaid per month so far
+    payment_rate = numpy.minimum(months_with_payment / months_elapsed, 1.0)
+    if has_history.any():
+        group_pace = (pace[has_history] / amount[has_history]).mean()
+        group_payment_rate = payment_rate[has_history].mean()
+    else:
+        group_pace, group_payment_rate = 0.0, 1.0
+    pace = numpy.where(has_history, pace, group_pace * amount)
+    payment_rate = numpy.where(has_history, payment_rate, group_payment_rate)
 
-    # Fetch all years with data
-    cursor.execute(
-        "SELECT DISTINCT year FROM contributions UNION SELECT DISTINCT YEAR(start_date) FROM loans ORDER BY year DESC")
-    all_years = [row['year'] for row in cursor.fetchall()]
+    # remaining[loan, t]: principal still outstanding after t months
+    remaining = numpy.maximum(outstanding[:, None] - pace[:, None] * numpy.arange(months + 1), 0)
+    principal = (remaining[:, :-1] - remaining[:, 1:]).sum(axis=0)
+    interest = (rate * payment_rate) @ remaining[:, :-1] / 120000  # rate is in hundredths of a percent a year
+    balance = inputs['balance'].paise + numpy.cumsum(contributions + fines + principal + interest)
+    return {'contributions': contributions, 'fines': fines, 'loan_principal': principal, 'loan_interest': interest,
+            'balance': balance}
 
-    if request.method == 'POST':
-        if report_type == 'monthly_contributions':
-            if not selected_month or not selected_year:
-                flash('Please select both month and year for Monthly Contributions report.', 'danger')
-            else:
-                report_title = f"Monthly Contributions Report - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
-                report_headers = ["Member Name", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date",
-                                  "UTR (Member)", "UTR (President)"]
-                cursor.execute("""
-                    SELECT u.name as member_name, c.amount, c.fine_amount, (c.amount + c.fine_amount) as total_paid,
-                           c.is_paid, c.payment_date, c.utr_number, c.president_utr_number
-                    FROM contributions c
-                    JOIN users u ON c.user_id = u.id
-                    WHERE c.month = %s AND c.year = %s
-                    ORDER BY u.id
-                """, (selected_month, selected_year))
-                report_data = cursor.fetchall()
 
-        elif report_type == 'yearly_contributions':
-            if not selected_year:
-                flash('Please select a year for Yearly Contributions report.', 'danger')
-            else:
-                report_title = f"Yearly Contributions Report - {selected_year}"
-                report_headers = ["Member Name", "Total Contributions", "Total Fines", "Grand Total"]
-                cursor.execute("""
-                    SELECT u.name as member_name, SUM(c.amount) as total_amount, SUM(c.fine_amount) as total_fine_amount
-                    FROM contributions c
-                    JOIN users u ON c.user_id = u.id
-                    WHERE c.year = %s AND c.is_paid = TRUE
-                    GROUP BY u.id, u.name
-                    ORDER BY u.id
-                """, (selected_year,))
-                report_data = cursor.fetchall()
-                # Add a 'grand_total' field for display
-                for row in report_data:
-                    row['grand_total'] = (row['total_amount'] + row['total_fine_amount']).quantize(Decimal('0.01'),
-                                                                                                   rounding=ROUND_HALF_UP)
+def _paise_array_to_decimals(values):
+    """Expected amounts in paise (a float array) as two-place Decimals."""
+    return [Money(paise).to_decimal() for paise in numpy.rint(values).astype(numpy.int64).tolist()]
 
-        elif report_type == 'monthly_loan_interest':
-            if not selected_month or not selected_year:
-                flash('Please select both month and year for Monthly Loan Interest report.', 'danger')
-            else:
-                report_title = f"Monthly Loan Interest Collected - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
-                report_headers = ["Borrower Name", "Loan Amount", "Interest Rate", "Interest Paid This Month",
-                                  "Payment Date"]
-                cursor.execute("""
-                    SELECT u.name as borrower_name, l.amount as loan_amount, l.interest_rate, lp.interest_paid, lp.payment_date
-                    FROM loan_payments lp
-                    JOIN loans l ON lp.loan_id = l.id
-                    JOIN users u ON l.user_id = u.id
-                    WHERE MONTH(lp.payment_date) = %s AND YEAR(lp.payment_date) = %s
-                    ORDER BY u.id, lp.payment_date
-                """, (selected_month, selected_year))
-                report_data = cursor.fetchall()
 
-        elif report_type == 'yearly_loan_interest':
-            if not selected_year:
-                flash('Please select a year for Yearly Loan Interest report.', 'danger')
-            else:
-                report_title = f"Yearly Loan Interest Collected - {selected_year}"
-                report_headers = ["Borrower Name", "Total Interest Paid in Year"]
-                cursor.execute("""
-                    SELECT u.name as borrower_name, SUM(lp.interest_paid) as total_interest_paid_yearly
-                    FROM loan_payments lp
-                    JOIN loans l ON lp.loan_id = l.id
-                    JOIN users u ON l.user_id = u.id
-                    WHERE YEAR(lp.payment_date) = %s
-                    GROUP BY u.id, u.name
-                    ORDER BY u.id
-                """, (selected_year,))
-                report_data = cursor.fetchall()
+def _month_rows(first_month, columns):
+    """One {'year', 'month', column: amount...} dict per month for the API, amounts as decimal strings."""
+    columns = {name: _paise_array_to_decimals(values) for name, values in columns.items()}
+    rows = []
+    for offset in range(len(next(iter(columns.values())))):
+        year, month_number = divmod(first_month + offset, 12)
+        rows.append(dict({'year': year, 'month': month_number + 1},
+                         **{name: api_value(values[offset]) for name, values in columns.items()}))
+    return rows
 
-        elif report_type == 'member_contributions':
-            if not selected_member_id:
-                flash('Please select a member for Member Contributions report.', 'danger')
-            else:
-                cursor.execute("SELECT name FROM users WHERE id = %s", (selected_member_id,))
-                member_name = cursor.fetchone()['name']
-                report_title = f"Contributions History for {member_name}"
-                report_headers = ["Month", "Year", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date"]
-                cursor.execute("""
-                    SELECT month, year, amount, fine_amount, (amount + fine_amount) as total_paid, is_paid, payment_date
-                    FROM contributions
-                    WHERE user_id = %s
-                    ORDER BY year DESC, month DESC
-                """, (selected_member_id,))
-                report_data = cursor.fetchall()
-                # Format month name for display
-                for row in report_data:
-                    row['month_name'] = datetime.strptime(str(row['month']), '%m').strftime('%B')
 
-        elif report_type == 'member_loans':
-            if not selected_member_id:
-                flash('Please select a member for Member Loans report.', 'danger')
-            else:
-                cursor.execute("SELECT name FROM users WHERE id = %s", (selected_member_id,))
-                member_name = cursor.fetchone()['name']
-                report_title = f"Loan History for {member_name}"
-                report_headers = ["Loan ID", "Amount", "Interest Rate", "Start Date", "Actual End Date", "Status",
-                                  "Disbursement Type"]
-                cursor.execute("""
-                    SELECT id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type, disbursement_details
-                    FROM loans
-                    WHERE user_id = %s
-                    ORDER BY start_date DESC
-                """, (selected_member_id,))
-                report_data = cursor.fetchall()
-                # Parse disbursement_details for display
-                for row in report_data:
-                    if row['disbursement_details']:
-                        row['disbursement_details_parsed'] = json.loads(row['disbursement_details'])
-                    else:
-                        row['disbursement_details_parsed'] = {}
+@app.route(API_PREFIX + '/forecast')
+@login_required(roles=['president', 'secretary'])
+def api_cash_flow_forecast():
+    """The group's projected bank balance for each of the next ?months= months (default FORECAST_DEFAULT_MONTHS)."""
+    if not NUMPY_AVAILABLE:
+        return api_error('Forecasting is not available: numpy is not installed.', 501)
+    months = request.args.get('months', app.config['FORECAST_DEFAULT_MONTHS'], type=int)
+    if not 1 <= months <= app.config['FORECAST_MAX_MONTHS']:
+        return api_error(f"months must be between 1 and {app.config['FORECAST_MAX_MONTHS']}.", 400)
+    group_id = current_group_id()
+    today = date.today()
+
+    forecast_key = f"forecast:{group_id}:{today.isoformat()}:{months}"
+    forecast, forecast_version = cache_backend.get_versioned(f"group:{group_id}", forecast_key)
+    if forecast is None:
+        conn = get_db_connection()
+        if conn is None:
+            return api_error('Database connection error.', 503)
+        try:
+            inputs = load_forecast_inputs(conn, group_id, today)
+        except mysql.connector.Error as err:
+            return api_error(f'Error loading forecast data: {err}', 500)
+        finally:
+            conn.close()
+        if inputs is None:
+            return api_error('Group settings not found.', 404)
+
+        forecast = {
+            'as_of': today.isoformat(),
+            'starting_balance': api_value(inputs['balance']),
+            'pending_loans_total': api_value(inputs['pending_loans']),
+            'members': len(inputs['member_history']),
+            'active_loans': len(inputs['loans']),
+            'projection': _month_rows(inputs['month_index'] + 1, project_cash_flow(inputs, months)),
+        }
+        cache_backend.set_versioned(f"group:{group_id}", forecast_key, forecast, forecast_version,
+                                    app.config['REPORT_CACHE_TTL'])
+    return jsonify(forecast)
+
+
+# --- Settings simulator ---
+# GET /api/v1/simulate?default_interest_rate=&default_fine_amount=&default_contribution_amount=
+# shows what proposed settings (any left out keep their current value) would have done and would
+# do, before manage_settings() changes them:
+#   - history: the last FORECAST_HISTORY_MONTHS months replayed with the proposed settings. Every
+#     paid contribution at the proposed amount, every paid fine at the proposed fine, and all
+#     interest collected rescaled from its loan's rate to the proposed rate, next to what was
+#     actually collected, with the running difference this makes to the balance;
+#   - projection: project_cash_flow() over the active loan book with the current settings and
+#     with the proposed ones (the proposed rate applied to every active loan).
+# Both are numpy arithmetic over per-month aggregates (numpy.bincount). The database inputs are
+# cached per group for the day until the next write, and results per settings tuple, so trying
+# one value after another never goes back to MySQL.
+def load_settings_history(conn, group_id, month_index):
+    """
+    Paid contributions and fines per month, and interest collected per month and loan rate, over
+    the FORECAST_HISTORY_MONTHS months before month_index, as int64 arrays in paise.
+    """
+    first_month = month_index - app.config['FORECAST_HISTORY_MONTHS']
+    first_day = date(first_month // 12, first_month % 12 + 1, 1)
+    last_day = date(month_index // 12, month_index % 12 + 1, 1)
+    cursor = conn.cursor(buffered=True)
+    try:
+        cursor.execute("""
+            SELECT year * 12 + month - 1 AS month_index,
+                   COUNT(CASE WHEN is_paid THEN 1 END) AS paid_count,
+                   CAST(COALESCE(SUM(CASE WHEN is_paid THEN amount END), 0) * 100 AS SIGNED) AS paid_amount,
+                   COUNT(CASE WHEN is_paid AND fine_amount > 0 THEN 1 END) AS fined_count,
+                   CAST(COALESCE(SUM(CASE WHEN is_paid THEN fine_amount END), 0) * 100 AS SIGNED) AS fines
+            FROM contributions
+            WHERE group_id = %s AND year * 12 + month - 1 >= %s AND year * 12 + month - 1 < %s
+            GROUP BY year, month
+        """, (group_id, first_month, month_index))
+        contributions = numpy.array(cursor.fetchall(), dtype=numpy.int64).reshape(-1, 5)
 
-        elif report_type == 'all_members_summary':
-            report_title = "All Members Summary"
-            report_headers = ["Member Name", "Total Contributions", "Total Loans Taken", "Active Loans Count"]
-            cursor.execute("""
-                SELECT u.id, u.name,
-                       SUM(CASE WHEN c.is_paid = TRUE THEN c.amount + c.fine_amount ELSE 0 END) as total_contributions,
-                       SUM(CASE WHEN l.status IN ('approved', 'overdue', 'completed') THEN l.amount ELSE 0 END) as total_loans_taken,
-                       COUNT(DISTINCT CASE WHEN l.status IN ('approved', 'overdue') THEN l.id ELSE NULL END) as active_loans_count
-                FROM users u
-                LEFT JOIN contributions c ON u.id = c.user_id
-                LEFT JOIN loans l ON u.id = l.user_id
-                WHERE u.role = 'member'
-                GROUP BY u.id, u.name
-                ORDER BY u.id
-            """)
-            report_data = cursor.fetchall()
+        cursor.execute("""
+            SELECT YEAR(lp.payment_date) * 12 + MONTH(lp.payment_date) - 1 AS month_index,
+                   CAST(l.interest_rate * 100 AS SIGNED) AS rate,
+                   CAST(COALESCE(SUM(lp.interest_paid), 0) * 100 AS SIGNED) AS interest
+            FROM loan_payments lp
+            JOIN loans l ON l.id = lp.loan_id
+            WHERE lp.group_id = %s AND lp.payment_date >= %s AND lp.payment_date < %s
+            GROUP BY month_index, l.interest_rate
+        """, (group_id, first_day, last_day))
+        interest = numpy.array(cursor.fetchall(), dtype=numpy.int64).reshape(-1, 3)
+    finally:
+        cursor.close()
+    return {'first_month': first_month, 'contributions': contributions, 'interest': interest}
 
-    cursor.close()
-    conn.close()
 
-    return render_template('reports.html',
-                           all_members=all_members,
-                           all_years=all_years,
-                           report_type=report_type,
-                           selected_month=selected_month,
-                           selected_year=selected_year,
-                           selected_member_id=selected_member_id,
-                           report_data=report_data,
-                           report_title=report_title,
-                           report_headers=report_headers,
-                           excel_available=EXCEL_AVAILABLE,  # Pass availability to template
-                           pdf_available=PDF_AVAILABLE)  # Pass availability to template
+def replay_settings_history(history, contribution_amount, fine_amount, interest_rate):
+    """
+    Actual and simulated contributions, fines and interest per month of history (float arrays in
+    paise), and the running difference the simulated settings make to the balance.
+    """
+    month_count = app.config['FORECAST_HISTORY_MONTHS']
+    contribution_month = history['contributions'][:, 0] - history['first_month']
+    paid_count, paid_amount, fined_count, fines = history['contributions'][:, 1:].T
+    interest_month = history['interest'][:, 0] - history['first_month']
+    loan_rate, interest = history['interest'][:, 1:].T
+
+    def per_month(month_offsets, values):
+        return numpy.bincount(month_offsets, weights=values, minlength=month_count)[:month_count]
+
+    proposed_rate = float(Decimal(interest_rate) * 100)
+    rescaled_interest = numpy.where(loan_rate > 0, interest * proposed_rate / numpy.maximum(loan_rate, 1), 0.0)
+    replay = {
+        'actual_contributions': per_month(contribution_month, paid_amount),
+        'simulated_contributions': per_month(contribution_month, paid_count * contribution_amount.paise),
+        'actual_fines': per_month(contribution_month, fines),
+        'simulated_fines': per_month(contribution_month, fined_count * fine_amount.paise),
+        'actual_interest': per_month(interest_month, interest),
+        'simulated_interest': per_month(interest_month, rescaled_interest),
+    }
+    replay['balance_difference'] = numpy.cumsum(
+        (replay['simulated_contributions'] - replay['actual_contributions'])
+        + (replay['simulated_fines'] - replay['actual_fines'])
+        + (replay['simulated_interest'] - replay['actual_interest']))
+    return replay
+
+
+def _parse_proposed_setting(name, current, minimum, maximum=None, minimum_inclusive=True):
+    """A proposed setting from the query string as a Decimal (current if absent); ValueError if invalid."""
+    value = request.args.get(name)
+    if value is None or value == '':
+        return current
+    try:
+        proposed = Decimal(value)
+    except ArithmeticError:
+        raise ValueError(f'{name} must be a number.') from None
+    if not proposed.is_finite() or proposed < minimum or (proposed == minimum and not minimum_inclusive) or (
+            maximum is not None and proposed > maximum):
+        raise ValueError(f'{name} is out of range.')
+    return proposed.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
 
 
-# --- Conceptual Export Routes (for demonstration, actual file generation may not work in sandbox) ---
-@app.route('/export_report/<report_format>', methods=['POST'])
+@app.route(API_PREFIX + '/simulate')
 @login_required(roles=['president', 'secretary'])
-def export_report(report_format):
+def api_settings_simulation():
+    """Replays proposed default interest rate, fine and contribution amount over the group's history and loan book."""
+    if not NUMPY_AVAILABLE:
+        return api_error('Simulation is not available: numpy is not installed.', 501)
+    months = request.args.get('months', app.config['FORECAST_DEFAULT_MONTHS'], type=int)
+    if not 1 <= months <= app.config['FORECAST_MAX_MONTHS']:
+        return api_error(f"months must be between 1 and {app.config['FORECAST_MAX_MONTHS']}.", 400)
+    group_id = current_group_id()
+    today = date.today()
+
+    inputs_key = f"simulation-inputs:{group_id}:{today.isoformat()}"
+    cached_inputs, inputs_version = cache_backend.get_versioned(f"group:{group_id}", inputs_key)
+    if cached_inputs is None:
+        conn = get_db_connection()
+        if conn is None:
+            return api_error('Database connection error.', 503)
+        try:
+            inputs = load_forecast_inputs(conn, group_id, today)
+            history = load_settings_history(conn, group_id, inputs['month_index']) if inputs else None
+        except mysql.connector.Error as err:
+            return api_error(f'Error loading simulation data: {err}', 500)
+        finally:
+            conn.close()
+        if inputs is None:
+            return api_error('Group settings not found.', 404)
+        cache_backend.set_versioned(f"group:{group_id}", inputs_key, (inputs, history), inputs_version,
+                                    app.config['REPORT_CACHE_TTL'])
+    else:
+        inputs, history = cached_inputs
+
+    current = {
+        'default_interest_rate': inputs['interest_rate'] or Decimal('0.00'),
+        'default_fine_amount': inputs['fine_amount'].to_decimal(),
+        'default_contribution_amount': inputs['contribution_amount'].to_decimal(),
+    }
+    try:
+        proposed = {
+            'default_interest_rate': _parse_proposed_setting(
+                'default_interest_rate', current['default_interest_rate'], Decimal('0'), Decimal('100')),
+            'default_fine_amount': _parse_proposed_setting(
+                'default_fine_amount', current['default_fine_amount'], Decimal('0')),
+            'default_contribution_amount': _parse_proposed_setting(
+                'default_contribution_amount', current['default_contribution_amount'], Decimal('0'),
+                minimum_inclusive=False),
+        }
+    except ValueError as err:
+        return api_error(str(err), 400)
+
+    # Results depend only on the inputs (same cache version) and the settings tuple
+    simulation_key = (f"simulation:{group_id}:{today.isoformat()}:{months}:{proposed['default_interest_rate']}:"
+                      f"{proposed['default_fine_amount']}:{proposed['default_contribution_amount']}")
+    simulation, simulation_version = cache_backend.get_versioned(f"group:{group_id}", simulation_key)
+    if simulation is None:
+        contribution_amount = Money.from_decimal(proposed['default_contribution_amount'])
+        fine_amount = Money.from_decimal(proposed['default_fine_amount'])
+        replay = replay_settings_history(history, contribution_amount, fine_amount, proposed['default_interest_rate'])
+        baseline = project_cash_flow(inputs, months)
+        projection = project_cash_flow(inputs, months, contribution_amount, fine_amount,
+                                       proposed['default_interest_rate'])
+        simulation = {
+            'as_of': today.isoformat(),
+            'current_settings': {name: api_value(value) for name, value in current.items()},
+            'proposed_settings': {name: api_value(value) for name, value in proposed.items()},
+            'history_totals': {name: api_value(Money(int(numpy.rint(values.sum()))).to_decimal())
+                               for name, values in replay.items() if name != 'balance_difference'},
+            'history': _month_rows(history['first_month'], replay),
+            'projection': _month_rows(inputs['month_index'] + 1, {
+                'contributions': projection['contributions'],
+                'fines': projection['fines'],
+                'loan_interest': projection['loan_interest'],
+                'balance': projection['balance'],
+                'current_settings_loan_interest': baseline['loan_interest'],
+                'current_settings_balance': baseline['balance'],
+            }),
+        }
+        cache_backend.set_versioned(f"group:{group_id}", simulation_key, simulation, simulation_version,
+                                    app.config['REPORT_CACHE_TTL'])
+    return jsonify(simulation)
+
+
+# --- Scheduled Jobs (run with: flask --app app <command>, e.g. from cron) ---
+def mark_overdue_loans(conn, grace_days, batch_size, today=None):
     """
-    Conceptual route for exporting reports.
-    Actual file generation and download might not work directly in all sandbox environments.
+    Flips approved loans to 'overdue' when they have had no payment since the cutoff date
+    (today - grace_days) and were started before it. The candidates are found with one
+    set-based query per chunk (idx_loans_status_start and idx_loan_payments_loan_date).
+    Each chunk is updated and committed in its own short transaction.
+    Returns the number of loans marked overdue.
     """
-    report_type = request.form.get('report_type')
-    selected_month = request.form.get('month')
-    selected_year = request.form.get('year')
-    selected_member_id = request.form.get('member_id')
+    cutoff_date = (today or date.today()) - timedelta(days=grace_days)
+    cursor = conn.cursor(buffered=True)
+    marked_count = 0
+    last_loan_id = 0
+    try:
+        while True:
+            cursor.execute("""
+                SELECT l.id, l.group_id
+                FROM loans l
+                WHERE l.status = 'approved' AND l.start_date < %s AND l.id > %s
+                  AND NOT EXISTS (
+                      SELECT 1 FROM loan_payments lp
+                      WHERE lp.loan_id = l.id AND lp.payment_date >= %s
+                  )
+                ORDER BY l.id
+                LIMIT %s
+            """, (cutoff_date, last_loan_id, cutoff_date, batch_size))
+            candidates = cursor.fetchall()
+            if not candidates:
+                break
+            loan_ids = [row[0] for row in candidates]
+
+            placeholders = ', '.join(['%s'] * len(loan_ids))
+            # status = 'approved' is re-checked so a loan paid or closed meanwhile is left alone
+            cursor.execute(
+                f"UPDATE loans SET status = 'overdue' WHERE status = 'approved' AND id IN ({placeholders})",
+                tuple(loan_ids))
+            marked_count += cursor.rowcount
+            cursor.execute(
+                f"UPDATE users SET data_version = data_version + 1 WHERE id IN (SELECT user_id FROM loans WHERE id IN ({placeholders}))",
+                tuple(loan_ids))
+            conn.commit()
+            for group_id in {row[1] for row in candidates}:
+                invalidate_group_cache(group_id)
+            last_loan_id = loan_ids[-1]
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return marked_count
 
+
+@app.cli.command('mark-overdue-loans')
+@click.option('--grace-days', default=None, type=int, help='Override OVERDUE_GRACE_DAYS for this run.')
+def mark_overdue_loans_command(grace_days):
+    """Marks approved loans with no recent payment as overdue (schedule daily)."""
     conn = get_db_connection()
     if conn is None:
-        flash('Database connection error. Cannot generate report.', 'danger')
-        return redirect(url_for('reports'))
-    cursor = conn.cursor(dictionary=True, buffered=True)
-
-    report_data = []
-    report_title = "Report"
-    report_headers = []
-
-    # Re-fetch data based on report type, similar to the /reports GET/POST logic
-    if report_type == 'monthly_contributions':
-        report_title = f"Monthly Contributions - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
-        report_headers = ["Member Name", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date",
-                          "UTR (Member)", "UTR (President)"]
-        cursor.execute("""
-            SELECT u.name as member_name, c.amount, c.fine_amount, (c.amount + c.fine_amount) as total_paid,
-                   c.is_paid, c.payment_date, c.utr_number, c.president_utr_number
-            FROM contributions c
-            JOIN users u ON c.user_id = u.id
-            WHERE c.month = %s AND c.year = %s
-            ORDER BY u.id
-        """, (selected_month, selected_year))
-        report_data = cursor.fetchall()
-        # Convert Decimal and datetime objects to string for export
-        for row in report_data:
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)  # Convert Decimal to float for export
-                elif isinstance(value, datetime):
-                    row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, date):
-                    row[key] = value.strftime('%Y-%m-%d')
-            row['is_paid'] = 'Paid' if row['is_paid'] else 'Pending'
+        print("Could not connect to database to check for overdue loans.")
+        return
+    try:
+        marked_count = mark_overdue_loans(
+            conn,
+            grace_days if grace_days is not None else app.config['OVERDUE_GRACE_DAYS'],
+            app.config['OVERDUE_BATCH_SIZE'])
+        print(f"Marked {marked_count} loan(s) as overdue.")
+    except mysql.connector.Error as err:
+        print(f"Error marking overdue loans: {err}")
+    finally:
+        conn.close()
 
 
-    elif report_type == 'yearly_contributions':
-        report_title = f"Yearly Contributions - {selected_year}"
-        report_headers = ["Member Name", "Total Contributions", "Total Fines", "Grand Total"]
+def run_monthly_close(conn, group_id, month, year, today=None):
+    """
+    Month-start / month-end batch for one group's contribution period. Safe to re-run (e.g. daily):
+      1. creates a pending contribution row for every member in one INSERT ... SELECT
+         (rows that already exist, paid or submitted, are left alone);
+      2. once payment_end_day has passed, applies default_fine_amount to rows still not submitted;
+      3. stores each active loan's interest due for the month in loan_interest_dues, so the
+         contributions page reads it instead of recomputing it per view.
+    Everything is committed in one transaction. Returns a dict of counts.
+    """
+    today = today or date.today()
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    try:
+        cursor.execute(
+            "SELECT default_contribution_amount, payment_end_day, default_fine_amount FROM bank_balance WHERE group_id = %s",
+            (group_id,))
+        settings = cursor.fetchone() or {}
+        contribution_amount = Money.from_decimal(settings.get('default_contribution_amount'))
+        fine_amount = Money.from_decimal(settings.get('default_fine_amount'))
+        payment_end_day = settings.get('payment_end_day') or 7
+
+        # 1. Pending contribution rows (utr_number stays NULL until the member submits payment)
         cursor.execute("""
-            SELECT u.name as member_name, SUM(c.amount) as total_amount, SUM(c.fine_amount) as total_fine_amount
-            FROM contributions c
-            JOIN users u ON c.user_id = u.id
-            WHERE c.year = %s AND c.is_paid = TRUE
-            GROUP BY u.id, u.name
-            ORDER BY u.id
-        """, (selected_year,))
-        report_data = cursor.fetchall()
-        for row in report_data:
-            row['grand_total'] = (row['total_amount'] + row['total_fine_amount']).quantize(Decimal('0.01'),
-                                                                                           rounding=ROUND_HALF_UP)
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)
+            INSERT INTO contributions (group_id, user_id, amount, month, year, is_paid, fine_amount)
+            SELECT u.group_id, u.id, %s, %s, %s, FALSE, 0.00 FROM users u WHERE u.group_id = %s
+            ON DUPLICATE KEY UPDATE id = id
+        """, (contribution_amount.to_decimal(), month, year, group_id))
+        contributions_created = cursor.rowcount
+
+        # 2. Fines for rows still not submitted after the payment window
+        fines_applied = 0
+        payment_window_over = (year, month) < (today.year, today.month) or (
+                (year, month) == (today.year, today.month) and today.day > payment_end_day)
+        if payment_window_over and fine_amount > 0:
+            cursor.execute("""
+                UPDATE contributions SET fine_amount = %s
+                WHERE group_id = %s AND year = %s AND month = %s AND is_paid = FALSE AND utr_number IS NULL
+                  AND fine_amount = 0
+            """, (fine_amount.to_decimal(), group_id, year, month))
+            fines_applied = cursor.rowcount
 
-    elif report_type == 'monthly_loan_interest':
-        report_title = f"Monthly Loan Interest Collected - {datetime.strptime(selected_month, '%m').strftime('%B')} {selected_year}"
-        report_headers = ["Borrower Name", "Loan Amount", "Interest Rate", "Interest Paid This Month", "Payment Date"]
+        # 3. Interest due on every active loan, from one grouped query over the payments
         cursor.execute("""
-            SELECT u.name as borrower_name, l.amount as loan_amount, l.interest_rate, lp.interest_paid, lp.payment_date
-            FROM loan_payments lp
-            JOIN loans l ON lp.loan_id = l.id
-            JOIN users u ON l.user_id = u.id
-            WHERE MONTH(lp.payment_date) = %s AND YEAR(lp.payment_date) = %s
-            ORDER BY u.id, lp.payment_date
-        """, (selected_month, selected_year))
-        report_data = cursor.fetchall()
-        for row in report_data:
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)
-                elif isinstance(value, datetime):
-                    row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, date):
-                    row[key] = value.strftime('%Y-%m-%d')
+            SELECT l.id, l.user_id, l.amount, l.interest_rate,
+                   SUM(lp.amount_paid) AS total_paid, SUM(lp.interest_paid) AS total_interest_paid
+            FROM loans l
+            LEFT JOIN loan_payments lp ON lp.loan_id = l.id
+            WHERE l.group_id = %s AND l.status IN ('approved', 'overdue')
+            GROUP BY l.id, l.user_id, l.amount, l.interest_rate
+        """, (group_id,))
+        due_rows = []
+        for loan in cursor.fetchall():
+            outstanding_principal = to_paise(loan['amount']) - (
+                    to_paise(loan['total_paid']) - to_paise(loan['total_interest_paid']))
+            if outstanding_principal > 0:
+                interest_due = interest_paise(outstanding_principal, loan['interest_rate'])
+            else:
+                outstanding_principal = interest_due = 0
+            due_rows.append((group_id, loan['id'], loan['user_id'], month, year,
+                             paise_to_decimal(outstanding_principal), paise_to_decimal(interest_due)))
+        if due_rows:
+            cursor.executemany("""
+                INSERT INTO loan_interest_dues (group_id, loan_id, user_id, month, year, outstanding_principal, interest_due)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE outstanding_principal = VALUES(outstanding_principal),
+                                        interest_due = VALUES(interest_due), computed_at = CURRENT_TIMESTAMP
+            """, due_rows)
+
+        bump_group_data_version(cursor, group_id)
+        conn.commit()
+        invalidate_group_cache(group_id)
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return {'contributions_created': contributions_created, 'fines_applied': fines_applied,
+            'loan_dues_stored': len(due_rows)}
+
+
+@app.cli.command('close-month')
+@click.option('--month', default=None, type=click.IntRange(1, 12), help='Contribution month (default: current).')
+@click.option('--year', default=None, type=int, help='Contribution year (default: current).')
+@click.option('--group', 'group_id', default=None, type=int, help='Only close this group (default: all groups).')
+def close_month_command(month, year, group_id):
+    """Creates pending contributions, applies fines and stores loan interest dues (schedule daily)."""
+    today = date.today()
+    month = month or today.month
+    year = year or today.year
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to database to run the monthly close.")
+        return
+    try:
+        if group_id is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM savings_groups ORDER BY id")
+            group_ids = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+        else:
+            group_ids = [group_id]
+        # Each group is its own transaction, so one failing group does not hold back the rest
+        for group_id in group_ids:
+            try:
+                result = run_monthly_close(conn, group_id, month, year, today)
+                print(f"Monthly close for group {group_id}, {month:02d}/{year}: "
+                      f"{result['contributions_created']} contribution(s) created, "
+                      f"{result['fines_applied']} fine(s) applied, {result['loan_dues_stored']} loan due(s) stored.")
+            except mysql.connector.Error as err:
+                print(f"Error running monthly close for group {group_id}: {err}")
+    except mysql.connector.Error as err:
+        print(f"Error listing groups for monthly close: {err}")
+    finally:
+        conn.close()
 
-    elif report_type == 'yearly_loan_interest':
-        report_title = f"Yearly Loan Interest Collected - {selected_year}"
-        report_headers = ["Borrower Name", "Total Interest Paid in Year"]
-        cursor.execute("""
-            SELECT u.name as borrower_name, SUM(lp.interest_paid) as total_interest_paid_yearly
-            FROM loan_payments lp
-            JOIN loans l ON lp.loan_id = l.id
-            JOIN users u ON l.user_id = u.id
-            WHERE YEAR(lp.payment_date) = %s
-            GROUP BY u.id, u.name
-            ORDER BY u.id
-        """, (selected_year,))
-        report_data = cursor.fetchall()
-        for row in report_data:
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)
 
-    elif report_type == 'member_contributions':
-        cursor.execute("SELECT name FROM users WHERE id = %s", (selected_member_id,))
-        member_name = cursor.fetchone()['name']
-        report_title = f"Contributions History for {member_name}"
-        report_headers = ["Month", "Year", "Amount", "Fine Amount", "Total Paid", "Status", "Payment Date"]
-        cursor.execute("""
-            SELECT month, year, amount, fine_amount, (amount + fine_amount) as total_paid, is_paid, payment_date
-            FROM contributions
-            WHERE user_id = %s
-            ORDER BY year DESC, month DESC
-        """, (selected_member_id,))
-        report_data = cursor.fetchall()
-        for row in report_data:
-            row['month_name'] = datetime.strptime(str(row['month']), '%m').strftime('%B')
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)
-                elif isinstance(value, datetime):
-                    row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, date):
-                    row[key] = value.strftime('%Y-%m-%d')
-            row['is_paid'] = 'Paid' if row['is_paid'] else 'Pending'
+@app.cli.command('generate-statements')
+@click.option('--month', default=None, type=click.IntRange(1, 12), help='Statement month (default: previous).')
+@click.option('--year', default=None, type=int, help='Statement year (default: that of the previous month).')
+@click.option('--group', 'group_id', default=None, type=int, help='Only this group (default: all groups).')
+def generate_statements_command(month, year, group_id):
+    """Writes a PDF statement for every member, with a manifest (schedule monthly)."""
+    if not PDF_AVAILABLE:
+        print("reportlab is not installed; cannot generate statements.")
+        return
+    previous_month = date.today().replace(day=1) - timedelta(days=1)
+    month = month or previous_month.month
+    year = year or previous_month.year
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to database to generate statements.")
+        return
+    try:
+        if group_id is None:
+            cursor = conn.cursor()
+            cursor.execute("SELECT id FROM savings_groups ORDER BY id")
+            group_ids = [row[0] for row in cursor.fetchall()]
+            cursor.close()
+        else:
+            group_ids = [group_id]
+        for group_id in group_ids:
+            started = time.perf_counter()
+            try:
+                manifest = generate_member_statements(conn, group_id, month, year)
+                print(f"Statements for group {group_id}, {month:02d}/{year}: {manifest['count']} written "
+                      f"({manifest['failed']} failed) in {time.perf_counter() - started:.1f}s to "
+                      f"{statement_run_dir(group_id, year, month)}")
+            except (mysql.connector.Error, OSError) as err:
+                print(f"Error generating statements for group {group_id}: {err}")
+    except mysql.connector.Error as err:
+        print(f"Error listing groups for statements: {err}")
+    finally:
+        conn.close()
 
 
-    elif report_type == 'member_loans':
-        cursor.execute("SELECT name FROM users WHERE id = %s", (selected_member_id,))
-        member_name = cursor.fetchone()['name']
-        report_title = f"Loan History for {member_name}"
-        report_headers = ["Loan ID", "Amount", "Interest Rate", "Start Date", "Actual End Date", "Status",
-                          "Disbursement Type", "Disbursement Details"]
-        cursor.execute("""
-            SELECT id, amount, interest_rate, start_date, actual_end_date, status, disbursement_type, disbursement_details
-            FROM loans
-            WHERE user_id = %s
-            ORDER BY start_date DESC
-        """, (selected_member_id,))
-        report_data = cursor.fetchall()
-        for row in report_data:
-            if row['disbursement_details']:
-                details = json.loads(row['disbursement_details'])
-                if row['disbursement_type'] == 'cash':
-                    row[
-                        'disbursement_details_formatted'] = f"₹500: {details.get('notes_500', 0)}, ₹200: {details.get('notes_200', 0)}, ₹100: {details.get('notes_100', 0)}"
-                elif row['disbursement_type'] == 'cheque':
-                    row['disbursement_details_formatted'] = f"Cheque No: {details.get('cheque_number', 'N/A')}"
-                elif row['disbursement_type'] == 'upi':
-                    row['disbursement_details_formatted'] = f"UTR: {details.get('upi_utr', 'N/A')}"
-                else:
-                    row['disbursement_details_formatted'] = "N/A"
-            else:
-                row['disbursement_details_formatted'] = "N/A"
+@app.cli.command('create-group')
+@click.option('--name', required=True, help='Display name of the self-help group.')
+@click.option('--code', required=True, help='Short unique code members use to register.')
+@click.option('--president-username', required=True)
+@click.option('--president-password', required=True, prompt=True, hide_input=True)
+@click.option('--president-name', default='President')
+@click.option('--president-email', required=True)
+@click.option('--president-contact', default='0000000000')
+def create_group_command(name, code, president_username, president_password, president_name, president_email,
+                         president_contact):
+    """Creates a new self-help group with its settings row and first president."""
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to database to create the group.")
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("INSERT INTO savings_groups (name, code) VALUES (%s, %s)", (name, code))
+        group_id = cursor.lastrowid
+        cursor.execute(
+            "INSERT INTO bank_balance (group_id, balance, default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            (group_id, Decimal('0.00'), Decimal('50.00'), Decimal('10.00'), Decimal('100.00'), 1, 7))
+        cursor.execute(
+            "INSERT INTO users (group_id, name, username, email, contact_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s)",
+            (group_id, president_name, president_username, president_email, president_contact,
+             hash_password(president_password), 'president'))
+        conn.commit()
+        print(f"Created group '{name}' (id {group_id}, code '{code}') with president '{president_username}'.")
+    except mysql.connector.Error as err:
+        print(f"Error creating group: {err}")
+        conn.rollback()
+    finally:
+        cursor.close()
+        conn.close()
 
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)
-                elif isinstance(value, datetime):
-                    row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
-                elif isinstance(value, date):
-                    row[key] = value.strftime('%Y-%m-%d')
 
-    elif report_type == 'all_members_summary':
-        report_title = "All Members Summary"
-        report_headers = ["Member Name", "Total Contributions", "Total Loans Taken", "Active Loans Count"]
-        cursor.execute("""
-            SELECT u.id, u.name,
-                   SUM(CASE WHEN c.is_paid = TRUE THEN c.amount + c.fine_amount ELSE 0 END) as total_contributions,
-                   SUM(CASE WHEN l.status IN ('approved', 'overdue', 'completed') THEN l.amount ELSE 0 END) as total_loans_taken,
-                   COUNT(DISTINCT CASE WHEN l.status IN ('approved', 'overdue') THEN l.id ELSE NULL END) as active_loans_count
-            FROM users u
-            LEFT JOIN contributions c ON u.id = c.user_id
-            LEFT JOIN loans l ON u.id = l.user_id
-            WHERE u.role = 'member'
-            GROUP BY u.id, u.name
-            ORDER BY u.id
-        """)
-        report_data = cursor.fetchall()
-        for row in report_data:
-            for key, value in row.items():
-                if isinstance(value, Decimal):
-                    row[key] = float(value)
+def purge_idempotency_keys(conn, ttl_hours, batch_size):
+    """Deletes idempotency keys older than ttl_hours in short batches (idx_idempotency_keys_created)."""
+    cursor = conn.cursor()
+    deleted_count = 0
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM idempotency_keys WHERE created_at < NOW() - INTERVAL %s HOUR LIMIT %s",
+                (ttl_hours, batch_size))
+            conn.commit()
+            deleted_count += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+    except mysql.connector.Error:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return deleted_count
 
-    cursor.close()
-    conn.close()
 
-    if not report_data:
-        flash('No data found for the selected report criteria.', 'info')
-        return redirect(url_for('reports'))
+@app.cli.command('purge-idempotency-keys')
+def purge_idempotency_keys_command():
+    """Deletes expired idempotency keys (schedule daily)."""
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to database to purge idempotency keys.")
+        return
+    try:
+        deleted_count = purge_idempotency_keys(conn, app.config['IDEMPOTENCY_KEY_TTL_HOURS'],
+                                               app.config['IDEMPOTENCY_PURGE_BATCH_SIZE'])
+        print(f"Deleted {deleted_count} expired idempotency key(s).")
+    except mysql.connector.Error as err:
+        print(f"Error purging idempotency keys: {err}")
+    finally:
+        conn.close()
 
-    if report_format == 'excel' and EXCEL_AVAILABLE:
-        output = BytesIO()
-        workbook = Workbook()
-        sheet = workbook.active
-        sheet.title = report_title[:31]  # Max 31 chars for sheet title
 
-        # Add title
-        sheet.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(report_headers))
-        title_cell = sheet.cell(row=1, column=1, value=report_title)
-        title_cell.font = Font(bold=True, size=16)
-        title_cell.alignment = Alignment(horizontal='center', vertical='center')
+# --- Columnar ledger export ---
+# contributions, loans and loan_payments as zstd-compressed Parquet files for offline analysis,
+# laid out as <table>/year=<YYYY>/part-0.parquet (hive partitioning, which duckdb, pandas and
+# Spark read back as a 'year' column). Rows come from an unbuffered - server-side - cursor
+# ordered by year, LEDGER_EXPORT_CHUNK_SIZE at a time, and each chunk becomes one row group, so
+# the export holds one chunk in memory however large the table is. Money columns keep their
+# exact decimal(10,2) type instead of going through float. Column kinds map to Arrow types in
+# _ledger_arrow_type(); 'year' is the SQL expression the table is partitioned by (None: not partitioned).
+LEDGER_EXPORT_TABLES = {
+    'contributions': {
+        'columns': (('id', 'int'), ('group_id', 'int'), ('user_id', 'int'), ('month', 'int'),
+                    ('amount', 'money'), ('fine_amount', 'money'), ('is_paid', 'flag'),
+                    ('payment_date', 'timestamp'), ('utr_number', 'string'), ('president_utr_number', 'string'),
+                    ('president_id', 'int'), ('updated_at', 'timestamp')),
+        'year': 'year',
+    },
+    'loans': {
+        'columns': (('id', 'int'), ('group_id', 'int'), ('user_id', 'int'), ('president_id', 'int'),
+                    ('amount', 'money'), ('interest_rate', 'rate'), ('start_date', 'date'), ('status', 'string'),
+                    ('actual_end_date', 'date'), ('disbursement_type', 'string'), ('disbursement_details', 'string'),
+                    ('updated_at', 'timestamp')),
+        'year': 'YEAR(start_date)',
+    },
+    'loan_payments': {
+        'columns': (('id', 'int'), ('group_id', 'int'), ('loan_id', 'int'), ('amount_paid', 'money'),
+                    ('interest_paid', 'money'), ('payment_date', 'timestamp'), ('updated_at', 'timestamp')),
+        'year': 'YEAR(COALESCE(payment_date, updated_at))',
+    },
+}
+
+
+def _ledger_arrow_type(kind):
+    """The Arrow type of a LEDGER_EXPORT_TABLES column kind, matching the MySQL column type."""
+    return {
+        'int': pyarrow.int32(),
+        'flag': pyarrow.int8(),  # tinyint(1)
+        'money': pyarrow.decimal128(10, 2),
+        'rate': pyarrow.decimal128(5, 2),
+        'string': pyarrow.string(),
+        'date': pyarrow.date32(),
+        'timestamp': pyarrow.timestamp('us'),
+    }[kind]
+
+
+def export_ledger_table(conn, table, output_dir, group_id=None, chunk_size=None, spec=None):
+    """
+    Writes one LEDGER_EXPORT_TABLES table (optionally one group's rows) under output_dir/<table>/,
+    replacing any earlier export of it only once the new one is complete. spec overrides the
+    LEDGER_EXPORT_TABLES entry. Returns the number of rows written per year.
+    """
+    spec = spec or LEDGER_EXPORT_TABLES[table]
+    chunk_size = chunk_size or app.config['LEDGER_EXPORT_CHUNK_SIZE']
+    schema = pyarrow.schema([(name, _ledger_arrow_type(kind)) for name, kind in spec['columns']])
+    query = f"SELECT {spec['year'] or 'NULL'} AS partition_year, {', '.join(schema.names)} FROM {table}"
+    params = ()
+    if group_id is not None:
+        query += " WHERE group_id = %s"
+        params = (group_id,)
+    query += " ORDER BY partition_year, id"
+
+    staging_dir = os.path.join(output_dir, f'.{table}.partial')
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    cursor = conn.cursor(buffered=False)
+    writer, writer_year, year_counts = None, None, {}
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            # Rows arrive ordered by year, so each year's rows are one run and one file
+            for year, run in itertools.groupby(rows, key=lambda row: row[0]):
+                run = list(run)
+                if writer is None or year != writer_year:
+                    if writer is not None:
+                        writer.close()
+                    partition_dir = staging_dir if year is None else os.path.join(staging_dir, f'year={year}')
+                    os.makedirs(partition_dir, exist_ok=True)
+                    writer = pyarrow.parquet.ParquetWriter(os.path.join(partition_dir, 'part-0.parquet'), schema,
+                                                           compression=app.config['LEDGER_EXPORT_COMPRESSION'])
+                    writer_year = year
+                columns = list(zip(*run))[1:]
+                writer.write_table(pyarrow.Table.from_arrays(
+                    [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema))
+                year_counts[year] = year_counts.get(year, 0) + len(run)
+        if writer is not None:
+            writer.close()
+            writer = None
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    finally:
+        cursor.close()
 
-        # Add headers
-        for col_num, header in enumerate(report_headers, 1):
-            cell = sheet.cell(row=3, column=col_num, value=header)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = Border(top=Side(style='thin'), bottom=Side(style='thin'), left=Side(style='thin'),
-                                 right=Side(style='thin'))
-            sheet.column_dimensions[get_column_letter(col_num)].width = 20  # Default width
+    final_dir = os.path.join(output_dir, table)
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(staging_dir, final_dir)
+    return year_counts
+
+
+@app.cli.command('export-ledger')
+@click.option('--output-dir', default=None, help='Directory to write to (default: LEDGER_EXPORT_DIR).')
+@click.option('--group', 'group_id', default=None, type=int, help='Only this group (default: all groups).')
+@click.option('--table', 'tables', multiple=True, type=click.Choice(list(LEDGER_EXPORT_TABLES)),
+              help='Table to export; repeatable (default: all three).')
+def export_ledger_command(output_dir, group_id, tables):
+    """Exports contributions, loans and loan payments as year-partitioned Parquet files."""
+    if not ARROW_AVAILABLE:
+        print("pyarrow is not installed; cannot export the ledger.")
+        return
+    output_dir = output_dir or app.config['LEDGER_EXPORT_DIR']
+    os.makedirs(output_dir, exist_ok=True)
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to database to export the ledger.")
+        return
+    try:
+        for table in tables or LEDGER_EXPORT_TABLES:
+            started = time.perf_counter()
+            try:
+                year_counts = export_ledger_table(conn, table, output_dir, group_id)
+                print(f"Exported {sum(year_counts.values())} {table} row(s) in {len(year_counts)} year "
+                      f"partition(s) in {time.perf_counter() - started:.1f}s to {os.path.join(output_dir, table)}")
+            except (mysql.connector.Error, OSError, pyarrow.ArrowException) as err:
+                print(f"Error exporting {table}: {err}")
+    finally:
+        conn.close()
 
-        # Add data
-        row_num = 4
-        for row_dict in report_data:
-            col_num = 1
-            for header_key in report_headers:
-                # Map header to dictionary key (e.g., "Member Name" -> "member_name")
-                # This requires careful mapping or consistent naming.
-                # For simplicity, we'll assume header names directly map to dictionary keys
-                # or we'll need a more robust mapping logic.
-                # Let's use a simplified mapping for common cases.
-                key_map = {
-                    "Member Name": "member_name",
-                    "Borrower Name": "borrower_name",
-                    "Loan ID": "id",
-                    "Amount": "amount",
-                    "Loan Amount": "loan_amount",
-                    "Interest Rate (%)": "interest_rate",
-                    "Start Date": "start_date",
-                    "Actual End Date": "actual_end_date",
-                    "Status": "status",
-                    "Disbursement Type": "disbursement_type",
-                    "Disbursement Details": "disbursement_details_formatted",  # Use formatted details
-                    "Month": "month_name",  # For member_contributions
-                    "Year": "year",
-                    "Fine Amount": "fine_amount",
-                    "Total Paid": "total_paid",
-                    "UTR (Member)": "utr_number",
-                    "UTR (President)": "president_utr_number",
-                    "Total Contributions": "total_contributions",
-                    "Total Fines": "total_fine_amount",
-                    "Grand Total": "grand_total",
-                    "Interest Paid This Month": "interest_paid",
-                    "Total Interest Paid in Year": "total_interest_paid_yearly",
-                    "Total Loans Taken": "total_loans_taken",
-                    "Active Loans Count": "active_loans_count"
-                }
-                data_key = key_map.get(header_key, header_key.replace(" ", "_").lower())
 
-                cell_value = row_dict.get(data_key, '')
+# --- Report snapshots ---
+# With REPORT_ENGINE = 'snapshot', the reports page and its exports read a local columnar copy of
+# the core tables through an embedded duckdb engine, and never touch MySQL. The snapshot-reports
+# command (schedule it, e.g. hourly) writes the tables below as Parquet (export_ledger_table)
+# from one consistent read transaction into a new REPORT_SNAPSHOT_DIR/snapshot-<timestamp>/,
+# then points current.json at it. The previous snapshot is kept for reports still reading it;
+# older ones are deleted. build_report() runs unchanged: ReportSnapshot and SnapshotCursor
+# provide the parts of the mysql.connector connection and cursor it uses, over one duckdb view
+# per table. Without duckdb or a snapshot younger than REPORT_SNAPSHOT_MAX_AGE_MINUTES, reports
+# run on MySQL as before.
+REPORT_SNAPSHOT_TABLES = dict(LEDGER_EXPORT_TABLES, users={
+    'columns': (('id', 'int'), ('group_id', 'int'), ('name', 'string'), ('role', 'string'),
+                ('created_at', 'timestamp')),
+    'year': None,
+})
+
+
+class SnapshotCursor:
+    """A duckdb cursor taking %s placeholders and returning tuples, or dicts when dictionary=True."""
+
+    def __init__(self, duck_cursor, dictionary=False):
+        self._cursor = duck_cursor
+        self._dictionary = dictionary
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, params=()):
+        if params:  # Like mysql.connector, placeholders are only substituted when there are parameters
+            query = query.replace('%s', '?')
+        self._cursor.execute(query, list(params))
+
+    def _rows(self, rows):
+        if not self._dictionary:
+            return rows
+        names = [column[0] for column in self._cursor.description]
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return None if row is None else self._rows([row])[0]
+
+    def fetchmany(self, size=1):
+        return self._rows(self._cursor.fetchmany(size))
+
+    def fetchall(self):
+        return self._rows(self._cursor.fetchall())
+
+    def close(self):
+        self._cursor.close()
+
+
+class ReportSnapshot:
+    """An in-memory duckdb database with one view per REPORT_SNAPSHOT_TABLES table of a snapshot."""
+
+    def __init__(self, snapshot_dir, info):
+        self.snapshot_id = info['snapshot_id']
+        self.taken_at = datetime.fromisoformat(info['taken_at'])
+        self._duck = duckdb.connect(':memory:')
+        for table, spec in REPORT_SNAPSHOT_TABLES.items():
+            if info['row_counts'][table]:
+                pattern = os.path.join(snapshot_dir, table, '*.parquet' if spec['year'] is None else '*/*.parquet')
+                quoted_pattern = "'" + pattern.replace("'", "''") + "'"
+                self._duck.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet({quoted_pattern}, "
+                                   f"hive_partitioning = {spec['year'] is not None})")
+            else:  # No files to read: an empty table with the same columns
+                fields = [(name, _ledger_arrow_type(kind)) for name, kind in spec['columns']]
+                if spec['year'] is not None:
+                    fields.append(('year', pyarrow.int64()))
+                # A registered Arrow table is only visible to this connection, not to the cursors
+                # handed out below, so copy it into the catalog
+                self._duck.register(f'empty_{table}', pyarrow.schema(fields).empty_table())
+                self._duck.execute(f"CREATE TABLE {table} AS SELECT * FROM empty_{table}")
+                self._duck.unregister(f'empty_{table}')
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SnapshotCursor(self._duck.cursor(), dictionary)
+
+    def close(self):
+        self._duck.close()
+
+
+def read_report_snapshot_info():
+    """The current.json of REPORT_SNAPSHOT_DIR, or None if no snapshot was taken yet."""
+    try:
+        with open(os.path.join(app.config['REPORT_SNAPSHOT_DIR'], 'current.json'), encoding='utf-8') as info_file:
+            return json.load(info_file)
+    except FileNotFoundError:
+        return None
 
-                # Special handling for boolean status
-                if data_key == 'is_paid':
-                    cell_value = 'Paid' if cell_value else 'Pending'
 
-                sheet.cell(row=row_num, column=col_num, value=cell_value)
-                col_num += 1
-            row_num += 1
+def open_report_snapshot():
+    """The current report snapshot, or None when reports should run on MySQL."""
+    if app.config['REPORT_ENGINE'] != 'snapshot' or not (DUCKDB_AVAILABLE and ARROW_AVAILABLE):
+        return None
+    info = read_report_snapshot_info()
+    if info is None:
+        return None
+    if datetime.now() - datetime.fromisoformat(info['taken_at']) > timedelta(
+            minutes=app.config['REPORT_SNAPSHOT_MAX_AGE_MINUTES']):
+        return None
+    try:
+        return ReportSnapshot(os.path.join(app.config['REPORT_SNAPSHOT_DIR'], info['snapshot_id']), info)
+    except (duckdb.Error, OSError) as err:
+        print(f"Error opening report snapshot {info['snapshot_id']}, using the database: {err}")
+        return None
 
-        workbook.save(output)
-        output.seek(0)
-        return send_file(output, download_name=f"{report_title.replace(' ', '_')}.xlsx", as_attachment=True,
-                         mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
 
-    elif report_format == 'pdf' and PDF_AVAILABLE:
-        output = BytesIO()
-        doc = SimpleDocTemplate(output, pagesize=letter)
-        styles = getSampleStyleSheet()
+def take_report_snapshot(conn):
+    """
+    Writes a new snapshot of REPORT_SNAPSHOT_TABLES from one consistent read, makes it current
+    and deletes all but it and the previous one. Returns its current.json contents.
+    """
+    snapshot_root = app.config['REPORT_SNAPSHOT_DIR']
+    taken_at = datetime.now()
+    snapshot_id = f"snapshot-{taken_at:%Y%m%d%H%M%S%f}"
+    snapshot_dir = os.path.join(snapshot_root, snapshot_id)
+    os.makedirs(snapshot_dir)
+    row_counts = {}
+    conn.start_transaction(consistent_snapshot=True, readonly=True)
+    try:
+        for table, spec in REPORT_SNAPSHOT_TABLES.items():
+            row_counts[table] = sum(export_ledger_table(conn, table, snapshot_dir, spec=spec).values())
+    except BaseException:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+        raise
+    finally:
+        conn.rollback()
 
-        elements = []
+    info = {'snapshot_id': snapshot_id, 'taken_at': taken_at.isoformat(), 'row_counts': row_counts}
+    _write_json_file(os.path.join(snapshot_root, 'current.json'), info)
+    snapshot_ids = sorted(name for name in os.listdir(snapshot_root) if name.startswith('snapshot-'))
+    for old_snapshot_id in snapshot_ids[:-2]:
+        shutil.rmtree(os.path.join(snapshot_root, old_snapshot_id), ignore_errors=True)
+    return info
+
+
+@app.cli.command('snapshot-reports')
+def snapshot_reports_command():
+    """Refreshes the columnar snapshot that reports read when REPORT_ENGINE is 'snapshot' (schedule hourly)."""
+    if not (ARROW_AVAILABLE and DUCKDB_AVAILABLE):
+        print("pyarrow and duckdb are needed for report snapshots.")
+        return
+    os.makedirs(app.config['REPORT_SNAPSHOT_DIR'], exist_ok=True)
+    conn = None
+    if app.config['DB_REPLICA_CONFIG']:  # A snapshot is one long read: take it from the replica if there is one
+        try:
+            conn = get_replica_pool().get_connection()
+        except mysql.connector.Error as err:
+            print(f"Error connecting to read replica, using primary: {err}")
+    conn = conn or get_db_connection()
+    if conn is None:
+        print("Could not connect to database to snapshot reports.")
+        return
+    started = time.perf_counter()
+    try:
+        info = take_report_snapshot(conn)
+        counts = ', '.join(f"{count} {table}" for table, count in info['row_counts'].items())
+        print(f"Report snapshot {info['snapshot_id']} ({counts}) written in {time.perf_counter() - started:.1f}s.")
+    except (mysql.connector.Error, OSError, pyarrow.ArrowException) as err:
+        print(f"Error taking report snapshot: {err}")
+    finally:
+        conn.close()
 
-        # Title
-        elements.append(Paragraph(report_title, styles['h1']))
-        elements.append(Spacer(1, 12))
 
-        # Table data
-        table_data = [report_headers]
-        for row_dict in report_data:
-            row_values = []
-            for header_key in report_headers:
-                key_map = {
-                    "Member Name": "member_name",
-                    "Borrower Name": "borrower_name",
-                    "Loan ID": "id",
-                    "Amount": "amount",
-                    "Loan Amount": "loan_amount",
-                    "Interest Rate (%)": "interest_rate",
-                    "Start Date": "start_date",
-                    "Actual End Date": "actual_end_date",
-                    "Status": "status",
-                    "Disbursement Type": "disbursement_type",
-                    "Disbursement Details": "disbursement_details_formatted",
-                    "Month": "month_name",
-                    "Year": "year",
-                    "Fine Amount": "fine_amount",
-                    "Total Paid": "total_paid",
-                    "UTR (Member)": "utr_number",
-                    "UTR (President)": "president_utr_number",
-                    "Total Contributions": "total_contributions",
-                    "Total Fines": "total_fine_amount",
-                    "Grand Total": "grand_total",
-                    "Interest Paid This Month": "interest_paid",
-                    "Total Interest Paid in Year": "total_interest_paid_yearly",
-                    "Total Loans Taken": "total_loans_taken",
-                    "Active Loans Count": "active_loans_count"
-                }
-                data_key = key_map.get(header_key, header_key.replace(" ", "_").lower())
+@app.cli.command('query-snapshot')
+@click.argument('sql')
+def query_snapshot_command(sql):
+    """Runs an ad-hoc SQL query on the current report snapshot and prints the result as CSV."""
+    if not (ARROW_AVAILABLE and DUCKDB_AVAILABLE):
+        print("pyarrow and duckdb are needed for report snapshots.")
+        return
+    info = read_report_snapshot_info()
+    if info is None:
+        print("No report snapshot yet; run snapshot-reports first.")
+        return
+    snapshot = ReportSnapshot(os.path.join(app.config['REPORT_SNAPSHOT_DIR'], info['snapshot_id']), info)
+    try:
+        cursor = snapshot.cursor()
+        cursor.execute(sql)
+        writer = csv.writer(click.get_text_stream('stdout'))
+        writer.writerow([column[0] for column in cursor.description])
+        rows = cursor.fetchmany(app.config['STREAM_BATCH_SIZE'])
+        while rows:
+            writer.writerows(rows)
+            rows = cursor.fetchmany(app.config['STREAM_BATCH_SIZE'])
+    except duckdb.Error as err:
+        print(f"Error running query: {err}")
+    finally:
+        snapshot.close()
 
-                cell_value = row_dict.get(data_key, '')
 
-                if data_key == 'is_paid':
-                    cell_value = 'Paid' if cell_value else 'Pending'
-                elif isinstance(cell_value, Decimal):
-                    cell_value = f"₹{float(cell_value):.2f}"
-                elif isinstance(cell_value, datetime) or isinstance(cell_value, date):
-                    cell_value = cell_value.strftime('%Y-%m-%d')
+# --- Diagnostics ---
+@app.cli.command('check-db-routing')
+def check_db_routing():
+    """Shows which MySQL server the primary and replica pools reach and how a read-only page is routed."""
 
-                row_values.append(str(cell_value))
-            table_data.append(row_values)
+    def describe(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT @@hostname, @@port, @@read_only")
+        hostname, port, read_only = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return f"{hostname}:{port} (read_only={read_only})"
 
-        table = Table(table_data)
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#E0E0E0')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-        ]))
-        elements.append(table)
+    try:
+        print(f"Primary: {describe(get_db_pool().get_connection())}")
+    except mysql.connector.Error as err:
+        print(f"Primary: unavailable ({err})")
+    if not app.config['DB_REPLICA_CONFIG']:
+        print("Replica: not configured (set DB_REPLICA_HOST)")
+    else:
+        try:
+            print(f"Replica: {describe(get_replica_pool().get_connection())}")
+        except mysql.connector.Error as err:
+            print(f"Replica: unavailable ({err})")
 
-        doc.build(output)
-        output.seek(0)
-        return send_file(output, download_name=f"{report_title.replace(' ', '_')}.pdf", as_attachment=True,
-                         mimetype='application/pdf')
+    with app.test_request_context('/reports', method='POST'):
+        conn = get_db_connection()
+        print(f"'reports' request is served by: {describe(conn) if conn else 'no connection'}")
+        session['last_write_at'] = time.time()
+        conn = get_db_connection()
+        print(f"'reports' right after the user's own write: {describe(conn) if conn else 'no connection'}")
 
-    else:
-        flash('Report format not supported or required libraries not installed.', 'danger')
-        return redirect(url_for('reports'))
 
+# --- Benchmarks (run with: flask --app app <command>) ---
+@app.cli.command('bench-prepared')
+@click.option('--iterations', default=2000, help='Number of executions per query and protocol.')
+def bench_prepared(iterations):
+    """Compares text protocol vs prepared statement throughput for the hot queries."""
+    conn = get_db_connection()
+    if conn is None:
+        print("Could not connect to database for benchmark.")
+        return
+
+    cursor = conn.cursor(dictionary=True, buffered=True)
+    cursor.execute("SELECT id, group_id FROM users ORDER BY id LIMIT 1")
+    user_row = cursor.fetchone()
+    cursor.execute("SELECT id, group_id FROM loans ORDER BY id LIMIT 1")
+    loan_row = cursor.fetchone()
+    user_id = user_row['id'] if user_row else 1
+    loan_id = loan_row['id'] if loan_row else 1
+    group_id = user_row['group_id'] if user_row else 1
+    loan_group_id = loan_row['group_id'] if loan_row else group_id
+    today = date.today()
+
+    sample_params = {
+        'user_role': (user_id,),
+        'loan_by_id': (loan_id, loan_group_id),
+        'loan_payment_summary': (loan_id,),
+        'contribution_for_month': (user_id, today.month, today.year),
+        'group_settings': (group_id,),
+    }
+
+    print(f"{'Query':<26}{'Text (q/s)':>14}{'Prepared (q/s)':>16}{'Speedup':>10}")
+    for query_name, params in sample_params.items():
+        start = time.perf_counter()
+        for _ in range(iterations):
+            cursor.execute(HOT_QUERIES[query_name], params)
+            cursor.fetchall()
+        text_rate = iterations / (time.perf_counter() - start)
+
+        run_hot_query(conn, query_name, params)  # Prepare once outside the timed loop
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run_hot_query(conn, query_name, params)
+        prepared_rate = iterations / (time.perf_counter() - start)
+
+        print(f"{query_name:<26}{text_rate:>14.0f}{prepared_rate:>16.0f}{prepared_rate / text_rate:>9.2f}x")
+
+    cursor.close()
+    conn.close()
 
-# --- End New Reports Feature ---
+
+
+@app.cli.command('bench-rows')
+@click.option('--rows', 'row_count', default=100000, help='Number of synthetic loan rows to build.')
+def bench_rows(row_count):
+    """Measures memory held by a loans-listing result as dict rows vs CompactRow objects."""
+    columns = ('id', 'user_id', 'president_id', 'amount', 'interest_rate', 'start_date', 'status',
+               'actual_end_date', 'disbursement_type', 'disbursement_details', 'borrower_name')
+
+    def raw_rows():
+        # Stand-in for the tuples the MySQL driver produces for each fetched row
+        for i in range(row_count):
+            yield (i, i % 500, 1, Decimal('5000.00'), Decimal('24.00'), date(2025, 1, 1), 'approved',
+                   None, 'cash', '{"notes_500": 10}', f"Member {i % 500}")
+
+    tracemalloc.start()
+    dict_rows = [dict(zip(columns, values)) for values in raw_rows()]  # What a dictionary cursor builds
+    dict_bytes = tracemalloc.get_traced_memory()[0]
+    del dict_rows
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    index = {name: position for position, name in enumerate(columns)}
+    compact_rows = [CompactRow(index, values) for values in raw_rows()]  # What fetch_compact_rows builds
+    compact_bytes = tracemalloc.get_traced_memory()[0]
+    del compact_rows
+    tracemalloc.stop()
+
+    print(f"Rows: {row_count}")
+    print(f"Dictionary rows: {dict_bytes / 1024 / 1024:8.2f} MiB")
+    print(f"Compact rows:    {compact_bytes / 1024 / 1024:8.2f} MiB")
+    print(f"Saved:           {(dict_bytes - compact_bytes) / 1024 / 1024:8.2f} MiB "
+          f"({(1 - compact_bytes / dict_bytes) * 100:.0f}%)")
+    print("With STREAM_LARGE_RESULTS on, list pages hold only STREAM_BATCH_SIZE rows at a time.")
+
+
+@app.cli.command('bench-money')
+@click.option('--samples', default=100000, help='Number of random loan/fine/cash cases to time.')
+@click.option('--seed', default=2025, help='Random seed for the generated cases.')
+def bench_money(samples, seed):
+    """
+    Times the paise-integer money arithmetic used in per-row loops against the previous Decimal
+    formulas on random inputs. Both give the same results; tests/test_money.py checks that.
+    """
+    rng = random.Random(seed)
+    cents = Decimal('0.01')
+    cases = []
+    for _ in range(samples):
+        principal = Decimal(rng.randint(0, 50000000)).scaleb(-2)  # Up to 5,00,000.00
+        total_paid = Decimal(rng.randint(0, 5000000)).scaleb(-2)
+        paid_interest = Decimal(rng.randint(0, 500000)).scaleb(-2)
+        rate = Decimal(rng.randint(0, 10000)).scaleb(-2)  # 0.00% to 100.00%
+        days = rng.randint(0, 1000)
+        fine = Decimal(rng.randint(0, 100000)).scaleb(-2)
+        notes = (rng.randint(0, 200), rng.randint(0, 200), rng.randint(0, 200))
+        cases.append((principal, total_paid, paid_interest, rate, days, fine, notes))
+
+    def decimal_path(principal, total_paid, paid_interest, rate, days, fine, notes):
+        outstanding = principal - (total_paid - paid_interest)
+        monthly = (outstanding * (rate / Decimal('100') / Decimal('12'))).quantize(cents, rounding=ROUND_HALF_UP)
+        daily = (outstanding * (rate / Decimal('100') / Decimal('365')) * days).quantize(cents, rounding=ROUND_HALF_UP)
+        cash = (Decimal(notes[0]) * 500) + (Decimal(notes[1]) * 200) + (Decimal(notes[2]) * 100)
+        total = (monthly + daily + fine + cash).quantize(cents, rounding=ROUND_HALF_UP)
+        return monthly, daily, cash, total
+
+    def paise_path(principal, total_paid, paid_interest, rate, days, fine, notes):
+        outstanding = principal - (total_paid - paid_interest)
+        monthly = interest_paise(outstanding, rate)
+        daily = interest_paise(outstanding, rate, days, 365)
+        cash = 50000 * notes[0] + 20000 * notes[1] + 10000 * notes[2]
+        return monthly, daily, cash, monthly + daily + fine + cash
+
+    def money_path(principal, total_paid, paid_interest, rate, days, fine, notes):
+        outstanding = principal - (total_paid - paid_interest)
+        monthly = outstanding.interest(rate)
+        daily = outstanding.interest(rate, days, 365)
+        cash = (Money(50000) * notes[0]) + (Money(20000) * notes[1]) + (Money(10000) * notes[2])
+        return monthly, daily, cash, monthly + daily + fine + cash
+
+    # Time the arithmetic itself on values already in each representation (conversion happens
+    # once at the DB boundary), then the cost of that boundary conversion on its own.
+    paise_cases = [(to_paise(principal), to_paise(total_paid), to_paise(paid_interest), rate, days, to_paise(fine), notes)
+                   for principal, total_paid, paid_interest, rate, days, fine, notes in cases]
+    money_cases = [tuple(_new_money(value) if index in (0, 1, 2, 5) else value for index, value in enumerate(case))
+                   for case in paise_cases]
+
+    timings = {}
+    for name, path, path_cases in (('Decimal', decimal_path, cases), ('paise', paise_path, paise_cases),
+                                   ('Money', money_path, money_cases)):
+        start = time.perf_counter()
+        for case in path_cases:
+            path(*case)
+        timings[name] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for principal, total_paid, paid_interest, rate, days, fine, notes in cases:
+        to_paise(principal), to_paise(total_paid), to_paise(paid_interest), to_paise(fine)
+    conversion_seconds = time.perf_counter() - start
+
+    print(f"Timed {samples} cases.")
+    print(f"Arithmetic - Decimal: {timings['Decimal']:.3f}s, "
+          f"paise ints (per-row loops): {timings['paise']:.3f}s ({timings['Decimal'] / timings['paise']:.2f}x), "
+          f"Money objects (request-level code): {timings['Money']:.3f}s ({timings['Decimal'] / timings['Money']:.2f}x)")
+    print(f"DB boundary conversion (4 values per case): {conversion_seconds:.3f}s")
+
+
+@app.cli.command('bench-templates')
+@click.option('--iterations', default=200, help='Renders per template.')
+@click.option('--rows', 'row_count', default=200, help='Loans in the manage_loans listing.')
+def bench_templates(iterations, row_count):
+    """
+    Times each page template per render, with the layout fragment cache off and on, and the cost of
+    loading every template cold (parse and compile) against loading it from the bytecode cache.
+    """
+    today = date.today()
+    loan = {'id': 1, 'amount': Decimal('5000.00'), 'interest_rate': Decimal('24.00'), 'start_date': today,
+            'actual_end_date': None, 'status': 'approved', 'disbursement_type': 'cash',
+            'disbursement_details': '{"notes_500": 10}', 'president_name': 'President', 'borrower_name': 'Member'}
+    contribution = {'month': 4, 'year': today.year, 'amount': Decimal('500.00'), 'fine_amount': Decimal('0.00'),
+                    'is_paid': True, 'payment_date': datetime.now(), 'utr_number': '123456789012',
+                    'approver_name': 'President'}
+    pages = {
+        'login.html': {},
+        'member_dashboard.html': dict(total_contributed=Decimal('12000.00'), current_loans=[loan] * 3,
+                                      pending_contribution=None, is_president=False),
+        'contributions.html': dict(contributions_history=[contribution] * 36, pending_contribution=None,
+                                   default_contribution_amount=Decimal('500.00'), current_fine_amount=Decimal('0.00'),
+                                   total_monthly_loan_interest_due=Decimal('100.00'),
+                                   total_amount_to_pay=Decimal('600.00'), payment_start_day=1, payment_end_day=7),
+        'member_loans.html': dict(loans=[loan] * 10),
+        'manage_loans.html': dict(loans=[loan] * row_count),
+    }
+
+    with app.test_request_context('/'):
+        session.update(user_id=1, name='Bench Member', role='member', group_id=1)
+        fragment_setting = app.config['FRAGMENT_CACHE_ENABLED']
+        print(f"{'Template':<26} {'no fragments':>14} {'fragments':>14}")
+        try:
+            for template_name, context in pages.items():
+                timings = []
+                for fragments_enabled in (False, True):
+                    app.config['FRAGMENT_CACHE_ENABLED'] = fragments_enabled
+                    render_template(template_name, **context)  # Warm-up (compiles, fills the fragment cache)
+                    start = time.perf_counter()
+                    for _ in range(iterations):
+                        render_template(template_name, **context)
+                    timings.append((time.perf_counter() - start) / iterations * 1000)
+                print(f"{template_name:<26} {timings[0]:11.3f} ms {timings[1]:11.3f} ms")
+        finally:
+            app.config['FRAGMENT_CACHE_ENABLED'] = fragment_setting
+
+    template_names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    load_timings = []
+    for bytecode_cache in (None, app.jinja_env.bytecode_cache):
+        environment = app.create_jinja_environment()
+        environment.bytecode_cache = bytecode_cache
+        if bytecode_cache is not None:
+            for name in template_names:  # Make sure every template is on disk before timing
+                environment.get_template(name)
+            environment = app.create_jinja_environment()
+            environment.bytecode_cache = bytecode_cache
+        start = time.perf_counter()
+        for name in template_names:
+            environment.get_template(name)
+        load_timings.append((time.perf_counter() - start) * 1000)
+    print(f"Loading {len(template_names)} templates - parse and compile: {load_timings[0]:.1f} ms, "
+          + (f"from bytecode cache: {load_timings[1]:.1f} ms" if app.jinja_env.bytecode_cache
+             else "bytecode cache off (JINJA_BYTECODE_CACHE_DIR is empty)"))
+
+
+@app.cli.command('bench-compression')
+@click.option('--rows', 'row_count', default=1000, help='Rows in the synthetic monthly contributions report.')
+@click.option('--kbps', default=400, help='Throttled link speed in kilobits per second (slow mobile: 400).')
+@click.option('--rtt-ms', default=300, help='Round-trip time of the throttled link in milliseconds.')
+def bench_compression(row_count, kbps, rtt_ms):
+    """
+    Renders a large reports page and sends it through CompressionMiddleware with each encoding,
+    whole and as streamed 8 KB chunks. Reports bytes on the wire, compression time and the time
+    until the page has arrived on the throttled link (one round trip plus transfer).
+    """
+    row = {'member_name': 'Member Name', 'amount': Decimal('500.00'), 'fine_amount': Decimal('50.00'),
+           'total_paid': Decimal('550.00'), 'is_paid': True, 'payment_date': datetime.now(),
+           'utr_number': '123456789012', 'president_utr_number': None}
+    with app.test_request_context('/reports'):
+        session.update(user_id=1, name='Bench President', role='president', group_id=1)
+        html = render_template('reports.html', all_members=[], all_years=[date.today().year],
+                               report_type='monthly_contributions', report_title='Monthly Contributions Report',
+                               report_headers=['Member Name', 'Amount', 'Fine Amount', 'Total Paid', 'Status',
+                                               'Payment Date', 'UTR (Member)', 'UTR (President)'],
+                               report_data=[row] * row_count, excel_available=EXCEL_AVAILABLE,
+                               pdf_available=PDF_AVAILABLE).encode('utf-8')
+
+    def page_app(chunk_size):
+        def wsgi_app(environ, start_response):
+            headers = [('Content-Type', 'text/html; charset=utf-8')]
+            if chunk_size is None:
+                headers.append(('Content-Length', str(len(html))))
+                start_response('200 OK', headers)
+                return [html]
+            start_response('200 OK', headers)
+            return (html[i:i + chunk_size] for i in range(0, len(html), chunk_size))
+        return wsgi_app
+
+    print(f"Page: {len(html) / 1024:.1f} KiB, link: {kbps} kbit/s, RTT {rtt_ms} ms")
+    print(f"{'Encoding':<10} {'Body':<9} {'Bytes':>10} {'Compress':>10} {'Arrives after':>14}")
+    encodings = ['identity', 'gzip'] + (['br'] if BROTLI_AVAILABLE else [])
+    for encoding in encodings:
+        for chunk_size, label in ((None, 'whole'), (8192, 'streamed')):
+            middleware = CompressionMiddleware(page_app(chunk_size), app.config['COMPRESSION_MIN_SIZE'],
+                                               app.config['COMPRESSION_GZIP_LEVEL'],
+                                               app.config['COMPRESSION_BROTLI_QUALITY'])
+            environ = {'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT_ENCODING': encoding}
+            start = time.perf_counter()
+            body = middleware(environ, lambda status, headers, exc_info=None: None)
+            sent = sum(len(chunk) for chunk in body)
+            compress_ms = (time.perf_counter() - start) * 1000
+            arrival_ms = compress_ms + rtt_ms + sent * 8 / kbps
+            print(f"{encoding:<10} {label:<9} {sent:>10} {compress_ms:>7.2f} ms {arrival_ms:>11.0f} ms")
+    if not BROTLI_AVAILABLE:
+        print("brotli is not installed, so only gzip was measured.")
 
 
 if __name__ == '__main__':
@@ -2467,6 +6944,72 @@ if __name__ == '__main__':
     if conn:
         cursor = conn.cursor(dictionary=True, buffered=True)
 
+        # --- New migration: Multi-group tenancy (savings_groups + group_id on every tenant table) ---
+        # Existing single-group data is moved into the default group (id 1).
+        try:
+            cursor.execute("SHOW TABLES LIKE 'savings_groups'")
+            if not cursor.fetchone():
+                cursor.execute("""
+                    CREATE TABLE savings_groups (
+                        id INT NOT NULL AUTO_INCREMENT,
+                        name VARCHAR(255) NOT NULL,
+                        code VARCHAR(50) NOT NULL,
+                        created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (id),
+                        UNIQUE KEY code (code)
+                    )
+                """)
+                conn.commit()
+                print("Created savings_groups table.")
+            cursor.execute("SELECT COUNT(*) FROM savings_groups")
+            if cursor.fetchone()['COUNT(*)'] == 0:
+                cursor.execute("INSERT INTO savings_groups (id, name, code) VALUES (1, 'Default Group', 'default')")
+                conn.commit()
+                print("Created default group (code: default).")
+
+            # (table, tenant index name, index definition, foreign key name)
+            tenant_tables = [
+                ('users', 'idx_users_group_role', '(group_id, role)', 'users_ibfk_1'),
+                ('contributions', 'idx_contributions_group_period', '(group_id, year, month, is_paid)',
+                 'contributions_ibfk_2'),
+                ('loans', 'idx_loans_group_status_start', '(group_id, status, start_date)', 'loans_ibfk_3'),
+                ('loan_payments', 'idx_loan_payments_group_date', '(group_id, payment_date)', 'loan_payments_ibfk_2'),
+                ('loan_interest_dues', 'idx_loan_interest_dues_group_period', '(group_id, year, month)',
+                 'loan_interest_dues_ibfk_3'),
+                ('bank_balance', 'group_id', '(group_id)', 'bank_balance_ibfk_1'),
+            ]
+            for table, index_name, index_columns, fk_name in tenant_tables:
+                cursor.execute(f"SHOW TABLES LIKE '{table}'")
+                if not cursor.fetchone():
+                    continue  # Created later with group_id already in place
+                cursor.execute(f"SHOW COLUMNS FROM {table} LIKE 'group_id'")
+                if cursor.fetchone():
+                    continue
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN group_id INT NOT NULL DEFAULT 1 AFTER id")
+                cursor.execute(f"ALTER TABLE {table} ALTER COLUMN group_id DROP DEFAULT")
+                unique = 'UNIQUE ' if table == 'bank_balance' else ''  # One settings/balance row per group
+                cursor.execute(f"CREATE {unique}INDEX {index_name} ON {table} {index_columns}")
+                cursor.execute(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {fk_name} FOREIGN KEY (group_id) REFERENCES savings_groups (id) ON DELETE CASCADE")
+                conn.commit()
+                print(f"Added group_id column and {index_name} index to {table} table.")
+        except mysql.connector.Error as err:
+            print(f"Error migrating to multi-group tenancy: {err}")
+            conn.rollback()
+        # --- End of new migration ---
+
+        # --- New migration: Per-member data version (API ETags) ---
+        try:
+            cursor.execute("SHOW COLUMNS FROM users LIKE 'data_version'")
+            if not cursor.fetchone():
+                cursor.execute("ALTER TABLE users ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0")
+                conn.commit()
+                print("Added data_version column to users table.")
+        except mysql.connector.Error as err:
+            print(f"Error adding data_version column to users table: {err}")
+            conn.rollback()
+        # --- End of new migration ---
+
         # Check and create default president user
         cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'president'")
         count = cursor.fetchone()['COUNT(*)']
@@ -2475,8 +7018,8 @@ if __name__ == '__main__':
             try:
                 hashed_password = generate_password_hash('password')
                 cursor.execute(
-                    "INSERT INTO users (name, username, email, contact_number, pan_number, aadhar_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-                    ('President Admin', 'president', 'president@bachatgat.com', '9876543210', 'ABCDE1234F',
+                    "INSERT INTO users (group_id, name, username, email, contact_number, pan_number, aadhar_number, password, role) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                    (1, 'President Admin', 'president', 'president@bachatgat.com', '9876543210', 'ABCDE1234F',
                      '123456789012', hashed_password, 'president')
                 )
                 conn.commit()
@@ -2492,7 +7035,7 @@ if __name__ == '__main__':
             balance_count = cursor.fetchone()['COUNT(*)']
             if balance_count == 0:
                 cursor.execute(
-                    "INSERT INTO bank_balance (id, balance, default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day) VALUES (1, %s, %s, %s, %s, %s, %s)",
+                    "INSERT INTO bank_balance (group_id, balance, default_fine_amount, default_interest_rate, default_contribution_amount, payment_start_day, payment_end_day) VALUES (1, %s, %s, %s, %s, %s, %s)",
                     (Decimal('0.00'), Decimal('50.00'), Decimal('10.00'), Decimal('100.00'), 1, 7))
                 conn.commit()
                 print(
@@ -2623,6 +7166,118 @@ if __name__ == '__main__':
             conn.rollback()
         # --- End of new migration ---
 
+        # --- New migration: Create loan_interest_dues table for the monthly close batch ---
+        try:
+            cursor.execute("SHOW TABLES LIKE 'loan_interest_dues'")
+            if not cursor.fetchone():
+                cursor.execute("""
+                    CREATE TABLE loan_interest_dues (
+                        id INT NOT NULL AUTO_INCREMENT,
+                        group_id INT NOT NULL,
+                        loan_id INT NOT NULL,
+                        user_id INT NOT NULL,
+                        month INT NOT NULL,
+                        year INT NOT NULL,
+                        outstanding_principal DECIMAL(10,2) NOT NULL,
+                        interest_due DECIMAL(10,2) NOT NULL,
+                        computed_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (id),
+                        UNIQUE KEY loan_id (loan_id, month, year),
+                        KEY idx_loan_interest_dues_user_period (user_id, year, month),
+                        KEY idx_loan_interest_dues_group_period (group_id, year, month),
+                        CONSTRAINT loan_interest_dues_ibfk_1 FOREIGN KEY (loan_id) REFERENCES loans (id) ON DELETE CASCADE,
+                        CONSTRAINT loan_interest_dues_ibfk_2 FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                        CONSTRAINT loan_interest_dues_ibfk_3 FOREIGN KEY (group_id) REFERENCES savings_groups (id) ON DELETE CASCADE
+                    )
+                """)
+                conn.commit()
+                print("Created loan_interest_dues table.")
+        except mysql.connector.Error as err:
+            print(f"Error creating loan_interest_dues table: {err}")
+            conn.rollback()
+        # --- End of new migration ---
+
+        # --- New migration: Indexes for the overdue loan check ---
+        try:
+            cursor.execute("SHOW INDEX FROM loans WHERE Key_name = 'idx_loans_status_start'")
+            if not cursor.fetchall():
+                cursor.execute("CREATE INDEX idx_loans_status_start ON loans (status, start_date)")
+                conn.commit()
+                print("Added idx_loans_status_start index to loans table.")
+
+            cursor.execute("SHOW INDEX FROM loan_payments WHERE Key_name = 'idx_loan_payments_loan_date'")
+            if not cursor.fetchall():
+                cursor.execute("CREATE INDEX idx_loan_payments_loan_date ON loan_payments (loan_id, payment_date)")
+                conn.commit()
+                print("Added idx_loan_payments_loan_date index to loan_payments table.")
+        except mysql.connector.Error as err:
+            print(f"Error adding overdue check indexes: {err}")
+            conn.rollback()
+        # --- End of new migration ---
+
+        # --- New migration: Change tracking and idempotency keys for offline sync ---
+        try:
+            for table in ('contributions', 'loans', 'loan_payments'):
+                cursor.execute(f"SHOW COLUMNS FROM {table} LIKE 'updated_at'")
+                if not cursor.fetchone():
+                    cursor.execute(f"""
+                        ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                        DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+                        ADD INDEX idx_{table}_group_updated (group_id, updated_at)
+                    """)
+                    conn.commit()
+                    print(f"Added updated_at column and idx_{table}_group_updated index to {table} table.")
+
+            cursor.execute("SHOW TABLES LIKE 'idempotency_keys'")
+            if not cursor.fetchone():
+                cursor.execute("""
+                    CREATE TABLE idempotency_keys (
+                        id BIGINT NOT NULL AUTO_INCREMENT,
+                        group_id INT NOT NULL,
+                        user_id INT NOT NULL,
+                        idempotency_key VARCHAR(64) NOT NULL,
+                        endpoint VARCHAR(64) NOT NULL,
+                        response TEXT NOT NULL,
+                        created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (id),
+                        UNIQUE KEY user_key (user_id, idempotency_key),
+                        KEY idx_idempotency_keys_created (created_at),
+                        CONSTRAINT idempotency_keys_ibfk_1 FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+                        CONSTRAINT idempotency_keys_ibfk_2 FOREIGN KEY (group_id) REFERENCES savings_groups (id) ON DELETE CASCADE
+                    )
+                """)
+                conn.commit()
+                print("Created idempotency_keys table.")
+        except mysql.connector.Error as err:
+            print(f"Error adding offline sync tables: {err}")
+            conn.rollback()
+        # --- End of new migration ---
+
+        # --- New migration: Tombstones of deleted rows for the sync pull ---
+        try:
+            cursor.execute("SHOW TABLES LIKE 'deleted_rows'")
+            if not cursor.fetchone():
+                cursor.execute("""
+                    CREATE TABLE deleted_rows (
+                        id BIGINT NOT NULL AUTO_INCREMENT,
+                        group_id INT NOT NULL,
+                        user_id INT NOT NULL,
+                        table_name VARCHAR(32) NOT NULL,
+                        row_id INT NOT NULL,
+                        deleted_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+                        PRIMARY KEY (id),
+                        KEY idx_deleted_rows_group_deleted (group_id, deleted_at),
+                        KEY idx_deleted_rows_user_deleted (user_id, deleted_at),
+                        CONSTRAINT deleted_rows_ibfk_1 FOREIGN KEY (group_id) REFERENCES savings_groups (id) ON DELETE CASCADE
+                    )
+                """)
+                conn.commit()
+                print("Created deleted_rows table.")
+        except mysql.connector.Error as err:
+            print(f"Error adding deleted_rows table: {err}")
+            conn.rollback()
+        # --- End of new migration ---
+
         cursor.close()  # Close cursor after all operations
         conn.close()
     else:
@@ -1,20 +1,173 @@
 import os
 
 class Config:
-    # Flask Secret Key for session management
-    # It's highly recommended to use a strong, randomly generated key
-    # and load it from an environment variable in production.
+    # Flask Secret Key. Only signs session cookies when SESSION_BACKEND is 'cookie'; then
+    # it must be set (from the environment) to the same value in every worker.
     SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(24)
 
+    # Sessions are stored server-side and the cookie only carries a random session id.
+    # 'sqlite' is shared by all workers on one machine, 'redis' by all machines, 'memory' only
+    # works with a single worker, and 'cookie' is Flask's signed cookie session.
+    SESSION_BACKEND = os.environ.get('SESSION_BACKEND', 'sqlite')
+    SESSION_SQLITE_PATH = os.environ.get(
+        'SESSION_SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sessions.sqlite3'))
+    SESSION_REDIS_URL = os.environ.get('SESSION_REDIS_URL', os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    SESSION_CLEANUP_INTERVAL = int(os.environ.get('SESSION_CLEANUP_INTERVAL', 300))  # Seconds between expiry sweeps
+    PERMANENT_SESSION_LIFETIME = int(os.environ.get('SESSION_LIFETIME', 7 * 24 * 3600))  # Seconds since last change
+
     # Database configuration
     # Replace with your actual MySQL credentials
     DB_CONFIG = {
         'host': 'localhost',
         'user': 'root',       # IMPORTANT: Replace with your MySQL username
         'password': 'Shrikant', # IMPORTANT: Replace with your MySQL password
-        'database': 'bachat_gat_db'
+        'database': 'bachat_gat_db',
+        'port': int(os.environ.get('DB_PORT', 3306))
     }
 
+    # Connection pool settings. Connections are handed out by get_db_connection()
+    # and returned to the pool when the route calls conn.close() (always in a finally block:
+    # the pool is fixed-size and a leaked connection is never reclaimed).
+    # Session reset is off by default so that server-side prepared statements
+    # for the hot queries survive between requests on the same pooled connection.
+    DB_POOL_NAME = 'bachat_pool'
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))  # mysql.connector allows at most 32
+    DB_POOL_RESET_SESSION = os.environ.get('DB_POOL_RESET_SESSION', 'false').lower() == 'true'
+    # Seconds a request waits for a free pooled connection before giving up
+    DB_POOL_CHECKOUT_TIMEOUT = float(os.environ.get('DB_POOL_CHECKOUT_TIMEOUT', 5))
+
+    # Large listings (all loans, members, reports) are read through an unbuffered cursor
+    # and handed to templates as compact tuple-backed rows, STREAM_BATCH_SIZE rows at a time.
+    STREAM_LARGE_RESULTS = os.environ.get('STREAM_LARGE_RESULTS', 'true').lower() == 'true'
+    STREAM_BATCH_SIZE = int(os.environ.get('STREAM_BATCH_SIZE', 500))
+
+    # Optional read replica. When DB_REPLICA_HOST is set, read-only pages (dashboard, reports,
+    # exports, member profile and the list views) are served from this server through their own
+    # pool, falling back to the primary if the replica cannot be reached. After a user's own
+    # write, their reads stay on the primary for READ_YOUR_WRITES_SECONDS to hide replication lag.
+    DB_REPLICA_CONFIG = {
+        'host': os.environ.get('DB_REPLICA_HOST'),
+        'port': int(os.environ.get('DB_REPLICA_PORT', 3306)),
+        'user': os.environ.get('DB_REPLICA_USER', DB_CONFIG['user']),
+        'password': os.environ.get('DB_REPLICA_PASSWORD', DB_CONFIG['password']),
+        'database': os.environ.get('DB_REPLICA_DATABASE', DB_CONFIG['database'])
+    } if os.environ.get('DB_REPLICA_HOST') else None
+    DB_REPLICA_POOL_SIZE = int(os.environ.get('DB_REPLICA_POOL_SIZE', 10))
+    DB_REPLICA_RETRY_SECONDS = int(os.environ.get('DB_REPLICA_RETRY_SECONDS', 30))  # Back-off after a replica failure
+    READ_YOUR_WRITES_SECONDS = int(os.environ.get('READ_YOUR_WRITES_SECONDS', 10))
+
+    # Overdue loan detection. Schedule 'flask --app app mark-overdue-loans' to run daily
+    # (cron / Task Scheduler). An approved loan becomes 'overdue' when it has had no payment
+    # (or, with no payments yet, was started) more than OVERDUE_GRACE_DAYS ago.
+    OVERDUE_GRACE_DAYS = int(os.environ.get('OVERDUE_GRACE_DAYS', 45))
+    OVERDUE_BATCH_SIZE = int(os.environ.get('OVERDUE_BATCH_SIZE', 500))  # Loans updated per transaction
+
+    # Cache backend for group settings, user rows, report results and rendered fragments.
+    # 'memory' keeps a separate LRU cache in every worker; 'redis' shares one cache between all
+    # workers and nodes (needs the redis package), so a change invalidates it everywhere at once.
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')  # 'memory' or 'redis'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'bachat:')  # Lets several apps share one server
+    CACHE_SOCKET_TIMEOUT = float(os.environ.get('CACHE_SOCKET_TIMEOUT', 0.5))  # Seconds; a slow cache is a miss
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 10000))  # Memory backend only, per worker
+
+    # Multi-group tenancy. Each self-help group's settings row (fine, interest rate,
+    # contribution, payment period) is cached per group. Updates invalidate it immediately on a
+    # shared backend; with the memory backend other workers pick them up within the TTL.
+    GROUP_SETTINGS_CACHE_TTL = int(os.environ.get('GROUP_SETTINGS_CACHE_TTL', 300))  # Seconds
+
+    # With a shared backend the login check's user row (role, group, data version) is cached until
+    # the next write in the user's group. Report results are cached the same way on any backend;
+    # with the memory backend other workers may show a report up to REPORT_CACHE_TTL old.
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 300))  # Seconds
+    REPORT_CACHE_TTL = int(os.environ.get('REPORT_CACHE_TTL', 600))  # Seconds
+
+    # Layout fragments marked with {% cache %} in the templates (navigation bar, footer) are
+    # rendered once per key and kept in the cache backend. Compiled templates are stored on disk
+    # so new workers skip parsing them, in JINJA_BYTECODE_CACHE_DIR (default: jinja_cache in the
+    # Flask instance folder); set it to '' to turn that off.
+    FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+    FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))  # Seconds
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+
+    # Static files get content-hash names at startup and are served with a one-year immutable
+    # Cache-Control, plus gzip/brotli variants. Images are recompressed and scaled copies are made
+    # for STATIC_IMAGE_WIDTHS (needs Pillow). Restart the app after changing a static file.
+    STATIC_FINGERPRINT = os.environ.get('STATIC_FINGERPRINT', 'true').lower() == 'true'
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 31536000))  # Seconds (one year)
+    STATIC_IMAGE_QUALITY = int(os.environ.get('STATIC_IMAGE_QUALITY', 82))  # JPEG quality for recompressed images
+    STATIC_IMAGE_WIDTHS = [int(width) for width in os.environ.get('STATIC_IMAGE_WIDTHS', '160,320').split(',')
+                           if width.strip()]
+
+    # HTML and JSON responses of at least COMPRESSION_MIN_SIZE bytes are gzip/brotli compressed
+    # for clients that accept it. Turn off when a reverse proxy already compresses responses.
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # Bytes
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))  # 1 (fastest) to 9 (smallest)
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))  # 0 to 11
+
+    # Password hashing runs in a small process pool instead of the request thread.
+    # PASSWORD_HASH_METHOD is a werkzeug method string; after changing it, each user's hash is
+    # replaced at their next successful login. PASSWORD_HASH_WORKERS = 0 hashes inline.
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))  # Processes per app worker
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 16))  # Queued or running hashes
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2))  # Seconds to wait for a slot
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 10))  # Seconds
+    PASSWORD_LOGIN_CONCURRENCY = int(os.environ.get('PASSWORD_LOGIN_CONCURRENCY', 2))  # Logins in flight per username
+    # Bulk member imports hash in a separate pool for the duration of the import
+    PASSWORD_BULK_HASH_WORKERS = int(os.environ.get('PASSWORD_BULK_HASH_WORKERS', os.cpu_count() or 2))
+
+    # Bulk member import (CSV/XLSX): largest file accepted and rows per multi-row INSERT
+    MEMBER_IMPORT_MAX_ROWS = int(os.environ.get('MEMBER_IMPORT_MAX_ROWS', 5000))
+    MEMBER_IMPORT_CHUNK_SIZE = int(os.environ.get('MEMBER_IMPORT_CHUNK_SIZE', 500))
+
+    # Computed contexts of a member's own pages (dashboard, contributions, loans, profile) are
+    # cached per worker on the member's data version, least recently used evicted first.
+    PAGE_CONTEXT_CACHE_SIZE = int(os.environ.get('PAGE_CONTEXT_CACHE_SIZE', 5000))  # Pages kept per worker
+
+    # Monthly member statements (generate-statements command or POST /api/v1/statements/<year>/<month>)
+    # are written as PDFs under STATEMENT_OUTPUT_DIR/group-<id>/<YYYY-MM>/ with a manifest.json.
+    STATEMENT_OUTPUT_DIR = os.environ.get(
+        'STATEMENT_OUTPUT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'statements'))
+    STATEMENT_WORKERS = int(os.environ.get('STATEMENT_WORKERS', os.cpu_count() or 2))  # 0 renders in-process
+    STATEMENT_CHUNK_SIZE = int(os.environ.get('STATEMENT_CHUNK_SIZE', 50))  # Members per pool task
+    # A queued or running run whose status.json has not been updated for this long is taken to have
+    # died with its worker, reported as failed and may be started again
+    STATEMENT_STALE_MINUTES = int(os.environ.get('STATEMENT_STALE_MINUTES', 15))
+
+    # Analyst export (export-ledger command): year-partitioned Parquet files of contributions,
+    # loans and loan_payments, streamed LEDGER_EXPORT_CHUNK_SIZE rows (one row group) at a time.
+    LEDGER_EXPORT_DIR = os.environ.get(
+        'LEDGER_EXPORT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ledger_export'))
+    LEDGER_EXPORT_CHUNK_SIZE = int(os.environ.get('LEDGER_EXPORT_CHUNK_SIZE', 50000))
+    LEDGER_EXPORT_COMPRESSION = os.environ.get('LEDGER_EXPORT_COMPRESSION', 'zstd')
+
+    # Reports engine: 'mysql', or 'snapshot' to run the reports page and its exports on the local
+    # columnar snapshot written by the snapshot-reports command (needs duckdb and pyarrow). A
+    # snapshot older than REPORT_SNAPSHOT_MAX_AGE_MINUTES is ignored and reports use MySQL.
+    REPORT_ENGINE = os.environ.get('REPORT_ENGINE', 'mysql').lower()
+    REPORT_SNAPSHOT_DIR = os.environ.get(
+        'REPORT_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'report_snapshots'))
+    REPORT_SNAPSHOT_MAX_AGE_MINUTES = int(os.environ.get('REPORT_SNAPSHOT_MAX_AGE_MINUTES', 24 * 60))
+
+    # Cash-flow forecast (GET /api/v1/forecast): horizon limits, and how many past months of
+    # contributions set each member's expected payment rate
+    FORECAST_DEFAULT_MONTHS = int(os.environ.get('FORECAST_DEFAULT_MONTHS', 12))
+    FORECAST_MAX_MONTHS = int(os.environ.get('FORECAST_MAX_MONTHS', 36))
+    FORECAST_HISTORY_MONTHS = int(os.environ.get('FORECAST_HISTORY_MONTHS', 12))
+
+    # Money-moving forms (and the sync API) are deduplicated by idempotency key. Stored outcomes
+    # are kept this long; the purge-idempotency-keys command deletes older ones in batches.
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 72))
+    IDEMPOTENCY_PURGE_BATCH_SIZE = int(os.environ.get('IDEMPOTENCY_PURGE_BATCH_SIZE', 1000))  # Rows per DELETE
+
+    # Offline sync (POST /api/v1/sync): limits per upload, and how far the client's cursor is
+    # moved back to catch rows from transactions that committed just after the previous sync.
+    SYNC_MAX_OPERATIONS = int(os.environ.get('SYNC_MAX_OPERATIONS', 1000))  # Operations per request
+    SYNC_MAX_BODY_BYTES = int(os.environ.get('SYNC_MAX_BODY_BYTES', 2 * 1024 * 1024))  # After inflating
+    SYNC_CURSOR_OVERLAP = int(os.environ.get('SYNC_CURSOR_OVERLAP', 5))  # Seconds
+
     # You can add other configurations here, e.g.,
     # MAIL_SERVER = 'smtp.example.com'
     # MAIL_PORT = 587
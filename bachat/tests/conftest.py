@@ -0,0 +1,149 @@
+"""
+Shared fixtures. The app talks to MySQL only through get_db_connection(), so tests swap that
+for a fake pool whose connections answer queries from a script and record whether they were
+returned (closed).
+"""
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault('SESSION_BACKEND', 'memory')
+os.environ.setdefault('CACHE_BACKEND', 'memory')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as bachat_app  # noqa: E402
+
+
+class FakeCursor:
+    """Cursor that answers each fetch from the connection's script and records executed SQL."""
+
+    def __init__(self, conn, options):
+        self.conn = conn
+        self.options = options  # Keyword arguments given to conn.cursor(), e.g. buffered
+        self.closed = False
+        self.rowcount = 0
+        self.lastrowid = 1
+        self.description = ()
+
+    def execute(self, operation, params=None):
+        self.conn.executed.append((operation, params))
+        for statement, error in self.conn.pool.fail_on.items():
+            if operation.lstrip().startswith(statement):
+                raise error
+        self.rowcount = 1
+
+    def executemany(self, operation, seq_params):
+        for params in seq_params:
+            self.execute(operation, params)
+
+    def fetchone(self):
+        return self.conn.answer(None)
+
+    def fetchall(self):
+        return self.conn.answer([])
+
+    def fetchmany(self, size=1):
+        return self.conn.answer([])
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    """Connection handed out by FakePool. close() returns it; closing twice is an error, as in the real pool."""
+
+    def __init__(self, pool):
+        self.pool = pool
+        self.executed = []
+        self.cursors = []
+        self.autocommit = True
+        self.closed = 0
+
+    def answer(self, default):
+        return self.pool.script.pop(0) if self.pool.script else default
+
+    def cursor(self, **options):
+        cursor = FakeCursor(self, options)
+        self.cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        self.pool.commits += 1
+
+    def rollback(self):
+        pass
+
+    def start_transaction(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        self.closed += 1
+        assert self.closed == 1, 'connection returned to the pool twice'
+
+
+class FakePool:
+    """
+    Counts checkouts; script holds the results the next fetchone()/fetchall() calls return, in order,
+    and fail_on maps the start of a statement to the error executing it raises.
+    """
+
+    def __init__(self):
+        self.connections = []
+        self.script = []
+        self.fail_on = {}
+        self.commits = 0
+
+    def get_connection(self):
+        conn = FakeConnection(self)
+        self.connections.append(conn)
+        return conn
+
+    def leaked(self):
+        return [conn for conn in self.connections if conn.closed != 1]
+
+
+PRESIDENT = dict(id=1, role='president', group_id=5, data_version=1, name='P', username='p')
+
+
+@pytest.fixture
+def app_module():
+    return bachat_app
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    fake = FakePool()
+    monkeypatch.setattr(bachat_app, 'get_db_connection', fake.get_connection)
+    monkeypatch.setattr(bachat_app, 'run_hot_query_one', lambda conn, name, params: dict(PRESIDENT))
+    return fake
+
+
+@pytest.fixture
+def primary_pool(monkeypatch):
+    """Like pool, but routes go through the real get_db_connection(), which checks out from the fake pool."""
+    fake = FakePool()
+    monkeypatch.setattr(bachat_app, 'get_db_pool', lambda: fake)
+    monkeypatch.setattr(bachat_app, 'run_hot_query_one', lambda conn, name, params: dict(PRESIDENT))
+    return fake
+
+
+@pytest.fixture
+def client():
+    bachat_app.app.config['TESTING'] = True
+    return bachat_app.app.test_client()
+
+
+@pytest.fixture
+def president(client):
+    """Test client logged in as the president of group 5."""
+    with client.session_transaction() as sess:
+        sess['user_id'] = PRESIDENT['id']
+        sess['group_id'] = PRESIDENT['group_id']
+        sess['role'] = PRESIDENT['role']
+        sess['name'] = PRESIDENT['name']
+        sess['username'] = PRESIDENT['username']
+    return client
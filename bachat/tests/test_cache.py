@@ -0,0 +1,37 @@
+"""The group cache is only invalidated after a write commits; backends implement the whole interface."""
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def invalidated(app_module, monkeypatch):
+    calls = []
+    monkeypatch.setattr(app_module, 'invalidate_group_cache', calls.append)
+    return calls
+
+
+def test_rejected_post_keeps_group_cache(president, primary_pool, invalidated):
+    response = president.post('/bank_balance', data={'action': 'deposit', 'amount': 'abc'})
+    assert response.status_code == 302
+    assert invalidated == []
+
+
+def test_committed_post_invalidates_group_cache(president, primary_pool, invalidated):
+    primary_pool.script = [(Decimal('0.00'),)]
+    response = president.post('/bank_balance', data={'action': 'deposit', 'amount': '10'})
+    assert response.status_code == 302
+    assert primary_pool.commits == 1
+    assert invalidated == [5]
+
+
+def test_cache_backend_is_abstract(app_module):
+    with pytest.raises(TypeError):
+        app_module.CacheBackend()
+
+    class Partial(app_module.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
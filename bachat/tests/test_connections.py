@@ -0,0 +1,120 @@
+"""Every route must hand its pooled connection back, including on validation and not-found returns."""
+from decimal import Decimal
+
+import pytest
+
+
+def assert_all_returned(pool):
+    assert pool.connections, 'route never checked out a connection'
+    assert not pool.leaked()
+
+
+def test_approve_loan_not_found(president, pool):
+    response = president.get('/approve_loan/7')
+    assert response.status_code == 302
+    assert_all_returned(pool)
+
+
+def test_disburse_loan_not_found(president, pool):
+    response = president.post('/disburse_loan/7', data={'transaction_type': 'cash'})
+    assert response.status_code == 302
+    assert_all_returned(pool)
+
+
+@pytest.mark.parametrize('form', [
+    {'transaction_type': 'cash', 'notes_500': '-1'},
+    {'transaction_type': 'cash', 'notes_500': 'x'},
+    {'transaction_type': 'cash', 'notes_500': '1'},
+    {'transaction_type': 'cheque', 'cheque_number': '12'},
+])
+def test_disburse_loan_invalid_details(president, pool, form):
+    pool.script = [(Decimal('1000.00'),)]
+    response = president.post('/disburse_loan/7', data=form)
+    assert response.status_code == 302
+    assert '/approve_loan/7' in response.headers['Location']
+    assert_all_returned(pool)
+
+
+@pytest.mark.parametrize('form', [
+    {'action': 'deposit'},
+    {'action': 'deposit', 'amount': 'abc'},
+    {'action': 'deposit', 'amount': '-5'},
+    {'action': 'withdraw', 'amount': '5'},
+    {'action': 'transfer', 'amount': '5'},
+])
+def test_bank_balance_rejected_posts(president, pool, form):
+    pool.script = [(Decimal('0.00'),)]
+    response = president.post('/bank_balance', data=form)
+    assert response.status_code == 302
+    assert pool.commits == 0
+    assert_all_returned(pool)
+
+
+def test_edit_member_not_found(president, pool):
+    response = president.get('/edit_member/9')
+    assert response.status_code == 302
+    assert_all_returned(pool)
+
+
+def test_review_loan_not_found(president, pool):
+    response = president.get('/review_loan/7')
+    assert response.status_code == 302
+    assert_all_returned(pool)
+
+
+def test_login_returns_connection_when_hashing_fails(client, pool, app_module, monkeypatch):
+    def busy(*args):
+        raise app_module.PasswordHashingBusy()
+
+    monkeypatch.setattr(app_module, 'verify_password', busy)
+    pool.script = [dict(id=1, group_id=5, username='p', password='pbkdf2:sha256:1$s$h', role='member', name='P')]
+    response = client.post('/login', data={'username': 'p', 'password': 'secret'})
+    assert response.status_code == 302  # "Too many logins" redirect back to the form
+    assert_all_returned(pool)
+
+
+def test_api_login_returns_connection_when_hashing_fails(client, pool, app_module, monkeypatch):
+    def busy(*args):
+        raise app_module.PasswordHashingBusy()
+
+    monkeypatch.setattr(app_module, 'verify_password', busy)
+    pool.script = [dict(id=1, group_id=5, username='p', password='pbkdf2:sha256:1$s$h', role='member', name='P')]
+    response = client.post('/api/v1/login', json={'username': 'p', 'password': 'secret'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert_all_returned(pool)
+
+
+def test_export_report_without_data(president, pool, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'open_report_snapshot', lambda: None)
+    response = president.post('/export_report/csv', data={'report_type': 'unknown'})
+    assert response.status_code == 302
+    assert_all_returned(pool)
+
+
+def test_checkout_waits_for_a_returned_connection(app_module, monkeypatch):
+    import mysql.connector
+
+    attempts = []
+
+    class BusyPool:
+        def get_connection(self):
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise mysql.connector.errors.PoolError('Failed getting connection; pool exhausted')
+            return 'conn'
+
+    assert app_module.checkout_connection(BusyPool()) == 'conn'
+    assert len(attempts) == 3
+
+
+def test_checkout_gives_up_after_timeout(app_module, monkeypatch):
+    import mysql.connector
+
+    class EmptyPool:
+        def get_connection(self):
+            raise mysql.connector.errors.PoolError('Failed getting connection; pool exhausted')
+
+    monkeypatch.setitem(app_module.app.config, 'DB_POOL_CHECKOUT_TIMEOUT', 0.05)
+    with pytest.raises(mysql.connector.errors.PoolError):
+        app_module.checkout_connection(EmptyPool())
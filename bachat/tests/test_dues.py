@@ -0,0 +1,28 @@
+"""compute_member_dues: stored monthly dues and on-the-fly interest are combined per loan."""
+from decimal import Decimal
+
+
+def hot_query(conn, name, params):
+    if name == 'loan_payment_summary':
+        return dict(total_paid=Decimal('2000.00'), total_interest_paid_from_payments=Decimal('0.00'))
+    return None
+
+
+def test_loans_without_a_stored_due_are_added_to_stored_dues(pool, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_hot_query_one', hot_query)
+    monkeypatch.setattr(app_module, 'get_group_settings', lambda conn, group_id: None)
+    pool.script = [[
+        dict(id=1, amount=Decimal('5000.00'), interest_rate=Decimal('12.00'), stored_interest_due=Decimal('50.00')),
+        dict(id=2, amount=Decimal('14000.00'), interest_rate=Decimal('12.00'), stored_interest_due=None),
+    ]]
+    conn = pool.get_connection()
+    dues = app_module.compute_member_dues(conn, 3, 5)
+    # Loan 1 as stored by the close batch, loan 2 (disbursed since) at 1% a month on 12000.00
+    assert dues['total_monthly_loan_interest_due'] == Decimal('170.00')
+
+
+def test_no_active_loans(pool, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'run_hot_query_one', hot_query)
+    monkeypatch.setattr(app_module, 'get_group_settings', lambda conn, group_id: None)
+    dues = app_module.compute_member_dues(pool.get_connection(), 3, 5)
+    assert dues['total_monthly_loan_interest_due'] == 0
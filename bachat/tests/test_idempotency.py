@@ -0,0 +1,63 @@
+"""Form submissions with an idempotency key run once; a re-sent key replays the first outcome."""
+import hashlib
+import json
+
+import mysql.connector
+import pytest
+
+FORM = {'action': 'deposit', 'amount': '10'}
+KEY = 'form-key-0001'
+
+
+def fingerprint(path, form):
+    return hashlib.sha256(json.dumps([path, sorted(form.items())]).encode()).hexdigest()
+
+
+@pytest.fixture
+def key_taken(pool):
+    """The INSERT that claims the key hits the unique index: the key was used before."""
+    pool.fail_on['INSERT INTO idempotency_keys'] = mysql.connector.IntegrityError('Duplicate entry')
+    return pool
+
+
+def stored_key(response, endpoint='bank_balance'):
+    return {'id': 1, 'endpoint': endpoint, 'response': response, 'expired': 0}
+
+
+def test_replay_returns_first_outcome_without_running_view(president, key_taken):
+    first = {'fingerprint': fingerprint('/bank_balance', FORM), 'status': 302, 'location': '/bank_balance',
+             'flashes': [['success', 'Deposited 10.00 into bank balance.']]}
+    key_taken.script = [stored_key(json.dumps(first))]
+    response = president.post('/bank_balance', data=dict(FORM, idempotency_key=KEY))
+    assert response.status_code == 302
+    assert response.headers['Idempotent-Replayed'] == 'true'
+    assert key_taken.commits == 0
+    assert not any('UPDATE bank_balance' in sql for conn in key_taken.connections for sql, params in conn.executed)
+    assert not key_taken.leaked()
+
+
+def test_key_reused_with_different_details(president, key_taken):
+    first = {'fingerprint': fingerprint('/bank_balance', {'action': 'withdraw', 'amount': '10'}), 'status': 302,
+             'location': '/bank_balance', 'flashes': []}
+    key_taken.script = [stored_key(json.dumps(first))]
+    response = president.post('/bank_balance', data=dict(FORM, idempotency_key=KEY))
+    assert response.status_code == 302
+    assert 'Idempotent-Replayed' not in response.headers
+    assert key_taken.commits == 0
+
+
+def test_pending_key_does_not_run_view_again(president, key_taken):
+    key_taken.script = [stored_key('')]
+    response = president.post('/bank_balance', data=dict(FORM, idempotency_key=KEY))
+    assert response.status_code == 302
+    assert key_taken.commits == 0
+    assert not key_taken.leaked()
+
+
+def test_new_key_runs_view_and_stores_outcome(president, pool):
+    pool.script = [(0,)]
+    response = president.post('/bank_balance', data=dict(FORM, idempotency_key=KEY))
+    assert response.status_code == 302
+    executed = [sql for conn in pool.connections for sql, params in conn.executed]
+    assert any(sql.startswith('UPDATE idempotency_keys SET response') for sql in executed)
+    assert not pool.leaked()
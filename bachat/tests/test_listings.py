@@ -0,0 +1,29 @@
+"""Listing and report pages: streamed cursors are always closed, report cursors are buffered."""
+import pytest
+
+
+@pytest.mark.parametrize('path', ['/loans', '/members'])
+def test_streamed_listing_closes_cursor_when_rendering_fails(president, pool, app_module, monkeypatch, path):
+    def broken_template(*args, **kwargs):
+        raise RuntimeError('template error')
+
+    monkeypatch.setattr(app_module, 'render_template', broken_template)
+    with pytest.raises(RuntimeError):
+        president.get(path)
+    assert not pool.leaked()
+    assert all(cursor.closed for conn in pool.connections for cursor in conn.cursors)
+
+
+@pytest.mark.parametrize('path', ['/loans', '/members'])
+def test_streamed_listing_renders(president, pool, path):
+    assert president.get(path).status_code == 200
+    assert not pool.leaked()
+
+
+def test_report_cursor_is_buffered_when_streaming(president, pool, app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'STREAM_LARGE_RESULTS', True)
+    monkeypatch.setattr(app_module, 'open_report_snapshot', lambda: None)
+    president.post('/reports', data={'report_type': 'monthly_contributions', 'month': '1', 'year': '2024'})
+    conn = pool.connections[-1]
+    assert all(cursor.options.get('buffered') for cursor in conn.cursors)
+    assert not pool.leaked()
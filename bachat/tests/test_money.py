@@ -0,0 +1,87 @@
+"""Money and the paise helpers give the same results as the Decimal formulas they replaced."""
+import random
+from decimal import Decimal, ROUND_HALF_UP
+from fractions import Fraction
+
+import pytest
+
+from app import Money, interest_paise, paise_to_decimal, to_paise
+
+CENTS = Decimal('0.01')
+
+
+def decimal_interest(amount, rate, periods=1, periods_per_year=12):
+    """The previous formula: the rate divided down in Decimal, then quantized half-up."""
+    return (amount * (rate / Decimal('100') / Decimal(periods_per_year)) * periods).quantize(
+        CENTS, rounding=ROUND_HALF_UP)
+
+
+def is_exact_tie(amount, rate, periods, periods_per_year):
+    """True when the exact interest is a half paisa, where the 28-digit Decimal quotient could round down."""
+    exact = Fraction(amount) * Fraction(rate) * periods / (100 * periods_per_year)
+    return (exact * 100) % 1 == Fraction(1, 2)
+
+
+def random_cases(count, seed=2025):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield (Decimal(rng.randint(0, 50000000)).scaleb(-2), Decimal(rng.randint(0, 5000000)).scaleb(-2),
+               Decimal(rng.randint(0, 500000)).scaleb(-2), Decimal(rng.randint(0, 10000)).scaleb(-2),
+               rng.randint(0, 1000), Decimal(rng.randint(0, 100000)).scaleb(-2))
+
+
+def test_interest_matches_decimal():
+    for principal, total_paid, paid_interest, rate, days, fine in random_cases(20000):
+        outstanding = principal - (total_paid - paid_interest)
+        paise = to_paise(principal) - (to_paise(total_paid) - to_paise(paid_interest))
+        assert paise_to_decimal(paise) == outstanding
+        for periods, periods_per_year in ((1, 12), (days, 365)):
+            expected = decimal_interest(outstanding, rate, periods, periods_per_year)
+            actual = paise_to_decimal(interest_paise(paise, rate, periods, periods_per_year))
+            if actual != expected:
+                assert is_exact_tie(outstanding, rate, periods, periods_per_year)
+                assert abs(actual - expected) == CENTS
+            assert Money(paise).interest(rate, periods, periods_per_year).to_decimal() == actual
+
+
+def test_sums_match_decimal():
+    for principal, total_paid, paid_interest, rate, days, fine in random_cases(2000, seed=7):
+        expected = principal + fine - total_paid
+        assert (Money.from_decimal(principal) + fine - Money.from_decimal(total_paid)).to_decimal() == expected
+        assert (Money(50000) * days + Money(10000) * 3).to_decimal() == Decimal(500) * days + Decimal(300)
+
+
+@pytest.mark.parametrize('value, paise', [
+    (Decimal('12.345'), 1235), (Decimal('-12.345'), -1235), (Decimal('12.344'), 1234),
+    ('0.005', 1), (7, 700), (None, 0), (Decimal('1E+2'), 10000),
+])
+def test_to_paise_rounds_half_away_from_zero(value, paise):
+    assert to_paise(value) == paise
+    if value is not None:
+        assert to_paise(value) == int(Decimal(value).quantize(CENTS, rounding=ROUND_HALF_UP) * 100)
+
+
+def test_negative_interest_rounds_like_decimal():
+    for paise in range(-2000, 0, 7):
+        expected = decimal_interest(paise_to_decimal(paise), Decimal('13.5'))
+        assert paise_to_decimal(interest_paise(paise, Decimal('13.5'))) == expected
+
+
+def test_comparisons():
+    assert Money(100) == Decimal('1.00')
+    assert Money(100) == 1
+    assert Money(0) == 0
+    assert Money(1) > 0
+    assert Money(-1) < Money(0)
+    assert Money(100) != Money(101)
+
+
+def test_not_equal_to_none_or_other_types():
+    assert Money(0) != None  # noqa: E711
+    assert not (Money(0) == None)  # noqa: E711
+    assert Money(0) != 'abc'
+    assert Money(0).__eq__(None) is NotImplemented
+    with pytest.raises(TypeError):
+        Money(0) + None
+    with pytest.raises(TypeError):
+        Money(0) < None
@@ -0,0 +1,30 @@
+"""Password rehash detection and the order of checks in register()."""
+import pytest
+from werkzeug.security import generate_password_hash
+
+
+@pytest.mark.parametrize('configured, stored_method, needs_rehash', [
+    ('pbkdf2:sha256', 'pbkdf2:sha256', False),
+    ('pbkdf2', 'pbkdf2:sha256', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256:600000', False),
+    ('pbkdf2:sha256:600000', 'pbkdf2:sha256', True),
+    ('scrypt', 'scrypt', False),
+    ('scrypt:32768:8:1', 'scrypt', False),
+    ('scrypt:16384:8:1', 'scrypt', True),
+    ('scrypt', 'pbkdf2:sha256:1000', True),
+])
+def test_password_needs_rehash(app_module, monkeypatch, configured, stored_method, needs_rehash):
+    monkeypatch.setitem(app_module.app.config, 'PASSWORD_HASH_METHOD', configured)
+    stored = generate_password_hash('secret', method=stored_method)
+    assert app_module.password_needs_rehash(stored) is needs_rehash
+
+
+def test_register_checks_group_code_before_hashing(client, pool, app_module, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(app_module, 'hash_password', lambda password: hashed.append(password) or 'hashed')
+    response = client.post('/register', data={
+        'name': 'M', 'username': 'm', 'email': 'm@example.com', 'contact_number': '1', 'pan_number': 'P',
+        'aadhar_number': 'A', 'password': 'secret', 'group_code': 'NOPE'})
+    assert b'Unknown group code' in response.data
+    assert hashed == []
+    assert not pool.leaked()
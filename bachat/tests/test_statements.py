@@ -0,0 +1,102 @@
+"""Statement run status: a run whose worker died does not block the month forever."""
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+
+@pytest.fixture
+def run_dir(tmp_path, app_module, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'STATEMENT_OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr(app_module, '_run_statement_job', lambda group_id, month, year: None)
+    path = app_module.statement_run_dir(5, 2024, 4)
+    os.makedirs(path)
+    return path
+
+
+def write_status(run_dir, state, updated_minutes_ago):
+    status = {'group_id': 5, 'year': 2024, 'month': 4, 'state': state, 'total': 10, 'done': 3, 'failed': 0,
+              'updated_at': (datetime.now() - timedelta(minutes=updated_minutes_ago)).isoformat()}
+    with open(os.path.join(run_dir, 'status.json'), 'w', encoding='utf-8') as status_file:
+        json.dump(status, status_file)
+
+
+def test_stale_running_status_is_reported_failed(president, pool, run_dir):
+    write_status(run_dir, 'running', updated_minutes_ago=60)
+    response = president.get('/api/v1/statements/2024/4')
+    assert response.get_json()['state'] == 'failed'
+
+
+def test_stale_run_can_be_started_again(president, pool, run_dir, app_module):
+    if not app_module.PDF_AVAILABLE:
+        pytest.skip('reportlab is not installed')
+    write_status(run_dir, 'running', updated_minutes_ago=60)
+    assert president.post('/api/v1/statements/2024/4').status_code == 202
+
+
+def test_active_run_blocks_a_second_start(president, pool, run_dir, app_module):
+    if not app_module.PDF_AVAILABLE:
+        pytest.skip('reportlab is not installed')
+    write_status(run_dir, 'running', updated_minutes_ago=1)
+    assert president.post('/api/v1/statements/2024/4').status_code == 409
+    assert president.get('/api/v1/statements/2024/4').get_json()['state'] == 'running'
+
+
+def test_concurrent_starts_claim_one_run(run_dir, app_module):
+    start = threading.Barrier(8)
+
+    def claim():
+        start.wait()
+        return app_module.claim_statement_run(5, 2024, 4)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        claims = list(executor.map(lambda _: claim(), range(8)))
+    assert len([status for status in claims if status is not None]) == 1
+    assert not os.path.exists(os.path.join(run_dir, 'run.lock'))
+
+
+def test_start_in_progress_elsewhere_blocks_a_second_start(president, pool, run_dir, app_module):
+    if not app_module.PDF_AVAILABLE:
+        pytest.skip('reportlab is not installed')
+    open(os.path.join(run_dir, 'run.lock'), 'w').close()
+    assert president.post('/api/v1/statements/2024/4').status_code == 409
+    assert os.path.exists(os.path.join(run_dir, 'run.lock'))
+
+
+def test_lock_left_by_a_killed_process_goes_once_stale(run_dir, app_module):
+    lock_path = os.path.join(run_dir, 'run.lock')
+    open(lock_path, 'w').close()
+    an_hour_ago = time.time() - 3600
+    os.utime(lock_path, (an_hour_ago, an_hour_ago))
+    assert app_module.claim_statement_run(5, 2024, 4) is None
+    assert app_module.claim_statement_run(5, 2024, 4)['state'] == 'queued'
+
+
+def test_status_does_not_expose_server_paths(president, pool, run_dir):
+    write_status(run_dir, 'finished', updated_minutes_ago=1)
+    body = president.get('/api/v1/statements/2024/4').get_json()
+    assert body['state'] == 'finished'
+    assert 'output_dir' not in body
+    assert run_dir not in json.dumps(body)
+
+
+def test_statement_amounts_use_a_printable_currency(tmp_path, app_module, monkeypatch):
+    if not app_module.PDF_AVAILABLE:
+        pytest.skip('reportlab is not installed')
+    import reportlab.rl_config
+    monkeypatch.setattr(reportlab.rl_config, 'pageCompression', 0)  # Keep the page text readable
+    member = dict(id=7, name='M', username='m', email='m@example.com', contact_number='1')
+    contribution = dict(month=4, year=2024, amount=Decimal('12.00'), fine_amount=None, status='paid',
+                        payment_date=None, utr_number=None)
+    statement = {'member': member, 'contributions': [contribution], 'loans': [],
+                 'total_contributed': Decimal('12.00')}
+    [entry] = app_module.render_statement_chunk(str(tmp_path), 'G', 'April 2024', [statement])
+    assert entry['status'] == 'ok'
+    content = (tmp_path / entry['file']).read_bytes()
+    assert b'Rs. 12.00' in content
+    assert b'ZapfDingbats' not in content  # Where Helvetica sends characters it has no glyph for
@@ -0,0 +1,68 @@
+"""Offline sync: deletions reach the client as tombstones, and operation keys replay safely."""
+import json
+from datetime import datetime
+
+SERVER_TIME = {'server_time': datetime(2024, 5, 3, 10, 0, 0)}
+NO_CHANGES = [[], [], []]  # contributions, loans, loan payments
+
+
+def sync(client, payload):
+    return client.post('/api/v1/sync', json=payload)
+
+
+def test_delete_contribution_writes_tombstone_first(president, pool):
+    pool.script = [(False, 3)]  # Pending contribution of member 3
+    response = president.post('/delete_contribution/7')
+    assert response.status_code == 302
+    statements = [sql.split()[0:3] for sql, params in pool.connections[-1].executed]
+    assert statements.index(['INSERT', 'INTO', 'deleted_rows']) < statements.index(['DELETE', 'FROM', 'contributions'])
+    assert pool.commits == 1
+
+
+def test_delete_member_writes_tombstones_for_cascaded_rows(president, pool):
+    president.post('/delete_member/3')
+    tombstones = [params[0] for sql, params in pool.connections[-1].executed if 'INTO deleted_rows' in sql]
+    assert tombstones == ['contributions', 'loans', 'loan_payments']
+
+
+def test_pull_after_delete_returns_tombstones(president, pool):
+    pool.script = [SERVER_TIME, *NO_CHANGES, [{'table_name': 'contributions', 'row_id': 7}]]
+    response = sync(president, {'cursor': '2024-05-01T00:00:00', 'operations': []})
+    assert response.status_code == 200
+    assert response.get_json()['changes']['deleted'] == [{'table': 'contributions', 'id': 7}]
+    assert not pool.leaked()
+
+
+def test_first_pull_has_no_tombstones(president, pool):
+    pool.script = [SERVER_TIME, *NO_CHANGES]
+    response = sync(president, {'cursor': None, 'operations': []})
+    assert response.get_json()['changes']['deleted'] == []
+    assert not any('deleted_rows' in sql for sql, params in pool.connections[-1].executed)
+
+
+def test_replayed_operation_key(president, pool):
+    stored = {'key': 'op-key-0001', 'status': 'applied', 'type': 'contribution'}
+    pool.script = [[{'idempotency_key': 'op-key-0001', 'endpoint': 'api_sync', 'response': json.dumps(stored)}],
+                   SERVER_TIME, *NO_CHANGES]
+    response = sync(president, {'cursor': None, 'operations': [
+        {'key': 'op-key-0001', 'type': 'contribution', 'amount': '150.00', 'utr_number': 'U1'}]})
+    assert response.status_code == 200
+    assert response.get_json()['results'] == [dict(stored, replayed=True)]
+    assert pool.commits == 0
+    assert not pool.leaked()
+
+
+def test_key_pending_on_a_form_submission(president, pool):
+    pool.script = [[{'idempotency_key': 'op-key-0001', 'endpoint': 'bank_balance', 'response': ''}]]
+    response = sync(president, {'operations': [{'key': 'op-key-0001', 'type': 'contribution', 'amount': '1'}]})
+    assert response.status_code == 409
+    assert response.headers['Retry-After'] == '1'
+    assert not pool.leaked()
+
+
+def test_key_used_by_another_endpoint(president, pool):
+    pool.script = [[{'idempotency_key': 'op-key-0001', 'endpoint': 'bank_balance',
+                     'response': json.dumps({'status': 302, 'location': '/bank_balance', 'flashes': []})}]]
+    response = sync(president, {'operations': [{'key': 'op-key-0001', 'type': 'contribution', 'amount': '1'}]})
+    assert response.status_code == 422
+    assert not pool.leaked()
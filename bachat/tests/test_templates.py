@@ -0,0 +1,18 @@
+"""Compiled-template cache location."""
+import os
+
+from jinja2 import DictLoader, Environment
+
+
+def test_bytecode_cache_directory_is_created_on_first_store(tmp_path, app_module):
+    directory = tmp_path / 'jinja_cache'
+    environment = Environment(loader=DictLoader({'page.html': 'Hello {{ name }}'}),
+                              bytecode_cache=app_module.LazyFileSystemBytecodeCache(str(directory)))
+    assert not directory.exists()
+    assert environment.get_template('page.html').render(name='there') == 'Hello there'
+    assert os.listdir(directory)
+
+
+def test_bytecode_cache_defaults_to_instance_folder(app_module):
+    cache = app_module.app.jinja_env.bytecode_cache
+    assert cache.directory == os.path.join(app_module.app.instance_path, 'jinja_cache')
@@ -0,0 +1,38 @@
+"""Self-registration cannot choose a role, and ids from another group are rejected."""
+import pytest
+
+
+def test_register_cannot_set_role(client, pool, app_module, monkeypatch):
+    monkeypatch.setattr(app_module, 'hash_password', lambda password: 'hashed')
+    pool.script = [(5,)]  # savings_groups lookup for the group code
+    response = client.post('/register', data={
+        'name': 'M', 'username': 'm', 'email': 'm@example.com', 'contact_number': '1', 'pan_number': 'P',
+        'aadhar_number': 'A', 'password': 'secret', 'group_code': 'G1', 'role': 'president'})
+    assert response.status_code == 302
+    insert = [params for sql, params in pool.connections[-1].executed if sql.startswith('INSERT INTO users')]
+    assert insert and insert[0][-1] == 'member'
+    assert not pool.leaked()
+
+
+def test_register_form_has_no_role_field(client):
+    assert b'name="role"' not in client.get('/register').data
+
+
+@pytest.mark.parametrize('report_type', ['member_contributions', 'member_loans'])
+def test_report_for_member_of_another_group(president, pool, app_module, monkeypatch, report_type):
+    monkeypatch.setattr(app_module, 'open_report_snapshot', lambda: None)
+    response = president.post('/reports', data={'report_type': report_type, 'member_id': '99'})
+    assert response.status_code == 200
+    assert b'Member not found.' in response.data
+    member_queries = [sql for conn in pool.connections for sql, params in conn.executed if params and '99' in params]
+    assert member_queries == ["SELECT name FROM users WHERE id = %s AND group_id = %s"]
+    assert not pool.leaked()
+
+
+@pytest.mark.parametrize('report_type', ['member_contributions', 'member_loans'])
+def test_export_for_member_of_another_group(president, pool, app_module, monkeypatch, report_type):
+    monkeypatch.setattr(app_module, 'open_report_snapshot', lambda: None)
+    response = president.post('/export_report/csv', data={'report_type': report_type, 'member_id': '99'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/reports')
+    assert not pool.leaked()